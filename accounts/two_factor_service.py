@@ -4,17 +4,15 @@ Service d'authentification à 2 facteurs (2FA)
 import base64
 import io
 import logging
-import random
 import secrets
-import string
 
 import pyotp
-import qrcode
 from django.conf import settings
-from django.core.cache import cache
 from django.core.mail import send_mail
 from django.utils import timezone
 
+from two_factor_auth.services import TwoFactorVerificationService
+
 logger = logging.getLogger(__name__)
 
 
@@ -31,15 +29,11 @@ class TwoFactorService:
         return pyotp.random_base32()
 
     @staticmethod
-    def generate_backup_codes(count=10):
+    def generate_backup_codes(user, count=10):
         """
-        Générer des codes de secours
+        Générer des codes de secours (seules leurs empreintes sont conservées)
         """
-        codes = []
-        for _ in range(count):
-            code = "".join(random.choices(string.ascii_uppercase + string.digits, k=8))
-            codes.append(code)
-        return codes
+        return TwoFactorVerificationService.generate_backup_codes(user, count)
 
     @staticmethod
     def generate_qr_code(user, secret):
@@ -50,6 +44,8 @@ class TwoFactorService:
             name=user.email, issuer_name="KefyStore"
         )
 
+        import qrcode
+
         qr = qrcode.QRCode(version=1, box_size=10, border=5)
         qr.add_data(totp_uri)
         qr.make(fit=True)
@@ -81,16 +77,12 @@ class TwoFactorService:
         Envoyer un code de vérification par SMS
         """
         try:
-            message = f"Votre code de vérification KefyStore: {code}. Ce code expire dans 5 minutes."
+            message = f"Votre code de vérification KefyStore: {code}. Ce code expire dans 10 minutes."
 
             # Simulation d'envoi SMS
             # Dans un vrai projet, vous utiliseriez un service SMS comme Twilio
             logger.info(f"SMS envoyé à {phone_number}: {message}")
 
-            # Stocker le code dans le cache avec expiration
-            cache_key = f"sms_code_{phone_number}"
-            cache.set(cache_key, code, timeout=300)  # 5 minutes
-
             return True
         except Exception as e:
             logger.error(f"Erreur lors de l'envoi SMS: {str(e)}")
@@ -113,7 +105,7 @@ class TwoFactorService:
 
             Votre code de vérification pour KefyStore est: {code}
 
-            Ce code expire dans 5 minutes.
+            Ce code expire dans 15 minutes.
 
             Si vous n'avez pas demandé ce code, ignorez cet email.
 
@@ -145,7 +137,7 @@ class TwoFactorService:
                                 {code}
                             </div>
                         </div>
-                        <p style="color: #666; font-size: 14px;">Ce code expire dans 5 minutes.</p>
+                        <p style="color: #666; font-size: 14px;">Ce code expire dans 15 minutes.</p>
                         <p style="color: #666; font-size: 14px;">Si vous n'avez pas demandé ce code, ignorez cet email.</p>
                         <p>Cordialement,<br>L'équipe KefyStore</p>
                     </div>
@@ -164,10 +156,6 @@ class TwoFactorService:
             msg.attach_alternative(html_content, "text/html")
             msg.send()
 
-            # Stocker le code dans le cache avec expiration
-            cache_key = f"email_code_{email}"
-            cache.set(cache_key, code, timeout=300)  # 5 minutes
-
             logger.info(f"Code de vérification envoyé par email à {email}")
             return True
         except Exception as e:
@@ -175,48 +163,25 @@ class TwoFactorService:
             return False
 
     @staticmethod
-    def generate_verification_code():
-        """
-        Générer un code de vérification à 6 chiffres
-        """
-        return str(random.randint(100000, 999999))
-
-    @staticmethod
-    def verify_sms_code(phone_number, code):
+    def verify_sms_code(user, code):
         """
-        Vérifier un code SMS
+        Vérifier un code SMS (stocké en base, partagé entre les workers)
         """
-        cache_key = f"sms_code_{phone_number}"
-        stored_code = cache.get(cache_key)
-
-        if stored_code and stored_code == code:
-            cache.delete(cache_key)
-            return True
-        return False
+        return TwoFactorVerificationService.verify_code(user, "sms", code)
 
     @staticmethod
-    def verify_email_code(email, code):
+    def verify_email_code(user, code):
         """
-        Vérifier un code email
+        Vérifier un code email (stocké en base, partagé entre les workers)
         """
-        cache_key = f"email_code_{email}"
-        stored_code = cache.get(cache_key)
-
-        if stored_code and stored_code == code:
-            cache.delete(cache_key)
-            return True
-        return False
+        return TwoFactorVerificationService.verify_code(user, "email", code)
 
     @staticmethod
     def verify_backup_code(user, code):
         """
         Vérifier un code de secours
         """
-        if code in user.backup_codes:
-            user.backup_codes.remove(code)
-            user.save()
-            return True
-        return False
+        return TwoFactorVerificationService.verify_backup_code(user, code)
 
     @staticmethod
     def setup_2fa(user, method="totp"):
@@ -228,14 +193,14 @@ class TwoFactorService:
                 secret = TwoFactorService.generate_secret()
                 user.two_factor_secret = secret
                 user.two_factor_enabled = True
-                user.backup_codes = TwoFactorService.generate_backup_codes()
+                user.backup_codes = []
                 user.save()
 
                 return {
                     "success": True,
                     "secret": secret,
                     "qr_code": TwoFactorService.generate_qr_code(user, secret),
-                    "backup_codes": user.backup_codes,
+                    "backup_codes": TwoFactorService.generate_backup_codes(user),
                 }
 
             elif method == "sms":
@@ -273,6 +238,7 @@ class TwoFactorService:
             user.two_factor_secret = None
             user.backup_codes = []
             user.save()
+            TwoFactorVerificationService.reset(user)
             return True
         except Exception as e:
             logger.error(f"Erreur lors de la désactivation 2FA: {str(e)}")
@@ -288,15 +254,15 @@ class TwoFactorService:
                 return True  # 2FA non activé
 
             if method == "totp" and user.two_factor_secret:
-                return TwoFactorService.verify_totp_code(user.two_factor_secret, code)
+                return TwoFactorVerificationService.verify_totp(
+                    user, user.two_factor_secret, code
+                )
 
             elif method == "sms" and user.phone_number:
-                return TwoFactorService.verify_sms_code(
-                    user.get_full_phone_number(), code
-                )
+                return TwoFactorService.verify_sms_code(user, code)
 
             elif method == "email":
-                return TwoFactorService.verify_email_code(user.email, code)
+                return TwoFactorService.verify_email_code(user, code)
 
             elif method == "backup":
                 return TwoFactorService.verify_backup_code(user, code)
@@ -308,14 +274,27 @@ class TwoFactorService:
             return False
 
     @staticmethod
-    def send_verification_code(user, method="sms"):
+    def send_verification_code(user, method="sms", ip_address=None, user_agent=""):
         """
         Envoyer un code de vérification selon la méthode choisie
         """
         try:
-            code = TwoFactorService.generate_verification_code()
+            if method not in ("sms", "email") or (
+                method == "sms" and not user.phone_number
+            ):
+                return {"success": False, "error": "Méthode non supportée"}
+
+            # Code conservé en base : vérifiable depuis n'importe quel worker
+            code = TwoFactorVerificationService.issue_code(
+                user, method, ip_address=ip_address, user_agent=user_agent
+            )
+            if code is None:
+                return {
+                    "success": False,
+                    "error": "Trop de tentatives. Réessayez plus tard.",
+                }
 
-            if method == "sms" and user.phone_number:
+            if method == "sms":
                 success = TwoFactorService.send_sms_code(
                     user.get_full_phone_number(), code
                 )
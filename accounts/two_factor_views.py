@@ -11,6 +11,8 @@ from django.utils.translation import gettext_lazy as _
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 
+from two_factor_auth.services import TwoFactorVerificationService
+
 from .models import User
 from .two_factor_service import TwoFactorService
 
@@ -60,7 +62,11 @@ def verify_2fa_setup(request, method):
     # Envoyer le code automatiquement si la méthode est email ou SMS
     if request.method == "GET" and method in ["email", "sms"]:
         try:
-            result = TwoFactorService.send_verification_code(request.user, method)
+            result = TwoFactorService.send_verification_code(
+                request.user,
+                method,
+                **TwoFactorVerificationService.client_metadata(request),
+            )
             if not result.get("success"):
                 messages.warning(
                     request, _("Erreur lors de l'envoi du code. Veuillez réessayer.")
@@ -121,7 +127,9 @@ def send_2fa_code(request):
         except User.DoesNotExist:
             return JsonResponse({"success": False, "error": "Utilisateur non trouvé"})
 
-        result = TwoFactorService.send_verification_code(user, method)
+        result = TwoFactorService.send_verification_code(
+            user, method, **TwoFactorVerificationService.client_metadata(request)
+        )
 
         return JsonResponse(result)
 
@@ -188,7 +196,9 @@ def two_factor_required(request):
 
         # Envoyer le code de vérification
         try:
-            result = TwoFactorService.send_verification_code(user, method)
+            result = TwoFactorService.send_verification_code(
+                user, method, **TwoFactorVerificationService.client_metadata(request)
+            )
             if not result.get("success"):
                 messages.warning(
                     request, _("Erreur lors de l'envoi du code. Veuillez réessayer.")
@@ -235,19 +245,23 @@ def two_factor_required(request):
                 )
 
             # Redirection selon le type d'utilisateur
-            from django.urls import reverse
-
             if user.is_superuser or user.user_type == "admin":
-                return redirect("dashboard:admin_dashboard")
+                response = redirect("dashboard:admin_dashboard")
             elif user.user_type == "vendeur":
                 if hasattr(user, "vendor_profile") and user.vendor_profile.is_approved:
-                    return redirect("dashboard:vendor_dashboard")
+                    response = redirect("dashboard:vendor_dashboard")
                 else:
-                    return redirect("products:home_page")
-            elif user.user_type == "client":
-                return redirect("products:home_page")
+                    response = redirect("products:home_page")
             else:
-                return redirect("products:home_page")
+                response = redirect("products:home_page")
+
+            # Appareil de confiance : pas de 2FA aux prochaines connexions
+            if request.POST.get("remember_device"):
+                token = TwoFactorVerificationService.trust_device(
+                    user, **TwoFactorVerificationService.client_metadata(request)
+                )
+                TwoFactorVerificationService.set_device_cookie(response, token)
+            return response
         else:
             messages.error(request, _("Code de vérification incorrect"))
 
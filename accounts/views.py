@@ -24,6 +24,7 @@ from django.views.generic.edit import UpdateView
 logger = logging.getLogger(__name__)
 
 from notifications.services import EmailService
+from two_factor_auth.services import TwoFactorVerificationService
 
 from .forms import (
     PasswordChangeForm,
@@ -213,8 +214,13 @@ class UserLoginView(LoginView):
             messages.error(self.request, "Nom d'utilisateur ou mot de passe incorrect.")
             return self.form_invalid(form)
 
-        # Vérifier si 2FA est activé
-        if user.two_factor_enabled:
+        # Vérifier si 2FA est activé (sauf appareil de confiance : une requête)
+        if (
+            user.two_factor_enabled
+            and not TwoFactorVerificationService.is_trusted_device(
+                user, TwoFactorVerificationService.get_device_token(self.request)
+            )
+        ):
             # Ne PAS connecter l'utilisateur, stocker dans la session
             self.request.session["2fa_user_id"] = user.id
             self.request.session["2fa_verified"] = False
@@ -326,15 +332,11 @@ def account_dashboard(request):
 
     elif user.user_type == "vendeur":
         try:
-            from orders.models import Order, OrderItem
+            from orders.services import VendorOrderService
             from products.models import Product
 
             products = Product.objects.filter(vendor=user).order_by("-created_at")[:5]
-            orders = (
-                Order.objects.filter(items__product__vendor=user)
-                .distinct()
-                .order_by("-created_at")[:5]
-            )
+            orders = VendorOrderService.orders_for_vendor(user)[:5]
 
             context.update(
                 {
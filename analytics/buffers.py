@@ -0,0 +1,233 @@
+"""
+Écritures différées (compteurs et événements)
+
+Les endpoints d'interaction à fort trafic (popups, recherche, suggestions)
+n'écrivent pas en base pendant la requête : ils déposent leurs incréments et
+leurs lignes dans un tampon en mémoire du processus. Un fil de fond le vide
+toutes les ``WRITE_BUFFER_FLUSH_INTERVAL`` secondes (ou plus tôt au-delà de
+``WRITE_BUFFER_MAX_PENDING`` opérations) :
+
+- les incréments d'une même ligne sont cumulés, puis appliqués par des
+  ``UPDATE ... SET champ = champ + n`` (une requête par valeur de delta) ;
+- les incréments par clé naturelle (``SearchSuggestion.query``) créent les
+  lignes manquantes en un ``bulk_create`` ;
+- les événements sont insérés par ``bulk_create``, un lot par modèle.
+
+Chaque groupe (modèle et champ) est appliqué dans sa propre transaction :
+une erreur (par exemple un événement dont le popup vient d'être supprimé)
+n'abandonne que ce groupe, et le nombre d'opérations perdues est journalisé.
+
+Les compteurs lus en base ont donc quelques secondes de retard. En cas
+d'arrêt brutal du processus, le tampon non vidé est perdu : ce mécanisme est
+réservé aux statistiques.
+"""
+import atexit
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, transaction
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBuffer:
+    """Tampon d'écritures différées, partagé par les fils du processus"""
+
+    def __init__(self, flush_interval=None, max_pending=None):
+        self._flush_interval = flush_interval
+        self._max_pending = max_pending
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._reset()
+
+    @property
+    def flush_interval(self):
+        """Période de vidage en secondes ; 0 : vidage explicite uniquement"""
+        if self._flush_interval is not None:
+            return self._flush_interval
+        return getattr(settings, "WRITE_BUFFER_FLUSH_INTERVAL", 2.0)
+
+    @property
+    def max_pending(self):
+        return self._max_pending or getattr(settings, "WRITE_BUFFER_MAX_PENDING", 5000)
+
+    def _reset(self):
+        # (modèle, champ) → {pk: delta}
+        self._increments = defaultdict(lambda: defaultdict(int))
+        # (modèle, champ clé, champ compteur) → {valeur clé: delta}
+        self._keyed = defaultdict(lambda: defaultdict(int))
+        # modèle → [instances]
+        self._events = defaultdict(list)
+        # clé de groupe ci-dessus → nombre d'opérations déposées
+        self._counts = defaultdict(int)
+        self._pending = 0
+
+    # Dépôt (sans requête)
+
+    def increment(self, model, pk, field, amount=1):
+        """Ajoute ``amount`` au champ ``field`` de la ligne ``pk``"""
+        with self._lock:
+            self._increments[(model, field)][pk] += amount
+            self._counts[(model, field)] += 1
+            self._pending += 1
+        self._schedule()
+
+    def increment_by_key(self, model, key_field, key, field, amount=1):
+        """
+        Ajoute ``amount`` au champ ``field`` de la ligne dont ``key_field``
+        (unique) vaut ``key`` ; la ligne est créée avec ``field=amount`` si
+        elle n'existe pas
+        """
+        with self._lock:
+            self._keyed[(model, key_field, field)][key] += amount
+            self._counts[(model, key_field, field)] += 1
+            self._pending += 1
+        self._schedule()
+
+    def append(self, instance):
+        """Insère une instance non sauvegardée au prochain ``bulk_create``"""
+        with self._lock:
+            self._events[type(instance)].append(instance)
+            self._counts[type(instance)] += 1
+            self._pending += 1
+        self._schedule()
+
+    @property
+    def pending(self):
+        return self._pending
+
+    # Vidage
+
+    def _schedule(self):
+        if self.flush_interval <= 0:
+            return
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(
+                        target=self._run, name="write-buffer", daemon=True
+                    )
+                    self._thread.start()
+        if self._pending >= self.max_pending:
+            self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Échec du vidage du tampon d'écritures")
+
+    def flush(self):
+        """
+        Applique les écritures en attente (une transaction par groupe) et
+        retourne le nombre d'opérations déposées appliquées
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                increments, keyed, events, counts = (
+                    self._increments,
+                    self._keyed,
+                    self._events,
+                    self._counts,
+                )
+                pending = self._pending
+                self._reset()
+
+            groups = []
+            for group, deltas in increments.items():
+                groups.append((group, self._apply_increments, (*group, deltas)))
+            for group, deltas in keyed.items():
+                groups.append((group, self._apply_keyed, (*group, deltas)))
+            for model, instances in events.items():
+                groups.append((model, self._apply_events, (model, instances)))
+            dropped = 0
+            for group, apply, args in groups:
+                try:
+                    with transaction.atomic():
+                        apply(*args)
+                except DatabaseError:
+                    dropped += counts[group]
+                    logger.exception(
+                        "Écritures différées abandonnées (%s) : %d opérations",
+                        group,
+                        counts[group],
+                    )
+            return pending - dropped
+
+    @staticmethod
+    def _apply_events(model, instances):
+        model.objects.bulk_create(instances, batch_size=500)
+
+    @staticmethod
+    def _apply_increments(model, field, deltas):
+        by_delta = defaultdict(list)
+        for pk, delta in deltas.items():
+            if delta:
+                by_delta[delta].append(pk)
+        for delta, pks in by_delta.items():
+            model.objects.filter(pk__in=pks).update(**{field: F(field) + delta})
+
+    @classmethod
+    def _apply_keyed(cls, model, key_field, field, deltas):
+        def existing():
+            return dict(
+                model.objects.filter(**{f"{key_field}__in": list(deltas)}).values_list(
+                    key_field, "pk"
+                )
+            )
+
+        rows = existing()
+        missing = [key for key in deltas if key not in rows]
+        if missing:
+            # Lignes créées à zéro puis incrémentées comme les autres : une
+            # ligne insérée entre-temps par un autre processus reste comptée
+            model.objects.bulk_create(
+                [model(**{key_field: key, field: 0}) for key in missing],
+                ignore_conflicts=True,
+            )
+            rows = existing()
+        cls._apply_increments(
+            model,
+            field,
+            {rows[key]: delta for key, delta in deltas.items() if key in rows},
+        )
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_write_buffer():
+    """Tampon du processus"""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = WriteBuffer()
+    return _buffer
+
+
+def flush_write_buffer():
+    """Vide le tampon du processus (arrêt, tests)"""
+    if _buffer is not None:
+        return _buffer.flush()
+    return 0
+
+
+@atexit.register
+def _flush_at_exit():
+    try:
+        flush_write_buffer()
+    except Exception:
+        logger.exception("Tampon d'écritures non vidé à l'arrêt")
@@ -1,3 +1,85 @@
-from django.test import TestCase
+from unittest.mock import patch
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from popups.models import Popup, PopupInteraction
+from search.models import SearchSuggestion
+
+from .buffers import WriteBuffer, flush_write_buffer, get_write_buffer
+
+User = get_user_model()
+
+
+@override_settings(WRITE_BUFFER_FLUSH_INTERVAL=0)
+class WriteBufferTest(TestCase):
+    """Tests pour le tampon d'écritures différées"""
+
+    def setUp(self):
+        flush_write_buffer()
+        self.popup = Popup.objects.create(
+            name="Promo", popup_type="promotion", title="Promo", content="Contenu"
+        )
+
+    def test_flush_aggregates_writes(self):
+        """Incréments cumulés, lignes par clé créées, événements insérés en lot"""
+        SearchSuggestion.objects.create(query="sac", popularity=4)
+        buffer = WriteBuffer()
+        with self.assertNumQueries(0):
+            for _ in range(3):
+                buffer.increment(Popup, self.popup.pk, "show_count")
+                buffer.increment_by_key(SearchSuggestion, "query", "sac", "popularity")
+                buffer.append(PopupInteraction(popup=self.popup, action="shown"))
+            buffer.increment_by_key(SearchSuggestion, "query", "robe", "popularity")
+
+        # UPDATE popup ; SELECT, INSERT, SELECT, 2 UPDATE suggestions ; INSERT
+        # (plus SAVEPOINT et RELEASE par groupe)
+        with self.assertNumQueries(13):
+            self.assertEqual(buffer.flush(), 10)
+
+        self.popup.refresh_from_db()
+        self.assertEqual(self.popup.show_count, 3)
+        self.assertEqual(
+            dict(SearchSuggestion.objects.values_list("query", "popularity")),
+            {"sac": 7, "robe": 1},
+        )
+        self.assertEqual(PopupInteraction.objects.count(), 3)
+        self.assertEqual(buffer.flush(), 0)
+
+    def test_failed_group_keeps_the_others(self):
+        """Un groupe en erreur est journalisé sans perdre les autres"""
+        buffer = WriteBuffer()
+        buffer.increment(Popup, self.popup.pk, "show_count")
+        buffer.increment_by_key(SearchSuggestion, "query", "sac", "popularity")
+        buffer.append(PopupInteraction(popup=self.popup, action="shown"))
+        buffer.append(PopupInteraction(popup=self.popup, action="closed"))
+
+        with patch.object(
+            WriteBuffer, "_apply_events", side_effect=IntegrityError("popup")
+        ), self.assertLogs("analytics.buffers", "ERROR") as logs:
+            self.assertEqual(buffer.flush(), 2)
+        self.assertIn("2 opérations", logs.output[0])
+
+        self.popup.refresh_from_db()
+        self.assertEqual(self.popup.show_count, 1)
+        self.assertEqual(SearchSuggestion.objects.get().popularity, 1)
+        self.assertFalse(PopupInteraction.objects.exists())
+
+    def test_search_endpoints_write_behind(self):
+        """Recherche et suggestions n'écrivent qu'au vidage du tampon"""
+        user = User.objects.create_user(
+            username="bufferuser", email="buffer@example.com", password="testpass123"
+        )
+        self.client.force_login(user)
+        self.client.post(
+            reverse("search:update_suggestion"),
+            '{"query": "chaussures"}',
+            content_type="application/json",
+        )
+        self.assertFalse(SearchSuggestion.objects.exists())
+        self.assertEqual(get_write_buffer().pending, 1)
+
+        flush_write_buffer()
+        self.assertEqual(SearchSuggestion.objects.get().popularity, 1)
@@ -1,13 +1,10 @@
 import base64
+import csv
 import json
 import logging
 from datetime import datetime, timedelta
 from io import BytesIO
 
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objs as go
-import plotly.utils
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.db.models import Avg, Count, Q, Sum
@@ -83,7 +80,9 @@ def analytics_dashboard(request):
     categories_chart = create_categories_chart(start_date, end_date)
 
     # Widgets du tableau de bord
-    widgets = DashboardWidget.objects.filter(is_active=True).order_by("order")
+    widgets = DashboardWidget.objects.filter(is_active=True).order_by(
+        "position_y", "position_x"
+    )
 
     context = {
         "total_orders": total_orders,
@@ -104,9 +103,21 @@ def analytics_dashboard(request):
     return render(request, "analytics/dashboard.html", context)
 
 
+def figure_json(fig):
+    """
+    Sérialise une figure plotly. plotly (et numpy/pandas qu'il entraîne) n'est
+    chargé que par les vues qui tracent des graphiques, pas au démarrage.
+    """
+    import plotly.utils
+
+    return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+
+
 def create_sales_chart(start_date, end_date):
     """Créer le graphique des ventes"""
     try:
+        import plotly.graph_objs as go
+
         # Données des ventes par jour
         sales_data = (
             Order.objects.filter(
@@ -142,7 +153,7 @@ def create_sales_chart(start_date, end_date):
             showlegend=False,
         )
 
-        return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+        return figure_json(fig)
     except Exception as e:
         logger.error(f"Erreur création graphique ventes: {e}")
         return None
@@ -151,6 +162,8 @@ def create_sales_chart(start_date, end_date):
 def create_orders_chart(start_date, end_date):
     """Créer le graphique des commandes"""
     try:
+        import plotly.graph_objs as go
+
         # Données des commandes par jour
         orders_data = (
             Order.objects.filter(created_at__range=[start_date, end_date])
@@ -176,7 +189,7 @@ def create_orders_chart(start_date, end_date):
             showlegend=False,
         )
 
-        return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+        return figure_json(fig)
     except Exception as e:
         logger.error(f"Erreur création graphique commandes: {e}")
         return None
@@ -185,6 +198,8 @@ def create_orders_chart(start_date, end_date):
 def create_customers_chart(start_date, end_date):
     """Créer le graphique des clients"""
     try:
+        import plotly.graph_objs as go
+
         # Données des nouveaux clients par jour
         customers_data = (
             User.objects.filter(date_joined__range=[start_date, end_date])
@@ -217,7 +232,7 @@ def create_customers_chart(start_date, end_date):
             showlegend=False,
         )
 
-        return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+        return figure_json(fig)
     except Exception as e:
         logger.error(f"Erreur création graphique clients: {e}")
         return None
@@ -226,6 +241,8 @@ def create_customers_chart(start_date, end_date):
 def create_top_products_chart(start_date, end_date):
     """Créer le graphique des produits les plus vendus"""
     try:
+        import plotly.graph_objs as go
+
         # Top 10 des produits les plus vendus
         top_products = (
             OrderItem.objects.filter(
@@ -233,7 +250,7 @@ def create_top_products_chart(start_date, end_date):
                 order__status="completed",
             )
             .values("product__name")
-            .annotate(total_quantity=Sum("quantity"), total_revenue=Sum("price"))
+            .annotate(total_quantity=Sum("quantity"), total_revenue=Sum("total_price"))
             .order_by("-total_quantity")[:10]
         )
 
@@ -258,7 +275,7 @@ def create_top_products_chart(start_date, end_date):
             showlegend=False,
         )
 
-        return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+        return figure_json(fig)
     except Exception as e:
         logger.error(f"Erreur création graphique produits: {e}")
         return None
@@ -267,6 +284,8 @@ def create_top_products_chart(start_date, end_date):
 def create_categories_chart(start_date, end_date):
     """Créer le graphique des catégories"""
     try:
+        import plotly.graph_objs as go
+
         # Ventes par catégorie
         categories_data = (
             OrderItem.objects.filter(
@@ -274,7 +293,7 @@ def create_categories_chart(start_date, end_date):
                 order__status="completed",
             )
             .values("product__category__name")
-            .annotate(total_revenue=Sum("price"))
+            .annotate(total_revenue=Sum("total_price"))
             .order_by("-total_revenue")
         )
 
@@ -287,7 +306,7 @@ def create_categories_chart(start_date, end_date):
             title="Répartition des Ventes par Catégorie", height=400, showlegend=True
         )
 
-        return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+        return figure_json(fig)
     except Exception as e:
         logger.error(f"Erreur création graphique catégories: {e}")
         return None
@@ -363,7 +382,7 @@ def sales_report(request):
     top_products = (
         OrderItem.objects.filter(order__in=orders_filter.filter(status="completed"))
         .values("product__name", "product__sku")
-        .annotate(quantity_sold=Sum("quantity"), total_revenue=Sum("price"))
+        .annotate(quantity_sold=Sum("quantity"), total_revenue=Sum("total_price"))
         .order_by("-quantity_sold")[:20]
     )
 
@@ -371,7 +390,7 @@ def sales_report(request):
     categories_data = (
         OrderItem.objects.filter(order__in=orders_filter.filter(status="completed"))
         .values("product__category__name")
-        .annotate(total_revenue=Sum("price"), total_quantity=Sum("quantity"))
+        .annotate(total_revenue=Sum("total_price"), total_quantity=Sum("quantity"))
         .order_by("-total_revenue")
     )
 
@@ -5,6 +5,7 @@ from django.contrib.auth import get_user_model
 from rest_framework import serializers
 
 from accounts.models import UserProfile, VendorProfile
+from i18n.services import TranslationService
 from orders.models import (
     Cart,
     CartItem,
@@ -25,6 +26,49 @@ from products.models import (
 User = get_user_model()
 
 
+class TranslatedListSerializer(serializers.ListSerializer):
+    """Charge en lot les traductions des objets d'une liste avant sérialisation"""
+
+    def to_representation(self, data):
+        objects = list(data.all() if hasattr(data, "all") else data)
+        self.child.load_translations(
+            [obj for obj in objects if not hasattr(obj, "_translations")]
+        )
+        return super().to_representation(objects)
+
+
+class TranslatedFieldsMixin:
+    """
+    Remplace les champs ``translated_fields`` par leur traduction dans la
+    langue de la requête ; les relations ``translated_relations`` sont
+    traduites dans la même passe (une requête par modèle et par page).
+    Le ``Meta`` doit déclarer ``list_serializer_class = TranslatedListSerializer``.
+    """
+
+    translated_fields = ()
+    translated_relations = ()
+
+    def get_language(self):
+        request = self.context.get("request")
+        return getattr(request, "LANGUAGE_CODE", None)
+
+    def load_translations(self, objects):
+        language = self.get_language()
+        TranslationService.translate(objects, language)
+        TranslationService.translate_related(
+            objects, *self.translated_relations, language=language
+        )
+
+    def to_representation(self, instance):
+        if not hasattr(instance, "_translations"):
+            self.load_translations([instance])
+        data = super().to_representation(instance)
+        for field in self.translated_fields:
+            if field in data:
+                data[field] = TranslationService.value(instance, field)
+        return data
+
+
 class UserSerializer(serializers.ModelSerializer):
     """Serializer pour le modèle User"""
 
@@ -118,13 +162,15 @@ class VendorProfileSerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "rating", "total_sales", "created_at", "updated_at"]
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(TranslatedFieldsMixin, serializers.ModelSerializer):
     """Serializer pour le modèle Category"""
 
+    translated_fields = ("name", "description")
     product_count = serializers.SerializerMethodField()
 
     class Meta:
         model = Category
+        list_serializer_class = TranslatedListSerializer
         fields = [
             "id",
             "name",
@@ -143,11 +189,14 @@ class CategorySerializer(serializers.ModelSerializer):
         return obj.products.filter(status="published").count()
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TranslatedFieldsMixin, serializers.ModelSerializer):
     """Serializer pour le modèle Tag"""
 
+    translated_fields = ("name",)
+
     class Meta:
         model = Tag
+        list_serializer_class = TranslatedListSerializer
         fields = ["id", "name", "slug", "color", "created_at"]
         read_only_fields = ["id", "created_at"]
 
@@ -212,9 +261,11 @@ class ProductReviewSerializer(serializers.ModelSerializer):
         return None
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(TranslatedFieldsMixin, serializers.ModelSerializer):
     """Serializer pour le modèle Product"""
 
+    translated_fields = ("name", "description", "short_description")
+    translated_relations = ("category",)
     vendor_name = serializers.SerializerMethodField()
     category_name = serializers.SerializerMethodField()
     tags = TagSerializer(many=True, read_only=True)
@@ -226,6 +277,7 @@ class ProductSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Product
+        list_serializer_class = TranslatedListSerializer
         fields = [
             "id",
             "name",
@@ -239,6 +291,7 @@ class ProductSerializer(serializers.ModelSerializer):
             "category_name",
             "tags",
             "price",
+            "effective_price",
             "compare_price",
             "stock",
             "min_stock",
@@ -269,8 +322,23 @@ class ProductSerializer(serializers.ModelSerializer):
     def get_vendor_name(self, obj):
         return obj.vendor.get_display_name() if obj.vendor else None
 
+    def load_translations(self, objects):
+        super().load_translations(objects)
+        # Tags préchargés : traduits dans la même passe que la page
+        TranslationService.translate(
+            [
+                tag
+                for obj in objects
+                if "tags" in getattr(obj, "_prefetched_objects_cache", {})
+                for tag in obj.tags.all()
+            ],
+            self.get_language(),
+        )
+
     def get_category_name(self, obj):
-        return obj.category.name if obj.category else None
+        if not obj.category:
+            return None
+        return TranslationService.value(obj.category, "name")
 
     def get_average_rating(self, obj):
         return obj.rating
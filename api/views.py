@@ -12,14 +12,8 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from accounts.models import UserProfile, VendorProfile
-from orders.models import (
-    Cart,
-    CartItem,
-    Order,
-    OrderItem,
-    OrderStatusHistory,
-    ShippingAddress,
-)
+from orders.models import Cart, CartItem, Order, OrderItem, ShippingAddress
+from orders.services import OrderStatusService, VendorOrderService
 from products.models import Category, Product, ProductReview, Tag
 
 from .serializers import (
@@ -99,7 +93,7 @@ class ProductViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         """Filtrer les produits selon les permissions"""
-        queryset = Product.objects.filter(status="published")
+        queryset = Product.objects.filter(status="published").prefetch_related("tags")
 
         # Filtres
         category = self.request.query_params.get("category")
@@ -120,18 +114,18 @@ class ProductViewSet(viewsets.ModelViewSet):
                 | Q(short_description__icontains=search)
             )
         if min_price:
-            queryset = queryset.filter(price__gte=min_price)
+            queryset = queryset.filter(effective_price__gte=min_price)
         if max_price:
-            queryset = queryset.filter(price__lte=max_price)
+            queryset = queryset.filter(effective_price__lte=max_price)
         if featured:
             queryset = queryset.filter(is_featured=True)
 
         # Tri
         sort_by = self.request.query_params.get("sort_by", "created_at")
         if sort_by == "price_asc":
-            queryset = queryset.order_by("price")
+            queryset = queryset.order_by("effective_price")
         elif sort_by == "price_desc":
-            queryset = queryset.order_by("-price")
+            queryset = queryset.order_by("-effective_price")
         elif sort_by == "name":
             queryset = queryset.order_by("name")
         elif sort_by == "rating":
@@ -326,9 +320,7 @@ class OrderViewSet(viewsets.ModelViewSet):
         if self.request.user.is_staff:
             return Order.objects.all()
         elif self.request.user.user_type == "vendeur":
-            return Order.objects.filter(
-                items__product__vendor=self.request.user
-            ).distinct()
+            return VendorOrderService.orders_for_vendor(self.request.user)
         else:
             return Order.objects.filter(user=self.request.user)
 
@@ -341,9 +333,14 @@ class OrderViewSet(viewsets.ModelViewSet):
         """Annuler une commande"""
         order = self.get_object()
         if order.can_be_cancelled():
-            order.status = "cancelled"
-            order.save()
-            return Response({"message": "Commande annulée"})
+            result = OrderStatusService.transition(
+                [order],
+                "cancelled",
+                user=request.user,
+                notes="Commande annulée par le client",
+            )
+            if result["updated"]:
+                return Response({"message": "Commande annulée"})
         return Response(
             {"error": "Cette commande ne peut pas être annulée"},
             status=status.HTTP_400_BAD_REQUEST,
@@ -351,8 +348,19 @@ class OrderViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=["post"])
     def update_status(self, request, pk=None):
-        """Mettre à jour le statut d'une commande"""
+        """Mettre à jour le statut d'une commande (staff ou vendeur concerné)"""
         order = self.get_object()
+        user = request.user
+        if not (
+            user.is_staff
+            or (
+                user.user_type == "vendeur"
+                and order.vendor_orders.filter(vendor=user).exists()
+            )
+        ):
+            return Response(
+                {"error": "Accès non autorisé"}, status=status.HTTP_403_FORBIDDEN
+            )
         new_status = request.data.get("status")
         notes = request.data.get("notes", "")
 
@@ -360,21 +368,65 @@ class OrderViewSet(viewsets.ModelViewSet):
             return Response(
                 {"error": "Statut requis"}, status=status.HTTP_400_BAD_REQUEST
             )
+        if new_status not in OrderStatusService.TRANSITIONS:
+            return Response(
+                {"error": "Statut inconnu"}, status=status.HTTP_400_BAD_REQUEST
+            )
 
-        old_status = order.status
-        order.status = new_status
-        order.save()
-
-        # Créer l'historique de statut
-        OrderStatusHistory.objects.create(
-            order=order,
-            status=new_status,
-            notes=notes or f"Statut changé de {old_status} à {new_status}",
-            created_by=request.user,
+        result = OrderStatusService.transition(
+            [order], new_status, user=request.user, notes=notes
         )
-
+        if not result["updated"]:
+            return Response(
+                {"error": f"Transition non autorisée depuis « {order.status} »"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
         return Response({"message": "Statut mis à jour"})
 
+    @action(
+        detail=False,
+        methods=["post"],
+        permission_classes=[permissions.IsAuthenticated, permissions.IsAdminUser],
+    )
+    def bulk_status(self, request):
+        """
+        Mettre à jour le statut de plusieurs commandes :
+        {"orders": [ids], "status": "...", "notes": "..."}
+        """
+        order_ids = request.data.get("orders")
+        new_status = request.data.get("status")
+        if not isinstance(order_ids, list) or not order_ids:
+            return Response(
+                {"error": "Liste de commandes requise"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if new_status not in OrderStatusService.TRANSITIONS:
+            return Response(
+                {"error": "Statut inconnu"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            order_ids = [int(pk) for pk in order_ids]
+        except (TypeError, ValueError):
+            return Response(
+                {"error": "Identifiants de commande invalides"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        result = OrderStatusService.transition(
+            order_ids,
+            new_status,
+            user=request.user,
+            notes=request.data.get("notes", ""),
+        )
+        return Response(
+            {
+                "updated": result["updated"],
+                "rejected": {
+                    str(pk): current for pk, current in result["rejected"].items()
+                },
+            }
+        )
+
 
 class ShippingAddressViewSet(viewsets.ModelViewSet):
     """ViewSet pour la gestion des adresses de livraison"""
@@ -460,29 +512,12 @@ class VendorStatsView(APIView):
         active_products = Product.objects.filter(
             vendor=request.user, status="published"
         ).count()
-        total_orders = (
-            Order.objects.filter(items__product__vendor=request.user).distinct().count()
-        )
-        total_revenue = (
-            Order.objects.filter(
-                items__product__vendor=request.user, status="delivered"
-            )
-            .distinct()
-            .aggregate(total=Sum("total_amount"))["total"]
-            or 0
-        )
-        pending_orders = (
-            Order.objects.filter(items__product__vendor=request.user, status="pending")
-            .distinct()
-            .count()
-        )
-        completed_orders = (
-            Order.objects.filter(
-                items__product__vendor=request.user, status="delivered"
-            )
-            .distinct()
-            .count()
-        )
+        # Commandes et revenus lus dans la projection VendorOrder (une requête)
+        order_stats = VendorOrderService.stats(request.user)
+        total_orders = order_stats["total_orders"]
+        total_revenue = order_stats["total_revenue"]
+        pending_orders = order_stats["pending_orders"]
+        completed_orders = order_stats["completed_orders"]
 
         # Note moyenne et nombre d'avis
         reviews = ProductReview.objects.filter(
@@ -492,11 +527,7 @@ class VendorStatsView(APIView):
         total_reviews = reviews.count()
 
         # Commandes récentes
-        recent_orders = (
-            Order.objects.filter(items__product__vendor=request.user)
-            .distinct()
-            .order_by("-created_at")[:10]
-        )
+        recent_orders = VendorOrderService.orders_for_vendor(request.user)[:10]
 
         # Produits les plus vendus du vendeur
         top_products = Product.objects.filter(
@@ -0,0 +1,254 @@
+"""
+Générateur déterministe du jeu de données des bancs d'essai
+
+Le catalogue de référence est celui des commandes ``create_categories_and_tags``
+et ``create_sample_products`` ; il est complété par des vendeurs, clients,
+produits, commandes et avis générés à partir d'une graine fixe. Les lignes sont
+insérées par ``bulk_create`` puis les colonnes dérivées (texte de recherche,
+prix effectifs, projection vendeur, notes) sont recalculées par les services
+de l'application, comme après un import.
+"""
+import random
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.db.models import Avg, Count
+from django.utils import timezone
+from django.utils.text import slugify
+
+from accounts.models import User
+from orders.models import Order, OrderItem
+from orders.services import VendorOrderService
+from products.models import Category, Product, ProductReview, Tag
+from products.pricing import PriceEngine
+from search.services import AdminSearchService
+
+PASSWORD = "bench-pass-123"
+
+WORDS = (
+    "Classique",
+    "Premium",
+    "Confort",
+    "Sport",
+    "Urbain",
+    "Tropical",
+    "Ivoire",
+    "Lagune",
+    "Savane",
+    "Wax",
+    "Bio",
+    "Pro",
+    "Mini",
+    "Max",
+    "Lite",
+)
+CITIES = ("Abidjan", "Bouaké", "Yamoussoukro", "San-Pédro", "Korhogo", "Daloa")
+ORDER_STATUSES = ("pending", "confirmed", "processing", "shipped", "delivered")
+
+
+class BenchmarkDataGenerator:
+    """Jeu de données reproductible : mêmes paramètres, mêmes lignes"""
+
+    BATCH_SIZE = 500
+
+    def __init__(
+        self,
+        seed=42,
+        vendors=10,
+        customers=50,
+        products=500,
+        orders=500,
+        reviews=1000,
+        now=None,
+    ):
+        self.seed = seed
+        self.sizes = {
+            "vendors": vendors,
+            "customers": customers,
+            "products": products,
+            "orders": orders,
+            "reviews": reviews,
+        }
+        self.now = now or timezone.now()
+        self.random = random.Random(seed)
+
+    def generate(self):
+        """Crée le jeu de données et retourne les comptes créés"""
+        self.random.seed(self.seed)
+        call_command("create_categories_and_tags", stdout=StringIO())
+        call_command("create_sample_products", stdout=StringIO())
+
+        self.categories = list(
+            Category.objects.filter(is_active=True, children__isnull=True).order_by(
+                "pk"
+            )
+        ) or list(Category.objects.order_by("pk"))
+        self.tags = list(Tag.objects.order_by("pk"))
+
+        self.admin = self.create_users("bench_admin", 1, "admin", is_staff=True)[0]
+        self.vendors = self.create_users(
+            "bench_vendor", self.sizes["vendors"], "vendeur"
+        )
+        self.customers = self.create_users(
+            "bench_client", self.sizes["customers"], "client"
+        )
+        self.products = self.create_products()
+        self.orders = self.create_orders()
+        self.create_reviews()
+
+        catalogue = Product.objects.filter(pk__in=[p.pk for p in self.products])
+        AdminSearchService.refresh_products(catalogue)
+        AdminSearchService.refresh_orders(
+            Order.objects.filter(pk__in=[o.pk for o in self.orders])
+        )
+        PriceEngine.refresh_products(catalogue)
+        VendorOrderService.rebuild_orders([order.pk for order in self.orders])
+        return {name: len(getattr(self, name)) for name in self.sizes}
+
+    def create_users(self, prefix, count, user_type, **extra):
+        password = make_password(PASSWORD)
+        users = []
+        for index in range(count):
+            username = f"{prefix}{index}"
+            user = User.objects.filter(username=username).first()
+            if user is None:
+                # create() : les signaux créent profil et panier
+                user = User.objects.create(
+                    username=username,
+                    email=f"{username}@bench.local",
+                    password=password,
+                    user_type=user_type,
+                    **extra,
+                )
+            users.append(user)
+        return users
+
+    def create_products(self):
+        products = []
+        for index in range(self.sizes["products"]):
+            vendor = self.vendors[index % len(self.vendors)]
+            category = self.random.choice(self.categories)
+            name = " ".join(self.random.sample(WORDS, 2) + [category.name, str(index)])
+            price = Decimal(self.random.randrange(1000, 500000, 500))
+            products.append(
+                Product(
+                    name=name,
+                    slug=f"{slugify(name)}-bench",
+                    sku=f"SKU-B{index:07d}",
+                    short_description=name,
+                    description=f"{name} : produit de banc d'essai.",
+                    vendor=vendor,
+                    category=category,
+                    price=price,
+                    effective_price=price,
+                    stock=1_000_000,
+                    status="published",
+                    published_at=self.now - timedelta(days=index % 90),
+                    is_featured=index % 10 == 0,
+                    views=self.random.randint(0, 5000),
+                    sales_count=self.random.randint(0, 300),
+                )
+            )
+        products = Product.objects.bulk_create(products, batch_size=self.BATCH_SIZE)
+
+        through = Product.tags.through
+        links = [
+            through(product_id=product.pk, tag_id=tag.pk)
+            for product in products
+            for tag in self.random.sample(self.tags, min(3, len(self.tags)))
+        ]
+        through.objects.bulk_create(links, batch_size=self.BATCH_SIZE)
+        return products
+
+    def create_orders(self):
+        orders = []
+        lines = []
+        for index in range(self.sizes["orders"]):
+            customer = self.customers[index % len(self.customers)]
+            picked = self.random.sample(self.products, self.random.randint(1, 4))
+            items = [(product, self.random.randint(1, 3)) for product in picked]
+            subtotal = sum(product.price * quantity for product, quantity in items)
+            status = self.random.choice(ORDER_STATUSES)
+            orders.append(
+                Order(
+                    order_number=f"CMD-B{index:07d}",
+                    user=customer,
+                    status=status,
+                    payment_method="cash",
+                    payment_status="paid" if status == "delivered" else "pending",
+                    shipping_first_name="Bench",
+                    shipping_last_name=customer.username,
+                    shipping_phone="+2250700000000",
+                    shipping_address="Rue du banc d'essai",
+                    shipping_city=self.random.choice(CITIES),
+                    subtotal=subtotal,
+                    shipping_cost=Decimal("1500"),
+                    total_amount=subtotal + Decimal("1500"),
+                )
+            )
+            lines.append(items)
+
+        orders = Order.objects.bulk_create(orders, batch_size=self.BATCH_SIZE)
+        # created_at (auto_now_add) réparti sur un an pour les tableaux de bord
+        for order in orders:
+            order.created_at = self.now - timedelta(
+                minutes=self.random.randint(0, 365 * 24 * 60)
+            )
+        Order.objects.bulk_update(orders, ["created_at"], batch_size=self.BATCH_SIZE)
+
+        OrderItem.objects.bulk_create(
+            [
+                OrderItem(
+                    order=order,
+                    product=product,
+                    quantity=quantity,
+                    unit_price=product.price,
+                    total_price=product.price * quantity,
+                )
+                for order, items in zip(orders, lines)
+                for product, quantity in items
+            ],
+            batch_size=self.BATCH_SIZE,
+        )
+        return orders
+
+    def create_reviews(self):
+        pairs = set()
+        limit = min(self.sizes["reviews"], len(self.products) * len(self.customers))
+        while len(pairs) < limit:
+            pairs.add(
+                (
+                    self.random.randrange(len(self.products)),
+                    self.random.randrange(len(self.customers)),
+                )
+            )
+        reviews = [
+            ProductReview(
+                product=self.products[product],
+                user=self.customers[customer],
+                rating=self.random.randint(1, 5),
+                title="Avis de banc d'essai",
+                comment="Produit conforme à la description.",
+            )
+            for product, customer in sorted(pairs)
+        ]
+        ProductReview.objects.bulk_create(reviews, batch_size=self.BATCH_SIZE)
+
+        stats = (
+            ProductReview.objects.filter(product__in=self.products)
+            .values("product")
+            .annotate(average=Avg("rating"), count=Count("pk"))
+        )
+        by_product = {row["product"]: row for row in stats}
+        for product in self.products:
+            row = by_product.get(product.pk)
+            if row:
+                product.rating = round(row["average"], 1)
+                product.review_count = row["count"]
+        Product.objects.bulk_update(
+            self.products, ["rating", "review_count"], batch_size=self.BATCH_SIZE
+        )
+        self.reviews = reviews
@@ -0,0 +1,80 @@
+"""
+Commande Django de profilage des imports au démarrage
+
+Démarre un interpréteur neuf (``django.setup()`` et URLconf, comme un worker)
+sous ``python -X importtime`` et affiche les imports les plus coûteux, la
+durée de démarrage et le pic de mémoire. Échoue si une bibliothèque lourde
+est chargée au démarrage ou si les plafonds donnés sont dépassés.
+
+    python manage.py profile_imports --top 30
+    python manage.py profile_imports --sort self --max-seconds 2 --max-rss-mb 100
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.startup import measure_boot
+
+
+class Command(BaseCommand):
+    help = "Profil des imports au démarrage (durée, mémoire, modules coûteux)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=25,
+            help="Nombre d'imports affichés (défaut : 25)",
+        )
+        parser.add_argument(
+            "--sort",
+            choices=["cumulative", "self"],
+            default="cumulative",
+            help="Tri par temps cumulé (sous-imports compris) ou propre",
+        )
+        parser.add_argument(
+            "--depth",
+            type=int,
+            default=None,
+            help="N'afficher que les imports de profondeur inférieure ou égale",
+        )
+        parser.add_argument("--max-seconds", type=float, help="Durée maximale")
+        parser.add_argument("--max-rss-mb", type=float, help="Mémoire maximale (Mo)")
+
+    def handle(self, *args, **options):
+        result = measure_boot(importtime=True)
+
+        imports = result["imports"]
+        if options["depth"] is not None:
+            imports = [row for row in imports if row[3] <= options["depth"]]
+        index = 2 if options["sort"] == "cumulative" else 1
+        imports = sorted(imports, key=lambda row: row[index], reverse=True)
+
+        self.stdout.write(f"{'Module':<60}{'propre ms':>11}{'cumulé ms':>11}")
+        for name, own, cumulative, depth in imports[: options["top"]]:
+            self.stdout.write(
+                f"{('  ' * depth + name)[:59]:<60}{own / 1000:>11.1f}"
+                f"{cumulative / 1000:>11.1f}"
+            )
+
+        rss = result["rss_mb"]
+        rss_text = f"RSS {rss:.0f} Mo" if rss is not None else "RSS inconnu"
+        self.stdout.write(
+            f"\nDémarrage : {result['seconds']:.2f} s, "
+            f"{result['modules']} modules, {rss_text}"
+        )
+
+        errors = []
+        if result["heavy"]:
+            errors.append(
+                "bibliothèques lourdes chargées au démarrage : "
+                + ", ".join(result["heavy"])
+            )
+        if options["max_seconds"] and result["seconds"] > options["max_seconds"]:
+            errors.append(
+                f"démarrage en {result['seconds']:.2f} s "
+                f"(maximum {options['max_seconds']} s)"
+            )
+        if options["max_rss_mb"] and rss is not None and rss > options["max_rss_mb"]:
+            errors.append(f"RSS {rss:.0f} Mo (maximum {options['max_rss_mb']} Mo)")
+        if errors:
+            raise CommandError("; ".join(errors))
+        self.stdout.write(self.style.SUCCESS("✓ Aucune bibliothèque lourde chargée"))
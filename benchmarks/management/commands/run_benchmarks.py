@@ -0,0 +1,237 @@
+"""
+Commande Django des bancs d'essai de performance
+
+Crée une base de test (SQLite en mémoire ou base ``test_...`` du serveur
+PostgreSQL local), y génère le jeu de données déterministe, rejoue les
+scénarios et compare les mesures à la référence ``benchmarks/baseline.json`` :
+toute régression fait échouer la commande (code de sortie 1).
+
+    python manage.py run_benchmarks
+    python manage.py run_benchmarks --scenario home --scenario checkout
+    python manage.py run_benchmarks --update-baseline
+"""
+import json
+import platform
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import (
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+from django.utils import translation
+
+from benchmarks.data import BenchmarkDataGenerator
+from benchmarks.scenarios import (
+    BenchmarkRunner,
+    ScenarioError,
+    build_scenarios,
+    compare,
+)
+
+DEFAULT_BASELINE = Path(__file__).resolve().parents[2] / "baseline.json"
+
+
+class Command(BaseCommand):
+    help = "Bancs d'essai : latence, requêtes SQL et mémoire des pages clés"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--vendors", type=int, default=10)
+        parser.add_argument("--customers", type=int, default=50)
+        parser.add_argument("--products", type=int, default=500)
+        parser.add_argument("--orders", type=int, default=500)
+        parser.add_argument("--reviews", type=int, default=1000)
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=20,
+            help="Exécutions mesurées par scénario (défaut : 20)",
+        )
+        parser.add_argument(
+            "--warmup",
+            type=int,
+            default=3,
+            help="Exécutions de chauffe par scénario (défaut : 3)",
+        )
+        parser.add_argument(
+            "--scenario",
+            action="append",
+            dest="scenarios",
+            help="Scénario à exécuter (répétable ; défaut : tous)",
+        )
+        parser.add_argument(
+            "--baseline",
+            default=str(DEFAULT_BASELINE),
+            help="Fichier JSON de référence",
+        )
+        parser.add_argument(
+            "--update-baseline",
+            action="store_true",
+            help="Enregistrer les mesures comme nouvelle référence",
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.5,
+            help="Dégradation relative tolérée de p50 et de la mémoire (défaut : 0.5)",
+        )
+        parser.add_argument("--output", help="Écrire les mesures dans ce fichier JSON")
+        parser.add_argument(
+            "--keepdb",
+            action="store_true",
+            help="Conserver la base de test entre deux exécutions",
+        )
+
+    def handle(self, *args, **options):
+        if options["iterations"] < 1:
+            raise CommandError("--iterations doit être positif")
+
+        setup_test_environment()
+        old_config = setup_databases(
+            verbosity=0,
+            interactive=False,
+            keepdb=options["keepdb"],
+            aliases={"default"},
+        )
+        try:
+            with override_settings(
+                DEBUG=False,
+                STATICFILES_STORAGE=(
+                    "django.contrib.staticfiles.storage.StaticFilesStorage"
+                ),
+                INSTRUMENTATION_SAMPLE_RATE=0,
+                DATABASE_REPLICAS=[],
+                # Écritures différées vidées par le banc, dans sa transaction
+                WRITE_BUFFER_FLUSH_INTERVAL=0,
+            ), translation.override(settings.LANGUAGE_CODE):
+                report = self.run(options)
+        finally:
+            teardown_databases(old_config, verbosity=0, keepdb=options["keepdb"])
+            teardown_test_environment()
+
+        self.check_baseline(report, options)
+
+    def run(self, options):
+        generator = BenchmarkDataGenerator(
+            seed=options["seed"],
+            vendors=options["vendors"],
+            customers=options["customers"],
+            products=options["products"],
+            orders=options["orders"],
+            reviews=options["reviews"],
+        )
+        self.stdout.write("Génération du jeu de données...")
+        counts = generator.generate()
+        self.stdout.write(
+            "  " + ", ".join(f"{count} {name}" for name, count in counts.items())
+        )
+
+        scenarios = build_scenarios(generator)
+        if options["scenarios"]:
+            known = {scenario.name for scenario in scenarios}
+            unknown = set(options["scenarios"]) - known
+            if unknown:
+                raise CommandError(
+                    f"Scénario(s) inconnu(s) : {', '.join(sorted(unknown))} "
+                    f"(disponibles : {', '.join(sorted(known))})"
+                )
+            scenarios = [s for s in scenarios if s.name in options["scenarios"]]
+
+        runner = BenchmarkRunner(
+            iterations=options["iterations"],
+            warmup=options["warmup"],
+            duplicate_threshold=getattr(
+                settings, "INSTRUMENTATION_DUPLICATE_THRESHOLD", 5
+            ),
+        )
+        self.stdout.write(
+            f"\n{'Scénario':<24}{'p50 ms':>9}{'p95 ms':>9}{'req.':>6}"
+            f"{'N+1':>5}{'pic Ko':>10}"
+        )
+        results = {}
+        for scenario in scenarios:
+            try:
+                result = runner.run(scenario)
+            except ScenarioError as e:
+                raise CommandError(str(e))
+            results[scenario.name] = result
+            self.stdout.write(
+                f"{scenario.name:<24}{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}"
+                f"{result['queries']:>6}{result['max_duplicates']:>5}"
+                f"{result['peak_kb']:>10.1f}"
+            )
+
+        return {
+            "environment": {
+                "database": connection.vendor,
+                "python": platform.python_version(),
+                "seed": options["seed"],
+                "dataset": generator.sizes,
+                "iterations": options["iterations"],
+            },
+            "scenarios": results,
+        }
+
+    def check_baseline(self, report, options):
+        if options["output"]:
+            Path(options["output"]).write_text(
+                json.dumps(report, indent=2, ensure_ascii=False) + "\n"
+            )
+
+        path = Path(options["baseline"])
+        if options["update_baseline"]:
+            if path.exists() and options["scenarios"]:
+                # Mise à jour partielle : conserver les autres scénarios
+                baseline = json.loads(path.read_text())
+                baseline["scenarios"].update(report["scenarios"])
+                report = {**baseline, "environment": report["environment"]}
+            path.write_text(json.dumps(report, indent=2, ensure_ascii=False) + "\n")
+            self.stdout.write(self.style.SUCCESS(f"\n✓ Référence enregistrée : {path}"))
+            return
+
+        if not path.exists():
+            self.stdout.write(
+                self.style.WARNING(
+                    f"\n⚠ Pas de référence ({path}) : relancer avec --update-baseline"
+                )
+            )
+            return
+
+        baseline = json.loads(path.read_text())
+        current, reference = report["environment"], baseline.get("environment", {})
+        # Les requêtes N+1 croissent avec le jeu de données : sans le même
+        # jeu, aucune mesure n'est comparable
+        if any(current.get(key) != reference.get(key) for key in ("seed", "dataset")):
+            self.stdout.write(
+                self.style.WARNING(
+                    "\n⚠ Jeu de données différent de la référence : "
+                    "aucune comparaison"
+                )
+            )
+            return
+        timings = current.get("database") == reference.get("database")
+        if not timings:
+            self.stdout.write(
+                self.style.WARNING(
+                    "\n⚠ Moteur différent de la référence : "
+                    "seules les requêtes SQL sont comparées"
+                )
+            )
+
+        regressions = compare(
+            report["scenarios"],
+            baseline.get("scenarios", {}),
+            tolerance=options["tolerance"],
+            timings=timings,
+        )
+        if regressions:
+            raise CommandError(
+                "Régressions de performance :\n  " + "\n  ".join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS("\n✓ Aucune régression"))
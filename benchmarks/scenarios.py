@@ -0,0 +1,284 @@
+"""
+Scénarios des bancs d'essai et comparaison avec la référence
+
+Chaque scénario rejoue une requête HTTP de bout en bout (client de test
+Django : middlewares, vues, gabarits) sur le jeu de données généré et mesure :
+
+- la latence (p50, p95, moyenne) sur ``iterations`` exécutions, après
+  ``warmup`` exécutions de chauffe (caches du processus remplis) ;
+- le nombre de requêtes SQL par exécution et la pire répétition d'une même
+  requête (N+1) ;
+- le pic de mémoire Python d'une exécution (``tracemalloc``, passe séparée
+  pour ne pas fausser la latence).
+
+Chaque scénario s'exécute dans une transaction annulée à la fin, cache vidé :
+ses écritures (commandes du paiement...) ne changent pas les mesures des
+suivants, quels que soient les scénarios choisis et le nombre d'exécutions.
+Les rappels ``on_commit`` de chaque requête sont exécutés (et mesurés) à la
+fin de la requête, comme hors transaction. Les instructions de contrôle de
+transaction (``BEGIN``, points de sauvegarde) ne sont pas comptées : leur
+nombre dépend de cette transaction englobante, pas du code mesuré.
+"""
+import math
+import statistics
+import time
+import tracemalloc
+from contextlib import ExitStack
+
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from analytics.buffers import flush_write_buffer
+from ecommerce_site.instrumentation import RequestProfile
+from orders.models import Cart, CartItem
+
+TRANSACTION_STATEMENTS = ("BEGIN", "SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO")
+
+
+class ScenarioError(Exception):
+    """Réponse inattendue d'un scénario"""
+
+
+class Scenario:
+    """Requête rejouée : URL, méthode, utilisateur et préparation"""
+
+    def __init__(
+        self,
+        name,
+        url,
+        method="get",
+        user=None,
+        data=None,
+        headers=None,
+        setup=None,
+        status=200,
+        check=None,
+    ):
+        self.name = name
+        self.url = url
+        self.method = method
+        self.user = user
+        self.data = data
+        self.headers = headers or {}
+        self.setup = setup
+        self.status = status
+        self.check = check
+
+    def request(self, client):
+        if self.setup is not None:
+            self.setup()
+        with TestCase.captureOnCommitCallbacks(execute=True):
+            response = getattr(client, self.method)(self.url, self.data, **self.headers)
+        if response.status_code != self.status or (
+            self.check is not None and not self.check(response)
+        ):
+            raise ScenarioError(
+                f"{self.name} : réponse {response.status_code} inattendue "
+                f"({response.get('Location', '')})"
+            )
+        # Consommer les réponses en flux (exports)
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        return response
+
+
+def build_scenarios(dataset):
+    """Scénarios de la boutique, du paiement et des tableaux de bord"""
+    product = dataset.products[0]
+    category = product.category
+    shopper = dataset.customers[0]
+    buyer = dataset.customers[-1]
+
+    def fill_cart():
+        cart, _ = Cart.objects.get_or_create(user=buyer)
+        CartItem.objects.update_or_create(
+            cart=cart, product=product, variant=None, defaults={"quantity": 1}
+        )
+
+    return [
+        Scenario("home", reverse("products:home_page")),
+        Scenario(
+            "product_list_filtered",
+            reverse("products:product_list"),
+            data={
+                "category": category.pk,
+                "min_price": 5000,
+                "max_price": 300000,
+                "sort_by": "price",
+            },
+        ),
+        Scenario("search", reverse("search:search"), data={"q": "Premium"}),
+        Scenario(
+            "product_detail",
+            reverse("products:product_detail", kwargs={"slug": product.slug}),
+        ),
+        Scenario(
+            "add_to_cart",
+            reverse("products:add_to_cart", kwargs={"product_id": product.pk}),
+            method="post",
+            user=shopper,
+            data={"quantity": 1},
+            headers={"HTTP_X_REQUESTED_WITH": "XMLHttpRequest"},
+        ),
+        Scenario(
+            "checkout",
+            reverse("orders:checkout"),
+            method="post",
+            user=buyer,
+            data={
+                "shipping_first_name": "Bench",
+                "shipping_last_name": "Checkout",
+                "shipping_phone": "0700000000",
+                "shipping_address": "Rue du banc d'essai",
+                "shipping_city": "Abidjan",
+                "shipping_country": "Côte d'Ivoire",
+                "payment_method": "cash",
+            },
+            setup=fill_cart,
+            status=302,
+            check=lambda response: "/orders/cart/" not in response["Location"],
+        ),
+        Scenario(
+            "vendor_dashboard",
+            reverse("dashboard:vendor_dashboard"),
+            user=dataset.vendors[0],
+        ),
+        Scenario(
+            "admin_dashboard", reverse("dashboard:admin_dashboard"), user=dataset.admin
+        ),
+        Scenario(
+            "analytics_dashboard", reverse("analytics:dashboard"), user=dataset.admin
+        ),
+        Scenario(
+            "export_sales_csv",
+            reverse("analytics:export_csv", kwargs={"report_type": "sales"}),
+            user=dataset.admin,
+        ),
+        Scenario(
+            "export_inventory_csv", reverse("inventory:export_csv"), user=dataset.admin
+        ),
+    ]
+
+
+def percentile(values, percent):
+    """Percentile au rang le plus proche"""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(percent / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class BenchmarkRunner:
+    """Exécute les scénarios et retourne leurs mesures"""
+
+    def __init__(self, iterations=20, warmup=3, duplicate_threshold=5):
+        self.iterations = iterations
+        self.warmup = warmup
+        self.duplicate_threshold = duplicate_threshold
+
+    def run(self, scenario):
+        """Mesure un scénario à partir du jeu de données initial"""
+        cache.clear()
+        with transaction.atomic():
+            try:
+                return self._run(scenario)
+            finally:
+                # Écritures différées appliquées puis annulées avec le reste
+                flush_write_buffer()
+                transaction.set_rollback(True)
+
+    @staticmethod
+    def _data_only(profile):
+        """``profile`` appliqué aux seules requêtes de données"""
+
+        def wrapper(execute, sql, params, many, context):
+            if sql.startswith(TRANSACTION_STATEMENTS):
+                return execute(sql, params, many, context)
+            return profile(execute, sql, params, many, context)
+
+        return wrapper
+
+    def _run(self, scenario):
+        client = Client()
+        if scenario.user is not None:
+            client.force_login(scenario.user)
+
+        for _ in range(self.warmup):
+            scenario.request(client)
+
+        durations = []
+        queries = []
+        duplicates = 0
+        for _ in range(self.iterations):
+            profile = RequestProfile()
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(
+                        connections[alias].execute_wrapper(self._data_only(profile))
+                    )
+                start = time.perf_counter()
+                scenario.request(client)
+                durations.append(time.perf_counter() - start)
+            queries.append(profile.queries)
+            repeated = profile.duplicates(self.duplicate_threshold)
+            if repeated:
+                duplicates = max(duplicates, repeated[0][1])
+
+        tracemalloc.start()
+        try:
+            scenario.request(client)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        return {
+            "iterations": self.iterations,
+            "p50_ms": round(percentile(durations, 50) * 1000, 2),
+            "p95_ms": round(percentile(durations, 95) * 1000, 2),
+            "mean_ms": round(statistics.mean(durations) * 1000, 2),
+            "queries": int(statistics.median(queries)),
+            "max_queries": max(queries),
+            "max_duplicates": duplicates,
+            "peak_kb": round(peak / 1024, 1),
+        }
+
+
+def compare(
+    results, reference, tolerance=0.5, timings=True, noise_ms=5.0, noise_kb=256.0
+):
+    """
+    Écarts par rapport aux mesures de référence (par scénario). Le nombre de
+    requêtes SQL ne doit pas augmenter. Latence médiane et pic mémoire
+    tolèrent ``tolerance`` (relatif) au-delà du bruit absolu (``noise_ms``,
+    ``noise_kb``) et ne sont comparés que si ``timings`` (même jeu de données,
+    même moteur). p95 est rapporté mais pas comparé : sur quelques dizaines
+    d'exécutions, il dépend surtout des pauses de la machine.
+    """
+    regressions = []
+
+    def exceeds(value, base, relative, noise):
+        return value > max(base * (1 + relative), base + noise)
+
+    for name, result in results.items():
+        base = reference.get(name)
+        if base is None:
+            continue
+        if result["queries"] > base["queries"]:
+            regressions.append(
+                f"{name} : {result['queries']} requêtes SQL (référence "
+                f"{base['queries']})"
+            )
+        if not timings:
+            continue
+        if exceeds(result["p50_ms"], base["p50_ms"], tolerance, noise_ms):
+            regressions.append(
+                f"{name} : p50 {result['p50_ms']} ms (référence {base['p50_ms']} ms)"
+            )
+        if exceeds(result["peak_kb"], base["peak_kb"], tolerance, noise_kb):
+            regressions.append(
+                f"{name} : pic mémoire {result['peak_kb']} Ko (référence "
+                f"{base['peak_kb']} Ko)"
+            )
+    return regressions
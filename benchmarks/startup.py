@@ -0,0 +1,103 @@
+"""
+Mesure du démarrage d'un processus (worker, commande, test)
+
+Le démarrage est mesuré dans un interpréteur neuf : ``django.setup()`` puis
+chargement de l'URLconf, qui importe les vues de toutes les applications,
+comme un worker gunicorn avant sa première requête. ``python -X importtime``
+fournit le coût de chaque import (propre et cumulé, en microsecondes).
+
+Les bibliothèques lourdes (calcul, graphiques, tableurs, QR codes) ne doivent
+être importées que dans les fonctions qui s'en servent.
+"""
+import json
+import os
+import re
+import subprocess
+import sys
+
+from django.conf import settings
+
+# Modules qui ne doivent pas être chargés au démarrage
+HEAVY_MODULES = (
+    "numpy",
+    "pandas",
+    "plotly",
+    "openpyxl",
+    "xlsxwriter",
+    "reportlab",
+    "qrcode",
+)
+
+# Plafonds du test de non-régression (larges : machines d'intégration lentes)
+MAX_BOOT_SECONDS = 3.0
+MAX_BOOT_RSS_MB = 120
+
+BOOT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+elapsed = time.perf_counter() - start
+rss_mb = None
+try:
+    # Pic propre au processus (ru_maxrss hérite du parent sous Linux)
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmHWM:"):
+                rss_mb = int(line.split()[1]) / 1024
+except OSError:
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        rss_mb = rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+    except ImportError:
+        pass
+print(json.dumps({
+    "seconds": elapsed,
+    "rss_mb": rss_mb,
+    "modules": len(sys.modules),
+    "loaded": sorted(name for name in sys.modules if "." not in name),
+}))
+"""
+
+_IMPORTTIME = re.compile(r"^import time:\s*(\d+)\s*\|\s*(\d+)\s*\|(\s*)(\S+)")
+
+
+def parse_importtime(stderr):
+    """Lignes ``-X importtime`` : [(module, µs propres, µs cumulés, profondeur)]"""
+    rows = []
+    for line in stderr.splitlines():
+        match = _IMPORTTIME.match(line)
+        if match:
+            own, cumulative, indent, name = match.groups()
+            rows.append((name, int(own), int(cumulative), (len(indent) - 1) // 2))
+    return rows
+
+
+def measure_boot(importtime=False):
+    """
+    Démarre un interpréteur neuf et retourne durée, pic de mémoire (RSS),
+    modules lourds chargés et, avec ``importtime``, le coût de chaque import
+    """
+    command = [sys.executable]
+    if importtime:
+        command += ["-X", "importtime"]
+    env = dict(os.environ)
+    env.setdefault("DJANGO_SETTINGS_MODULE", "ecommerce_site.settings")
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [str(settings.BASE_DIR), env.get("PYTHONPATH")])
+    )
+    completed = subprocess.run(
+        command + ["-c", BOOT_SCRIPT],
+        cwd=settings.BASE_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["heavy"] = [name for name in HEAVY_MODULES if name in result["loaded"]]
+    result["imports"] = parse_importtime(completed.stderr) if importtime else []
+    return result
@@ -0,0 +1,75 @@
+from django.test import SimpleTestCase, TestCase
+
+from orders.models import Order
+from products.models import Product
+
+from .data import BenchmarkDataGenerator
+from .scenarios import BenchmarkRunner, build_scenarios, compare
+from .startup import MAX_BOOT_RSS_MB, MAX_BOOT_SECONDS, measure_boot, parse_importtime
+
+
+class BenchmarkDataTest(TestCase):
+    """Tests pour le jeu de données et les scénarios des bancs d'essai"""
+
+    def test_dataset_and_scenarios(self):
+        """Jeu de données aux tailles demandées, scénarios rejoués"""
+        generator = BenchmarkDataGenerator(
+            vendors=2, customers=3, products=12, orders=6, reviews=10
+        )
+        counts = generator.generate()
+
+        self.assertEqual(
+            counts,
+            {"vendors": 2, "customers": 3, "products": 12, "orders": 6, "reviews": 10},
+        )
+        product = Product.objects.get(pk=generator.products[0].pk)
+        self.assertTrue(product.search_text)
+        self.assertEqual(product.effective_price, product.price)
+
+        scenarios = {s.name: s for s in build_scenarios(generator)}
+        runner = BenchmarkRunner(iterations=2, warmup=0)
+        orders = Order.objects.count()
+        result = runner.run(scenarios["checkout"])
+
+        # Les commandes du scénario sont annulées avec sa transaction
+        self.assertEqual(Order.objects.count(), orders)
+        self.assertGreater(result["queries"], 0)
+        self.assertGreater(result["peak_kb"], 0)
+
+    def test_compare(self):
+        """Requêtes en plus et latence médiane dégradée sont des régressions"""
+        base = {"p50_ms": 10.0, "p95_ms": 12.0, "queries": 5, "peak_kb": 100.0}
+        reference = {"home": base, "search": base}
+        results = {
+            "home": {**base, "queries": 6},
+            "search": {**base, "p50_ms": 30.0, "p95_ms": 90.0},
+            "new": {**base, "queries": 50},
+        }
+
+        regressions = compare(results, reference)
+        self.assertEqual(len(regressions), 2)
+        self.assertIn("home : 6 requêtes SQL", regressions[0])
+        self.assertIn("search : p50 30.0 ms", regressions[1])
+
+        self.assertEqual(len(compare(results, reference, timings=False)), 1)
+
+
+class StartupTest(SimpleTestCase):
+    """Tests de non-régression du démarrage d'un worker"""
+
+    def test_worker_boot(self):
+        """Pas de bibliothèque lourde, durée et mémoire plafonnées"""
+        result = measure_boot()
+
+        self.assertEqual(result["heavy"], [])
+        self.assertLess(result["seconds"], MAX_BOOT_SECONDS)
+        if result["rss_mb"] is not None:
+            self.assertLess(result["rss_mb"], MAX_BOOT_RSS_MB)
+
+    def test_parse_importtime(self):
+        rows = parse_importtime(
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |   plotly.io\n"
+            "import time:       300 |        420 | plotly\n"
+        )
+        self.assertEqual(rows, [("plotly.io", 120, 120, 1), ("plotly", 300, 420, 0)])
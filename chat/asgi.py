@@ -0,0 +1,207 @@
+"""
+Transport WebSocket du chat et routage ASGI
+"""
+import asyncio
+import json
+import logging
+import re
+from importlib import import_module
+from urllib.parse import urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpRequest
+from django.http.cookie import parse_cookie
+from django.http.request import validate_host
+
+from .hub import get_hub
+from .models import ChatMessage
+from .services import ChatService
+from .writer import get_writer
+
+logger = logging.getLogger(__name__)
+
+ROOM_PATH = re.compile(r"^/ws/chat/(?P<room_id>[\w-]+)/$")
+
+# Codes de fermeture WebSocket
+CLOSE_FORBIDDEN = 4403
+CLOSE_TRY_AGAIN_LATER = 1013
+
+
+def _header(scope, name):
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode("latin1")
+    return None
+
+
+def get_scope_user(scope):
+    """Utilisateur authentifié de la session transmise par cookie, ou None"""
+    from django.contrib.auth import get_user
+
+    cookies = parse_cookie(_header(scope, b"cookie") or "")
+    session_key = cookies.get(settings.SESSION_COOKIE_NAME)
+    if not session_key:
+        return None
+
+    request = HttpRequest()
+    request.session = import_module(settings.SESSION_ENGINE).SessionStore(session_key)
+    user = get_user(request)
+    return user if user.is_authenticated else None
+
+
+def is_origin_allowed(scope):
+    """Refuse les connexions ouvertes depuis un autre site"""
+    origin = _header(scope, b"origin")
+    if not origin:
+        return True
+    host = urlsplit(origin).hostname or ""
+    allowed_hosts = settings.ALLOWED_HOSTS
+    if settings.DEBUG and not allowed_hosts:
+        allowed_hosts = [".localhost", "127.0.0.1", "[::1]"]
+    return validate_host(host, allowed_hosts)
+
+
+class ChatConnection:
+    """
+    Connexion WebSocket d'un utilisateur à une salle.
+
+    Messages acceptés (JSON) :
+    - ``{"type": "message", "message": "..."}`` : envoi d'un message ;
+    - ``{"type": "read", "message_id": 42}`` : accusé de lecture ;
+    - ``{"type": "history", "after": 42}`` : messages postérieurs au curseur.
+    """
+
+    __slots__ = ("room", "user", "send", "subscriber")
+
+    def __init__(self, room, user, send, subscriber):
+        self.room = room
+        self.user = user
+        self.send = send
+        self.subscriber = subscriber
+
+    async def send_json(self, data):
+        await self.send({"type": "websocket.send", "text": json.dumps(data)})
+
+    async def pump(self):
+        """Transmet au client les événements diffusés dans la salle"""
+        while True:
+            events = await self.subscriber.get()
+            if self.subscriber.dropped:
+                # Tampon saturé : le client doit recharger depuis son curseur
+                self.subscriber.dropped = 0
+                await self.send_json({"type": "resync"})
+            for event in events:
+                await self.send_json(event)
+
+    async def handle(self, text):
+        try:
+            data = json.loads(text or "")
+        except ValueError:
+            await self.send_json({"type": "error", "error": "JSON invalide"})
+            return
+        if not isinstance(data, dict):
+            return
+
+        action = data.get("type")
+        if action == "message":
+            message = str(data.get("message", "")).strip()
+            if not message or len(message) > ChatService.MAX_MESSAGE_LENGTH:
+                await self.send_json({"type": "error", "error": "Message invalide"})
+                return
+            await get_writer().submit(self.room, self.user, message)
+        elif action == "read":
+            try:
+                message_id = int(data.get("message_id"))
+            except (TypeError, ValueError):
+                return
+            try:
+                receipt = await sync_to_async(ChatService.mark_read)(
+                    self.room, self.user, message_id
+                )
+            except ChatMessage.DoesNotExist:
+                await self.send_json({"type": "error", "error": "Message invalide"})
+                return
+            if receipt:
+                await get_hub().publish(self.room.room_id, receipt)
+        elif action == "history":
+            try:
+                after = int(data.get("after") or 0)
+            except (TypeError, ValueError):
+                after = 0
+            for event in await sync_to_async(ChatService.messages_after)(
+                self.room, after
+            ):
+                await self.send_json(event)
+
+
+async def chat_websocket(scope, receive, send, room_id):
+    """Application ASGI d'une connexion WebSocket de chat"""
+    event = await receive()
+    if event["type"] != "websocket.connect":
+        return
+
+    room = None
+    if is_origin_allowed(scope):
+        user = await sync_to_async(get_scope_user)(scope)
+        room = await sync_to_async(ChatService.get_room_for_user)(room_id, user)
+    if room is None:
+        await send({"type": "websocket.close", "code": CLOSE_FORBIDDEN})
+        return
+
+    hub = get_hub()
+    subscriber = hub.subscribe(room.room_id)
+    if subscriber is None:
+        await send({"type": "websocket.close", "code": CLOSE_TRY_AGAIN_LATER})
+        return
+
+    await send({"type": "websocket.accept"})
+    connection = ChatConnection(room, user, send, subscriber)
+    pump = asyncio.get_running_loop().create_task(connection.pump())
+    try:
+        while True:
+            event = await receive()
+            if event["type"] == "websocket.disconnect":
+                break
+            if event["type"] == "websocket.receive":
+                await connection.handle(event.get("text"))
+    finally:
+        pump.cancel()
+        hub.unsubscribe(subscriber)
+
+
+class ChatRouter:
+    """
+    Application ASGI principale : WebSocket de chat, cycle de vie du processus
+    et délégation de tout le trafic HTTP à Django
+    """
+
+    def __init__(self, django_application):
+        self.django_application = django_application
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "websocket":
+            match = ROOM_PATH.match(scope["path"])
+            if match is None:
+                await receive()
+                await send({"type": "websocket.close", "code": CLOSE_FORBIDDEN})
+                return
+            await chat_websocket(scope, receive, send, match["room_id"])
+        elif scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+        else:
+            await self.django_application(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                try:
+                    await get_writer().flush()
+                    await get_hub().close()
+                except Exception:
+                    logger.exception("Erreur à l'arrêt du chat")
+                await send({"type": "lifespan.shutdown.complete"})
+                return
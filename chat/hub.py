@@ -0,0 +1,206 @@
+"""
+Hub de diffusion (pub/sub) des événements de chat
+"""
+import asyncio
+import json
+import logging
+from collections import deque
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+def _wake(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class Subscriber:
+    """
+    Abonnement d'une connexion à une salle.
+
+    Le tampon est borné : si le client ne consomme pas assez vite, les
+    événements les plus anciens sont abandonnés et ``dropped`` est incrémenté
+    (le client se resynchronise alors avec son curseur de message).
+    """
+
+    __slots__ = ("room_id", "events", "dropped", "_waiter")
+
+    def __init__(self, room_id, buffer_size):
+        self.room_id = room_id
+        self.events = deque(maxlen=buffer_size)
+        self.dropped = 0
+        self._waiter = None
+
+    def push(self, event):
+        if len(self.events) == self.events.maxlen:
+            self.dropped += 1
+        self.events.append(event)
+        waiter = self._waiter
+        if waiter is None or waiter.done():
+            return
+        loop = waiter.get_loop()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if loop is running:
+            waiter.set_result(None)
+        else:
+            # Publication depuis une autre boucle ou un autre thread
+            loop.call_soon_threadsafe(_wake, waiter)
+
+    async def get(self, timeout=None):
+        """
+        Attend au moins un événement et retourne tous ceux en attente
+        (liste vide si le délai expire)
+        """
+        if not self.events:
+            # Le futur n'existe que pendant l'attente : une connexion inactive
+            # ne coûte que l'objet Subscriber
+            self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                await asyncio.wait_for(self._waiter, timeout)
+            except asyncio.TimeoutError:
+                return []
+            finally:
+                self._waiter = None
+        events = list(self.events)
+        self.events.clear()
+        return events
+
+
+class InProcessBackend:
+    """
+    Diffusion en mémoire, limitée au processus courant
+    """
+
+    def __init__(self, buffer_size=None, max_connections=None):
+        self.buffer_size = buffer_size or getattr(
+            settings, "CHAT_SUBSCRIBER_BUFFER", 50
+        )
+        self.max_connections = max_connections or getattr(
+            settings, "CHAT_MAX_CONNECTIONS", 10000
+        )
+        self.rooms = {}
+        self.connections = 0
+
+    def subscribe(self, room_id):
+        """
+        Abonne une connexion à une salle.
+        Retourne None si le nombre maximal de connexions est atteint.
+        """
+        if self.connections >= self.max_connections:
+            return None
+        subscriber = Subscriber(room_id, self.buffer_size)
+        self.rooms.setdefault(room_id, set()).add(subscriber)
+        self.connections += 1
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        subscribers = self.rooms.get(subscriber.room_id)
+        if subscribers and subscriber in subscribers:
+            subscribers.discard(subscriber)
+            self.connections -= 1
+            if not subscribers:
+                del self.rooms[subscriber.room_id]
+
+    def deliver(self, room_id, event):
+        """Distribue un événement aux abonnés locaux d'une salle"""
+        for subscriber in tuple(self.rooms.get(room_id, ())):
+            subscriber.push(event)
+
+    async def publish(self, room_id, event):
+        self.deliver(room_id, event)
+
+    async def close(self):
+        self.rooms.clear()
+        self.connections = 0
+
+
+class RedisBackend(InProcessBackend):
+    """
+    Diffusion inter-nœuds via Redis pub/sub.
+
+    Chaque nœud garde ses abonnés en mémoire et n'ouvre qu'une seule connexion
+    d'abonnement Redis (motif ``chat:room:*``), quel que soit le nombre de clients.
+    """
+
+    CHANNEL_PREFIX = "chat:room:"
+
+    def __init__(self, url=None, **kwargs):
+        super().__init__(**kwargs)
+        self.url = url or getattr(settings, "CHAT_REDIS_URL", settings.REDIS_URL)
+        self._redis = None
+        self._listener = None
+
+    def _client(self):
+        if self._redis is None:
+            # Dépendance optionnelle : uniquement requise pour ce backend
+            import redis.asyncio as redis
+
+            self._redis = redis.from_url(self.url)
+        return self._redis
+
+    def subscribe(self, room_id):
+        subscriber = super().subscribe(room_id)
+        if subscriber is not None and self._listener is None:
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+        return subscriber
+
+    async def _listen(self):
+        pubsub = self._client().pubsub()
+        await pubsub.psubscribe(f"{self.CHANNEL_PREFIX}*")
+        try:
+            async for message in pubsub.listen():
+                if message["type"] != "pmessage":
+                    continue
+                channel = message["channel"]
+                if isinstance(channel, bytes):
+                    channel = channel.decode()
+                try:
+                    event = json.loads(message["data"])
+                except ValueError:
+                    continue
+                self.deliver(channel[len(self.CHANNEL_PREFIX) :], event)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Écoute Redis du chat interrompue")
+            self._listener = None
+        finally:
+            await pubsub.close()
+
+    async def publish(self, room_id, event):
+        await self._client().publish(
+            f"{self.CHANNEL_PREFIX}{room_id}", json.dumps(event, default=str)
+        )
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+        await super().close()
+
+
+_hub = None
+
+
+def get_hub():
+    """Hub du processus, construit selon ``CHAT_HUB_BACKEND``"""
+    global _hub
+    if _hub is None:
+        backend = getattr(settings, "CHAT_HUB_BACKEND", "chat.hub.InProcessBackend")
+        _hub = import_string(backend)()
+    return _hub
+
+
+def reset_hub():
+    """Oublie le hub courant (tests, rechargement de configuration)"""
+    global _hub
+    _hub = None
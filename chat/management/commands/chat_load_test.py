@@ -0,0 +1,155 @@
+"""
+Commande Django de test de charge du transport de chat
+
+Deux modes :
+- en mémoire (par défaut) : ouvre N connexions simulées sur le hub du processus
+  et mesure la mémoire par connexion inactive et le temps de diffusion ;
+- réseau (``--url``) : ouvre N vraies connexions WebSocket vers un serveur ASGI
+  (nécessite le paquet ``websockets``).
+"""
+import asyncio
+import gc
+import json
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+
+from chat.asgi import ChatConnection
+from chat.hub import InProcessBackend
+
+
+class Command(BaseCommand):
+    help = "Test de charge des connexions de chat (mémoire et diffusion)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--connections",
+            type=int,
+            default=10000,
+            help="Nombre de connexions à ouvrir (défaut : 10000)",
+        )
+        parser.add_argument(
+            "--rooms",
+            type=int,
+            default=100,
+            help="Nombre de salles simulées en mode mémoire (défaut : 100)",
+        )
+        parser.add_argument(
+            "--messages",
+            type=int,
+            default=100,
+            help="Nombre de messages diffusés (défaut : 100)",
+        )
+        parser.add_argument(
+            "--url",
+            help="URL WebSocket d'une salle, ex. ws://localhost:8000/ws/chat/ABC123/",
+        )
+        parser.add_argument(
+            "--cookie",
+            default="",
+            help="En-tête Cookie à transmettre (sessionid=...) en mode réseau",
+        )
+
+    def handle(self, *args, **options):
+        if options["connections"] < 1:
+            raise CommandError("--connections doit être positif")
+        if options["url"]:
+            asyncio.run(self.run_network(options))
+        else:
+            asyncio.run(self.run_in_process(options))
+
+    async def run_in_process(self, options):
+        connections = options["connections"]
+        rooms = max(1, min(options["rooms"], connections))
+        hub = InProcessBackend(max_connections=connections)
+        received = [0]
+
+        async def send(message):
+            received[0] += 1
+
+        gc.collect()
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+
+        tasks = []
+        for index in range(connections):
+            room_id = f"load-{index % rooms}"
+            subscriber = hub.subscribe(room_id)
+            connection = ChatConnection(None, None, send, subscriber)
+            tasks.append(asyncio.get_running_loop().create_task(connection.pump()))
+        # Laisser chaque connexion atteindre son état d'attente
+        await asyncio.sleep(0)
+
+        gc.collect()
+        idle_memory = tracemalloc.get_traced_memory()[0] - baseline
+        tracemalloc.stop()
+
+        expected = options["messages"] * (connections // rooms)
+        started = time.perf_counter()
+        for index in range(options["messages"]):
+            await hub.publish(
+                "load-0", {"type": "message", "id": index, "message": "ping"}
+            )
+        while received[0] < expected:
+            await asyncio.sleep(0)
+        elapsed = time.perf_counter() - started
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        self.stdout.write(f"Connexions inactives : {connections} ({rooms} salles)")
+        self.stdout.write(
+            f"Mémoire : {idle_memory / 1024 / 1024:.1f} Mo, "
+            f"{idle_memory / connections:.0f} octets par connexion"
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✓ {expected} événements distribués en {elapsed * 1000:.1f} ms "
+                f"({expected / elapsed:.0f} événements/s)"
+            )
+        )
+
+    async def run_network(self, options):
+        try:
+            import websockets
+        except ImportError:
+            raise CommandError("Le mode réseau nécessite le paquet « websockets »")
+
+        headers = {"Cookie": options["cookie"]} if options["cookie"] else {}
+        sockets = []
+        started = time.perf_counter()
+        for _ in range(options["connections"]):
+            sockets.append(
+                await websockets.connect(options["url"], extra_headers=headers)
+            )
+        self.stdout.write(
+            f"{len(sockets)} connexions ouvertes en "
+            f"{time.perf_counter() - started:.1f} s"
+        )
+
+        latencies = []
+        listener = sockets[-1]
+        for index in range(options["messages"]):
+            text = f"load-test {index}"
+            sent_at = time.perf_counter()
+            await sockets[0].send(json.dumps({"type": "message", "message": text}))
+            while True:
+                event = json.loads(await listener.recv())
+                if event.get("type") == "message" and event.get("message") == text:
+                    latencies.append(time.perf_counter() - sent_at)
+                    break
+
+        for socket in sockets:
+            await socket.close()
+
+        latencies.sort()
+        if latencies:
+            p50 = latencies[len(latencies) // 2] * 1000
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"✓ Latence aller-retour : p50 {p50:.1f} ms, p99 {p99:.1f} ms"
+                )
+            )
@@ -96,11 +96,15 @@ class ChatRoom(models.Model):
 
     def get_unread_count(self, user):
         """Récupérer le nombre de messages non lus pour un utilisateur"""
-        return self.messages.filter(is_read=False).exclude(sender=user).count()
+        from notifications.counters import UnreadCounterService
+
+        return UnreadCounterService.get_room_unread(self, user)
 
     def mark_as_read(self, user):
         """Marquer tous les messages comme lus pour un utilisateur"""
-        self.messages.filter(is_read=False).exclude(sender=user).update(is_read=True)
+        from notifications.counters import UnreadCounterService
+
+        return UnreadCounterService.mark_room_read(self, user)
 
     def close_room(self, closed_by):
         """Fermer la salle de chat"""
@@ -174,8 +178,9 @@ class ChatMessage(models.Model):
     def mark_as_read(self):
         """Marquer le message comme lu"""
         if not self.is_read:
-            self.is_read = True
-            self.save()
+            from notifications.counters import UnreadCounterService
+
+            UnreadCounterService.mark_chat_message_read(self)
 
     def edit_message(self, new_content):
         """Modifier le contenu du message"""
@@ -197,6 +202,14 @@ class ChatParticipant(models.Model):
     joined_at = models.DateTimeField(auto_now_add=True)
     last_seen = models.DateTimeField(auto_now=True)
     is_online = models.BooleanField(default=False)
+    # Accusé de lecture : dernier message lu par le participant
+    last_read_message = models.ForeignKey(
+        ChatMessage,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
 
     class Meta:
         verbose_name = "Participant de chat"
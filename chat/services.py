@@ -0,0 +1,102 @@
+"""
+Services du chat : accès aux salles, historique et accusés de lecture
+"""
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ChatMessage, ChatParticipant, ChatRoom
+
+
+class ChatService:
+    """
+    Opérations synchrones utilisées par les transports WebSocket et long-poll
+    """
+
+    HISTORY_LIMIT = 100
+    MAX_MESSAGE_LENGTH = 4000
+
+    @staticmethod
+    def get_room_for_user(room_id, user):
+        """
+        Salle accessible à l'utilisateur (participant ou membre du staff),
+        ou None
+        """
+        if user is None or not user.is_authenticated:
+            return None
+        rooms = ChatRoom.objects.filter(room_id=room_id)
+        if not user.is_staff:
+            rooms = rooms.filter(Q(customer=user) | Q(vendor=user) | Q(admin=user))
+        return rooms.first()
+
+    @staticmethod
+    def serialize_message(message, sender=None):
+        sender = sender or message.sender
+        return {
+            "type": "message",
+            "id": message.pk,
+            "room": message.room.room_id,
+            "sender_id": sender.pk,
+            "sender": sender.get_display_name(),
+            "message": message.message,
+            "message_type": message.message_type,
+            "created_at": message.created_at.isoformat(),
+        }
+
+    @classmethod
+    def messages_after(cls, room, after_id=0, limit=None):
+        """Messages de la salle postérieurs au curseur ``after_id``"""
+        messages = (
+            ChatMessage.objects.filter(room=room, pk__gt=after_id or 0)
+            .select_related("sender")
+            .order_by("pk")[: limit or cls.HISTORY_LIMIT]
+        )
+        events = []
+        for message in messages:
+            message.room = room
+            events.append(cls.serialize_message(message))
+        return events
+
+    @staticmethod
+    def mark_read(room, user, message_id):
+        """
+        Enregistre un accusé de lecture jusqu'au message ``message_id``.
+
+        Le message doit appartenir à la salle (``ChatMessage.DoesNotExist``
+        sinon). Seul le curseur du participant est avancé (une ligne, jamais en
+        arrière) ; les indicateurs ``is_read`` des messages jusqu'à
+        ``message_id`` ne sont réécrits, en une requête, que s'il reste des
+        messages non lus d'après le compteur en cache.
+        Retourne l'événement à diffuser, ou None si le curseur n'a pas avancé.
+        """
+        from notifications.counters import UnreadCounterService
+
+        if not ChatMessage.objects.filter(room=room, pk=message_id).exists():
+            raise ChatMessage.DoesNotExist(f"Message {message_id} inconnu")
+
+        now = timezone.now()
+        advanced = (
+            ChatParticipant.objects.filter(room=room, user=user)
+            .filter(
+                Q(last_read_message__isnull=True)
+                | Q(last_read_message_id__lt=message_id)
+            )
+            .update(last_read_message_id=message_id, last_seen=now)
+        )
+        if not advanced:
+            participant, created = ChatParticipant.objects.get_or_create(
+                room=room,
+                user=user,
+                defaults={"last_read_message_id": message_id},
+            )
+            if not created:
+                return None
+
+        if UnreadCounterService.get_room_unread(room, user):
+            UnreadCounterService.mark_room_read(room, user, up_to=message_id)
+
+        return {
+            "type": "read",
+            "room": room.room_id,
+            "user_id": user.pk,
+            "message_id": message_id,
+        }
@@ -0,0 +1,174 @@
+import asyncio
+import json
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from notifications.counters import UnreadCounterService
+
+from .asgi import ChatRouter
+from .hub import Subscriber, get_hub, reset_hub
+from .models import ChatMessage, ChatParticipant, ChatRoom
+from .writer import MessageWriter
+
+User = get_user_model()
+
+
+async def not_found(scope, receive, send):
+    raise AssertionError("Le trafic WebSocket ne doit pas atteindre Django")
+
+
+class ChatTransportTest(TestCase):
+    """Tests pour le transport temps réel du chat"""
+
+    def setUp(self):
+        cache.clear()
+        reset_hub()
+        self.customer = User.objects.create_user(
+            username="chatclient", email="chat@example.com", password="testpass123"
+        )
+        self.vendor = User.objects.create_user(
+            username="chatvendor", email="vendor@example.com", password="testpass123"
+        )
+        self.room = ChatRoom.objects.create(
+            room_id="ROOM1", customer=self.customer, vendor=self.vendor
+        )
+
+    def tearDown(self):
+        reset_hub()
+
+    def test_subscriber_buffer_is_bounded(self):
+        """Un client lent ne conserve que les derniers événements"""
+        subscriber = Subscriber("ROOM1", buffer_size=5)
+        for index in range(8):
+            subscriber.push({"id": index})
+
+        events = async_to_sync(subscriber.get)(timeout=0)
+
+        self.assertEqual([event["id"] for event in events], [3, 4, 5, 6, 7])
+        self.assertEqual(subscriber.dropped, 3)
+
+    def test_writer_persists_batch_and_fans_out(self):
+        """Les messages sont écrits en un lot puis diffusés avec leur identifiant"""
+        subscriber = get_hub().subscribe("ROOM1")
+        writer = MessageWriter(batch_size=10, flush_interval=0.01)
+
+        async def send_all():
+            return await asyncio.gather(
+                *[
+                    writer.submit(self.room, self.vendor, f"Message {index}")
+                    for index in range(3)
+                ]
+            )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            events = async_to_sync(send_all)()
+
+        self.assertEqual(ChatMessage.objects.filter(room=self.room).count(), 3)
+        self.assertEqual(
+            [event["id"] for event in async_to_sync(subscriber.get)(timeout=0)],
+            [event["id"] for event in events],
+        )
+        self.assertEqual(self.room.get_unread_count(self.customer), 3)
+
+    def test_websocket_roundtrip(self):
+        """Un participant connecté envoie un message et le reçoit en diffusion"""
+        self.client.force_login(self.customer)
+        session_cookie = self.client.cookies[settings.SESSION_COOKIE_NAME]
+        cookie = f"{settings.SESSION_COOKIE_NAME}={session_cookie.value}"
+        application = ChatRouter(not_found)
+
+        async def session(headers):
+            incoming = asyncio.Queue()
+            outgoing = asyncio.Queue()
+            scope = {"type": "websocket", "path": "/ws/chat/ROOM1/", "headers": headers}
+            task = asyncio.ensure_future(application(scope, incoming.get, outgoing.put))
+            await incoming.put({"type": "websocket.connect"})
+            accepted = await asyncio.wait_for(outgoing.get(), 5)
+            if accepted["type"] != "websocket.accept":
+                await task
+                return accepted, None
+
+            await incoming.put(
+                {
+                    "type": "websocket.receive",
+                    "text": json.dumps({"type": "message", "message": "Bonjour"}),
+                }
+            )
+            event = await asyncio.wait_for(outgoing.get(), 5)
+            await incoming.put({"type": "websocket.disconnect"})
+            await task
+            return accepted, json.loads(event["text"])
+
+        accepted, event = async_to_sync(session)([(b"cookie", cookie.encode())])
+        self.assertEqual(accepted["type"], "websocket.accept")
+        self.assertEqual(event["message"], "Bonjour")
+        self.assertEqual(event["sender_id"], self.customer.pk)
+        self.assertEqual(get_hub().connections, 0)
+
+        refused, _ = async_to_sync(session)([])
+        self.assertEqual(refused["type"], "websocket.close")
+
+    def test_long_poll_and_read_receipt(self):
+        """Le long-poll renvoie les messages suivants et l'accusé de lecture avance"""
+        first = ChatMessage.objects.create(
+            room=self.room, sender=self.vendor, message="Bonjour"
+        )
+        message = ChatMessage.objects.create(
+            room=self.room, sender=self.vendor, message="Disponible ?"
+        )
+        self.client.force_login(self.customer)
+        url = reverse("chat:read", args=["ROOM1"])
+
+        response = self.client.get(reverse("chat:poll", args=["ROOM1"]), {"after": 0})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["cursor"], message.pk)
+
+        # Seuls les messages jusqu'à l'accusé sont marqués comme lus
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {"message_id": first.pk})
+        self.assertTrue(response.json()["updated"])
+        self.assertEqual(
+            UnreadCounterService.get_room_unread(self.room, self.customer), 1
+        )
+        message.refresh_from_db()
+        self.assertFalse(message.is_read)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {"message_id": message.pk})
+        self.assertTrue(response.json()["updated"])
+        participant = ChatParticipant.objects.get(room=self.room, user=self.customer)
+        self.assertEqual(participant.last_read_message_id, message.pk)
+        self.assertEqual(
+            UnreadCounterService.get_room_unread(self.room, self.customer), 0
+        )
+
+        # Un accusé plus ancien ne fait pas reculer le curseur
+        response = self.client.post(url, {"message_id": first.pk})
+        self.assertFalse(response.json()["updated"])
+
+        # Message inconnu ou d'une autre salle : refusé
+        other_room = ChatRoom.objects.create(
+            room_id="ROOM2", customer=self.vendor, room_type="customer_vendor"
+        )
+        elsewhere = ChatMessage.objects.create(
+            room=other_room, sender=self.vendor, message="Ailleurs"
+        )
+        for message_id in (elsewhere.pk, elsewhere.pk + 100):
+            response = self.client.post(url, {"message_id": message_id})
+            self.assertEqual(response.status_code, 400)
+        participant.refresh_from_db()
+        self.assertEqual(participant.last_read_message_id, message.pk)
+
+    def test_poll_requires_participant(self):
+        """Une salle n'est accessible qu'à ses participants"""
+        outsider = User.objects.create_user(
+            username="outsider", email="out@example.com", password="testpass123"
+        )
+        self.client.force_login(outsider)
+        response = self.client.get(reverse("chat:poll", args=["ROOM1"]))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,11 @@
+from django.urls import path
+
+from . import views
+
+app_name = "chat"
+
+urlpatterns = [
+    path("<str:room_id>/poll/", views.poll_messages, name="poll"),
+    path("<str:room_id>/send/", views.send_message, name="send"),
+    path("<str:room_id>/read/", views.mark_read, name="read"),
+]
@@ -0,0 +1,104 @@
+"""
+Vues HTTP du chat (long-poll) pour les clients sans WebSocket
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+
+from .hub import get_hub
+from .models import ChatMessage
+from .services import ChatService
+from .writer import get_writer
+
+
+def _get_room(request, room_id):
+    """Utilisateur connecté et salle accessible (appel synchrone)"""
+    user = request.user
+    if not user.is_authenticated:
+        return None, None
+    return user, ChatService.get_room_for_user(room_id, user)
+
+
+async def _resolve(request, room_id, method):
+    """Retourne (utilisateur, salle, réponse d'erreur éventuelle)"""
+    if request.method != method:
+        return None, None, JsonResponse({"error": "Méthode non autorisée"}, status=405)
+    user, room = await sync_to_async(_get_room)(request, room_id)
+    if user is None:
+        return (
+            None,
+            None,
+            JsonResponse({"error": "Authentification requise"}, status=401),
+        )
+    if room is None:
+        return None, None, JsonResponse({"error": "Salle introuvable"}, status=404)
+    return user, room, None
+
+
+async def poll_messages(request, room_id):
+    """
+    Attend les nouveaux événements de la salle postérieurs au curseur ``after``
+    (au plus CHAT_LONG_POLL_TIMEOUT secondes)
+    """
+    user, room, error = await _resolve(request, room_id, "GET")
+    if error:
+        return error
+    try:
+        after = int(request.GET.get("after") or 0)
+    except ValueError:
+        return JsonResponse({"error": "Curseur invalide"}, status=400)
+
+    hub = get_hub()
+    subscriber = hub.subscribe(room.room_id)
+    if subscriber is None:
+        return JsonResponse({"error": "Serveur saturé"}, status=503)
+    try:
+        # Abonnement avant la lecture : aucun message ne peut être manqué
+        events = await sync_to_async(ChatService.messages_after)(room, after)
+        if not events:
+            events = await subscriber.get(
+                timeout=getattr(settings, "CHAT_LONG_POLL_TIMEOUT", 25)
+            )
+    finally:
+        hub.unsubscribe(subscriber)
+
+    events = [
+        event for event in events if event["type"] != "message" or event["id"] > after
+    ]
+    cursor = max(
+        [after] + [event["id"] for event in events if event["type"] == "message"]
+    )
+    return JsonResponse({"events": events, "cursor": cursor})
+
+
+async def send_message(request, room_id):
+    """Envoie un message dans la salle"""
+    user, room, error = await _resolve(request, room_id, "POST")
+    if error:
+        return error
+
+    message = request.POST.get("message", "").strip()
+    if not message or len(message) > ChatService.MAX_MESSAGE_LENGTH:
+        return JsonResponse({"error": "Message invalide"}, status=400)
+
+    event = await get_writer().submit(room, user, message)
+    return JsonResponse(event, status=201)
+
+
+async def mark_read(request, room_id):
+    """Accusé de lecture jusqu'au message ``message_id``"""
+    user, room, error = await _resolve(request, room_id, "POST")
+    if error:
+        return error
+    try:
+        message_id = int(request.POST.get("message_id", ""))
+    except ValueError:
+        return JsonResponse({"error": "Message invalide"}, status=400)
+
+    try:
+        receipt = await sync_to_async(ChatService.mark_read)(room, user, message_id)
+    except ChatMessage.DoesNotExist:
+        return JsonResponse({"error": "Message invalide"}, status=400)
+    if receipt:
+        await get_hub().publish(room.room_id, receipt)
+    return JsonResponse({"success": True, "updated": bool(receipt)})
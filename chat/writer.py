@@ -0,0 +1,118 @@
+"""
+Persistance groupée des messages de chat
+"""
+import asyncio
+import logging
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .hub import get_hub
+from .models import ChatMessage, ChatRoom
+from .services import ChatService
+
+logger = logging.getLogger(__name__)
+
+
+class MessageWriter:
+    """
+    Regroupe les messages reçus pendant ``flush_interval`` (ou jusqu'à
+    ``batch_size``) et les écrit en un seul ``bulk_create``, suivi d'une seule
+    mise à jour de ``last_activity`` par lot. Les messages ne sont diffusés
+    qu'une fois persistés, avec leur identifiant définitif.
+    """
+
+    def __init__(self, batch_size=None, flush_interval=None):
+        self.batch_size = batch_size or getattr(settings, "CHAT_WRITE_BATCH_SIZE", 100)
+        self.flush_interval = flush_interval or getattr(
+            settings, "CHAT_WRITE_FLUSH_INTERVAL", 0.05
+        )
+        self._pending = []
+        self._full = asyncio.Event()
+        self._task = None
+
+    async def submit(self, room, sender, message, message_type="text"):
+        """
+        Ajoute un message au prochain lot et attend sa persistance.
+        Retourne l'événement sérialisé du message.
+        """
+        future = asyncio.get_running_loop().create_future()
+        chat_message = ChatMessage(
+            room=room, sender=sender, message=message, message_type=message_type
+        )
+        self._pending.append((chat_message, future))
+
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        elif len(self._pending) >= self.batch_size:
+            self._full.set()
+        return await future
+
+    async def flush(self):
+        """Écrit immédiatement les messages en attente"""
+        if self._task is not None:
+            self._full.set()
+            await self._task
+
+    async def _run(self):
+        try:
+            while self._pending:
+                if len(self._pending) < self.batch_size:
+                    try:
+                        await asyncio.wait_for(self._full.wait(), self.flush_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                self._full.clear()
+                batch = self._pending[: self.batch_size]
+                del self._pending[: self.batch_size]
+                await self._write(batch)
+        finally:
+            self._task = None
+
+    async def _write(self, batch):
+        try:
+            events = await sync_to_async(self._persist)(
+                [message for message, _ in batch]
+            )
+        except Exception as exc:
+            logger.exception("Échec de l'écriture d'un lot de messages de chat")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        hub = get_hub()
+        for (message, future), event in zip(batch, events):
+            await hub.publish(message.room.room_id, event)
+            if not future.done():
+                future.set_result(event)
+
+    @staticmethod
+    def _persist(messages):
+        from notifications.counters import UnreadCounterService
+
+        now = timezone.now()
+        with transaction.atomic():
+            ChatMessage.objects.bulk_create(messages)
+            ChatRoom.objects.filter(
+                pk__in={message.room_id for message in messages}
+            ).update(last_activity=now)
+            # bulk_create n'envoie pas post_save : mettre à jour les compteurs ici
+            for message in messages:
+                UnreadCounterService.chat_message_created(message)
+        return [ChatService.serialize_message(message) for message in messages]
+
+
+_writers = weakref.WeakKeyDictionary()
+
+
+def get_writer():
+    """Écrivain associé à la boucle d'événements courante"""
+    loop = asyncio.get_running_loop()
+    writer = _writers.get(loop)
+    if writer is None:
+        writer = _writers[loop] = MessageWriter()
+    return writer
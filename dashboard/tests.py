@@ -1,3 +1,295 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from orders.models import Order, OrderItem, OrderStatusHistory, VendorOrder
+from orders.services import OrderStatusService, VendorOrderService
+from products.models import Category, Product, ProductVariant
+
+User = get_user_model()
+
+
+class VendorOrderServiceTest(TestCase):
+    """Tests pour la projection des commandes par vendeur"""
+
+    def setUp(self):
+        self.client_user = User.objects.create_user(
+            username="dashclient",
+            email="client@example.com",
+            password="testpass123",
+            user_type="client",
+        )
+        self.vendor = User.objects.create_user(
+            username="dashvendor",
+            email="vendor@example.com",
+            password="testpass123",
+            user_type="vendeur",
+        )
+        self.other_vendor = User.objects.create_user(
+            username="dashvendor2",
+            email="vendor2@example.com",
+            password="testpass123",
+            user_type="vendeur",
+        )
+        category = Category.objects.create(name="Électronique")
+        self.products = [
+            Product.objects.create(
+                name=f"Produit {index}",
+                description="Description",
+                vendor=vendor,
+                category=category,
+                price=100.00,
+                stock=10,
+                status="published",
+            )
+            for index, vendor in enumerate(
+                [self.vendor, self.vendor, self.other_vendor]
+            )
+        ]
+        self.order = Order.objects.create(
+            user=self.client_user,
+            shipping_first_name="John",
+            shipping_last_name="Doe",
+            shipping_phone="0700000000",
+            shipping_address="Rue 12",
+            shipping_city="Abidjan",
+            payment_method="cash",
+            subtotal=Decimal("500.00"),
+            total_amount=Decimal("500.00"),
+        )
+        for product, quantity in zip(self.products, [1, 2, 2]):
+            OrderItem.objects.create(
+                order=self.order,
+                product=product,
+                quantity=quantity,
+                unit_price=Decimal("100.00"),
+                total_price=Decimal("100.00") * quantity,
+            )
+        VendorOrderService.rebuild_orders([self.order.pk])
+
+    def test_rebuild_creates_one_row_per_vendor(self):
+        """Une ligne par vendeur avec son sous-total et son nombre d'articles"""
+        row = VendorOrder.objects.get(order=self.order, vendor=self.vendor)
+        self.assertEqual(row.subtotal, Decimal("300.00"))
+        self.assertEqual(row.item_count, 3)
+        self.assertEqual(VendorOrder.objects.filter(order=self.order).count(), 2)
+
+        # La reconstruction est idempotente
+        VendorOrderService.rebuild_orders([self.order.pk])
+        self.assertEqual(VendorOrder.objects.filter(order=self.order).count(), 2)
+
+    def test_status_change_is_mirrored(self):
+        """Le changement de statut de la commande est recopié dans la projection"""
+        self.order.status = "delivered"
+        self.order.save()
+
+        self.assertFalse(
+            VendorOrder.objects.filter(order=self.order)
+            .exclude(status="delivered")
+            .exists()
+        )
+        stats = VendorOrderService.stats(self.vendor)
+        self.assertEqual(stats["completed_orders"], 1)
+        self.assertEqual(stats["total_revenue"], Decimal("300.00"))
+
+    def test_orders_for_vendor_without_duplicates(self):
+        """Une commande à plusieurs articles du vendeur n'apparaît qu'une fois"""
+        orders = list(VendorOrderService.orders_for_vendor(self.vendor))
+
+        self.assertEqual(orders, [self.order])
+        self.assertEqual(orders[0].vendor_subtotal, Decimal("300.00"))
+        self.assertEqual(
+            list(VendorOrderService.orders_for_vendor(self.vendor, status="shipped")),
+            [],
+        )
+
+
+class OrderStatusServiceTest(TestCase):
+    """Tests des transitions de statut en masse"""
+
+    def setUp(self):
+        self.staff = User.objects.create_user(
+            username="staff",
+            email="staff@example.com",
+            password="x",
+            is_staff=True,
+            is_superuser=True,
+        )
+        self.user = User.objects.create_user(
+            username="testclient",
+            email="client@example.com",
+            password="testpass123",
+            user_type="client",
+        )
+        self.vendor = User.objects.create_user(
+            username="testvendor",
+            email="vendor@example.com",
+            password="testpass123",
+            user_type="vendeur",
+        )
+        category = Category.objects.create(name="Électronique")
+        self.product = Product.objects.create(
+            name="Test Product",
+            description="Test description",
+            vendor=self.vendor,
+            category=category,
+            price=Decimal("5000"),
+            stock=10,
+            sales_count=5,
+            status="published",
+        )
+        self.variant = ProductVariant.objects.create(
+            product=self.product,
+            name="XL",
+            sku="TP-XL",
+            price=Decimal("5000"),
+            stock=4,
+        )
+        self.orders = []
+        for index in range(3):
+            order = Order.objects.create(
+                user=self.user,
+                shipping_first_name="John",
+                shipping_last_name="Doe",
+                shipping_phone="1234567890",
+                shipping_address="123 Test Street",
+                shipping_city="Abidjan",
+                payment_method="cash",
+                subtotal=Decimal("10000"),
+                total_amount=Decimal("10000"),
+            )
+            OrderItem.objects.create(
+                order=order,
+                product=self.product,
+                quantity=2,
+                unit_price=Decimal("5000"),
+                total_price=Decimal("10000"),
+            )
+            OrderItem.objects.create(
+                order=order,
+                product=self.product,
+                variant=self.variant,
+                quantity=1,
+                unit_price=Decimal("5000"),
+                total_price=Decimal("5000"),
+            )
+            self.orders.append(order)
+
+    def test_cancel_in_bulk(self):
+        from notifications.models import EmailQueue
+
+        Order.objects.filter(pk=self.orders[2].pk).update(status="shipped")
+
+        with self.assertNumQueries(15):
+            result = OrderStatusService.transition(
+                Order.objects.all(), "cancelled", user=self.staff
+            )
+
+        self.assertEqual(
+            sorted(result["updated"]), [self.orders[0].pk, self.orders[1].pk]
+        )
+        self.assertEqual(result["rejected"], {self.orders[2].pk: "shipped"})
+        self.assertEqual(Order.objects.filter(status="cancelled").count(), 2)
+        self.assertEqual(
+            OrderStatusHistory.objects.filter(
+                status="cancelled", created_by=self.staff
+            ).count(),
+            2,
+        )
+        self.product.refresh_from_db()
+        self.variant.refresh_from_db()
+        self.assertEqual(self.product.stock, 14)
+        self.assertEqual(self.product.sales_count, 1)
+        self.assertEqual(self.variant.stock, 6)
+        self.assertEqual(EmailQueue.objects.filter(to_email=self.user.email).count(), 2)
+
+    def test_delivery_sets_dates_and_accrues_points(self):
+        from loyalty.models import LoyaltyPoints
+
+        Order.objects.update(status="shipped")
+        result = OrderStatusService.transition(self.orders[:2], "delivered")
+
+        self.assertEqual(len(result["updated"]), 2)
+        delivered = Order.objects.filter(status="delivered")
+        self.assertFalse(delivered.filter(delivered_at__isnull=True).exists())
+        self.assertFalse(delivered.filter(shipped_at__isnull=True).exists())
+        self.assertEqual(LoyaltyPoints.objects.get(user=self.user).points, 20)
+
+        # Pas de double crédit ni de retour en arrière
+        result = OrderStatusService.transition(self.orders, "delivered")
+        self.assertEqual(result["updated"], [self.orders[2].pk])
+        self.assertEqual(LoyaltyPoints.objects.get(user=self.user).points, 30)
+        self.assertEqual(
+            OrderStatusService.transition(self.orders, "confirmed")["updated"], []
+        )
+
+    def test_admin_action(self):
+        self.client.force_login(self.staff)
+        response = self.client.post(
+            reverse("admin:orders_order_changelist"),
+            {
+                "action": "mark_as_shipped",
+                "_selected_action": [order.pk for order in self.orders],
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+        # En attente -> expédiée n'est pas autorisé
+        self.assertFalse(Order.objects.filter(status="shipped").exists())
+
+        Order.objects.update(status="processing")
+        self.client.post(
+            reverse("admin:orders_order_changelist"),
+            {
+                "action": "mark_as_shipped",
+                "_selected_action": [order.pk for order in self.orders],
+            },
+        )
+        self.assertEqual(Order.objects.filter(status="shipped").count(), 3)
+        self.assertEqual(OrderStatusHistory.objects.filter(status="shipped").count(), 3)
+
+    @override_settings(
+        STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage"
+    )
+    def test_vendor_dashboard_uses_transitions(self):
+        """Le tableau de bord vendeur refuse les retours en arrière"""
+        from loyalty.models import LoyaltyPoints
+
+        VendorOrderService.rebuild_orders([order.pk for order in self.orders])
+        order = self.orders[0]
+        Order.objects.filter(pk=order.pk).update(status="shipped")
+        self.client.force_login(self.vendor)
+        url = reverse("dashboard:vendor_orders")
+
+        self.client.post(
+            url, {"action": "update_status", "order_id": order.pk, "status": "pending"}
+        )
+        order.refresh_from_db()
+        self.assertEqual(order.status, "shipped")
+
+        self.client.post(
+            url,
+            {"action": "update_status", "order_id": order.pk, "status": "delivered"},
+        )
+        order.refresh_from_db()
+        self.assertEqual(order.status, "delivered")
+        self.assertEqual(LoyaltyPoints.objects.get(user=self.user).points, 10)
+
+    def test_api_status_update_requires_staff_or_vendor(self):
+        """Le client ne peut pas faire avancer sa propre commande"""
+        VendorOrderService.rebuild_orders([order.pk for order in self.orders])
+        order = self.orders[0]
+        url = reverse("order-update-status", args=[order.pk])
+
+        self.client.force_login(self.user)
+        response = self.client.post(url, {"status": "confirmed"})
+        self.assertEqual(response.status_code, 403)
+        order.refresh_from_db()
+        self.assertEqual(order.status, "pending")
+
+        self.client.force_login(self.vendor)
+        response = self.client.post(url, {"status": "confirmed"})
+        self.assertEqual(response.status_code, 200)
+        order.refresh_from_db()
+        self.assertEqual(order.status, "confirmed")
@@ -10,6 +10,11 @@ urlpatterns = [
     path("vendor/", views.VendorDashboardView.as_view(), name="vendor_dashboard"),
     # Gestion des produits (vendeurs)
     path("vendor/products/", views.vendor_products, name="vendor_products"),
+    path(
+        "vendor/products/<int:product_id>/price-history/",
+        views.vendor_price_history,
+        name="vendor_price_history",
+    ),
     path("vendor/orders/", views.vendor_orders, name="vendor_orders"),
     # Gestion des utilisateurs (admin)
     path("admin/users/", views.admin_users, name="admin_users"),
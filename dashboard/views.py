@@ -20,8 +20,11 @@ from accounts.mixins import (
     VendorRequiredMixin,
 )
 from accounts.models import User, VendorProfile
-from orders.models import Order, OrderItem
+from orders.models import Order
+from orders.services import OrderStatusService, VendorOrderService
 from products.models import Category, Product, ProductReview
+from search.pagination import CountlessPaginator
+from search.services import AdminSearchService
 
 
 class AdminDashboardView(AdminRequiredMixin, TemplateView):
@@ -163,31 +166,20 @@ class VendorDashboardView(VendorRequiredMixin, TemplateView):
         draft_products = products.filter(status="draft").count()
         low_stock_products = products.filter(stock__lte=F("min_stock")).count()
 
-        # Commandes contenant des produits du vendeur
-        vendor_orders = Order.objects.filter(items__product__vendor=user).distinct()
-
-        # Statistiques des commandes
-        total_orders = vendor_orders.count()
-        pending_orders = vendor_orders.filter(status="pending").count()
-        # Commandes livrées = uniquement celles qui ont le statut 'delivered'
-        completed_orders = vendor_orders.filter(status="delivered").count()
-        # Commandes expédiées = 'shipped' ou 'delivered'
-        shipped_orders = vendor_orders.filter(
-            status__in=["shipped", "delivered"]
-        ).count()
+        # Commandes du vendeur (projection VendorOrder)
+        vendor_orders = VendorOrderService.orders_for_vendor(user)
 
-        # Revenus - Calculer le revenu uniquement pour les produits du vendeur
-        total_revenue = (
-            OrderItem.objects.filter(
-                order__status="delivered", product__vendor=user
-            ).aggregate(total=Sum("total_price"))["total"]
-            or 0
-        )
+        # Statistiques des commandes en une requête : livrées = 'delivered',
+        # expédiées = 'shipped' ou 'delivered', revenus = sous-totaux vendeur livrés
+        order_stats = VendorOrderService.stats(user)
+        total_orders = order_stats["total_orders"]
+        pending_orders = order_stats["pending_orders"]
+        completed_orders = order_stats["completed_orders"]
+        shipped_orders = order_stats["shipped_orders"]
+        total_revenue = order_stats["total_revenue"]
 
         # Commandes récentes
-        recent_orders = vendor_orders.select_related("user").order_by("-created_at")[
-            :10
-        ]
+        recent_orders = vendor_orders.select_related("user")[:10]
 
         # Produits les plus vendus - Utiliser OrderItem au lieu de orderitem
         top_products = (
@@ -224,7 +216,7 @@ class VendorDashboardView(VendorRequiredMixin, TemplateView):
         # Commandes nécessitant une attention
         attention_orders = vendor_orders.filter(
             status__in=["pending", "confirmed", "processing"]
-        ).order_by("-created_at")[:5]
+        )[:5]
 
         # Statistiques de performance du mois en cours
         from datetime import datetime, timedelta
@@ -232,18 +224,9 @@ class VendorDashboardView(VendorRequiredMixin, TemplateView):
         current_month_start = timezone.now().replace(
             day=1, hour=0, minute=0, second=0, microsecond=0
         )
-        current_month_orders = vendor_orders.filter(created_at__gte=current_month_start)
-
-        monthly_revenue = (
-            OrderItem.objects.filter(
-                order__in=current_month_orders,
-                order__status="delivered",
-                product__vendor=user,
-            ).aggregate(total=Sum("total_price"))["total"]
-            or 0
-        )
-
-        monthly_orders_count = current_month_orders.count()
+        current_month_stats = VendorOrderService.stats(user, since=current_month_start)
+        monthly_revenue = current_month_stats["total_revenue"]
+        monthly_orders_count = current_month_stats["total_orders"]
 
         # Produits en rupture de stock (stock = 0)
         out_of_stock_products = products.filter(stock=0).count()
@@ -252,7 +235,7 @@ class VendorDashboardView(VendorRequiredMixin, TemplateView):
         archived_products = products.filter(status="archived").count()
 
         # Commandes en cours de traitement
-        processing_orders = vendor_orders.filter(status="processing").count()
+        processing_orders = order_stats["processing_orders"]
 
         # Produits par catégorie
         products_by_category = products.values("category__name").annotate(
@@ -314,42 +297,31 @@ class VendorDashboardView(VendorRequiredMixin, TemplateView):
 
         end_date = timezone.now()
         start_date = end_date - timedelta(days=365)
+        first_month = timezone.localtime(start_date).replace(
+            day=1, hour=0, minute=0, second=0, microsecond=0
+        )
 
-        # Calculer les revenus mensuels via OrderItem
-        monthly_data = []
-        current_date = start_date
-        while current_date <= end_date:
-            month_start = current_date.replace(day=1)
-            if month_start.month == 12:
-                month_end = month_start.replace(year=month_start.year + 1, month=1)
-            else:
-                month_end = month_start.replace(month=month_start.month + 1)
-
-            # Commandes livrées du vendeur pour ce mois
-            month_orders = Order.objects.filter(
-                items__product__vendor=user,
-                created_at__gte=month_start,
-                created_at__lt=month_end,
-                status="delivered",
-            ).distinct()
-
-            # Revenus du vendeur pour ce mois
-            month_revenue = (
-                OrderItem.objects.filter(
-                    order__in=month_orders, product__vendor=user
-                ).aggregate(total=Sum("total_price"))["total"]
-                or 0
-            )
+        # Commandes livrées et revenus du vendeur groupés par mois, en une requête
+        totals = {
+            (row["month"].year, row["month"].month): row
+            for row in VendorOrderService.monthly_stats(user, since=first_month)
+        }
 
+        monthly_data = []
+        month_start = first_month
+        while month_start <= end_date:
+            row = totals.get((month_start.year, month_start.month), {})
             monthly_data.append(
                 {
                     "month": month_start.strftime("%Y-%m-%d"),
-                    "order_count": month_orders.count(),
-                    "revenue": float(month_revenue),
+                    "order_count": row.get("order_count", 0),
+                    "revenue": float(row.get("revenue") or 0),
                 }
             )
-
-            current_date = month_end
+            if month_start.month == 12:
+                month_start = month_start.replace(year=month_start.year + 1, month=1)
+            else:
+                month_start = month_start.replace(month=month_start.month + 1)
 
         return monthly_data
 
@@ -406,6 +378,47 @@ def vendor_products(request):
     return render(request, "dashboard/vendor_products.html", context)
 
 
+@login_required
+def vendor_price_history(request, product_id):
+    """
+    Historique des prix d'un produit du vendeur (JSON pour les graphiques)
+    """
+    from products.price_history import PriceHistoryService
+
+    product = get_object_or_404(Product, pk=product_id)
+    if not (request.user.is_staff or product.vendor_id == request.user.pk):
+        return JsonResponse(
+            {"success": False, "error": "Accès non autorisé"}, status=403
+        )
+
+    try:
+        days = min(max(int(request.GET.get("days", 90)), 1), 730)
+    except ValueError:
+        days = 90
+
+    series = [
+        {
+            "date": point["recorded_at"].isoformat(),
+            "resolution": point["resolution"],
+            "price": point["price"],
+            "original_price": point["original_price"],
+            "compare_price": point["compare_price"],
+            "effective_price": point["effective_price"],
+        }
+        for point in PriceHistoryService.series(product, days=days)
+    ]
+    lowest = PriceHistoryService.lowest_prices([product])[product.pk]
+    return JsonResponse(
+        {
+            "success": True,
+            "product": product.pk,
+            "days": days,
+            "series": series,
+            "lowest_30_days": lowest,
+        }
+    )
+
+
 @login_required
 def vendor_orders(request):
     """
@@ -417,8 +430,6 @@ def vendor_orders(request):
 
     # Gérer le changement de statut
     if request.method == "POST" and request.POST.get("action") == "update_status":
-        from orders.models import OrderStatusHistory
-
         order_id = request.POST.get("order_id")
         new_status = request.POST.get("status")
 
@@ -426,11 +437,7 @@ def vendor_orders(request):
             order = Order.objects.get(id=order_id)
 
             # Vérifier que la commande contient des produits du vendeur
-            vendor_order_items = order.items.filter(product__vendor=request.user)
-
-            if vendor_order_items.exists():
-                old_status = order.status
-
+            if order.vendor_orders.filter(vendor=request.user).exists():
                 # Empêcher seulement l'annulation (seul le client peut annuler)
                 if new_status in ["cancelled", "refunded"]:
                     messages.error(
@@ -438,23 +445,29 @@ def vendor_orders(request):
                         "Seul le client peut annuler ou demander un remboursement.",
                     )
                     return redirect("dashboard:vendor_orders")
+                if new_status not in OrderStatusService.TRANSITIONS:
+                    messages.error(request, "Statut inconnu")
+                    return redirect("dashboard:vendor_orders")
 
-                # Mettre à jour le statut
-                order.status = new_status
-                order.save()
-
-                # Créer un historique du statut
-                OrderStatusHistory.objects.create(
-                    order=order,
-                    status=new_status,
-                    created_by=request.user,
-                    notes=f"Statut changé de {dict(Order.STATUS_CHOICES)[old_status]} à {dict(Order.STATUS_CHOICES)[new_status]} par {request.user.get_display_name()}",
-                )
-
-                messages.success(
-                    request,
-                    f'Statut de la commande {order.order_number} mis à jour en "{order.get_status_display()}"',
+                # Machine à états : transition vérifiée, historique, fidélité
+                # et emails
+                result = OrderStatusService.transition(
+                    [order], new_status, user=request.user
                 )
+                if order.pk in result["rejected"]:
+                    current = result["rejected"][order.pk]
+                    messages.error(
+                        request,
+                        f"Impossible de passer la commande {order.order_number} de "
+                        f'"{dict(Order.STATUS_CHOICES)[current]}" à '
+                        f'"{dict(Order.STATUS_CHOICES)[new_status]}"',
+                    )
+                else:
+                    messages.success(
+                        request,
+                        f"Statut de la commande {order.order_number} mis à jour en "
+                        f'"{dict(Order.STATUS_CHOICES)[new_status]}"',
+                    )
             else:
                 messages.error(
                     request, "Vous n'avez pas la permission de modifier cette commande"
@@ -463,25 +476,14 @@ def vendor_orders(request):
         except Order.DoesNotExist:
             messages.error(request, "Commande non trouvée")
 
-    orders = (
-        Order.objects.filter(items__product__vendor=request.user)
-        .distinct()
-        .order_by("-created_at")
-    )
-
-    # Filtres
+    # Filtres, appliqués à la projection VendorOrder
     status_filter = request.GET.get("status")
     date_from = request.GET.get("date_from")
     date_to = request.GET.get("date_to")
 
-    if status_filter:
-        orders = orders.filter(status=status_filter)
-
-    if date_from:
-        orders = orders.filter(created_at__date__gte=date_from)
-
-    if date_to:
-        orders = orders.filter(created_at__date__lte=date_to)
+    orders = VendorOrderService.orders_for_vendor(
+        request.user, status=status_filter, date_from=date_from, date_to=date_to
+    )
 
     # Pagination
     paginator = Paginator(orders, 20)
@@ -850,14 +852,10 @@ def admin_products(request):
         products = products.filter(category_id=category_filter)
 
     if search_query:
-        products = products.filter(
-            Q(name__icontains=search_query)
-            | Q(description__icontains=search_query)
-            | Q(vendor__username__icontains=search_query)
-        )
+        products = AdminSearchService.search_products(search_query, products)
 
-    # Pagination
-    paginator = Paginator(products, 20)
+    # Pagination (sans COUNT sur la table des produits)
+    paginator = CountlessPaginator(products, 20)
     page_number = request.GET.get("page")
     products = paginator.get_page(page_number)
 
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class DeliverySystemConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "delivery_system"
+
+    def ready(self):
+        import delivery_system.signals  # Activer les signaux (table des zones)
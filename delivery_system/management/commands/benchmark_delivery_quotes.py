@@ -0,0 +1,128 @@
+"""
+Commande Django de mesure du coût des devis de livraison
+
+Génère N destinations (villes connues, fautes de frappe, pays étrangers,
+poids et montants variés) et mesure le coût par devis du calcul en lot
+(``DeliveryQuoteService.quote_many``) face au même calcul appelé
+destination par destination.
+"""
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from delivery_system.models import DeliveryZone
+from delivery_system.resolver import DEFAULT_CITY_ZONES, ZoneResolver
+from delivery_system.services import COUNTRY_DELIVERY_FEES, DeliveryQuoteService
+
+
+class Command(BaseCommand):
+    help = "Mesure le coût par devis du calcul de livraison en lot"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--destinations",
+            type=int,
+            default=DeliveryQuoteService.MAX_DESTINATIONS,
+            help="Nombre de destinations par lot (défaut : 10000)",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Nombre de lots mesurés (défaut : 5)",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Graine du générateur (défaut : 0)"
+        )
+
+    def handle(self, *args, **options):
+        count, repeat = options["destinations"], options["repeat"]
+        if not 0 < count <= DeliveryQuoteService.MAX_DESTINATIONS or repeat < 1:
+            raise CommandError("--destinations ou --repeat hors limites")
+
+        try:
+            resolver = ZoneResolver.build()
+        except DatabaseError:
+            resolver = ZoneResolver([], [])
+        if resolver.default_zone is None:
+            # Base sans zones : tarifs en mémoire, sans écriture
+            resolver = ZoneResolver(self.sample_zones(), [])
+            self.stdout.write("Aucune zone en base : zones d'exemple en mémoire")
+        destinations = self.destinations(count, random.Random(options["seed"]))
+
+        DeliveryQuoteService.quote_many(destinations[:100], resolver=resolver)
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            quotes = DeliveryQuoteService.quote_many(destinations, resolver=resolver)
+            timings.append(time.perf_counter() - started)
+        best = min(timings)
+        errors = sum(1 for quote in quotes if "error" in quote)
+        self.stdout.write(
+            f"Lot : {count} devis en {best * 1000:.1f} ms "
+            f"(meilleur de {repeat}), {best / count * 1e6:.2f} µs/devis, "
+            f"{errors} erreurs"
+        )
+
+        # Référence : un appel par destination, sans mémorisation partagée
+        sample = destinations[: min(count, 1000)]
+        started = time.perf_counter()
+        for destination in sample:
+            DeliveryQuoteService.quote_many([destination], resolver=resolver)
+        unit = (time.perf_counter() - started) / len(sample)
+        self.stdout.write(
+            f"Unitaire : {unit * 1e6:.2f} µs/devis (sur {len(sample)} destinations)"
+        )
+        self.stdout.write(self.style.SUCCESS(f"Gain : x{unit / (best / count):.1f}"))
+
+    def destinations(self, count, rng):
+        cities = [city for names in DEFAULT_CITY_ZONES.values() for city in names]
+        typos = [city[:-1] + "x" for city in cities if len(city) > 5]
+        countries = list(COUNTRY_DELIVERY_FEES)
+        destinations = []
+        for index in range(count):
+            draw = rng.random()
+            country = ""
+            if draw < 0.6:
+                city = rng.choice(cities).title()
+            elif draw < 0.8:
+                city = rng.choice(typos)
+            elif draw < 0.9:
+                city = f"Ville {rng.randrange(500)}"
+            else:
+                city, country = "Capitale", rng.choice(countries)
+            destinations.append(
+                {
+                    "ref": index,
+                    "city": city,
+                    "country": country,
+                    "weight": round(rng.uniform(0.2, 20), 1),
+                    "amount": rng.randrange(1000, 200000),
+                    "method": "express" if draw < 0.15 else "standard",
+                }
+            )
+        return destinations
+
+    def sample_zones(self):
+        zones = [
+            DeliveryZone(
+                pk=index,
+                name=label,
+                zone_type=zone_type,
+                delivery_fee=Decimal(fee),
+                estimated_days=days,
+            )
+            for index, (zone_type, label, fee, days) in enumerate(
+                [
+                    ("abidjan", "Abidjan", "2500", 1),
+                    ("bassam", "Grand-Bassam", "3000", 2),
+                    ("civ_other", "Autres villes", "3000", 3),
+                    ("international", "International", "5000", 7),
+                ],
+                start=1,
+            )
+        ]
+        return zones
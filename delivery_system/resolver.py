@@ -0,0 +1,240 @@
+"""
+Résolution compilée des zones de livraison
+
+La table de correspondance ville → zone est construite une seule fois par
+processus à partir de ``DeliveryZone`` (``city_list`` et ville rattachée), de
+``City``/``Region`` et de la table historique ``DEFAULT_CITY_ZONES``. Les noms
+sont normalisés (minuscules, sans accents ni tirets) ; une faute de frappe
+est rattrapée par rapprochement approximatif, mémorisé.
+
+Une modification d'une zone, d'une ville ou d'une région (admin) vide la
+table du processus courant et change, au commit, sa version
+(``ecommerce_site.caching.CacheVersion`` : vue des autres processus avec un
+cache partagé). Par sécurité, une table n'est jamais conservée plus de
+``MAX_AGE`` secondes. Une résolution ne touche pas la base.
+"""
+import difflib
+import re
+import threading
+import time
+from types import MappingProxyType
+
+from ecommerce_site.caching import CacheVersion
+from search.utils import normalize_search_text
+
+# Villes connues hors base, par type de zone (reprise de l'ancien mapping de
+# DeliveryService.calculate_delivery_fee)
+DEFAULT_CITY_ZONES = {
+    "abidjan": [
+        "abidjan",
+        "cocody",
+        "yopougon",
+        "marcory",
+        "treichville",
+        "adjame",
+        "plateau",
+        "abobo",
+        "anyama",
+        "koumassi",
+        "port-bouet",
+        "bingerville",
+        "attecoube",
+        "williamsville",
+        "songon",
+        "dabou",
+    ],
+    "bassam": ["grand-bassam", "bassam", "jacqueville", "bonoua"],
+    "sanpedro": ["san-pedro", "sanpedro", "sassandra", "tabou"],
+    "yamoussoukro": ["yamoussoukro", "yamossoukro", "tabe", "bangolo"],
+    "bouake": ["bouake", "katiola", "boundiali"],
+    "daloa": ["daloa", "issia", "oume"],
+    "korhogo": ["korhogo", "tingrela", "korogo", "ferkessedougou", "ferkesse"],
+    "man": ["man", "duekoue", "guiglo", "touba"],
+    "gagnoa": ["gagnoa", "ouragahio"],
+    "divo": ["divo", "lakota"],
+    "abengourou": ["abengourou", "agboville", "agnibilekrou"],
+    "odienne": ["odienne", "seguela", "madinan"],
+}
+
+DEFAULT_ZONE_TYPE = "civ_other"
+INTERNATIONAL_ZONE_TYPE = "international"
+HOME_COUNTRIES = {"", "cote d ivoire", "cote divoire", "ci", "civ", "ivory coast"}
+
+_PUNCTUATION = re.compile(r"[-'’_.,/]+")
+
+
+def fold(name):
+    """Forme normalisée d'un nom de ville ou de pays"""
+    return normalize_search_text(_PUNCTUATION.sub(" ", str(name or "")))
+
+
+class ZoneResolution:
+    """Résultat immuable d'une résolution"""
+
+    __slots__ = ("zone", "city", "matched", "exact")
+
+    def __init__(self, zone, city, matched, exact):
+        object.__setattr__(self, "zone", zone)
+        object.__setattr__(self, "city", city)
+        object.__setattr__(self, "matched", matched)
+        object.__setattr__(self, "exact", exact)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ZoneResolution est immuable")
+
+    def __repr__(self):
+        return f"<ZoneResolution {self.city!r} → {self.zone}>"
+
+
+class ZoneResolver:
+    """
+    Table de résolution compilée. Les zones retournées sont des instances
+    ``DeliveryZone`` partagées entre requêtes : à lire, jamais à modifier.
+    """
+
+    FUZZY_CUTOFF = 0.8
+    FUZZY_CACHE_SIZE = 2048
+
+    def __init__(self, zones, cities, version=None):
+        """
+        ``zones`` : zones actives ; ``cities`` : tuples (nom de ville, nom de
+        région) des villes actives
+        """
+        self.version = version
+        by_type = {}
+        for zone in zones:
+            by_type.setdefault(zone.zone_type, zone)
+        self.default_zone = by_type.get(DEFAULT_ZONE_TYPE) or next(
+            iter(by_type.values()), None
+        )
+        self.international_zone = by_type.get(INTERNATIONAL_ZONE_TYPE)
+
+        lookup = {}
+
+        def add(name, zone, override=False):
+            key = fold(name)
+            if key and zone is not None and (override or key not in lookup):
+                lookup[key] = zone
+
+        # Du moins prioritaire au plus prioritaire
+        for zone_type, names in DEFAULT_CITY_ZONES.items():
+            for name in names:
+                add(name, by_type.get(zone_type))
+        region_zones = {}
+        for name, region in cities:
+            region_zone = lookup.get(fold(region))
+            if region_zone is not None:
+                region_zones[fold(name)] = region_zone
+        for name, region_zone in region_zones.items():
+            add(name, region_zone)
+        for name, _ in cities:
+            # Ville connue sans zone propre : elle reste une cible du
+            # rapprochement approximatif, rattachée à la zone par défaut
+            add(name, self.default_zone)
+        for zone in zones:
+            if zone.city_id is not None and zone.city is not None:
+                add(zone.city.name, zone, override=True)
+        for zone in zones:
+            for name in (zone.city_list or "").split(","):
+                add(name, zone, override=True)
+
+        self._lookup = MappingProxyType(lookup)
+        self._names = tuple(lookup)
+        self._fuzzy = {}
+        self._fuzzy_lock = threading.Lock()
+
+    @property
+    def cities(self):
+        """Noms normalisés connus (lecture seule)"""
+        return self._lookup
+
+    def _closest(self, key):
+        try:
+            return self._fuzzy[key]
+        except KeyError:
+            pass
+        matches = difflib.get_close_matches(
+            key, self._names, n=1, cutoff=self.FUZZY_CUTOFF
+        )
+        match = matches[0] if matches else None
+        with self._fuzzy_lock:
+            if len(self._fuzzy) >= self.FUZZY_CACHE_SIZE:
+                self._fuzzy.clear()
+            self._fuzzy[key] = match
+        return match
+
+    def resolve(self, city, country=""):
+        """Zone de livraison d'une ville (et d'un pays), sans accès à la base"""
+        if fold(country) not in HOME_COUNTRIES and self.international_zone:
+            return ZoneResolution(self.international_zone, city, None, True)
+
+        key = fold(city)
+        zone = self._lookup.get(key)
+        if zone is not None:
+            return ZoneResolution(zone, city, key, True)
+
+        match = self._closest(key) if key else None
+        if match is not None:
+            return ZoneResolution(self._lookup[match], city, match, False)
+        return ZoneResolution(self.default_zone, city, None, False)
+
+    @classmethod
+    def build(cls, version=None):
+        """Compile la table depuis la base (deux requêtes)"""
+        from .models import City, DeliveryZone
+
+        zones = list(
+            DeliveryZone.objects.filter(is_active=True)
+            .select_related("city")
+            .order_by("zone_type", "name", "pk")
+        )
+        cities = list(
+            City.objects.filter(is_active=True, region__is_active=True).values_list(
+                "name", "region__name"
+            )
+        )
+        return cls(zones, cities, version=version)
+
+
+VERSION = CacheVersion("delivery:zone_resolver:version")
+MAX_AGE = 300
+
+_state = {"resolver": None, "built_at": 0.0}
+_lock = threading.Lock()
+
+
+def get_zone_resolver():
+    """
+    Table compilée du processus, recompilée quand sa version change ; la base
+    n'est lue qu'à la recompilation.
+    """
+    version = VERSION.get()
+    now = time.monotonic()
+
+    def stale(resolver):
+        return (
+            resolver is None
+            or resolver.version != version
+            or now - _state["built_at"] > MAX_AGE
+        )
+
+    resolver = _state["resolver"]
+    if stale(resolver):
+        with _lock:
+            resolver = _state["resolver"]
+            if stale(resolver):
+                resolver = _state["resolver"] = ZoneResolver.build(version)
+                _state["built_at"] = now
+    return resolver
+
+
+def reset_zone_resolver():
+    """Vide la table du processus courant (recompilée au prochain appel)"""
+    _state["resolver"] = None
+    VERSION.forget()
+
+
+def invalidate_zone_resolver():
+    """Change la version de la table (après une modification validée)"""
+    VERSION.bump()
+    reset_zone_resolver()
@@ -1,9 +1,41 @@
+import math
 from datetime import timedelta
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
 
 from django.utils import timezone
 
-from .models import City, DeliveryAddress, DeliveryZone, Region
+from .models import City, DeliveryZone, Region
+from .resolver import fold, get_zone_resolver, invalidate_zone_resolver
+
+# Tarifs de livraison pour les pays hors Côte d'Ivoire
+COUNTRY_DELIVERY_FEES = {
+    # Pays proches : 10 000 FCFA
+    "Mali": Decimal("10000"),
+    "Burkina Faso": Decimal("10000"),
+    "Sénégal": Decimal("10000"),
+    "Guinée": Decimal("10000"),
+    # Pays un peu plus éloignés : 15 000 FCFA
+    "Ghana": Decimal("15000"),
+    "Togo": Decimal("15000"),
+    "Bénin": Decimal("15000"),
+    "Niger": Decimal("15000"),
+    "Nigeria": Decimal("15000"),
+    "Cameroun": Decimal("15000"),
+    "Congo": Decimal("15000"),
+    "Gabon": Decimal("15000"),
+    "Tchad": Decimal("15000"),
+    "RCA": Decimal("15000"),
+    "Tunisie": Decimal("15000"),
+    "Maroc": Decimal("15000"),
+    "Algérie": Decimal("15000"),
+    "France": Decimal("15000"),
+    "Belgique": Decimal("15000"),
+}
+
+
+def country_delivery_days(fee):
+    """Délai estimé d'un tarif pays : 7 jours pour les pays proches, 10 sinon"""
+    return 7 if fee == Decimal("10000") else 10
 
 
 class DeliveryService:
@@ -21,109 +53,22 @@ class DeliveryService:
     @staticmethod
     def calculate_delivery_fee(city, country="Côte d'Ivoire"):
         """
-        Calcule les frais de livraison selon la ville et le pays
-        Support étendu pour toutes les villes de Côte d'Ivoire
+        Calcule les frais de livraison selon la ville et le pays.
+        La zone est lue dans la table compilée (voir resolver.py), sans
+        requête ; les fautes de frappe sur la ville sont tolérées.
         """
-        city_lower = city.lower().strip()
-
-        # Mapping des villes vers les types de zones
-        cities_to_zones = {
-            # Abidjan
-            "abidjan": "abidjan",
-            "cocody": "abidjan",
-            "yopougon": "abidjan",
-            "marcory": "abidjan",
-            "treichville": "abidjan",
-            "adjame": "abidjan",
-            "plateau": "abidjan",
-            "abobo": "abidjan",
-            "anyama": "abidjan",
-            "koumassi": "abidjan",
-            "port-bouet": "abidjan",
-            "bingerville": "abidjan",
-            "attécoubé": "abidjan",
-            "williamsville": "abidjan",
-            "attecoube": "abidjan",
-            # Grand-Bassam
-            "grand-bassam": "bassam",
-            "grand bassam": "bassam",
-            "bassam": "bassam",
-            "jacqueville": "bassam",
-            "bonoua": "bassam",
-            # San-Pédro
-            "san-pédro": "sanpedro",
-            "san pedro": "sanpedro",
-            "sanpedro": "sanpedro",
-            "sassandra": "sanpedro",
-            "tabou": "sanpedro",
-            # Yamoussoukro
-            "yamoussoukro": "yamoussoukro",
-            "yamossoukro": "yamoussoukro",
-            "duekoue": "yamoussoukro",
-            "duékoué": "yamoussoukro",
-            "tabé": "yamoussoukro",
-            "bangolo": "yamoussoukro",
-            # Bouaké
-            "bouaké": "bouake",
-            "bouake": "bouake",
-            "katiola": "bouake",
-            "boundiali": "bouake",
-            # Daloa
-            "daloa": "daloa",
-            "issia": "daloa",
-            "oumé": "daloa",
-            "oume": "daloa",
-            # Korhogo
-            "korhogo": "korhogo",
-            "tingrela": "korhogo",
-            "korogo": "korhogo",
-            "ferkessedougou": "korhogo",
-            "ferkessédougou": "korhogo",
-            "ferkesse": "korhogo",
-            # Man
-            "man": "man",
-            "duékoué": "man",
-            "duekoue": "man",
-            "guiglo": "man",
-            "touba": "man",
-            # Gagnoa
-            "gagnoa": "gagnoa",
-            "ouragahio": "gagnoa",
-            # Divo
-            "divo": "divo",
-            "lakota": "divo",
-            # Abengourou
-            "abengourou": "abengourou",
-            "agboville": "abengourou",
-            "agnibilekrou": "abengourou",
-            # Odienné
-            "odienné": "odienne",
-            "odienne": "odienne",
-            "seguela": "odienne",
-            "séguela": "odienne",
-            "madinan": "odienne",
-        }
-
-        # Déterminer la zone
-        zone_type = cities_to_zones.get(city_lower, "civ_other")
-
-        # Récupérer la zone correspondante
-        try:
-            zone = DeliveryZone.objects.get(zone_type=zone_type, is_active=True)
-        except DeliveryZone.DoesNotExist:
-            # Zone par défaut si non trouvée
-            zone = DeliveryZone.objects.filter(
-                is_active=True, zone_type="civ_other"
-            ).first()
-            if not zone:
-                # Créer une zone par défaut si aucune n'existe
-                zone = DeliveryZone.objects.create(
-                    name="Zone par défaut",
-                    zone_type="civ_other",
-                    delivery_fee=4000,
-                    estimated_days=5,
-                    description="Zone par défaut",
-                )
+        resolution = get_zone_resolver().resolve(city, country)
+        zone = resolution.zone
+        if zone is None:
+            # Aucune zone active : créer la zone par défaut
+            zone = DeliveryZone.objects.create(
+                name="Zone par défaut",
+                zone_type="civ_other",
+                delivery_fee=4000,
+                estimated_days=5,
+                description="Zone par défaut",
+            )
+            invalidate_zone_resolver()
 
         # Calculer la date de livraison estimée
         estimated_date = timezone.now().date() + timedelta(days=zone.estimated_days)
@@ -133,6 +78,7 @@ class DeliveryService:
             "fee": zone.delivery_fee,
             "estimated_days": zone.estimated_days,
             "estimated_date": estimated_date,
+            "matched_city": resolution.matched,
         }
 
     @staticmethod
@@ -204,38 +150,7 @@ class DeliveryService:
         Returns:
             DeliveryZone: Zone de livraison
         """
-        city_lower = city.lower().strip()
-
-        # Villes d'Abidjan
-        abidjan_cities = [
-            "abidjan",
-            "cocody",
-            "yopougon",
-            "marcory",
-            "treichville",
-            "adjame",
-            "plateau",
-            "koumassi",
-            "attecoube",
-            "songon",
-            "anyama",
-            "bassam",
-            "port-bouet",
-            "abobo",
-            "dabou",
-        ]
-
-        if city_lower in abidjan_cities:
-            zone_type = "abidjan"
-        elif city_lower in ["grand-bassam", "bassam", "grand bassam"]:
-            zone_type = "bassam"
-        else:
-            zone_type = "civ_other"
-
-        try:
-            return DeliveryZone.objects.get(zone_type=zone_type, is_active=True)
-        except DeliveryZone.DoesNotExist:
-            return DeliveryZone.objects.filter(is_active=True).first()
+        return get_zone_resolver().resolve(city).zone
 
     @staticmethod
     def get_all_regions():
@@ -255,30 +170,174 @@ class DeliveryService:
     def get_delivery_fee_for_city(city_name, country="Côte d'Ivoire"):
         """
         Calcule les frais de livraison pour une ville spécifique
+        (même résolution que calculate_delivery_fee)
         """
+        return DeliveryService.calculate_delivery_fee(city_name, country)
+
+
+class QuoteError(ValueError):
+    """Destination invalide dans une demande de devis"""
+
+
+class DeliveryQuoteService:
+    """
+    Devis de livraison en lot (jusqu'à ``MAX_DESTINATIONS`` par appel).
+
+    Les tarifs sont résolus une fois par couple (ville, pays) distinct puis
+    appliqués en arithmétique entière (centimes) : un devis coûte quelques
+    microsecondes et aucune requête une fois la table des zones compilée.
+
+    Règles appliquées à la tarification de la zone (ou du pays) :
+    - au-delà de ``INCLUDED_WEIGHT_KG``, chaque kilo entamé coûte ``COST_PER_KG`` ;
+    - la méthode ``express`` majore les frais de ``EXPRESS_RATE`` % et divise
+      le délai par deux (arrondi au supérieur), hors international ;
+    - si ``FREE_DELIVERY_THRESHOLD`` est défini, une commande d'un montant au
+      moins égal est livrée gratuitement.
+    """
+
+    MAX_DESTINATIONS = 10000
+    METHODS = ("standard", "express")
+    INCLUDED_WEIGHT_KG = 5
+    COST_PER_KG = Decimal("500")
+    EXPRESS_RATE = 150
+    FREE_DELIVERY_THRESHOLD = None
+
+    @staticmethod
+    def _cents(amount):
+        return int(Decimal(amount) * 100)
+
+    @staticmethod
+    def _format(cents):
+        return f"{cents // 100}.{cents % 100:02d}"
+
+    @staticmethod
+    def _number(value, label):
+        if value in (None, ""):
+            return None
         try:
-            # Chercher la ville dans la base de données
-            city = City.objects.get(name__iexact=city_name, is_active=True)
+            number = Decimal(str(value))
+        except InvalidOperation:
+            raise QuoteError(f"{label} invalide")
+        if not number.is_finite() or number < 0:
+            raise QuoteError(f"{label} invalide")
+        return number
+
+    @classmethod
+    def tariffs(cls, resolver=None):
+        """
+        Retourne une fonction (ville, pays) → tarif, mémorisée par couple.
+        Un tarif est le tuple (zone, frais en centimes, délai, ville
+        reconnue, international) ; ``zone`` vaut None pour un tarif pays.
+        """
+        resolver = resolver or get_zone_resolver()
+        countries = {
+            fold(name): (cls._cents(fee), country_delivery_days(fee))
+            for name, fee in COUNTRY_DELIVERY_FEES.items()
+        }
+        memo = {}
 
-            # Chercher la zone de livraison associée
-            if city.delivery_zones.exists():
-                zone = city.delivery_zones.filter(is_active=True).first()
+        def tariff(city, country):
+            key = (city, country)
+            try:
+                return memo[key]
+            except KeyError:
+                pass
+            by_country = countries.get(fold(country))
+            if by_country is not None:
+                value = (None, by_country[0], by_country[1], None, True)
             else:
-                # Utiliser la zone par défaut de la région
-                zone = DeliveryZone.objects.filter(
-                    zone_type="civ_other", is_active=True
-                ).first()
-
-            # Calculer la date de livraison
-            estimated_date = timezone.now().date() + timedelta(days=zone.estimated_days)
-
-            return {
-                "zone": zone,
-                "fee": zone.delivery_fee,
-                "estimated_days": zone.estimated_days,
-                "estimated_date": estimated_date,
-                "city": city,
-            }
-        except City.DoesNotExist:
-            # Si la ville n'est pas trouvée, utiliser le calcul par défaut
-            return DeliveryService.calculate_delivery_fee(city_name, country)
+                resolution = resolver.resolve(city, country)
+                zone = resolution.zone
+                if zone is None:
+                    raise QuoteError("aucune zone de livraison active")
+                value = (
+                    zone,
+                    cls._cents(zone.delivery_fee),
+                    zone.estimated_days,
+                    resolution.matched,
+                    zone is resolver.international_zone,
+                )
+            memo[key] = value
+            return value
+
+        return tariff
+
+    @classmethod
+    def quote_many(cls, destinations, method="standard", today=None, resolver=None):
+        """
+        Calcule un devis par destination. Chaque destination est un
+        dictionnaire ``city``, ``country``, ``weight`` (kg), ``amount``
+        (montant de la commande), ``method`` et ``ref`` (renvoyée telle quelle),
+        tous optionnels sauf ``city`` en Côte d'Ivoire.
+
+        Returns:
+            list: un dictionnaire par destination, dans l'ordre ; une
+            destination invalide porte une clé ``error`` au lieu d'un tarif.
+        """
+        if len(destinations) > cls.MAX_DESTINATIONS:
+            raise QuoteError(
+                f"{cls.MAX_DESTINATIONS} destinations au maximum par demande"
+            )
+        tariff = cls.tariffs(resolver)
+        today = today or timezone.localdate()
+        dates = {}
+        included_kg = cls.INCLUDED_WEIGHT_KG
+        per_kg = cls._cents(cls.COST_PER_KG)
+        express_rate = cls.EXPRESS_RATE
+        threshold = cls.FREE_DELIVERY_THRESHOLD
+        threshold = Decimal(threshold) if threshold is not None else None
+
+        quotes = []
+        for index, destination in enumerate(destinations):
+            ref = index
+            try:
+                if not isinstance(destination, dict):
+                    raise QuoteError("destination invalide")
+                ref = destination.get("ref", index)
+                city = str(destination.get("city") or "").strip()
+                country = str(destination.get("country") or "").strip()
+                row_method = destination.get("method") or method
+                if row_method not in cls.METHODS:
+                    raise QuoteError("méthode de livraison inconnue")
+                zone, fee, days, matched, international = tariff(city, country)
+                if zone is not None and not international and not city:
+                    raise QuoteError("ville requise pour la Côte d'Ivoire")
+
+                weight = cls._number(destination.get("weight"), "poids")
+                if weight is not None and weight > included_kg:
+                    fee += math.ceil(weight - included_kg) * per_kg
+                if row_method == "express":
+                    if international:
+                        raise QuoteError("express indisponible à l'international")
+                    fee = fee * express_rate // 100
+                    days = (days + 1) // 2
+
+                amount = cls._number(destination.get("amount"), "montant")
+                free = (
+                    threshold is not None and amount is not None and amount >= threshold
+                )
+                if free:
+                    fee = 0
+            except QuoteError as error:
+                quotes.append({"ref": ref, "error": str(error)})
+                continue
+
+            estimated_date = dates.get(days)
+            if estimated_date is None:
+                estimated_date = dates[days] = (
+                    today + timedelta(days=days)
+                ).isoformat()
+            quotes.append(
+                {
+                    "ref": ref,
+                    "zone_id": zone.pk if zone is not None else None,
+                    "zone": zone.name if zone is not None else country,
+                    "method": row_method,
+                    "fee": cls._format(fee),
+                    "free_delivery": free,
+                    "estimated_days": days,
+                    "estimated_date": estimated_date,
+                    "matched_city": matched,
+                }
+            )
+        return quotes
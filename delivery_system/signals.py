@@ -0,0 +1,26 @@
+"""
+Signaux Django pour l'application delivery_system
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import City, DeliveryZone, Region
+from .resolver import invalidate_zone_resolver, reset_zone_resolver
+
+
+@receiver(post_save, sender=DeliveryZone)
+@receiver(post_delete, sender=DeliveryZone)
+@receiver(post_save, sender=City)
+@receiver(post_delete, sender=City)
+@receiver(post_save, sender=Region)
+@receiver(post_delete, sender=Region)
+def reload_zone_resolver(sender, raw=False, **kwargs):
+    """
+    Zone, ville ou région modifiée (admin, commandes d'initialisation) : la
+    table des zones est recompilée
+    """
+    if raw:
+        return
+    reset_zone_resolver()
+    transaction.on_commit(invalidate_zone_resolver)
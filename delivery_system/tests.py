@@ -1,3 +1,194 @@
+import json
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+
+from .models import City, DeliveryZone, Region
+from .resolver import ZoneResolver, fold, reset_zone_resolver
+from .services import DeliveryQuoteService, DeliveryService
+
+
+class ZoneResolverTest(TestCase):
+    """Tests pour la résolution compilée des zones de livraison"""
+
+    def setUp(self):
+        cache.clear()
+        reset_zone_resolver()
+        self.abidjan = DeliveryZone.objects.create(
+            name="Abidjan", zone_type="abidjan", delivery_fee=Decimal("2500")
+        )
+        self.other = DeliveryZone.objects.create(
+            name="Autres villes",
+            zone_type="civ_other",
+            delivery_fee=Decimal("3000"),
+            estimated_days=3,
+        )
+        self.international = DeliveryZone.objects.create(
+            name="International",
+            zone_type="international",
+            delivery_fee=Decimal("5000"),
+            estimated_days=7,
+        )
+
+    def tearDown(self):
+        reset_zone_resolver()
+
+    def test_fold_and_fuzzy_matching(self):
+        """Accents, tirets et fautes de frappe sont tolérés"""
+        self.assertEqual(fold("  Port-Bouët "), "port bouet")
+        resolver = ZoneResolver.build()
+
+        self.assertEqual(resolver.resolve("ATTÉCOUBÉ").zone, self.abidjan)
+        resolution = resolver.resolve("Yopougonn")
+        self.assertEqual(resolution.zone, self.abidjan)
+        self.assertFalse(resolution.exact)
+        self.assertEqual(resolver.resolve("Ville inconnue").zone, self.other)
+        self.assertEqual(resolver.resolve("Lyon", "France").zone, self.international)
+
+    def test_database_sources_and_priority(self):
+        """city_list et les villes d'une région connue priment sur la zone par défaut"""
+        region = Region.objects.create(name="Abidjan", code="ABI")
+        City.objects.create(name="Bingerville-Est", region=region)
+        north = DeliveryZone.objects.create(
+            name="Nord",
+            zone_type="civ_other",
+            delivery_fee=Decimal("4500"),
+            city_list="Korhogo, Ferkessédougou",
+        )
+        resolver = ZoneResolver.build()
+
+        self.assertEqual(resolver.resolve("bingerville est").zone, self.abidjan)
+        self.assertEqual(resolver.resolve("ferkessedougou").zone, north)
+
+    def test_resolution_without_queries_and_reload(self):
+        """Une fois compilée, la table répond sans requête et suit les modifications"""
+        DeliveryService.calculate_delivery_fee("Cocody")
+
+        with self.assertNumQueries(0):
+            info = DeliveryService.calculate_delivery_fee("Cocody")
+        self.assertEqual(info["fee"], Decimal("2500"))
+
+        self.abidjan.delivery_fee = Decimal("2000")
+        self.abidjan.save()
+        self.assertEqual(
+            DeliveryService.calculate_delivery_fee("Cocody")["fee"], Decimal("2000")
+        )
+
+
+class DeliveryQuoteServiceTest(TestCase):
+    """Tests pour les devis de livraison en lot"""
+
+    def setUp(self):
+        cache.clear()
+        reset_zone_resolver()
+        self.abidjan = DeliveryZone.objects.create(
+            name="Abidjan", zone_type="abidjan", delivery_fee=Decimal("2500")
+        )
+        DeliveryZone.objects.create(
+            name="Autres villes",
+            zone_type="civ_other",
+            delivery_fee=Decimal("3000"),
+            estimated_days=3,
+        )
+
+    def tearDown(self):
+        reset_zone_resolver()
+
+    def test_fee_rules(self):
+        """Poids, express, tarif pays, gratuité et erreurs par destination"""
+        destinations = [
+            {"ref": "a", "city": "Cocody"},
+            {"city": "Cocody", "weight": "7.2"},
+            {"city": "Bouaké", "method": "express"},
+            {"city": "Dakar", "country": "Sénégal"},
+            {"city": "Dakar", "country": "Sénégal", "method": "express"},
+            {"city": "", "weight": 1},
+            {"city": "Cocody", "weight": "lourd"},
+            {"city": "Cocody", "amount": 60000},
+        ]
+
+        with mock.patch.object(DeliveryQuoteService, "FREE_DELIVERY_THRESHOLD", 50000):
+            quotes = DeliveryQuoteService.quote_many(
+                destinations, today=date(2024, 1, 1)
+            )
+
+        self.assertEqual(
+            quotes[0],
+            {
+                "ref": "a",
+                "zone_id": self.abidjan.pk,
+                "zone": "Abidjan",
+                "method": "standard",
+                "fee": "2500.00",
+                "free_delivery": False,
+                "estimated_days": 1,
+                "estimated_date": "2024-01-02",
+                "matched_city": "cocody",
+            },
+        )
+        self.assertEqual(quotes[1]["fee"], "4000.00")
+        self.assertEqual(
+            (quotes[2]["fee"], quotes[2]["estimated_days"]), ("4500.00", 2)
+        )
+        self.assertEqual(
+            (quotes[3]["zone_id"], quotes[3]["fee"], quotes[3]["estimated_days"]),
+            (None, "10000.00", 7),
+        )
+        self.assertIn("error", quotes[4])
+        self.assertIn("error", quotes[5])
+        self.assertEqual(quotes[6], {"ref": 6, "error": "poids invalide"})
+        self.assertEqual((quotes[7]["fee"], quotes[7]["free_delivery"]), ("0.00", True))
+
+    def test_bulk_endpoint(self):
+        """L'API répond en lot sans requête par destination et borne la taille"""
+        user = get_user_model().objects.create_user(
+            username="quoter", email="quoter@example.com", password="testpass123"
+        )
+        self.client.force_login(user)
+        url = reverse("delivery_system:delivery_quotes")
+        DeliveryQuoteService.quote_many([{"city": "Cocody"}])
+        payload = {"destinations": [{"city": f"Ville {i}"} for i in range(500)]}
+
+        with self.assertNumQueries(2):
+            response = self.client.post(
+                url, json.dumps(payload), content_type="application/json"
+            )
+
+        data = response.json()
+        self.assertEqual((data["count"], data["errors"]), (500, 0))
+        self.assertEqual(data["quotes"][0]["fee"], "3000.00")
+
+        with mock.patch.object(DeliveryQuoteService, "MAX_DESTINATIONS", 10):
+            response = self.client.post(
+                url,
+                json.dumps({"destinations": [{"city": "Cocody"}] * 11}),
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 400)
+
+    def test_checkout_fee_endpoint(self):
+        """L'API de frais du paiement répond pour l'étranger et la Côte d'Ivoire"""
+        user = get_user_model().objects.create_user(
+            username="feeclient", email="fee@example.com", password="testpass123"
+        )
+        self.client.force_login(user)
+        url = reverse("orders:calculate_delivery_fee")
+
+        response = self.client.post(
+            url,
+            json.dumps({"city": "Dakar", "country": "Sénégal"}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["fee"], "10000")
 
-# Create your tests here.
+        response = self.client.post(
+            url, json.dumps({"city": "Cocody"}), content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["fee"], "2500.00")
@@ -28,6 +28,7 @@ urlpatterns = [
         views.calculate_delivery_fee,
         name="calculate_delivery_fee",
     ),
+    path("api/quotes/", views.delivery_quotes, name="delivery_quotes"),
     # Dashboard (admin)
     path("dashboard/", views.delivery_dashboard, name="delivery_dashboard"),
 ]
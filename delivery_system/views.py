@@ -10,12 +10,13 @@ from django.http import HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse_lazy
 from django.utils import timezone
+from django.views.decorators.http import require_POST
 from django.views.generic import CreateView, DetailView, ListView, UpdateView
 
 from orders.models import Order
 
 from .models import DeliveryAddress, DeliveryCalculation, DeliveryZone
-from .services import DeliveryService
+from .services import DeliveryQuoteService, DeliveryService, QuoteError
 
 logger = logging.getLogger(__name__)
 
@@ -137,6 +138,39 @@ def calculate_delivery_fee(request):
         return JsonResponse({"error": "Erreur lors du calcul"}, status=500)
 
 
+@login_required
+@require_POST
+def delivery_quotes(request):
+    """
+    API de devis en lot : ``{"destinations": [...], "method": "standard"}``,
+    un devis par destination (voir DeliveryQuoteService.quote_many)
+    """
+    try:
+        data = json.loads(request.body)
+    except (ValueError, UnicodeDecodeError):
+        return JsonResponse({"error": "JSON invalide"}, status=400)
+    destinations = data.get("destinations") if isinstance(data, dict) else None
+    if not isinstance(destinations, list):
+        return JsonResponse({"error": "Liste de destinations requise"}, status=400)
+    method = data.get("method") or "standard"
+    if method not in DeliveryQuoteService.METHODS:
+        return JsonResponse({"error": "Méthode de livraison inconnue"}, status=400)
+
+    try:
+        quotes = DeliveryQuoteService.quote_many(destinations, method=method)
+    except QuoteError as error:
+        return JsonResponse({"error": str(error)}, status=400)
+
+    return JsonResponse(
+        {
+            "success": True,
+            "count": len(quotes),
+            "errors": sum(1 for quote in quotes if "error" in quote),
+            "quotes": quotes,
+        }
+    )
+
+
 @staff_member_required
 def delivery_dashboard(request):
     """Tableau de bord des livraisons"""
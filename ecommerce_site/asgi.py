@@ -13,4 +13,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ecommerce_site.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Importé après l'initialisation de Django (modèles chargés)
+from chat.asgi import ChatRouter  # noqa: E402
+
+application = ChatRouter(django_application)
@@ -0,0 +1,107 @@
+"""
+Outils communs autour du cache Django
+
+Le cache configuré par défaut (``LocMemCache``) est propre à chaque processus :
+ce qu'un worker y écrit (compteurs, numéros de version) n'est pas vu par les
+autres. Les services qui partagent un état par le cache doivent donc soit
+l'accepter (durée de vie courte, recalcul depuis la base), soit exiger un
+cache partagé (Redis, Memcached, base de données).
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache
+
+# Backends dont les données ne sont visibles que du processus courant
+PROCESS_LOCAL_BACKENDS = {
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+}
+
+
+def cache_is_shared(alias=DEFAULT_CACHE_ALIAS):
+    """Le cache ``alias`` est-il partagé entre les processus ?"""
+    backend = settings.CACHES.get(alias, {}).get("BACKEND", "")
+    return backend not in PROCESS_LOCAL_BACKENDS
+
+
+class CacheVersion:
+    """
+    Numéro de version d'un état compilé en mémoire par chaque processus
+    (table des zones, catalogues de traduction, règles de popups, index de
+    facettes), éventuellement décliné par nom (une version par catégorie).
+
+    ``get`` relit la version en cache au plus une fois toutes les
+    ``check_interval`` secondes ; ``bump``, appelé au commit d'une
+    modification, en crée une nouvelle. L'état compilé avec une autre version
+    que celle retournée par ``get`` est à reconstruire.
+
+    Avec un cache partagé, tous les processus voient la nouvelle version au
+    plus ``check_interval`` secondes après. Avec un cache propre au processus
+    (``LocMemCache``), ``bump`` n'est vu que du processus courant : les
+    versions y expirent alors après ``CACHE_VERSION_LOCAL_TIMEOUT`` secondes
+    (60 par défaut), ce qui borne la durée pendant laquelle les autres
+    processus servent un état périmé.
+    """
+
+    LOCAL_TIMEOUT = 60
+
+    def __init__(self, key, check_interval=1.0):
+        self.key = key
+        self.check_interval = check_interval
+        # Versions relues par ce processus : {nom: (instant de lecture, version)}
+        self._seen = {}
+
+    def cache_key(self, name=None):
+        return self.key if name is None else f"{self.key}:{name}"
+
+    def timeout(self):
+        if cache_is_shared():
+            return None
+        return getattr(settings, "CACHE_VERSION_LOCAL_TIMEOUT", self.LOCAL_TIMEOUT)
+
+    def get(self, name=None):
+        """Version courante (relue en cache au plus une fois par intervalle)"""
+        return self.get_many([name])[name]
+
+    def get_many(self, names):
+        """Versions de plusieurs noms, en une lecture groupée du cache"""
+        now = time.monotonic()
+        versions, due = {}, {}
+        for name in names:
+            seen = self._seen.get(name)
+            if seen is not None and now - seen[0] < self.check_interval:
+                versions[name] = seen[1]
+            else:
+                due[self.cache_key(name)] = name
+        if due:
+            found = cache.get_many(due)
+            for key, name in due.items():
+                version = found.get(key)
+                if version is None:
+                    version = time.time_ns()
+                    cache.add(key, version, self.timeout())
+                    version = cache.get(key, version)
+                versions[name] = version
+                self._seen[name] = (now, version)
+        return versions
+
+    def bump(self, *names):
+        """
+        Crée une nouvelle version (de la version globale si aucun nom) et
+        retourne ``{nom: version}``
+        """
+        names = names or (None,)
+        base = time.time_ns()
+        versions = {name: base + offset for offset, name in enumerate(names)}
+        cache.set_many(
+            {self.cache_key(name): version for name, version in versions.items()},
+            self.timeout(),
+        )
+        for name in names:
+            self._seen.pop(name, None)
+        return versions
+
+    def forget(self):
+        """Oublie les versions relues : la prochaine lecture interroge le cache"""
+        self._seen.clear()
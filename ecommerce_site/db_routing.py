@@ -0,0 +1,237 @@
+"""
+Routage des lectures vers les réplicas de base de données
+
+Les écritures vont toujours à la base principale (``default``). Les lectures
+y vont aussi, sauf dans une portée « réplica » :
+
+- les requêtes GET/HEAD des vues en lecture seule (espaces de noms
+  ``DATABASE_REPLICA_NAMESPACES`` ou vues décorées par ``use_replica()``) ;
+- les traitements lourds (exports, rapports) enveloppés dans ``use_replica()``.
+
+Lecture de ses propres écritures :
+- après une écriture, les lectures de la même requête repassent sur la base
+  principale ;
+- après une requête d'écriture (POST, PUT, PATCH, DELETE), un cookie
+  maintient l'utilisateur sur la base principale pendant
+  ``DATABASE_REPLICA_STICKY_SECONDS`` secondes.
+
+Chaque réplica est surveillé (requête de retard de réplication au plus une
+fois toutes les ``CHECK_INTERVAL`` secondes) : un réplica injoignable ou en
+retard de plus de ``DATABASE_REPLICA_MAX_LAG`` secondes est écarté et les
+lectures retombent sur la base principale.
+"""
+import contextvars
+import logging
+import random
+import threading
+import time
+from contextlib import ContextDecorator
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+STICKY_COOKIE_NAME = "db_primary_until"
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class RoutingState:
+    """Portée de routage d'une requête ou d'un traitement"""
+
+    __slots__ = ("replica", "wrote")
+
+    def __init__(self, replica=False):
+        self.replica = replica
+        self.wrote = False
+
+
+_routing = contextvars.ContextVar("db_routing", default=None)
+
+
+def replica_aliases():
+    """Alias des réplicas configurés (``DATABASE_REPLICAS``)"""
+    return [
+        alias
+        for alias in getattr(settings, "DATABASE_REPLICAS", [])
+        if alias in connections.settings
+    ]
+
+
+class use_replica(ContextDecorator):
+    """
+    Lectures de la portée envoyées aux réplicas (décorateur de vue ou
+    ``with use_replica():`` pour les exports et rapports)
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._token = None
+
+    def _recreate_cm(self):
+        # Une instance par appel de la vue décorée (appels concurrents)
+        return type(self)(self.enabled)
+
+    def __enter__(self):
+        self._token = _routing.set(RoutingState(replica=self.enabled))
+        return self
+
+    def __exit__(self, *exc):
+        wrote = _routing.get().wrote
+        _routing.reset(self._token)
+        outer = _routing.get()
+        if wrote and outer is not None:
+            outer.wrote = True
+        return False
+
+
+def use_primary():
+    """Lectures de la portée envoyées à la base principale"""
+    return use_replica(enabled=False)
+
+
+# Surveillance des réplicas
+
+
+class ReplicaMonitor:
+    """État de santé des réplicas, vérifié au plus une fois par intervalle"""
+
+    CHECK_INTERVAL = 5.0
+
+    LAG_QUERIES = {
+        "postgresql": (
+            "SELECT CASE WHEN pg_is_in_recovery() THEN COALESCE("
+            "EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) "
+            "ELSE 0 END"
+        ),
+    }
+
+    def __init__(self):
+        self._status = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def replica_lag(cls, alias):
+        """Retard de réplication en secondes (0 si le moteur ne l'expose pas)"""
+        connection = connections[alias]
+        query = cls.LAG_QUERIES.get(connection.vendor, "SELECT 0")
+        with connection.cursor() as cursor:
+            cursor.execute(query)
+            lag = cursor.fetchone()[0]
+        return float(lag or 0)
+
+    def is_healthy(self, alias):
+        now = time.monotonic()
+        status = self._status.get(alias)
+        if status is not None and now - status[1] < self.CHECK_INTERVAL:
+            return status[0]
+
+        with self._lock:
+            status = self._status.get(alias)
+            if status is not None and now - status[1] < self.CHECK_INTERVAL:
+                return status[0]
+            max_lag = getattr(settings, "DATABASE_REPLICA_MAX_LAG", 5)
+            try:
+                lag = self.replica_lag(alias)
+            except Exception:
+                logger.warning("Réplica %s injoignable", alias, exc_info=True)
+                healthy = False
+            else:
+                healthy = lag <= max_lag
+                if not healthy:
+                    logger.warning("Réplica %s en retard de %.1f s", alias, lag)
+            self._status[alias] = (healthy, now)
+            return healthy
+
+    def healthy_replicas(self):
+        return [alias for alias in replica_aliases() if self.is_healthy(alias)]
+
+    def reset(self):
+        self._status = {}
+
+
+monitor = ReplicaMonitor()
+
+
+class ReplicaRouter:
+    """Routeur de base de données (``DATABASE_ROUTERS``)"""
+
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state is None or not state.replica or state.wrote:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # Dans une transaction, lire ce que l'on vient d'écrire
+            return DEFAULT_DB_ALIAS
+        replicas = monitor.healthy_replicas()
+        return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Les réplicas reçoivent le schéma par réplication
+        if db in replica_aliases():
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Ouvre la portée de routage de chaque requête : réplicas pour les GET des
+    vues en lecture seule, base principale pour le reste et pour les
+    utilisateurs ayant écrit récemment (cookie ``db_primary_until``)
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    @staticmethod
+    def is_sticky(request):
+        try:
+            return float(request.COOKIES.get(STICKY_COOKIE_NAME, 0)) > time.time()
+        except ValueError:
+            return False
+
+    def __call__(self, request):
+        state = RoutingState()
+        token = _routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+
+        if request.method not in SAFE_METHODS and state.wrote:
+            seconds = getattr(settings, "DATABASE_REPLICA_STICKY_SECONDS", 10)
+            response.set_cookie(
+                STICKY_COOKIE_NAME,
+                str(int(time.time() + seconds)),
+                max_age=seconds,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _routing.get()
+        if (
+            state is None
+            or request.method not in SAFE_METHODS
+            or not replica_aliases()
+            or self.is_sticky(request)
+        ):
+            return None
+        namespaces = set(getattr(settings, "DATABASE_REPLICA_NAMESPACES", []))
+        match = request.resolver_match
+        if match is not None and namespaces.intersection(match.namespaces):
+            state.replica = True
+        return None
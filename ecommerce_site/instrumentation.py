@@ -0,0 +1,272 @@
+"""
+Instrumentation des requêtes : requêtes SQL, temps base, rendu des gabarits
+
+Une fraction ``INSTRUMENTATION_SAMPLE_RATE`` des requêtes (0 : désactivé,
+coût d'un tirage par requête) est mesurée :
+
+- nombre de requêtes SQL et temps passé en base (``execute_wrapper`` posé
+  sur chaque connexion le temps de la requête) ;
+- empreintes des requêtes (littéraux remplacés par ``?``) : une même
+  empreinte exécutée au moins ``INSTRUMENTATION_DUPLICATE_THRESHOLD`` fois
+  signale un N+1 ;
+- temps de rendu des gabarits (rendu le plus externe uniquement).
+
+Chaque requête mesurée produit une ligne de journal JSON (logger
+``ecommerce.instrumentation``, WARNING en cas de N+1) et alimente des
+agrégats par vue exposés au format texte Prometheus sur ``/metrics/``
+(jeton ``INSTRUMENTATION_METRICS_TOKEN`` ou compte staff). Les agrégats sont
+propres à chaque processus : Prometheus les additionne par instance.
+"""
+import contextvars
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from django.template.base import Template
+from django.utils.crypto import constant_time_compare
+
+logger = logging.getLogger("ecommerce.instrumentation")
+
+_FINGERPRINT_RULES = (
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"\bIN\s*\((?:\s*(?:\?|%s)\s*,?)+\)", re.IGNORECASE), "IN (...)"),
+    (re.compile(r"%s"), "?"),
+    (re.compile(r"\s+"), " "),
+)
+
+
+def fingerprint(sql):
+    """Forme normalisée d'une requête SQL (littéraux et listes IN effacés)"""
+    for pattern, replacement in _FINGERPRINT_RULES:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+class RequestProfile:
+    """Mesures d'une requête HTTP"""
+
+    __slots__ = ("queries", "db_time", "template_time", "fingerprints", "_depth")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.fingerprints = Counter()
+        self._depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # execute_wrapper de django.db
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+            self.fingerprints[sql] += 1
+
+    def duplicates(self, threshold):
+        """Empreintes exécutées au moins ``threshold`` fois (N+1 probables)"""
+        counts = Counter()
+        for sql, count in self.fingerprints.items():
+            counts[fingerprint(sql)] += count
+        return [
+            (statement, count)
+            for statement, count in counts.most_common()
+            if count >= threshold
+        ]
+
+
+_profile = contextvars.ContextVar("instrumentation_profile", default=None)
+
+
+def _instrument_templates():
+    """Chronométrage de ``Template.render`` (posé une fois par processus)"""
+    if getattr(Template.render, "_instrumented", False):
+        return
+    render = Template.render
+
+    def instrumented_render(self, context):
+        profile = _profile.get()
+        if profile is None or profile._depth:
+            return render(self, context)
+        profile._depth += 1
+        start = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            profile.template_time += time.perf_counter() - start
+            profile._depth -= 1
+
+    instrumented_render._instrumented = True
+    Template.render = instrumented_render
+
+
+class MetricsRegistry:
+    """Agrégats par vue, au format texte Prometheus"""
+
+    BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    METRICS = (
+        ("requests", "http_sampled_requests_total", "Requêtes mesurées"),
+        ("queries", "db_queries_total", "Requêtes SQL"),
+        ("db", "db_query_duration_seconds_total", "Temps passé en base"),
+        ("templates", "template_render_seconds_total", "Temps de rendu des gabarits"),
+        (
+            "n_plus_one",
+            "db_n_plus_one_requests_total",
+            "Requêtes avec requêtes SQL dupliquées",
+        ),
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counters = defaultdict(lambda: defaultdict(float))
+            self._histograms = defaultdict(lambda: [0] * len(self.BUCKETS))
+
+    def observe(self, view, method, status, duration, profile, duplicates):
+        labels = (view, method, str(status))
+        bucket = next(
+            (i for i, bound in enumerate(self.BUCKETS) if duration <= bound),
+            len(self.BUCKETS),
+        )
+        with self._lock:
+            counters = self._counters[labels]
+            counters["requests"] += 1
+            counters["duration"] += duration
+            counters["queries"] += profile.queries
+            counters["db"] += profile.db_time
+            counters["templates"] += profile.template_time
+            counters["n_plus_one"] += 1 if duplicates else 0
+            histogram = self._histograms[labels]
+            if bucket < len(self.BUCKETS):
+                histogram[bucket] += 1
+
+    @staticmethod
+    def _labels(labels, **extra):
+        view, method, status = labels
+        pairs = {"view": view, "method": method, "status": status, **extra}
+        return ",".join(
+            '%s="%s"' % (key, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+            for key, value in pairs.items()
+        )
+
+    def render(self):
+        with self._lock:
+            counters = {
+                labels: dict(values) for labels, values in self._counters.items()
+            }
+            histograms = {
+                labels: list(values) for labels, values in self._histograms.items()
+            }
+
+        lines = []
+        for key, name, help_text in self.METRICS:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for labels, values in sorted(counters.items()):
+                lines.append(f"{name}{{{self._labels(labels)}}} {values[key]:g}")
+
+        name = "http_request_duration_seconds"
+        lines.append(f"# HELP {name} Durée des requêtes mesurées")
+        lines.append(f"# TYPE {name} histogram")
+        for labels, buckets in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(self.BUCKETS, buckets):
+                cumulative += count
+                lines.append(
+                    f"{name}_bucket{{{self._labels(labels, le=bound)}}} {cumulative}"
+                )
+            values = counters[labels]
+            lines.append(
+                f'{name}_bucket{{{self._labels(labels, le="+Inf")}}} '
+                f'{values["requests"]:g}'
+            )
+            lines.append(f"{name}_sum{{{self._labels(labels)}}} {values['duration']:g}")
+            lines.append(
+                f"{name}_count{{{self._labels(labels)}}} {values['requests']:g}"
+            )
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+class InstrumentationMiddleware:
+    """Mesure un échantillon des requêtes (``INSTRUMENTATION_SAMPLE_RATE``)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        _instrument_templates()
+
+    def __call__(self, request):
+        rate = getattr(settings, "INSTRUMENTATION_SAMPLE_RATE", 0)
+        if rate <= 0 or (rate < 1 and random.random() >= rate):
+            return self.get_response(request)
+
+        profile = RequestProfile()
+        token = _profile.set(profile)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(profile))
+                response = self.get_response(request)
+        finally:
+            _profile.reset(token)
+        self.record(request, response, profile, time.perf_counter() - start)
+        return response
+
+    @staticmethod
+    def record(request, response, profile, duration):
+        match = getattr(request, "resolver_match", None)
+        view = (match.view_name if match else None) or "<unresolved>"
+        threshold = getattr(settings, "INSTRUMENTATION_DUPLICATE_THRESHOLD", 5)
+        duplicates = profile.duplicates(threshold)
+
+        metrics.observe(
+            view, request.method, response.status_code, duration, profile, duplicates
+        )
+        line = {
+            "view": view,
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "duration_ms": round(duration * 1000, 2),
+            "queries": profile.queries,
+            "db_ms": round(profile.db_time * 1000, 2),
+            "template_ms": round(profile.template_time * 1000, 2),
+        }
+        if duplicates:
+            line["duplicates"] = [
+                {"sql": statement[:300], "count": count}
+                for statement, count in duplicates[:5]
+            ]
+            logger.warning("request %s", json.dumps(line, ensure_ascii=False))
+        else:
+            logger.info("request %s", json.dumps(line, ensure_ascii=False))
+
+
+def metrics_view(request):
+    """Agrégats au format texte Prometheus (jeton Bearer ou compte staff)"""
+    token = getattr(settings, "INSTRUMENTATION_METRICS_TOKEN", "")
+    authorization = request.headers.get("Authorization", "")
+    allowed = bool(token) and constant_time_compare(authorization, f"Bearer {token}")
+    user = getattr(request, "user", None)
+    if not allowed and not (user is not None and user.is_staff):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -75,12 +75,15 @@ INSTALLED_APPS = [
     "i18n",
     "returns",
     "promotions",
+    "benchmarks",
 ]
 
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",  # Pour servir les fichiers statiques sur Render
+    "ecommerce_site.instrumentation.InstrumentationMiddleware",
+    "ecommerce_site.db_routing.ReplicaRoutingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.locale.LocaleMiddleware",  # Doit être après SessionMiddleware et avant CommonMiddleware
     "django.middleware.common.CommonMiddleware",
@@ -129,6 +132,32 @@ else:
         }
     }
 
+# Réplicas en lecture (ecommerce_site.db_routing) : URLs séparées par des virgules
+DATABASE_REPLICAS = []
+for index, url in enumerate(
+    filter(None, os.environ.get("DATABASE_REPLICA_URLS", "").split(",")), start=1
+):
+    if dj_database_url is None:
+        break
+    alias = f"replica_{index}"
+    DATABASES[alias] = dj_database_url.parse(url.strip(), conn_max_age=600)
+    DATABASES[alias]["TEST"] = {"MIRROR": "default"}
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ["ecommerce_site.db_routing.ReplicaRouter"]
+# Vues en lecture seule dont les GET lisent sur les réplicas
+DATABASE_REPLICA_NAMESPACES = [
+    "products",
+    "search",
+    "home",
+    "pages",
+    "reviews",
+    "analytics",
+    "dashboard",
+]
+DATABASE_REPLICA_STICKY_SECONDS = 10  # Base principale après une écriture
+DATABASE_REPLICA_MAX_LAG = 5  # secondes ; au-delà, le réplica est écarté
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -217,6 +246,20 @@ EMAIL_TIMEOUT = 30
 SITE_ID = 1
 SITE_URL = os.environ.get("SITE_URL", "http://localhost:8000")
 
+# Flux produits et sitemaps générés (products.feeds, commande generate_feeds),
+# servis sous /feeds/ et /sitemap*.xml
+FEEDS_ROOT = MEDIA_ROOT / "feeds"
+FEEDS_CURRENCY = "XOF"
+
+# Navigation à facettes : bornes des tranches de prix (prix effectif)
+FACET_PRICE_BUCKETS = (5000, 10000, 25000, 50000, 100000)
+
+# Historique des prix : lignes brutes conservées PRICE_HISTORY_RAW_DAYS jours
+# (puis regroupées par jour), lignes journalières PRICE_HISTORY_DAILY_DAYS jours
+# (puis regroupées par semaine)
+PRICE_HISTORY_RAW_DAYS = 35
+PRICE_HISTORY_DAILY_DAYS = 365
+
 # Crispy Forms
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"
@@ -346,6 +389,9 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 # Cache Configuration
+# LocMemCache est propre à chaque processus : avec plusieurs workers, utiliser
+# un cache partagé (Redis, Memcached) pour que les compteurs de non-lus et les
+# versions de cache soient communs (voir ecommerce_site/caching.py)
 CACHES = {
     "default": {
         "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
@@ -477,6 +523,26 @@ CELERY_TIMEZONE = TIME_ZONE
 # Redis Configuration
 REDIS_URL = "redis://localhost:6379/0"
 
+# Chat temps réel (ASGI)
+# "chat.hub.RedisBackend" pour diffuser les messages entre plusieurs nœuds
+CHAT_HUB_BACKEND = os.environ.get("CHAT_HUB_BACKEND", "chat.hub.InProcessBackend")
+CHAT_REDIS_URL = os.environ.get("CHAT_REDIS_URL", REDIS_URL)
+CHAT_MAX_CONNECTIONS = int(os.environ.get("CHAT_MAX_CONNECTIONS", 10000))
+CHAT_SUBSCRIBER_BUFFER = 50  # Événements conservés par connexion lente
+CHAT_LONG_POLL_TIMEOUT = 25  # secondes
+CHAT_WRITE_BATCH_SIZE = 100
+CHAT_WRITE_FLUSH_INTERVAL = 0.05  # secondes
+
+# Écritures différées des compteurs et événements d'interaction (analytics.buffers)
+WRITE_BUFFER_FLUSH_INTERVAL = float(os.environ.get("WRITE_BUFFER_FLUSH_INTERVAL", 2.0))
+WRITE_BUFFER_MAX_PENDING = 5000  # Vidage anticipé au-delà
+
+# Instrumentation des requêtes (ecommerce_site.instrumentation)
+# Fraction des requêtes mesurées : 0 désactive, 1 mesure tout
+INSTRUMENTATION_SAMPLE_RATE = float(os.environ.get("INSTRUMENTATION_SAMPLE_RATE", 0))
+INSTRUMENTATION_DUPLICATE_THRESHOLD = 5  # Même requête SQL répétée : N+1 probable
+INSTRUMENTATION_METRICS_TOKEN = os.environ.get("INSTRUMENTATION_METRICS_TOKEN", "")
+
 # CKEditor Configuration (django-ckeditor, pas CKEditor 5)
 # Note: Les configurations CKEDITOR_5_CONFIGS ne sont pas utilisées avec django-ckeditor
 # Elles sont commentées car django-ckeditor utilise CKEDITOR_CONFIGS
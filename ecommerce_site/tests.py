@@ -0,0 +1,214 @@
+import json
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import ResolverMatch, reverse
+
+from search.models import SearchSuggestion
+
+from .caching import CacheVersion
+from .db_routing import (
+    STICKY_COOKIE_NAME,
+    ReplicaRoutingMiddleware,
+    monitor,
+    use_primary,
+    use_replica,
+)
+from .instrumentation import InstrumentationMiddleware, fingerprint, metrics
+
+User = get_user_model()
+
+REPLICA = "replica_test"
+
+# Second fichier SQLite déclaré avant la création des bases de test
+_replica_dir = tempfile.mkdtemp()
+_replica_name = str(Path(_replica_dir) / "replica.sqlite3")
+connections.settings[REPLICA] = connections.configure_settings(
+    {
+        "default": {},
+        REPLICA: {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": _replica_name,
+            "TEST": {"NAME": _replica_name},
+        },
+    }
+)[REPLICA]
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA], DATABASE_REPLICA_NAMESPACES=["search"])
+class ReplicaRoutingTest(TransactionTestCase):
+    """Tests pour le routage des lectures vers un réplica (deux fichiers SQLite)"""
+
+    databases = {"default", REPLICA}
+
+    def setUp(self):
+        monitor.reset()
+        SearchSuggestion.objects.create(query="principale")
+        SearchSuggestion.objects.using(REPLICA).create(query="réplica")
+        self.middleware = ReplicaRoutingMiddleware(self.view)
+
+    def tearDown(self):
+        monitor.reset()
+        # Le routeur interdit les migrations (donc le flush) sur les réplicas
+        SearchSuggestion.objects.using(REPLICA).all().delete()
+
+    @staticmethod
+    def view(request):
+        return HttpResponse(SearchSuggestion.objects.order_by("pk").first().query)
+
+    def call(self, method, namespace="search", cookies=None):
+        request = getattr(RequestFactory(), method)("/")
+        request.COOKIES.update(cookies or {})
+        request.resolver_match = ResolverMatch(
+            self.view, (), {}, app_names=[namespace], namespaces=[namespace]
+        )
+
+        def get_response(request):
+            self.middleware.process_view(request, self.view, (), {})
+            return self.view(request)
+
+        self.middleware.get_response = get_response
+        return self.middleware(request)
+
+    def test_scopes(self):
+        """Lectures sur la base principale hors portée réplica"""
+        self.assertEqual(SearchSuggestion.objects.get().query, "principale")
+        with use_replica():
+            self.assertEqual(SearchSuggestion.objects.get().query, "réplica")
+            with use_primary():
+                self.assertEqual(SearchSuggestion.objects.get().query, "principale")
+            SearchSuggestion.objects.create(query="nouvelle")
+            # Après une écriture, la portée lit ses propres écritures
+            self.assertEqual(SearchSuggestion.objects.count(), 2)
+
+    def test_middleware_stickiness(self):
+        """GET en lecture seule sur le réplica, puis collé au principal après un POST"""
+        self.assertEqual(self.call("get").content.decode(), "réplica")
+        self.assertEqual(self.call("get", namespace="orders").content, b"principale")
+
+        self.middleware.get_response = lambda request: (
+            SearchSuggestion.objects.create(query="post") and HttpResponse()
+        )
+        response = self.middleware(RequestFactory().post("/"))
+        cookie = response.cookies[STICKY_COOKIE_NAME].value
+
+        response = self.call("get", cookies={STICKY_COOKIE_NAME: cookie})
+        self.assertEqual(response.content, b"principale")
+
+    def test_lagging_replica_falls_back_to_primary(self):
+        """Un réplica en retard ou injoignable est écarté"""
+        with mock.patch.object(monitor, "replica_lag", return_value=60):
+            with use_replica():
+                self.assertEqual(SearchSuggestion.objects.get().query, "principale")
+
+        monitor.reset()
+        with mock.patch.object(monitor, "replica_lag", side_effect=OSError):
+            with use_replica():
+                self.assertEqual(SearchSuggestion.objects.get().query, "principale")
+
+
+class InstrumentationTest(TestCase):
+    """Tests pour l'instrumentation des requêtes"""
+
+    def setUp(self):
+        metrics.reset()
+        self.users = [
+            User.objects.create_user(username=f"instr{index}", password="testpass123")
+            for index in range(4)
+        ]
+
+    def n_plus_one_view(self, request):
+        names = [User.objects.get(pk=user.pk).username for user in self.users]
+        return HttpResponse(Template("{{ names|join:',' }}").render(Context(locals())))
+
+    def test_fingerprint(self):
+        """Littéraux et listes IN sont effacés"""
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id = 42 AND name = 'a''b'"),
+            "SELECT * FROM t WHERE id = ? AND name = ?",
+        )
+        self.assertEqual(
+            fingerprint('SELECT "a" FROM t WHERE "id" IN (%s, %s,\n %s)'),
+            'SELECT "a" FROM t WHERE "id" IN (...)',
+        )
+
+    @override_settings(
+        INSTRUMENTATION_SAMPLE_RATE=1, INSTRUMENTATION_DUPLICATE_THRESHOLD=3
+    )
+    def test_n_plus_one_detected(self):
+        """Les requêtes répétées sont signalées et agrégées"""
+        middleware = InstrumentationMiddleware(self.n_plus_one_view)
+        with self.assertLogs("ecommerce.instrumentation", "WARNING") as logs:
+            response = middleware(RequestFactory().get("/"))
+
+        self.assertEqual(response.content.decode(), "instr0,instr1,instr2,instr3")
+        line = json.loads(logs.records[0].getMessage().split(" ", 1)[1])
+        self.assertEqual(line["queries"], 4)
+        self.assertEqual(line["duplicates"][0]["count"], 4)
+        self.assertGreater(line["template_ms"], 0)
+        self.assertIn(
+            'db_n_plus_one_requests_total{view="<unresolved>",method="GET",'
+            'status="200"} 1',
+            metrics.render(),
+        )
+
+    @override_settings(INSTRUMENTATION_SAMPLE_RATE=0)
+    def test_disabled(self):
+        """Hors échantillon, aucune mesure n'est posée"""
+
+        def view(request):
+            self.assertEqual(connection.execute_wrappers, [])
+            return HttpResponse()
+
+        InstrumentationMiddleware(view)(RequestFactory().get("/"))
+        self.assertNotIn("http_sampled_requests_total{", metrics.render())
+
+    @override_settings(INSTRUMENTATION_METRICS_TOKEN="secret")
+    def test_metrics_endpoint(self):
+        """Endpoint réservé au jeton ou au staff"""
+        url = reverse("metrics")
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        response = self.client.get(url, HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+
+
+class CacheVersionTest(TestCase):
+    """Tests pour les versions d'états compilés partagées par le cache"""
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.version = CacheVersion("tests:version", check_interval=60)
+
+    def test_version_is_memoized_and_bumped(self):
+        """La version est relue au plus une fois par intervalle"""
+        from django.core.cache import cache
+
+        first = self.version.get()
+        with mock.patch.object(cache, "get_many") as get_many:
+            self.assertEqual(self.version.get(), first)
+        get_many.assert_not_called()
+
+        self.version.bump()
+        self.assertNotEqual(self.version.get(), first)
+
+        versions = self.version.get_many([1, 2])
+        self.version.bump(2)
+        self.assertEqual(self.version.get(1), versions[1])
+        self.assertNotEqual(self.version.get(2), versions[2])
+
+    def test_versions_expire_with_a_process_local_cache(self):
+        """Sans cache partagé, les versions ont une durée de vie bornée"""
+        self.assertEqual(self.version.timeout(), CacheVersion.LOCAL_TIMEOUT)
+        redis = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache"}}
+        with override_settings(CACHES=redis):
+            self.assertIsNone(self.version.timeout())
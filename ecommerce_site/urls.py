@@ -3,15 +3,30 @@ from django.conf.urls.i18n import i18n_patterns
 from django.conf.urls.static import static
 from django.contrib import admin
 from django.http import HttpResponse
-from django.urls import include, path
+from django.urls import include, path, re_path
 from django.views.generic import RedirectView
 from django.views.i18n import set_language
 
+from ecommerce_site.instrumentation import metrics_view
+from products.feeds import feed_file_view
+
 # URLs qui ne doivent PAS avoir de préfixe de langue
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("i18n/setlang/", set_language, name="set_language"),
     path("ckeditor5/", include("django_ckeditor_5.urls")),  # CKEditor 5 URLs
+    path("metrics/", metrics_view, name="metrics"),
+    # Flux produits et sitemaps générés par la commande generate_feeds
+    re_path(
+        r"^(?P<path>sitemap(?:-[\w-]+)?\.xml(?:\.gz)?)$",
+        feed_file_view,
+        name="sitemap",
+    ),
+    re_path(
+        r"^feeds/(?P<path>products-[\w-]+\.(?:csv|xml|json))$",
+        feed_file_view,
+        name="product_feed",
+    ),
     path(
         "favicon.ico",
         RedirectView.as_view(url="/static/images/favicon.ico", permanent=False),
@@ -39,6 +54,7 @@ urlpatterns += i18n_patterns(
     path("analytics/", include("analytics.urls")),
     path("2fa/", include("two_factor_auth.urls")),
     path("notifications/", include("notifications.urls")),
+    path("chat/", include("chat.urls")),
     # Applications avec URLs génériques (doivent être APRÈS les URLs spécifiques)
     path("", include("products.urls")),
     prefix_default_language=False,  # Pas de préfixe pour la langue par défaut (fr)
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class I18nConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "i18n"
+
+    def ready(self):
+        import i18n.signals  # Activer les signaux (catalogues de traduction)
@@ -0,0 +1,229 @@
+"""
+Résolution des traductions
+
+Deux mécanismes :
+
+- les traductions d'objets (``ProductTranslation``, ``CategoryTranslation``,
+  ``TagTranslation``) sont chargées en une requête par modèle pour toute une
+  page d'objets (``TranslationService.translate``) et attachées aux
+  instances ; templates et API les lisent ensuite sans requête ;
+- les clés ``TranslationKey``/``TranslationValue`` sont compilées en un
+  catalogue en mémoire par langue ; une modification vide les catalogues du
+  processus courant et change, au commit, leur version
+  (``ecommerce_site.caching.CacheVersion``).
+
+Dans les deux cas, la langue demandée se replie sur sa langue de base
+(``en-us`` → ``en``), puis sur ``LANGUAGE_CODE``, puis sur le contenu source.
+"""
+import threading
+from types import MappingProxyType
+
+from django.conf import settings
+from django.utils import translation
+
+from ecommerce_site.caching import CacheVersion
+
+from .models import (
+    CategoryTranslation,
+    ProductTranslation,
+    TagTranslation,
+    TranslationValue,
+)
+
+# Modèle traduit → (modèle de traduction, clé étrangère, champs traduits)
+TRANSLATED_MODELS = {
+    "products.product": (
+        ProductTranslation,
+        "product",
+        (
+            "name",
+            "description",
+            "short_description",
+            "meta_title",
+            "meta_description",
+        ),
+    ),
+    "products.category": (
+        CategoryTranslation,
+        "category",
+        ("name", "description", "meta_title", "meta_description"),
+    ),
+    "products.tag": (TagTranslation, "tag", ("name", "description")),
+}
+
+
+def fallback_chain(language=None):
+    """Langues à essayer, de la plus à la moins prioritaire"""
+    language = (language or translation.get_language() or "").lower()
+    chain = []
+    for code in (language, language.split("-")[0], settings.LANGUAGE_CODE.lower()):
+        if code and code not in chain:
+            chain.append(code)
+    return tuple(chain)
+
+
+class TranslationService:
+    """
+    Service de traduction des objets du catalogue
+    """
+
+    @staticmethod
+    def translate(objects, language=None, fields=None):
+        """
+        Charge en une requête les traductions d'une liste d'objets d'un même
+        modèle et les attache aux instances (lecture par ``value`` ou le
+        filtre de template ``translated``). Un champ vide dans une langue se
+        replie sur la suivante de la chaîne, puis sur la valeur source.
+
+        Returns:
+            list: les objets, dans l'ordre
+        """
+        objects = [obj for obj in objects if obj is not None]
+        if not objects:
+            return objects
+        best = TranslationService.lookup(
+            objects[0]._meta.label_lower,
+            {obj.pk for obj in objects},
+            language,
+            fields,
+        )
+        chain = fallback_chain(language)
+        for obj in objects:
+            obj._translations = best.get(obj.pk, {})
+            obj._translation_language = chain[0]
+        return objects
+
+    @staticmethod
+    def lookup(label, object_ids, language=None, fields=None):
+        """
+        Traductions d'objets désignés par leur identifiant, en une requête,
+        sans charger les objets (exports en flux par ``values()``)
+
+        Returns:
+            dict: {id: {champ: valeur traduite}} (champs vides omis)
+        """
+        translation_model, foreign_key, translated_fields = TRANSLATED_MODELS[label]
+        fields = tuple(fields or translated_fields)
+        chain = fallback_chain(language)
+
+        rows = translation_model.objects.filter(
+            **{f"{foreign_key}_id__in": object_ids},
+            language__code__in=chain,
+            language__is_active=True,
+        ).values_list(f"{foreign_key}_id", "language__code", *fields)
+
+        rank = {code: index for index, code in enumerate(chain)}
+        best = {}
+        for object_id, code, *values in sorted(rows, key=lambda row: rank[row[1]]):
+            found = best.setdefault(object_id, {})
+            for field, value in zip(fields, values):
+                if value and field not in found:
+                    found[field] = value
+        return best
+
+    @staticmethod
+    def translate_related(objects, *relations, language=None):
+        """Traduit les objets liés (``category``, ...), une requête par relation"""
+        for relation in relations:
+            TranslationService.translate(
+                [getattr(obj, relation, None) for obj in objects], language
+            )
+        return objects
+
+    @staticmethod
+    def value(obj, field):
+        """
+        Valeur traduite d'un champ, sans requête : les traductions doivent
+        avoir été chargées par ``translate`` (sinon, valeur source)
+        """
+        translations = getattr(obj, "_translations", None)
+        if translations and field in translations:
+            return translations[field]
+        return getattr(obj, field, "")
+
+    @staticmethod
+    def gettext(key, language=None, default=None):
+        """Traduction d'une clé du catalogue (la clé elle-même à défaut)"""
+        value = get_catalog(language).get(key)
+        if value is None:
+            return key if default is None else default
+        return value
+
+
+class TranslationCatalog:
+    """Catalogue compilé des clés de traduction d'une langue (lecture seule)"""
+
+    def __init__(self, language, values, version=None):
+        self.language = language
+        self.version = version
+        self._values = MappingProxyType(dict(values))
+
+    def get(self, key, default=None):
+        return self._values.get(key, default)
+
+    def __getitem__(self, key):
+        return self._values[key]
+
+    def __contains__(self, key):
+        return key in self._values
+
+    def __len__(self):
+        return len(self._values)
+
+    @classmethod
+    def build(cls, language, version=None):
+        """Compile le catalogue d'une langue et de ses replis (une requête)"""
+        chain = fallback_chain(language)
+        rows = TranslationValue.objects.filter(
+            key__is_active=True,
+            language__code__in=chain,
+            language__is_active=True,
+        ).values_list("key__key", "language__code", "value")
+
+        rank = {code: index for index, code in enumerate(chain)}
+        values = {}
+        for key, code, value in sorted(rows, key=lambda row: -rank[row[1]]):
+            if value:
+                values[key] = value
+        return cls(chain[0], values, version=version)
+
+
+VERSION = CacheVersion("i18n:catalog:version")
+
+_state = {"catalogs": {}, "version": None}
+_lock = threading.Lock()
+
+
+def get_catalog(language=None):
+    """
+    Catalogue compilé d'une langue, recompilé quand la version des
+    catalogues change ; la base n'est lue qu'à la compilation.
+    """
+    language = fallback_chain(language)[0]
+    version = VERSION.get()
+    if version != _state["version"]:
+        with _lock:
+            if version != _state["version"]:
+                _state["catalogs"] = {}
+                _state["version"] = version
+
+    catalog = _state["catalogs"].get(language)
+    if catalog is None:
+        with _lock:
+            catalog = _state["catalogs"].get(language)
+            if catalog is None:
+                catalog = TranslationCatalog.build(language, version)
+                _state["catalogs"] = {**_state["catalogs"], language: catalog}
+    return catalog
+
+
+def reset_catalogs():
+    """Vide les catalogues du processus courant (recompilés au prochain appel)"""
+    _state["catalogs"] = {}
+    VERSION.forget()
+
+
+def invalidate_catalogs():
+    """Change la version des catalogues (après une modification validée)"""
+    VERSION.bump()
+    reset_catalogs()
@@ -0,0 +1,25 @@
+"""
+Signaux Django pour l'application i18n
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Language, TranslationKey, TranslationValue
+from .services import invalidate_catalogs, reset_catalogs
+
+
+@receiver(post_save, sender=TranslationKey)
+@receiver(post_delete, sender=TranslationKey)
+@receiver(post_save, sender=TranslationValue)
+@receiver(post_delete, sender=TranslationValue)
+@receiver(post_save, sender=Language)
+@receiver(post_delete, sender=Language)
+def reload_catalogs(sender, raw=False, **kwargs):
+    """
+    Clé, valeur ou langue modifiée : les catalogues sont recompilés
+    """
+    if raw:
+        return
+    reset_catalogs()
+    transaction.on_commit(invalidate_catalogs)
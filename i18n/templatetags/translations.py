@@ -0,0 +1,22 @@
+from django import template
+
+from i18n.services import TranslationService
+
+register = template.Library()
+
+
+@register.filter
+def translated(obj, field):
+    """
+    Valeur traduite d'un champ ({{ product|translated:"name" }}), chargée au
+    préalable par TranslationService.translate ; valeur source à défaut
+    """
+    if obj is None:
+        return ""
+    return TranslationService.value(obj, field)
+
+
+@register.simple_tag
+def tr(key, default=None):
+    """Traduction d'une clé du catalogue dans la langue active ({% tr "cart.title" %})"""
+    return TranslationService.gettext(key, default=default)
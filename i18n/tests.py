@@ -0,0 +1,121 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import translation
+
+from api.serializers import ProductSerializer
+from products.models import Category, Product
+
+from .models import (
+    CategoryTranslation,
+    Language,
+    ProductTranslation,
+    TranslationKey,
+    TranslationValue,
+)
+from .services import TranslationService, fallback_chain, get_catalog, reset_catalogs
+
+User = get_user_model()
+
+
+class TranslationServiceTest(TestCase):
+    """Tests pour la résolution des traductions"""
+
+    def setUp(self):
+        cache.clear()
+        reset_catalogs()
+        self.fr = Language.objects.create(code="fr", name="Français")
+        self.en = Language.objects.create(code="en", name="English")
+        vendor = User.objects.create_user(
+            username="i18nvendor", email="i18n@example.com", password="testpass123"
+        )
+        self.category = Category.objects.create(name="Maison")
+        self.products = [
+            Product.objects.create(
+                name=f"Produit {index}",
+                description="Description",
+                vendor=vendor,
+                category=self.category,
+                price=100.00,
+                stock=10,
+                status="published",
+            )
+            for index in range(3)
+        ]
+        ProductTranslation.objects.create(
+            product=self.products[0],
+            language=self.en,
+            name="Product 0",
+            description="",
+        )
+        ProductTranslation.objects.create(
+            product=self.products[0],
+            language=self.fr,
+            name="Produit zéro",
+            description="Description française",
+        )
+        CategoryTranslation.objects.create(
+            category=self.category, language=self.en, name="Home"
+        )
+
+    def tearDown(self):
+        reset_catalogs()
+
+    def test_fallback_chain(self):
+        """Langue demandée, langue de base puis LANGUAGE_CODE"""
+        self.assertEqual(fallback_chain("en-US"), ("en-us", "en", "fr"))
+        self.assertEqual(fallback_chain("fr"), ("fr",))
+
+    def test_translate_page_in_one_query(self):
+        """Une requête pour la page, repli champ par champ"""
+        with self.assertNumQueries(1):
+            products = TranslationService.translate(self.products, "en-gb")
+
+        first, second, _ = products
+        self.assertEqual(TranslationService.value(first, "name"), "Product 0")
+        self.assertEqual(
+            TranslationService.value(first, "description"), "Description française"
+        )
+        self.assertEqual(TranslationService.value(second, "name"), "Produit 1")
+
+    def test_catalog_compiled_and_invalidated(self):
+        """Le catalogue répond sans requête et suit les modifications"""
+        key = TranslationKey.objects.create(key="cart.title")
+        TranslationValue.objects.create(key=key, language=self.fr, value="Panier")
+        TranslationKey.objects.create(key="cart.empty")
+
+        self.assertEqual(get_catalog("en").get("cart.title"), "Panier")
+        with self.assertNumQueries(0):
+            self.assertEqual(TranslationService.gettext("cart.title", "en"), "Panier")
+            self.assertEqual(
+                TranslationService.gettext("cart.empty", "en"), "cart.empty"
+            )
+
+        TranslationValue.objects.create(key=key, language=self.en, value="Cart")
+        self.assertEqual(TranslationService.gettext("cart.title", "en"), "Cart")
+
+    def test_api_serializer(self):
+        """L'API sert les champs traduits de la langue de la requête"""
+        request = RequestFactory().get("/")
+        request.LANGUAGE_CODE = "en"
+        data = ProductSerializer(
+            Product.objects.order_by("pk"), many=True, context={"request": request}
+        ).data
+
+        self.assertEqual(data[0]["name"], "Product 0")
+        self.assertEqual(data[0]["category_name"], "Home")
+        self.assertEqual(data[1]["name"], "Produit 1")
+
+    @override_settings(
+        STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage"
+    )
+    def test_product_list_template(self):
+        """La liste des produits affiche les noms traduits"""
+        with translation.override("en"):
+            url = reverse("products:product_list")
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Product 0")
+        self.assertContains(response, "Home")
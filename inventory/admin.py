@@ -52,6 +52,7 @@ class SupplierAdmin(admin.ModelAdmin):
 class StockAlertAdmin(admin.ModelAdmin):
     list_display = [
         "product",
+        "variant",
         "alert_type",
         "priority",
         "current_stock",
@@ -69,6 +70,7 @@ class StockAlertAdmin(admin.ModelAdmin):
             {
                 "fields": (
                     "product",
+                    "variant",
                     "alert_type",
                     "priority",
                     "threshold_value",
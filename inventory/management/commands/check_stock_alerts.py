@@ -0,0 +1,24 @@
+"""
+Commande Django pour réconcilier les alertes de stock avec tout le catalogue
+À exécuter une fois après déploiement, puis ponctuellement (cron hebdomadaire)
+"""
+from django.core.management.base import BaseCommand
+
+from inventory.services import StockAlertService
+
+
+class Command(BaseCommand):
+    help = (
+        "Évalue les seuils de stock de tous les produits et variantes et "
+        "ouvre ou résout les alertes correspondantes"
+    )
+
+    def handle(self, *args, **options):
+        totals = StockAlertService.evaluate_all()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✓ Alertes : {totals['created']} ouverte(s), "
+                f"{totals['updated']} mise(s) à jour, "
+                f"{totals['resolved']} résolue(s)"
+            )
+        )
@@ -0,0 +1,68 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+
+def resolve_duplicate_open_alerts(apps, schema_editor):
+    """Ne garde que l'alerte ouverte la plus récente de chaque produit"""
+    StockAlert = apps.get_model("inventory", "StockAlert")
+    seen = set()
+    duplicates = []
+    for pk, product_id in (
+        StockAlert.objects.filter(is_resolved=False)
+        .order_by("product_id", "-created_at", "-pk")
+        .values_list("pk", "product_id")
+    ):
+        if product_id in seen:
+            duplicates.append(pk)
+        seen.add(product_id)
+    StockAlert.objects.filter(pk__in=duplicates).update(
+        is_resolved=True, resolved_at=timezone.now()
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0008_product_search_text"),
+        ("inventory", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="stockalert",
+            name="variant",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="stock_alerts",
+                to="products.productvariant",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="stockalert",
+            index=models.Index(
+                fields=["is_resolved", "alert_type", "-created_at"],
+                name="inventory_s_is_reso_4febc1_idx",
+            ),
+        ),
+        migrations.RunPython(resolve_duplicate_open_alerts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="stockalert",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("is_resolved", False), ("variant__isnull", True)),
+                fields=("product",),
+                name="unique_open_stock_alert_per_product",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="stockalert",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("is_resolved", False), ("variant__isnull", False)),
+                fields=("variant",),
+                name="unique_open_stock_alert_per_variant",
+            ),
+        ),
+    ]
@@ -85,6 +85,13 @@ class StockAlert(models.Model):
     product = models.ForeignKey(
         "products.Product", on_delete=models.CASCADE, related_name="stock_alerts"
     )
+    variant = models.ForeignKey(
+        "products.ProductVariant",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="stock_alerts",
+    )
     alert_type = models.CharField(max_length=20, choices=ALERT_TYPES)
     priority = models.CharField(
         max_length=10, choices=PRIORITY_LEVELS, default="medium"
@@ -109,6 +116,22 @@ class StockAlert(models.Model):
         verbose_name = "Alerte de stock"
         verbose_name_plural = "Alertes de stock"
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["is_resolved", "alert_type", "-created_at"]),
+        ]
+        constraints = [
+            # Une seule alerte ouverte par produit (sans variante) ou par variante
+            models.UniqueConstraint(
+                fields=["product"],
+                condition=models.Q(is_resolved=False, variant__isnull=True),
+                name="unique_open_stock_alert_per_product",
+            ),
+            models.UniqueConstraint(
+                fields=["variant"],
+                condition=models.Q(is_resolved=False, variant__isnull=False),
+                name="unique_open_stock_alert_per_variant",
+            ),
+        ]
 
     def __str__(self):
         return f"Alerte {self.alert_type} - {self.product.name}"
@@ -0,0 +1,536 @@
+"""
+Services de l'application inventory
+"""
+import csv
+import io
+import os
+import threading
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from products.facets import FacetEngine
+from products.models import Product, ProductVariant
+
+from .models import StockAlert, StockMovement
+
+
+class StockImportError(Exception):
+    """Fichier d'import de stock illisible"""
+
+
+class BulkStockImporter:
+    """
+    Applique en masse des niveaux de stock absolus (synchronisation
+    fournisseur, inventaire physique).
+
+    Les produits référencés sont lus en une requête (verrouillés dans la
+    transaction), les écarts sont calculés en mémoire, puis les stocks et
+    statuts sont écrits par ``bulk_update`` et les mouvements par
+    ``bulk_create`` dans une seule transaction. Chaque ligne reçoit un
+    résultat dans le rapport.
+
+    Une ligne identifie le produit par ``product_id`` ou ``sku`` et donne le
+    nouveau stock dans ``stock`` (``stock_quantity`` est accepté).
+    """
+
+    BATCH_SIZE = 500
+    STOCK_KEYS = ("stock", "stock_quantity")
+
+    def __init__(self, user, reason="Mise à jour en masse", reference=""):
+        self.user = user
+        self.reason = reason
+        self.reference = reference[:100]
+
+    # Lecture des fichiers
+
+    @classmethod
+    def read_upload(cls, uploaded_file):
+        """
+        Itère sur les lignes d'un fichier CSV ou XLSX importé, sans le charger
+        entièrement en mémoire. La première ligne contient les en-têtes.
+        """
+        extension = os.path.splitext(uploaded_file.name or "")[1].lower()
+        if extension == ".csv":
+            return cls._read_csv(uploaded_file)
+        if extension == ".xlsx":
+            return cls._read_xlsx(uploaded_file)
+        raise StockImportError("Format non pris en charge (CSV ou XLSX attendu)")
+
+    @staticmethod
+    def _normalize_header(header):
+        return str(header or "").strip().lower()
+
+    @classmethod
+    def _read_csv(cls, uploaded_file):
+        uploaded_file.seek(0)
+        text = io.TextIOWrapper(uploaded_file, encoding="utf-8-sig", newline="")
+        sample = text.read(4096)
+        text.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.reader(text, dialect)
+        headers = [cls._normalize_header(header) for header in next(reader, [])]
+        for values in reader:
+            if any(value.strip() for value in values):
+                yield dict(zip(headers, values))
+
+    @classmethod
+    def _read_xlsx(cls, uploaded_file):
+        import openpyxl
+
+        try:
+            workbook = openpyxl.load_workbook(
+                uploaded_file, read_only=True, data_only=True
+            )
+        except Exception as exc:
+            raise StockImportError(f"Classeur illisible : {exc}")
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            headers = [cls._normalize_header(header) for header in next(rows, ())]
+            for values in rows:
+                if any(value not in (None, "") for value in values):
+                    yield dict(zip(headers, values))
+        finally:
+            workbook.close()
+
+    # Validation
+
+    @classmethod
+    def _parse_row(cls, row):
+        """Retourne (identifiant, stock, raison) ou lève ValueError"""
+        product_id = row.get("product_id")
+        sku = str(row.get("sku") or "").strip()
+        if product_id not in (None, ""):
+            try:
+                key = ("pk", int(product_id))
+            except (TypeError, ValueError):
+                raise ValueError("product_id invalide")
+        elif sku:
+            key = ("sku", sku)
+        else:
+            raise ValueError("product_id ou sku requis")
+
+        value = next(
+            (row[name] for name in cls.STOCK_KEYS if row.get(name) not in (None, "")),
+            None,
+        )
+        if value is None:
+            raise ValueError("stock requis")
+        try:
+            stock = int(str(value).strip())
+        except ValueError:
+            try:
+                stock = float(str(value).strip().replace(",", "."))
+            except ValueError:
+                raise ValueError("stock invalide")
+            if not stock.is_integer():
+                raise ValueError("stock invalide")
+            stock = int(stock)
+        if stock < 0:
+            raise ValueError("le stock ne peut pas être négatif")
+        return key, stock, str(row.get("reason") or "").strip()
+
+    # Application
+
+    def apply(self, rows, partial=False, dry_run=False):
+        """
+        Applique les lignes et retourne le rapport.
+
+        Sans ``partial``, une seule ligne en erreur annule tout l'import ;
+        avec ``partial``, les lignes valides sont appliquées et les autres
+        signalées. ``dry_run`` calcule le rapport sans rien écrire.
+        """
+        results = []
+        parsed = []
+        for line, row in enumerate(rows, 1):
+            result = {"row": line, "status": "error"}
+            results.append(result)
+            try:
+                key, stock, reason = self._parse_row(row)
+            except ValueError as exc:
+                result["message"] = str(exc)
+                continue
+            parsed.append((result, key, stock, reason))
+
+        with transaction.atomic():
+            products = self._load_products(parsed)
+            updates, movements, seen = [], [], set()
+            now = timezone.now()
+            for result, key, stock, reason in parsed:
+                product = products.get(key)
+                if product is None:
+                    result["message"] = "produit introuvable"
+                    continue
+                if product.pk in seen:
+                    result["message"] = "produit présent plusieurs fois"
+                    continue
+                seen.add(product.pk)
+                result.update(
+                    product_id=product.pk,
+                    sku=product.sku,
+                    previous_stock=product.stock,
+                    new_stock=stock,
+                )
+                if stock == product.stock:
+                    result["status"] = "unchanged"
+                    continue
+
+                previous_stock, previous_status = product.stock, product.status
+                product.stock = stock
+                product.status = product.status_for_stock(previous_stock)
+                product.updated_at = now
+                result["status"] = "updated"
+                notes = f"{reason or self.reason}: {previous_stock} → {stock}"
+                if product.status != previous_status:
+                    result["product_status"] = product.status
+                    notes += f" (statut {previous_status} → {product.status})"
+                updates.append(product)
+                movements.append(
+                    StockMovement(
+                        product=product,
+                        movement_type="adjustment",
+                        quantity=stock - previous_stock,
+                        previous_stock=previous_stock,
+                        new_stock=stock,
+                        reference=self.reference,
+                        notes=notes,
+                        created_by=self.user,
+                    )
+                )
+
+            report = self._report(results)
+            report["applied"] = False
+            if dry_run or not updates or (report["errors"] and not partial):
+                transaction.set_rollback(True)
+                return report
+
+            Product.objects.bulk_update(
+                updates, ["stock", "status", "updated_at"], batch_size=self.BATCH_SIZE
+            )
+            StockMovement.objects.bulk_create(movements, batch_size=self.BATCH_SIZE)
+            # bulk_update n'envoie pas post_save : prévenir le veilleur d'alertes
+            StockAlertService.watch(product_ids=[product.pk for product in updates])
+            FacetEngine.products_changed([product.pk for product in updates])
+            report["applied"] = True
+        return report
+
+    @staticmethod
+    def _load_products(parsed):
+        """Produits référencés, en une requête par type d'identifiant"""
+        ids = {key[1] for _, key, _, _ in parsed if key[0] == "pk"}
+        skus = {key[1] for _, key, _, _ in parsed if key[0] == "sku"}
+        products = {}
+        fields = ("id", "sku", "stock", "status")
+        if ids:
+            for product in (
+                Product.objects.select_for_update().filter(pk__in=ids).only(*fields)
+            ):
+                products[("pk", product.pk)] = product
+        if skus:
+            for product in (
+                Product.objects.select_for_update().filter(sku__in=skus).only(*fields)
+            ):
+                # Même instance si le produit est aussi référencé par son id
+                product = products.setdefault(("pk", product.pk), product)
+                products[("sku", product.sku)] = product
+        return products
+
+    @staticmethod
+    def _report(results):
+        counts = {"updated": 0, "unchanged": 0, "error": 0}
+        for result in results:
+            counts[result["status"]] += 1
+        return {
+            "total": len(results),
+            "updated": counts["updated"],
+            "unchanged": counts["unchanged"],
+            "errors": counts["error"],
+            "rows": results,
+        }
+
+
+class StockAlertService:
+    """
+    Veilleur de seuils de stock.
+
+    Seules les lignes dont le stock vient de changer sont évaluées : les
+    sauvegardes de produits et de variantes (passage de commande, annulation)
+    passent par les signaux de l'application, les écritures en masse
+    (import, retours) appellent ``watch`` directement. Les identifiants d'une
+    même transaction sont regroupés dans un ensemble propre au thread et
+    évalués une seule fois après le commit ; ceux d'une transaction annulée
+    sont évalués au commit suivant (l'évaluation part du stock courant).
+
+    Il existe au plus une alerte ouverte par produit (sans variante) ou par
+    variante : elle est créée, mise à jour ou résolue selon le stock courant,
+    ce qui rend l'évaluation idempotente. Le seuil est ``min_stock`` du
+    produit, y compris pour ses variantes.
+    """
+
+    BATCH_SIZE = 500
+    _local = threading.local()
+
+    @staticmethod
+    def classify(stock, threshold):
+        """Retourne (type d'alerte, priorité), ou (None, None) si le stock suffit"""
+        if stock <= 0:
+            return "out_of_stock", "urgent"
+        if stock <= threshold:
+            return "low_stock", "high" if stock <= threshold // 2 else "medium"
+        return None, None
+
+    @classmethod
+    def watch(cls, product_ids=(), variant_ids=()):
+        """
+        Programme l'évaluation des produits et variantes donnés après le
+        commit de la transaction courante (immédiatement hors transaction)
+        """
+        pending = cls._pending()
+        pending["products"].update(product_ids)
+        pending["variants"].update(variant_ids)
+        transaction.on_commit(cls.flush)
+
+    @classmethod
+    def _pending(cls):
+        if not hasattr(cls._local, "pending"):
+            cls._local.pending = {"products": set(), "variants": set()}
+        return cls._local.pending
+
+    @classmethod
+    def flush(cls):
+        """
+        Évalue les identifiants en attente. Les rappels suivants de la même
+        transaction trouvent l'ensemble vide et ne font aucune requête.
+        """
+        pending = cls._pending()
+        if not pending["products"] and not pending["variants"]:
+            return None
+        cls._local.pending = {"products": set(), "variants": set()}
+        return cls.evaluate(pending["products"], pending["variants"])
+
+    @classmethod
+    def evaluate(cls, product_ids=(), variant_ids=()):
+        """
+        Ouvre, met à jour ou résout les alertes des produits et variantes
+        donnés. Retourne le nombre d'alertes créées, mises à jour et résolues.
+        """
+        product_ids, variant_ids = set(product_ids), set(variant_ids)
+        if not product_ids and not variant_ids:
+            return {"created": 0, "updated": 0, "resolved": 0}
+
+        targets = {}
+        if product_ids:
+            for pk, name, stock, threshold in Product.objects.filter(
+                pk__in=product_ids
+            ).values_list("pk", "name", "stock", "min_stock"):
+                targets[(pk, None)] = (name, stock, threshold, True)
+        if variant_ids:
+            for (
+                pk,
+                product_id,
+                name,
+                product_name,
+                stock,
+                threshold,
+                active,
+            ) in ProductVariant.objects.filter(pk__in=variant_ids).values_list(
+                "pk",
+                "product_id",
+                "name",
+                "product__name",
+                "stock",
+                "product__min_stock",
+                "is_active",
+            ):
+                targets[(product_id, pk)] = (
+                    f"{product_name} – {name}",
+                    stock,
+                    threshold,
+                    active,
+                )
+        open_alerts = {
+            (alert.product_id, alert.variant_id): alert
+            for alert in StockAlert.objects.filter(is_resolved=False).filter(
+                Q(variant__isnull=True, product_id__in=product_ids)
+                | Q(variant_id__in=variant_ids)
+            )
+        }
+
+        now = timezone.now()
+        to_create, to_update, to_resolve = [], [], []
+        for (product_id, variant_id), (
+            name,
+            stock,
+            threshold,
+            active,
+        ) in targets.items():
+            alert_type, priority = cls.classify(stock, threshold)
+            alert = open_alerts.pop((product_id, variant_id), None)
+            if alert_type is None or not active:
+                if alert is not None:
+                    to_resolve.append(alert.pk)
+                continue
+
+            message = f"{name} : stock {stock} (seuil {threshold})"
+            if alert is None:
+                to_create.append(
+                    StockAlert(
+                        product_id=product_id,
+                        variant_id=variant_id,
+                        alert_type=alert_type,
+                        priority=priority,
+                        threshold_value=threshold,
+                        current_stock=stock,
+                        message=message,
+                    )
+                )
+            elif (alert.alert_type, alert.current_stock, alert.threshold_value) != (
+                alert_type,
+                stock,
+                threshold,
+            ):
+                alert.alert_type = alert_type
+                alert.priority = priority
+                alert.threshold_value = threshold
+                alert.current_stock = stock
+                alert.message = message
+                alert.updated_at = now
+                to_update.append(alert)
+
+        # Alertes ouvertes dont le produit ou la variante a disparu
+        to_resolve.extend(alert.pk for alert in open_alerts.values())
+
+        with transaction.atomic():
+            # ignore_conflicts : une évaluation concurrente a déjà ouvert l'alerte
+            StockAlert.objects.bulk_create(
+                to_create, batch_size=cls.BATCH_SIZE, ignore_conflicts=True
+            )
+            StockAlert.objects.bulk_update(
+                to_update,
+                [
+                    "alert_type",
+                    "priority",
+                    "threshold_value",
+                    "current_stock",
+                    "message",
+                    "updated_at",
+                ],
+                batch_size=cls.BATCH_SIZE,
+            )
+            if to_resolve:
+                StockAlert.objects.filter(pk__in=to_resolve).update(
+                    is_resolved=True, resolved_at=now, updated_at=now
+                )
+        return {
+            "created": len(to_create),
+            "updated": len(to_update),
+            "resolved": len(to_resolve),
+        }
+
+    @classmethod
+    def evaluate_all(cls):
+        """Évalue tout le catalogue par lots (initialisation, réconciliation)"""
+        totals = {"created": 0, "updated": 0, "resolved": 0}
+        for model, key in (
+            (Product, "product_ids"),
+            (ProductVariant, "variant_ids"),
+        ):
+            ids = list(model.objects.order_by("pk").values_list("pk", flat=True))
+            for start in range(0, len(ids), cls.BATCH_SIZE):
+                result = cls.evaluate(**{key: ids[start : start + cls.BATCH_SIZE]})
+                for name, value in result.items():
+                    totals[name] += value
+        return totals
+
+
+class RestockService:
+    """
+    Remise en stock en masse (annulations de commandes, retours reçus).
+
+    Les quantités sont agrégées par produit et par variante par l'appelant.
+    Les produits sont verrouillés puis écrits en un ``bulk_update`` (stock,
+    statut publié/archivé selon la règle de ``check_stock_before_save``,
+    compteur de ventes) avec un mouvement de stock par produit ; les
+    variantes sont incrémentées par un UPDATE avec CASE.
+    """
+
+    BATCH_SIZE = 500
+
+    @classmethod
+    def restock(
+        cls,
+        products=None,
+        variants=None,
+        user=None,
+        movement_type="return",
+        reference="",
+        notes="",
+        sales=None,
+    ):
+        """
+        Ajoute ``{produit: quantité}`` et ``{variante: quantité}`` au stock.
+        ``sales`` ({produit: quantité}) est retiré du compteur de ventes.
+        Les mouvements ne sont écrits que si ``user`` est fourni.
+        Retourne le nombre d'unités remises en stock.
+        """
+        products, variants, sales = products or {}, variants or {}, sales or {}
+        now = timezone.now()
+        with transaction.atomic():
+            updates, movements = [], []
+            product_ids = sorted(set(products) | set(sales))
+            for start in range(0, len(product_ids), cls.BATCH_SIZE):
+                for product in (
+                    Product.objects.select_for_update()
+                    .filter(pk__in=product_ids[start : start + cls.BATCH_SIZE])
+                    .order_by("pk")
+                    .only("id", "stock", "status", "sales_count")
+                ):
+                    quantity = products.get(product.pk, 0)
+                    previous_stock = product.stock
+                    product.stock += quantity
+                    product.status = product.status_for_stock(previous_stock)
+                    product.sales_count = max(
+                        product.sales_count - sales.get(product.pk, 0), 0
+                    )
+                    product.updated_at = now
+                    updates.append(product)
+                    if quantity and user is not None:
+                        movements.append(
+                            StockMovement(
+                                product=product,
+                                movement_type=movement_type,
+                                quantity=quantity,
+                                previous_stock=previous_stock,
+                                new_stock=product.stock,
+                                reference=reference,
+                                notes=notes,
+                                created_by=user,
+                            )
+                        )
+            Product.objects.bulk_update(
+                updates,
+                ["stock", "status", "sales_count", "updated_at"],
+                batch_size=cls.BATCH_SIZE,
+            )
+            StockMovement.objects.bulk_create(movements, batch_size=cls.BATCH_SIZE)
+
+            variant_ids = list(variants)
+            for start in range(0, len(variant_ids), cls.BATCH_SIZE):
+                chunk = variant_ids[start : start + cls.BATCH_SIZE]
+                ProductVariant.objects.filter(pk__in=chunk).update(
+                    stock=F("stock")
+                    + Case(
+                        *[When(pk=pk, then=Value(variants[pk])) for pk in chunk],
+                        default=Value(0),
+                        output_field=IntegerField(),
+                    )
+                )
+
+            # Écritures sans post_save : prévenir le veilleur d'alertes
+            StockAlertService.watch(product_ids=products, variant_ids=variants)
+            FacetEngine.products_changed(products)
+        return sum(products.values()) + sum(variants.values())
@@ -0,0 +1,28 @@
+"""
+Signaux Django pour l'application inventory
+"""
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from products.models import Product, ProductVariant
+
+from .services import StockAlertService
+
+
+def _stock_may_have_changed(kwargs):
+    update_fields = kwargs.get("update_fields")
+    return not kwargs.get("raw") and (not update_fields or "stock" in update_fields)
+
+
+@receiver(post_save, sender=Product)
+def watch_product_stock(sender, instance, **kwargs):
+    """Évalue les seuils du produit après le commit de la sauvegarde"""
+    if _stock_may_have_changed(kwargs):
+        StockAlertService.watch(product_ids=[instance.pk])
+
+
+@receiver(post_save, sender=ProductVariant)
+def watch_variant_stock(sender, instance, **kwargs):
+    """Évalue les seuils de la variante après le commit de la sauvegarde"""
+    if _stock_may_have_changed(kwargs):
+        StockAlertService.watch(variant_ids=[instance.pk])
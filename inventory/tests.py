@@ -1,3 +1,210 @@
+import json
+from io import BytesIO
+from unittest.mock import patch
+
+import openpyxl
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase
+from django.urls import reverse
+
+from products.models import Category, Product, ProductVariant
+
+from .models import StockAlert, StockMovement
+from .services import BulkStockImporter, StockAlertService
+
+User = get_user_model()
+
+
+class BulkStockImporterTest(TestCase):
+    """Tests pour la mise à jour du stock en masse"""
+
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username="stockadmin",
+            email="stock@example.com",
+            password="testpass123",
+            is_staff=True,
+        )
+        category = Category.objects.create(name="Électronique")
+        self.products = [
+            Product.objects.create(
+                name=f"Produit {index}",
+                description="Description",
+                vendor=self.admin,
+                category=category,
+                price=100.00,
+                stock=stock,
+                status=status,
+            )
+            for index, (stock, status) in enumerate(
+                [(10, "published"), (5, "published"), (0, "archived")]
+            )
+        ]
+
+    def test_apply_updates_stock_status_and_movements(self):
+        """Stocks, statuts et mouvements écrits en lot avec un rapport par ligne"""
+        first, second, third = self.products
+        rows = [
+            {"product_id": first.pk, "stock": 12},
+            {"sku": second.sku, "stock": "0"},
+            {"product_id": str(third.pk), "stock_quantity": 3},
+            {"product_id": first.pk + 1000, "stock": 1},
+        ]
+
+        with self.assertNumQueries(6):
+            report = BulkStockImporter(self.admin).apply(rows, partial=True)
+
+        self.assertTrue(report["applied"])
+        self.assertEqual((report["updated"], report["errors"]), (3, 1))
+        self.assertEqual(report["rows"][3]["message"], "produit introuvable")
+        second.refresh_from_db()
+        third.refresh_from_db()
+        self.assertEqual((second.stock, second.status), (0, "archived"))
+        self.assertEqual((third.stock, third.status), (3, "published"))
+        movement = StockMovement.objects.get(product=first)
+        self.assertEqual(
+            (movement.quantity, movement.previous_stock, movement.new_stock),
+            (2, 10, 12),
+        )
+
+    def test_errors_roll_back_whole_import(self):
+        """Sans mode partiel, une ligne invalide annule tout l'import"""
+        rows = [
+            {"product_id": self.products[0].pk, "stock": 50},
+            {"product_id": self.products[1].pk, "stock": -1},
+        ]
+
+        report = BulkStockImporter(self.admin).apply(rows)
+
+        self.assertFalse(report["applied"])
+        self.assertEqual(report["rows"][1]["status"], "error")
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].stock, 10)
+        self.assertFalse(StockMovement.objects.exists())
+
+    def test_csv_upload(self):
+        """Un fichier CSV (séparateur point-virgule) est importé par SKU"""
+        content = f"SKU;Stock\n{self.products[0].sku};7\n".encode()
+        self.client.force_login(self.admin)
+
+        response = self.client.post(
+            reverse("inventory:bulk_stock_update"),
+            {"file": SimpleUploadedFile("stock.csv", content)},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["updated"], 1)
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].stock, 7)
+
+    def test_xlsx_upload_and_json_payload(self):
+        """Fichier XLSX et charge utile JSON passent par le même moteur"""
+        workbook = openpyxl.Workbook()
+        workbook.active.append(["product_id", "stock"])
+        workbook.active.append([self.products[1].pk, 8])
+        buffer = BytesIO()
+        workbook.save(buffer)
+        self.client.force_login(self.admin)
+
+        response = self.client.post(
+            reverse("inventory:bulk_stock_update"),
+            {"file": SimpleUploadedFile("stock.xlsx", buffer.getvalue())},
+        )
+        self.assertEqual(response.json()["updated"], 1)
+
+        response = self.client.post(
+            reverse("inventory:bulk_stock_update"),
+            json.dumps({"updates": [{"product_id": self.products[1].pk, "stock": 8}]}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.json()["unchanged"], 1)
+        self.assertEqual(StockMovement.objects.count(), 1)
+
+
+class StockAlertServiceTest(TestCase):
+    """Tests pour le veilleur de seuils de stock"""
+
+    def setUp(self):
+        self.vendor = User.objects.create_user(
+            username="alertvendor",
+            email="alert@example.com",
+            password="testpass123",
+            user_type="vendeur",
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product = Product.objects.create(
+                name="Produit surveillé",
+                description="Description",
+                vendor=self.vendor,
+                category=Category.objects.create(name="Maison"),
+                price=100.00,
+                stock=20,
+                min_stock=5,
+                status="published",
+            )
+
+    def set_stock(self, stock):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.stock = stock
+            self.product.save()
+
+    def test_alert_raised_escalated_and_resolved(self):
+        """Une seule alerte ouverte suit le stock jusqu'au réapprovisionnement"""
+        self.assertFalse(StockAlert.objects.exists())
+
+        self.set_stock(4)
+        alert = StockAlert.objects.get(product=self.product, is_resolved=False)
+        self.assertEqual((alert.alert_type, alert.priority), ("low_stock", "medium"))
+
+        self.set_stock(0)
+        alert.refresh_from_db()
+        self.assertEqual((alert.alert_type, alert.current_stock), ("out_of_stock", 0))
+
+        self.assertEqual(
+            StockAlertService.evaluate(product_ids=[self.product.pk]),
+            {"created": 0, "updated": 0, "resolved": 0},
+        )
+
+        self.set_stock(30)
+        alert.refresh_from_db()
+        self.assertTrue(alert.is_resolved)
+        self.assertEqual(StockAlert.objects.count(), 1)
+
+    def test_saves_in_one_transaction_are_evaluated_once(self):
+        """Les sauvegardes d'une transaction donnent une seule évaluation"""
+        with self.captureOnCommitCallbacks(execute=True):
+            variant = ProductVariant.objects.create(
+                product=self.product, name="Rouge", price=100, stock=10
+            )
+        with patch.object(
+            StockAlertService, "evaluate", wraps=StockAlertService.evaluate
+        ) as evaluate, self.captureOnCommitCallbacks(execute=True):
+            self.product.stock = 3
+            self.product.save()
+            variant.stock = 2
+            variant.save(update_fields=["stock"])
+            self.product.save(update_fields=["views"])
+
+        evaluate.assert_called_once_with({self.product.pk}, {variant.pk})
+        self.assertEqual(
+            set(
+                StockAlert.objects.filter(is_resolved=False).values_list(
+                    "variant_id", "alert_type"
+                )
+            ),
+            {(None, "low_stock"), (variant.pk, "low_stock")},
+        )
+
+    def test_alert_api_reads_alert_table(self):
+        """L'API sert les alertes ouvertes du vendeur, paginées"""
+        self.set_stock(0)
+        self.client.force_login(self.vendor)
+
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse("inventory:low_stock_alert"))
 
-# Create your tests here.
+        data = response.json()
+        self.assertEqual(data["total_out_of_stock"], 1)
+        self.assertEqual(data["out_of_stock"][0]["id"], self.product.pk)
+        self.assertFalse(data["has_next"])
@@ -16,6 +16,7 @@ urlpatterns = [
     path("movements/", views.StockMovementListView.as_view(), name="stock_movements"),
     # Alertes de stock
     path("alerts/", views.StockAlertListView.as_view(), name="stock_alerts"),
+    path("alerts/api/", views.low_stock_alert, name="low_stock_alert"),
     # Rapports d'inventaire
     path("reports/", views.InventoryReportView.as_view(), name="inventory_report"),
     # Mise à jour du stock d'un produit
@@ -24,6 +25,8 @@ urlpatterns = [
         views.ProductStockUpdateView.as_view(),
         name="product_stock_update",
     ),
+    # Mise à jour du stock en masse (JSON, CSV ou XLSX)
+    path("stock/bulk-update/", views.bulk_stock_update, name="bulk_stock_update"),
     # Export des données
     path("export/csv/", views.export_inventory_csv, name="export_csv"),
     path("export/excel/", views.export_inventory_excel, name="export_excel"),
@@ -4,7 +4,6 @@ import logging
 from datetime import datetime, timedelta
 from io import BytesIO
 
-import openpyxl
 from django.contrib import messages
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
@@ -13,8 +12,10 @@ from django.http import HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse_lazy
 from django.utils import timezone
+from django.views.decorators.http import require_POST
 from django.views.generic import CreateView, DetailView, ListView, UpdateView
 
+from ecommerce_site.db_routing import use_replica
 from products.models import Product
 
 from .models import (
@@ -25,6 +26,7 @@ from .models import (
     StockMovement,
     Supplier,
 )
+from .services import BulkStockImporter, StockImportError
 
 logger = logging.getLogger(__name__)
 
@@ -116,8 +118,8 @@ class StockAlertListView(ListView):
 
     def get_queryset(self):
         return (
-            StockAlert.objects.filter(is_active=True)
-            .select_related("product")
+            StockAlert.objects.filter(is_resolved=False)
+            .select_related("product", "variant")
             .order_by("-created_at")
         )
 
@@ -134,18 +136,19 @@ class InventoryReportView(ListView):
 
         # Statistiques générales
         context["total_products"] = Product.objects.count()
-        context["low_stock_products"] = Product.objects.filter(
-            stock_quantity__lt=10
-        ).count()
-        context["out_of_stock_products"] = Product.objects.filter(
-            stock_quantity=0
-        ).count()
+        open_alerts = StockAlert.objects.filter(is_resolved=False).aggregate(
+            low_stock=Count("id", filter=Q(alert_type="low_stock")),
+            out_of_stock=Count("id", filter=Q(alert_type="out_of_stock")),
+            active=Count("id"),
+        )
+        context["low_stock_products"] = open_alerts["low_stock"]
+        context["out_of_stock_products"] = open_alerts["out_of_stock"]
 
         # Mouvements récents
         context["recent_movements"] = StockMovement.objects.order_by("-created_at")[:10]
 
         # Alertes actives
-        context["active_alerts"] = StockAlert.objects.filter(is_active=True).count()
+        context["active_alerts"] = open_alerts["active"]
 
         return context
 
@@ -185,6 +188,7 @@ class ProductStockUpdateView(UpdateView):
 
 
 @staff_member_required
+@use_replica()
 def export_inventory_csv(request):
     """Exporter l'inventaire en CSV"""
     try:
@@ -210,10 +214,10 @@ def export_inventory_csv(request):
                     [
                         product.name,
                         product.sku,
-                        product.stock_quantity,
+                        product.stock,
                         product.price,
                         product.category.name if product.category else "",
-                        "En Stock" if product.stock_quantity > 0 else "Rupture",
+                        "En Stock" if product.stock > 0 else "Rupture",
                     ]
                 )
 
@@ -271,6 +275,7 @@ def export_inventory_csv(request):
 
 
 @staff_member_required
+@use_replica()
 def export_inventory_excel(request):
     """Exporter l'inventaire en Excel"""
     try:
@@ -284,6 +289,8 @@ def export_inventory_excel(request):
             "Content-Disposition"
         ] = f'attachment; filename="inventory_{report_type}.xlsx"'
 
+        import openpyxl
+
         # Créer un nouveau classeur
         wb = openpyxl.Workbook()
         ws = wb.active
@@ -300,7 +307,7 @@ def export_inventory_excel(request):
             for row, product in enumerate(products, 2):
                 ws.cell(row=row, column=1, value=product.name)
                 ws.cell(row=row, column=2, value=product.sku)
-                ws.cell(row=row, column=3, value=product.stock_quantity)
+                ws.cell(row=row, column=3, value=product.stock)
                 ws.cell(row=row, column=4, value=product.price)
                 ws.cell(
                     row=row,
@@ -310,7 +317,7 @@ def export_inventory_excel(request):
                 ws.cell(
                     row=row,
                     column=6,
-                    value="En Stock" if product.stock_quantity > 0 else "Rupture",
+                    value="En Stock" if product.stock > 0 else "Rupture",
                 )
 
         elif report_type == "movements":
@@ -363,82 +370,116 @@ def export_inventory_excel(request):
 
 @login_required
 def low_stock_alert(request):
-    """API pour vérifier les alertes de stock bas"""
+    """
+    API des alertes de stock ouvertes, lues dans la table des alertes tenue
+    à jour par StockAlertService (aucun parcours du catalogue).
+    Les non-administrateurs ne voient que les alertes de leurs produits.
+    """
     try:
-        # Produits avec stock bas
-        low_stock_products = Product.objects.filter(
-            stock_quantity__lt=10, stock_quantity__gt=0
-        ).values("id", "name", "sku", "stock_quantity")
-
-        # Produits en rupture
-        out_of_stock_products = Product.objects.filter(stock_quantity=0).values(
-            "id", "name", "sku", "stock_quantity"
+        page_size = 50
+        try:
+            page = max(1, int(request.GET.get("page", 1)))
+        except ValueError:
+            page = 1
+
+        alerts = StockAlert.objects.filter(is_resolved=False)
+        if not request.user.is_staff:
+            alerts = alerts.filter(product__vendor=request.user)
+        totals = alerts.aggregate(
+            total_low_stock=Count("id", filter=Q(alert_type="low_stock")),
+            total_out_of_stock=Count("id", filter=Q(alert_type="out_of_stock")),
         )
 
-        return JsonResponse(
-            {
-                "low_stock": list(low_stock_products),
-                "out_of_stock": list(out_of_stock_products),
-                "total_low_stock": low_stock_products.count(),
-                "total_out_of_stock": out_of_stock_products.count(),
-            }
+        alert_type = request.GET.get("type")
+        if alert_type in ("low_stock", "out_of_stock"):
+            alerts = alerts.filter(alert_type=alert_type)
+        start = (page - 1) * page_size
+        rows = list(
+            alerts.filter(alert_type__in=["low_stock", "out_of_stock"])
+            .order_by("-created_at", "-pk")
+            .values(
+                "id",
+                "alert_type",
+                "priority",
+                "product_id",
+                "variant_id",
+                "product__name",
+                "product__sku",
+                "variant__sku",
+                "current_stock",
+                "threshold_value",
+                "created_at",
+            )[start : start + page_size + 1]
         )
 
+        response = {"low_stock": [], "out_of_stock": [], **totals}
+        for row in rows[:page_size]:
+            response[row["alert_type"]].append(
+                {
+                    "alert_id": row["id"],
+                    "id": row["product_id"],
+                    "variant_id": row["variant_id"],
+                    "name": row["product__name"],
+                    "sku": row["variant__sku"] or row["product__sku"],
+                    "stock": row["current_stock"],
+                    "threshold": row["threshold_value"],
+                    "priority": row["priority"],
+                    "created_at": row["created_at"].isoformat(),
+                }
+            )
+        response["page"] = page
+        response["has_next"] = len(rows) > page_size
+        return JsonResponse(response)
+
     except Exception as e:
         logger.error(f"Erreur low stock alert: {e}")
         return JsonResponse({"error": "Erreur lors de la vérification"}, status=500)
 
 
 @staff_member_required
+@require_POST
 def bulk_stock_update(request):
-    """Mise à jour en masse du stock"""
-    if request.method == "POST":
-        try:
-            # Récupérer les données JSON
-            data = json.loads(request.body)
-            updates = data.get("updates", [])
-
-            updated_count = 0
-
-            for update in updates:
-                product_id = update.get("product_id")
-                new_stock = update.get("stock_quantity")
-                reason = update.get("reason", "Mise à jour en masse")
-
-                if product_id and new_stock is not None:
-                    product = Product.objects.get(id=product_id)
-                    old_stock = product.stock_quantity
-
-                    # Mettre à jour le stock
-                    product.stock_quantity = new_stock
-                    product.save()
-
-                    # Créer un mouvement
-                    quantity_change = new_stock - old_stock
-                    if quantity_change != 0:
-                        StockMovement.objects.create(
-                            product=product,
-                            movement_type="adjustment",
-                            quantity=abs(quantity_change),
-                            is_incoming=quantity_change > 0,
-                            reason=f"{reason}: {old_stock} → {new_stock}",
-                            user=request.user,
-                        )
-
-                    updated_count += 1
-
-            return JsonResponse(
-                {
-                    "success": True,
-                    "message": f"{updated_count} produits mis à jour avec succès",
-                }
-            )
+    """
+    Mise à jour en masse du stock.
 
-        except Exception as e:
-            logger.error(f"Erreur bulk stock update: {e}")
-            return JsonResponse(
-                {"success": False, "message": "Erreur lors de la mise à jour"},
-                status=500,
-            )
+    Accepte soit un JSON ``{"updates": [...], "partial": false}``, soit un
+    fichier CSV/XLSX envoyé dans le champ ``file``. Retourne le rapport ligne
+    par ligne ; sans ``partial``, rien n'est appliqué si une ligne est en erreur.
+    """
+    try:
+        if request.FILES.get("file"):
+            upload = request.FILES["file"]
+            rows = BulkStockImporter.read_upload(upload)
+            options = request.POST
+            reference = upload.name
+        else:
+            data = json.loads(request.body or b"{}")
+            rows = data.get("updates", [])
+            options = data
+            reference = ""
+            if not isinstance(rows, list):
+                raise StockImportError("« updates » doit être une liste")
+
+        partial = str(options.get("partial", "")).lower() in ("1", "true", "on")
+        dry_run = str(options.get("dry_run", "")).lower() in ("1", "true", "on")
+        importer = BulkStockImporter(
+            request.user,
+            reason=options.get("reason") or "Mise à jour en masse",
+            reference=options.get("reference") or reference,
+        )
+        report = importer.apply(rows, partial=partial, dry_run=dry_run)
+    except (StockImportError, ValueError) as e:
+        return JsonResponse({"success": False, "message": str(e)}, status=400)
+    except Exception as e:
+        logger.error(f"Erreur bulk stock update: {e}")
+        return JsonResponse(
+            {"success": False, "message": "Erreur lors de la mise à jour"},
+            status=500,
+        )
 
-    return JsonResponse({"error": "Méthode non autorisée"}, status=405)
+    success = not report["errors"] or partial
+    report["success"] = success
+    report["message"] = f"{report['updated']} produits mis à jour" + (
+        "" if report["applied"] else " (non appliqué)"
+    )
+    return JsonResponse(report, status=200 if success else 400)
@@ -0,0 +1,51 @@
+"""
+Commande Django pour créditer les points de fidélité des commandes livrées
+À exécuter quotidiennement via cron ou task scheduler
+"""
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from loyalty.services import LoyaltyLedger
+
+
+class Command(BaseCommand):
+    help = (
+        "Crédite les points des commandes livrées, recalcule les niveaux "
+        "et met à jour les bilans mensuels"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--date",
+            help="Jour de livraison à traiter (AAAA-MM-JJ, aujourd'hui par défaut)",
+        )
+        parser.add_argument(
+            "--months",
+            type=int,
+            default=2,
+            help="Nombre de mois de bilans à recalculer (défaut : 2)",
+        )
+
+    def handle(self, *args, **options):
+        day = None
+        if options["date"]:
+            try:
+                day = datetime.strptime(options["date"], "%Y-%m-%d").date()
+            except ValueError:
+                raise CommandError("Format de date invalide, attendu AAAA-MM-JJ")
+
+        summary = LoyaltyLedger.accrue_delivered_orders(day)
+        self.stdout.write(
+            f"{summary['points']} point(s) crédité(s) pour {summary['orders']} "
+            f"commande(s) et {summary['users']} client(s)."
+        )
+
+        levels = LoyaltyLedger.recompute_levels()
+        snapshots = LoyaltyLedger.snapshot_months(options["months"])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✓ {levels} niveau(x) mis à jour, {snapshots} bilan(s) mensuel(s)."
+            )
+        )
@@ -0,0 +1,78 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("orders", "0001_initial"),
+        ("loyalty", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LoyaltyMonthlySnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("month", models.DateField()),
+                ("points_earned", models.IntegerField(default=0)),
+                ("points_spent", models.IntegerField(default=0)),
+                ("balance_end", models.IntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Bilan mensuel des points",
+                "verbose_name_plural": "Bilans mensuels des points",
+                "ordering": ["-month"],
+            },
+        ),
+        migrations.AddField(
+            model_name="loyaltypointshistory",
+            name="order",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="loyalty_entries",
+                to="orders.order",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="loyaltypointshistory",
+            index=models.Index(
+                fields=["user", "created_at"], name="loyalty_loy_user_id_73d208_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="loyaltypointshistory",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("points__gt", 0)),
+                fields=("order",),
+                name="unique_loyalty_credit_per_order",
+            ),
+        ),
+        migrations.AddField(
+            model_name="loyaltymonthlysnapshot",
+            name="user",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="loyalty_snapshots",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="loyaltymonthlysnapshot",
+            unique_together={("user", "month")},
+        ),
+    ]
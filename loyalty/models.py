@@ -35,42 +35,39 @@ class LoyaltyPoints(models.Model):
     def __str__(self):
         return f"{self.user.get_display_name()} - {self.points} points ({self.level})"
 
+    # Seuils de niveau, du plus élevé au plus bas
+    LEVEL_THRESHOLDS = [
+        ("platinum", 5000),
+        ("gold", 2000),
+        ("silver", 500),
+    ]
+
     def add_points(self, amount, reason=""):
         """Ajouter des points avec une raison"""
-        self.points += amount
-        self.total_earned += amount
-        self.update_level()
-        self.save()
-
-        # Créer un historique
-        LoyaltyPointsHistory.objects.create(
-            user=self.user, points=amount, reason=reason, balance_after=self.points
+        from .services import LoyaltyLedger
+
+        LoyaltyLedger.credit(self.user, amount, reason)
+        self.refresh_from_db(
+            fields=["points", "level", "total_earned", "total_spent", "updated_at"]
         )
 
     def spend_points(self, amount, reason=""):
         """Dépenser des points"""
-        if self.points >= amount:
-            self.points -= amount
-            self.total_spent += amount
-            self.save()
-
-            # Créer un historique
-            LoyaltyPointsHistory.objects.create(
-                user=self.user, points=-amount, reason=reason, balance_after=self.points
-            )
-            return True
-        return False
+        from .services import LoyaltyLedger
+
+        spent = LoyaltyLedger.debit(self.user, amount, reason)
+        self.refresh_from_db(
+            fields=["points", "level", "total_earned", "total_spent", "updated_at"]
+        )
+        return spent
 
     def update_level(self):
         """Mettre à jour le niveau selon les points"""
-        if self.points >= 5000:
-            self.level = "platinum"
-        elif self.points >= 2000:
-            self.level = "gold"
-        elif self.points >= 500:
-            self.level = "silver"
-        else:
-            self.level = "bronze"
+        for level, threshold in self.LEVEL_THRESHOLDS:
+            if self.points >= threshold:
+                self.level = level
+                return
+        self.level = "bronze"
 
     def get_level_benefits(self):
         """Retourner les avantages du niveau actuel"""
@@ -112,17 +109,55 @@ class LoyaltyPointsHistory(models.Model):
     points = models.IntegerField()  # Positif pour gain, négatif pour dépense
     reason = models.CharField(max_length=200)
     balance_after = models.IntegerField()
+    order = models.ForeignKey(
+        "orders.Order",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="loyalty_entries",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         verbose_name = "Historique des points"
         verbose_name_plural = "Historiques des points"
         ordering = ["-created_at"]
+        indexes = [models.Index(fields=["user", "created_at"])]
+        constraints = [
+            # Une commande ne peut être créditée qu'une seule fois
+            models.UniqueConstraint(
+                fields=["order"],
+                condition=models.Q(points__gt=0),
+                name="unique_loyalty_credit_per_order",
+            )
+        ]
 
     def __str__(self):
         return f"{self.user.get_display_name()} - {self.points} points - {self.reason}"
 
 
+class LoyaltyMonthlySnapshot(models.Model):
+    """Agrégat mensuel des mouvements de points, recalculé périodiquement"""
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="loyalty_snapshots"
+    )
+    month = models.DateField()  # Premier jour du mois
+    points_earned = models.IntegerField(default=0)
+    points_spent = models.IntegerField(default=0)
+    balance_end = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Bilan mensuel des points"
+        verbose_name_plural = "Bilans mensuels des points"
+        ordering = ["-month"]
+        unique_together = ["user", "month"]
+
+    def __str__(self):
+        return f"{self.user.get_display_name()} - {self.month:%Y-%m} - {self.balance_end} points"
+
+
 class LoyaltyReward(models.Model):
     """Modèle pour les récompenses de fidélité"""
 
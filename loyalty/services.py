@@ -0,0 +1,309 @@
+"""
+Grand livre des points de fidélité
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, CharField, F, IntegerField, Max, Q, Sum, Value, When
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import LoyaltyMonthlySnapshot, LoyaltyPoints, LoyaltyPointsHistory
+
+
+class LoyaltyLedger:
+    """
+    Service de gestion des points de fidélité.
+
+    Les soldes ne sont modifiés que par des UPDATE conditionnels avec F(), ce qui
+    évite les pertes de points en concurrence et tout solde négatif. Chaque
+    mouvement est ajouté à LoyaltyPointsHistory, qui n'est jamais modifié.
+    """
+
+    # 1 point pour 1 000 FCFA de commande livrée
+    AMOUNT_PER_POINT = Decimal("1000")
+    BATCH_SIZE = 500
+
+    @staticmethod
+    def level_case(delta=0):
+        """
+        Expression SQL du niveau correspondant au solde ``points + delta``
+        """
+        return Case(
+            *[
+                When(points__gte=threshold - delta, then=Value(level))
+                for level, threshold in LoyaltyPoints.LEVEL_THRESHOLDS
+            ],
+            default=Value("bronze"),
+            output_field=CharField(),
+        )
+
+    @classmethod
+    def points_for_amount(cls, amount):
+        """Nombre de points gagnés pour un montant de commande"""
+        return int(Decimal(str(amount)) // cls.AMOUNT_PER_POINT)
+
+    @staticmethod
+    def _balance(user_id):
+        return (
+            LoyaltyPoints.objects.filter(user_id=user_id)
+            .values_list("points", flat=True)
+            .get()
+        )
+
+    @classmethod
+    def _apply_credit(cls, user_id, amount):
+        return LoyaltyPoints.objects.filter(user_id=user_id).update(
+            level=cls.level_case(amount),
+            points=F("points") + amount,
+            total_earned=F("total_earned") + amount,
+            updated_at=timezone.now(),
+        )
+
+    @classmethod
+    def credit(cls, user, amount, reason="", order=None):
+        """
+        Ajoute des points au solde de l'utilisateur.
+        Retourne le nouveau solde.
+        """
+        if amount <= 0:
+            raise ValueError("Le nombre de points à créditer doit être positif")
+
+        with transaction.atomic():
+            if not cls._apply_credit(user.pk, amount):
+                LoyaltyPoints.objects.get_or_create(user_id=user.pk)
+                cls._apply_credit(user.pk, amount)
+
+            # La ligne est verrouillée par l'UPDATE jusqu'à la fin de la transaction
+            balance = cls._balance(user.pk)
+            LoyaltyPointsHistory.objects.bulk_create(
+                [
+                    LoyaltyPointsHistory(
+                        user_id=user.pk,
+                        points=amount,
+                        reason=reason,
+                        balance_after=balance,
+                        order=order,
+                    )
+                ]
+            )
+        return balance
+
+    @classmethod
+    def debit(cls, user, amount, reason=""):
+        """
+        Retire des points si le solde est suffisant.
+        Retourne True si les points ont été dépensés.
+        """
+        if amount <= 0:
+            raise ValueError("Le nombre de points à débiter doit être positif")
+
+        with transaction.atomic():
+            updated = LoyaltyPoints.objects.filter(
+                user_id=user.pk, points__gte=amount
+            ).update(
+                points=F("points") - amount,
+                total_spent=F("total_spent") + amount,
+                updated_at=timezone.now(),
+            )
+            if not updated:
+                return False
+
+            LoyaltyPointsHistory.objects.bulk_create(
+                [
+                    LoyaltyPointsHistory(
+                        user_id=user.pk,
+                        points=-amount,
+                        reason=reason,
+                        balance_after=cls._balance(user.pk),
+                    )
+                ]
+            )
+        return True
+
+    @classmethod
+    def recompute_levels(cls, user_ids=None):
+        """
+        Recalcule les niveaux en une requête ensembliste (par lots si une liste
+        d'utilisateurs est fournie). Retourne le nombre de comptes modifiés.
+        """
+        if user_ids is None:
+            return LoyaltyPoints.objects.exclude(level=cls.level_case()).update(
+                level=cls.level_case()
+            )
+
+        user_ids = list(user_ids)
+        updated = 0
+        for start in range(0, len(user_ids), cls.BATCH_SIZE):
+            chunk = user_ids[start : start + cls.BATCH_SIZE]
+            updated += (
+                LoyaltyPoints.objects.filter(user_id__in=chunk)
+                .exclude(level=cls.level_case())
+                .update(level=cls.level_case())
+            )
+        return updated
+
+    @classmethod
+    def accrue_delivered_orders(cls, day=None):
+        """
+        Crédite en une passe les points des commandes livrées un jour donné
+        (aujourd'hui par défaut). Les commandes déjà créditées sont ignorées.
+        Retourne un résumé {orders, users, points}.
+        """
+        from orders.models import Order
+
+        day = day or timezone.localdate()
+        start = timezone.make_aware(datetime.combine(day, time.min))
+        end = start + timedelta(days=1)
+
+        return cls.accrue_orders(
+            Order.objects.filter(delivered_at__gte=start, delivered_at__lt=end)
+        )
+
+    @classmethod
+    def accrue_orders(cls, orders):
+        """
+        Crédite en une passe les points des commandes livrées du queryset
+        donné (livraison en masse, traitement quotidien). Les commandes déjà
+        créditées sont ignorées. Retourne un résumé {orders, users, points}.
+        """
+        orders = (
+            orders.filter(status="delivered")
+            .exclude(loyalty_entries__points__gt=0)
+            .order_by("delivered_at", "pk")
+            .values_list("pk", "user_id", "order_number", "total_amount")
+        )
+
+        credits = defaultdict(list)
+        for order_id, user_id, order_number, total_amount in orders:
+            points = cls.points_for_amount(total_amount)
+            if points > 0:
+                credits[user_id].append((order_id, order_number, points))
+
+        summary = {"orders": 0, "users": len(credits), "points": 0}
+        if not credits:
+            return summary
+
+        totals = {
+            user_id: sum(points for _, _, points in entries)
+            for user_id, entries in credits.items()
+        }
+        user_ids = list(totals)
+        now = timezone.now()
+
+        with transaction.atomic():
+            LoyaltyPoints.objects.bulk_create(
+                [LoyaltyPoints(user_id=user_id) for user_id in user_ids],
+                ignore_conflicts=True,
+            )
+
+            # Un seul UPDATE par lot d'utilisateurs, avec un CASE sur le delta
+            for start_index in range(0, len(user_ids), cls.BATCH_SIZE):
+                chunk = user_ids[start_index : start_index + cls.BATCH_SIZE]
+                delta = Case(
+                    *[
+                        When(user_id=user_id, then=Value(totals[user_id]))
+                        for user_id in chunk
+                    ],
+                    default=Value(0),
+                    output_field=IntegerField(),
+                )
+                LoyaltyPoints.objects.filter(user_id__in=chunk).update(
+                    points=F("points") + delta,
+                    total_earned=F("total_earned") + delta,
+                    updated_at=now,
+                )
+
+            balances = {}
+            for start_index in range(0, len(user_ids), cls.BATCH_SIZE):
+                chunk = user_ids[start_index : start_index + cls.BATCH_SIZE]
+                balances.update(
+                    LoyaltyPoints.objects.filter(user_id__in=chunk).values_list(
+                        "user_id", "points"
+                    )
+                )
+
+            history = []
+            for user_id, entries in credits.items():
+                balance = balances[user_id] - totals[user_id]
+                for order_id, order_number, points in entries:
+                    balance += points
+                    history.append(
+                        LoyaltyPointsHistory(
+                            user_id=user_id,
+                            points=points,
+                            reason=f"Commande {order_number} livrée",
+                            balance_after=balance,
+                            order_id=order_id,
+                        )
+                    )
+            LoyaltyPointsHistory.objects.bulk_create(history, batch_size=cls.BATCH_SIZE)
+
+            cls.recompute_levels(user_ids)
+
+        summary["orders"] = len(history)
+        summary["points"] = sum(totals.values())
+        return summary
+
+    @classmethod
+    def snapshot_months(cls, months=2, now=None):
+        """
+        Recalcule les bilans mensuels des ``months`` derniers mois à partir de
+        l'historique. Retourne le nombre de bilans écrits.
+        """
+        now = now or timezone.now()
+        first_month = timezone.localdate(now).replace(day=1)
+        for _ in range(months - 1):
+            first_month = (first_month - timedelta(days=1)).replace(day=1)
+        start = timezone.make_aware(datetime.combine(first_month, time.min))
+
+        rows = list(
+            LoyaltyPointsHistory.objects.filter(created_at__gte=start)
+            .annotate(month=TruncMonth("created_at"))
+            .values("user_id", "month")
+            .annotate(
+                earned=Sum("points", filter=Q(points__gt=0)),
+                spent=Sum("points", filter=Q(points__lt=0)),
+                last_entry=Max("pk"),
+            )
+            .order_by()
+        )
+        if not rows:
+            return 0
+
+        balances = {}
+        entry_ids = [row["last_entry"] for row in rows]
+        for start_index in range(0, len(entry_ids), cls.BATCH_SIZE):
+            balances.update(
+                LoyaltyPointsHistory.objects.filter(
+                    pk__in=entry_ids[start_index : start_index + cls.BATCH_SIZE]
+                ).values_list("pk", "balance_after")
+            )
+
+        snapshots = [
+            LoyaltyMonthlySnapshot(
+                user_id=row["user_id"],
+                month=timezone.localdate(row["month"])
+                if timezone.is_aware(row["month"])
+                else row["month"].date(),
+                points_earned=row["earned"] or 0,
+                points_spent=-(row["spent"] or 0),
+                balance_end=balances[row["last_entry"]],
+            )
+            for row in rows
+        ]
+        LoyaltyMonthlySnapshot.objects.bulk_create(
+            snapshots,
+            batch_size=cls.BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=["user", "month"],
+            update_fields=[
+                "points_earned",
+                "points_spent",
+                "balance_end",
+                "updated_at",
+            ],
+        )
+        return len(snapshots)
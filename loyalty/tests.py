@@ -0,0 +1,99 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+
+from orders.models import Order
+
+from .models import LoyaltyMonthlySnapshot, LoyaltyPoints, LoyaltyPointsHistory
+from .services import LoyaltyLedger
+
+User = get_user_model()
+
+
+def create_delivered_order(user, total_amount):
+    return Order.objects.create(
+        user=user,
+        shipping_first_name="John",
+        shipping_last_name="Doe",
+        shipping_phone="0700000000",
+        shipping_address="Rue 12",
+        shipping_city="Abidjan",
+        payment_method="cash",
+        status="delivered",
+        delivered_at=timezone.now(),
+        subtotal=total_amount,
+        total_amount=total_amount,
+    )
+
+
+class LoyaltyLedgerTest(TestCase):
+    """Tests pour le grand livre des points de fidélité"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="fidele", email="fidele@example.com", password="testpass123"
+        )
+
+    def test_credit_updates_balance_level_and_history(self):
+        """Un crédit met à jour le solde, le niveau et l'historique"""
+        balance = LoyaltyLedger.credit(self.user, 600, "Bienvenue")
+
+        account = LoyaltyPoints.objects.get(user=self.user)
+        self.assertEqual(balance, 600)
+        self.assertEqual(account.points, 600)
+        self.assertEqual(account.level, "silver")
+        entry = LoyaltyPointsHistory.objects.get(user=self.user)
+        self.assertEqual(entry.balance_after, 600)
+
+    def test_debit_never_goes_negative(self):
+        """Un débit supérieur au solde est refusé sans modifier le solde"""
+        account = LoyaltyPoints.objects.create(user=self.user)
+        account.add_points(100, "Test")
+
+        self.assertFalse(account.spend_points(150, "Trop"))
+        self.assertTrue(account.spend_points(100, "Tout"))
+        self.assertEqual(account.points, 0)
+        self.assertFalse(LoyaltyLedger.debit(self.user, 1, "Vide"))
+        self.assertEqual(LoyaltyPointsHistory.objects.filter(user=self.user).count(), 2)
+
+    def test_accrual_is_batched_and_idempotent(self):
+        """Les commandes livrées ne sont créditées qu'une seule fois"""
+        create_delivered_order(self.user, Decimal("250000.00"))
+        create_delivered_order(self.user, Decimal("350000.00"))
+
+        summary = LoyaltyLedger.accrue_delivered_orders()
+        self.assertEqual(summary, {"orders": 2, "users": 1, "points": 600})
+        self.assertEqual(
+            LoyaltyLedger.accrue_delivered_orders(),
+            {"orders": 0, "users": 0, "points": 0},
+        )
+
+        account = LoyaltyPoints.objects.get(user=self.user)
+        self.assertEqual(account.points, 600)
+        self.assertEqual(account.level, "silver")
+        self.assertEqual(
+            sorted(
+                LoyaltyPointsHistory.objects.filter(user=self.user).values_list(
+                    "balance_after", flat=True
+                )
+            ),
+            [250, 600],
+        )
+
+    def test_recompute_levels_and_snapshot(self):
+        """Les niveaux et bilans mensuels sont recalculés de façon ensembliste"""
+        LoyaltyLedger.credit(self.user, 2500, "Bonus")
+        LoyaltyLedger.debit(self.user, 1000, "Récompense")
+        LoyaltyPoints.objects.filter(user=self.user).update(level="platinum")
+
+        self.assertEqual(LoyaltyLedger.recompute_levels(), 1)
+        self.assertEqual(LoyaltyPoints.objects.get(user=self.user).level, "silver")
+
+        self.assertEqual(LoyaltyLedger.snapshot_months(), 1)
+        LoyaltyLedger.snapshot_months()
+        snapshot = LoyaltyMonthlySnapshot.objects.get(user=self.user)
+        self.assertEqual(snapshot.points_earned, 2500)
+        self.assertEqual(snapshot.points_spent, 1000)
+        self.assertEqual(snapshot.balance_end, 1500)
@@ -6,7 +6,7 @@ from datetime import timedelta
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import Sum
+from django.db import transaction
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils import timezone
@@ -14,7 +14,14 @@ from django.views.generic import DetailView, ListView
 
 from orders.models import Order
 
-from .models import LoyaltyPoints, LoyaltyPointsHistory, LoyaltyReward, UserReward
+from .models import (
+    LoyaltyMonthlySnapshot,
+    LoyaltyPoints,
+    LoyaltyPointsHistory,
+    LoyaltyReward,
+    UserReward,
+)
+from .services import LoyaltyLedger
 
 
 class LoyaltyDashboardView(LoginRequiredMixin, ListView):
@@ -50,10 +57,16 @@ class LoyaltyDashboardView(LoginRequiredMixin, ListView):
             "-used_at"
         )[:10]
 
+        # Bilans mensuels précalculés (12 derniers mois)
+        monthly_snapshots = LoyaltyMonthlySnapshot.objects.filter(
+            user=self.request.user
+        )[:12]
+
         context.update(
             {
                 "loyalty_points": loyalty_points,
                 "recent_history": recent_history,
+                "monthly_snapshots": monthly_snapshots,
                 "available_rewards": available_rewards,
                 "user_rewards": user_rewards,
                 "benefits": loyalty_points.get_level_benefits(),
@@ -67,24 +80,20 @@ class LoyaltyDashboardView(LoginRequiredMixin, ListView):
 def claim_reward(request, reward_id):
     """Réclamer une récompense"""
     reward = get_object_or_404(LoyaltyReward, id=reward_id, is_active=True)
-    loyalty_points, created = LoyaltyPoints.objects.get_or_create(user=request.user)
 
-    if loyalty_points.points < reward.points_cost:
-        messages.error(
-            request, "Vous n'avez pas assez de points pour cette récompense."
-        )
-        return redirect("loyalty:dashboard")
-
-    # Créer la récompense utilisateur
-    user_reward = UserReward.objects.create(user=request.user, reward=reward)
+    with transaction.atomic():
+        # Débit conditionnel : échoue sans modifier le solde s'il est insuffisant
+        if not LoyaltyLedger.debit(
+            request.user, reward.points_cost, f"Récompense: {reward.name}"
+        ):
+            messages.error(
+                request, "Vous n'avez pas assez de points pour cette récompense."
+            )
+            return redirect("loyalty:dashboard")
 
-    # Dépenser les points
-    if loyalty_points.spend_points(reward.points_cost, f"Récompense: {reward.name}"):
-        messages.success(request, f'Récompense "{reward.name}" réclamée avec succès!')
-    else:
-        messages.error(request, "Erreur lors de la réclamation de la récompense.")
-        user_reward.delete()
+        UserReward.objects.create(user=request.user, reward=reward)
 
+    messages.success(request, f'Récompense "{reward.name}" réclamée avec succès!')
     return redirect("loyalty:dashboard")
 
 
@@ -107,19 +116,16 @@ def loyalty_stats_api(request):
     """API pour les statistiques de fidélité"""
     loyalty_points, created = LoyaltyPoints.objects.get_or_create(user=request.user)
 
-    # Statistiques des 12 derniers mois
-    twelve_months_ago = timezone.now() - timedelta(days=365)
-    monthly_stats = (
-        LoyaltyPointsHistory.objects.filter(
-            user=request.user,
-            created_at__gte=twelve_months_ago,
-            points__gt=0,  # Seulement les gains
+    # Statistiques des 12 derniers mois, lues dans les bilans mensuels
+    twelve_months_ago = timezone.localdate() - timedelta(days=365)
+    monthly_stats = [
+        {"month": f"{month:%Y-%m}", "total_points": points_earned}
+        for month, points_earned in LoyaltyMonthlySnapshot.objects.filter(
+            user=request.user, month__gte=twelve_months_ago.replace(day=1)
         )
-        .extra(select={"month": "strftime('%%Y-%%m', created_at)"})
-        .values("month")
-        .annotate(total_points=Sum("points"))
         .order_by("month")
-    )
+        .values_list("month", "points_earned")
+    ]
 
     return JsonResponse(
         {
@@ -127,7 +133,7 @@ def loyalty_stats_api(request):
             "level": loyalty_points.level,
             "total_earned": loyalty_points.total_earned,
             "total_spent": loyalty_points.total_spent,
-            "monthly_stats": list(monthly_stats),
+            "monthly_stats": monthly_stats,
             "benefits": loyalty_points.get_level_benefits(),
         }
     )
@@ -0,0 +1,306 @@
+"""
+Compteurs de non-lus (notifications et chat) conservés dans le cache
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from ecommerce_site.caching import cache_is_shared
+
+from .models import Notification
+
+
+class UnreadCounterService:
+    """
+    Maintient en cache les compteurs de non-lus affichés dans les badges.
+
+    - les compteurs sont incrémentés/décrémentés après commit, sans requête ;
+    - une clé absente est recalculée par un COUNT à la première lecture ;
+    - la commande ``reconcile_unread_counters`` resynchronise périodiquement
+      le cache avec la base.
+
+    Les deltas ne sont vus par tous les workers qu'avec un cache partagé
+    (Redis, Memcached...) : les compteurs y sont conservés
+    ``UNREAD_COUNTER_TIMEOUT`` secondes (24 h par défaut). Avec un cache propre
+    au processus (``LocMemCache``), chaque worker recalcule ses compteurs
+    depuis la base toutes les ``UNREAD_COUNTER_LOCAL_TIMEOUT`` secondes
+    (30 s par défaut) : les badges des autres workers ont au plus ce retard.
+    """
+
+    CACHE_TIMEOUT = 24 * 3600
+    LOCAL_CACHE_TIMEOUT = 30
+    BATCH_SIZE = 500
+
+    @classmethod
+    def timeout(cls):
+        """Durée de vie des compteurs selon que le cache est partagé ou non"""
+        if cache_is_shared():
+            return getattr(settings, "UNREAD_COUNTER_TIMEOUT", cls.CACHE_TIMEOUT)
+        return getattr(
+            settings, "UNREAD_COUNTER_LOCAL_TIMEOUT", cls.LOCAL_CACHE_TIMEOUT
+        )
+
+    # Clés de cache
+
+    @staticmethod
+    def _notifications_key(user_id):
+        return f"notifications:unread:{user_id}"
+
+    @staticmethod
+    def _chat_total_key(user_id):
+        return f"chat:unread:user:{user_id}"
+
+    @staticmethod
+    def _chat_room_key(room_id, user_id):
+        return f"chat:unread:room:{room_id}:user:{user_id}"
+
+    @staticmethod
+    def _add(key, delta):
+        """Applique un delta à une clé existante ; une clé absente sera recalculée"""
+        try:
+            if delta > 0:
+                cache.incr(key, delta)
+            elif delta < 0:
+                cache.decr(key, -delta)
+        except ValueError:
+            pass
+
+    @classmethod
+    def _add_on_commit(cls, changes):
+        """Applique les deltas {clé: delta} une fois la transaction validée"""
+        changes = {key: delta for key, delta in changes.items() if delta}
+        if changes:
+            transaction.on_commit(
+                lambda: [cls._add(key, delta) for key, delta in changes.items()]
+            )
+
+    @staticmethod
+    def _room_participant_ids(room):
+        return {
+            user_id
+            for user_id in (room.customer_id, room.vendor_id, room.admin_id)
+            if user_id
+        }
+
+    @staticmethod
+    def _chat_messages_for(user_id):
+        """Messages non lus destinés à un utilisateur (requête de référence)"""
+        from chat.models import ChatMessage
+
+        return ChatMessage.objects.filter(is_read=False).exclude(sender_id=user_id)
+
+    # Notifications
+
+    @classmethod
+    def get_notifications_unread(cls, user):
+        """Nombre de notifications non lues"""
+        key = cls._notifications_key(user.pk)
+        count = cache.get(key)
+        if count is None:
+            count = Notification.objects.filter(user=user, is_read=False).count()
+            cache.set(key, count, cls.timeout())
+        return max(count, 0)
+
+    @classmethod
+    def notification_created(cls, notification):
+        if not notification.is_read:
+            cls._add_on_commit({cls._notifications_key(notification.user_id): 1})
+
+    @classmethod
+    def invalidate_notifications(cls, user_id):
+        """Supprime le compteur, qui sera recalculé à la prochaine lecture"""
+        key = cls._notifications_key(user_id)
+        transaction.on_commit(lambda: cache.delete(key))
+
+    @classmethod
+    def mark_notifications_read(cls, user, queryset=None):
+        """
+        Marque comme lues les notifications non lues du queryset (toutes celles
+        de l'utilisateur par défaut). Retourne le nombre de notifications marquées.
+        """
+        if queryset is None:
+            queryset = Notification.objects.filter(user=user)
+        updated = queryset.filter(user=user, is_read=False).update(
+            is_read=True, read_at=timezone.now()
+        )
+        cls._add_on_commit({cls._notifications_key(user.pk): -updated})
+        return updated
+
+    @classmethod
+    def delete_notifications(cls, user, queryset):
+        """
+        Supprime les notifications du queryset en décomptant exactement
+        les non lues. Retourne le nombre de notifications supprimées.
+        """
+        queryset = queryset.filter(user=user)
+        with transaction.atomic():
+            unread_deleted = queryset.filter(is_read=False).delete()[0]
+            read_deleted = queryset.filter(is_read=True).delete()[0]
+            cls._add_on_commit({cls._notifications_key(user.pk): -unread_deleted})
+        return unread_deleted + read_deleted
+
+    # Chat
+
+    @classmethod
+    def get_chat_unread(cls, user):
+        """Nombre total de messages de chat non lus"""
+        key = cls._chat_total_key(user.pk)
+        count = cache.get(key)
+        if count is None:
+            count = (
+                cls._chat_messages_for(user.pk)
+                .filter(
+                    Q(room__customer_id=user.pk)
+                    | Q(room__vendor_id=user.pk)
+                    | Q(room__admin_id=user.pk)
+                )
+                .count()
+            )
+            cache.set(key, count, cls.timeout())
+        return max(count, 0)
+
+    @classmethod
+    def get_room_unread(cls, room, user):
+        """Nombre de messages non lus d'une salle pour un utilisateur"""
+        key = cls._chat_room_key(room.pk, user.pk)
+        count = cache.get(key)
+        if count is None:
+            count = cls._chat_messages_for(user.pk).filter(room_id=room.pk).count()
+            cache.set(key, count, cls.timeout())
+        return max(count, 0)
+
+    @classmethod
+    def chat_message_created(cls, message):
+        if message.is_read:
+            return
+        changes = {}
+        for user_id in cls._room_participant_ids(message.room):
+            if user_id != message.sender_id:
+                changes[cls._chat_room_key(message.room_id, user_id)] = 1
+                changes[cls._chat_total_key(user_id)] = 1
+        cls._add_on_commit(changes)
+
+    @classmethod
+    def mark_chat_message_read(cls, message):
+        """
+        Marque un message comme lu. Retourne True si le message était non lu.
+        """
+        from chat.models import ChatMessage
+
+        updated = ChatMessage.objects.filter(pk=message.pk, is_read=False).update(
+            is_read=True
+        )
+        message.is_read = True
+        if updated:
+            changes = {}
+            for user_id in cls._room_participant_ids(message.room):
+                if user_id != message.sender_id:
+                    changes[cls._chat_room_key(message.room_id, user_id)] = -1
+                    changes[cls._chat_total_key(user_id)] = -1
+            cls._add_on_commit(changes)
+        return bool(updated)
+
+    @classmethod
+    def mark_room_read(cls, room, user, up_to=None):
+        """
+        Marque comme lus les messages reçus par l'utilisateur dans une salle
+        (jusqu'au message ``up_to`` inclus, s'il est donné).
+        Le statut de lecture étant partagé, les compteurs des autres
+        participants sont décrémentés des messages qu'ils n'ont pas envoyés.
+        """
+        unread = room.messages.filter(is_read=False).exclude(sender=user)
+        if up_to is not None:
+            unread = unread.filter(pk__lte=up_to)
+        with transaction.atomic():
+            marked = list(
+                unread.values("sender_id")
+                .annotate(total=Count("id"))
+                .values_list("sender_id", "total")
+            )
+            if not marked:
+                return 0
+            updated = unread.update(is_read=True)
+
+            changes = {}
+            for participant_id in cls._room_participant_ids(room):
+                delta = -sum(
+                    total for sender_id, total in marked if sender_id != participant_id
+                )
+                changes[cls._chat_room_key(room.pk, participant_id)] = delta
+                changes[cls._chat_total_key(participant_id)] = delta
+            cls._add_on_commit(changes)
+        return updated
+
+    # Badges et réconciliation
+
+    @classmethod
+    def get_badges(cls, user):
+        """Tous les compteurs des badges, sans requête si le cache est chaud"""
+        return {
+            "notifications": cls.get_notifications_unread(user),
+            "chat": cls.get_chat_unread(user),
+        }
+
+    @classmethod
+    def reconcile(cls, user_ids=None):
+        """
+        Recalcule les compteurs depuis la base, par lots d'utilisateurs.
+        Retourne le nombre d'utilisateurs resynchronisés.
+        """
+        from django.contrib.auth import get_user_model
+
+        from chat.models import ChatMessage, ChatRoom
+
+        if user_ids is None:
+            user_ids = get_user_model().objects.values_list("pk", flat=True)
+        user_ids = list(user_ids)
+
+        for start in range(0, len(user_ids), cls.BATCH_SIZE):
+            chunk = user_ids[start : start + cls.BATCH_SIZE]
+            values = {}
+
+            notifications = dict(
+                Notification.objects.filter(user_id__in=chunk, is_read=False)
+                .values("user_id")
+                .annotate(total=Count("id"))
+                .values_list("user_id", "total")
+            )
+
+            chat_totals = dict.fromkeys(chunk, 0)
+            for role in ("customer", "vendor", "admin"):
+                participant = f"room__{role}_id"
+                rows = (
+                    ChatMessage.objects.filter(
+                        is_read=False, **{f"{participant}__in": chunk}
+                    )
+                    .exclude(sender_id=F(participant))
+                    .values("room_id", participant)
+                    .annotate(total=Count("id"))
+                    .values_list("room_id", participant, "total")
+                )
+                for room_id, user_id, total in rows:
+                    values[cls._chat_room_key(room_id, user_id)] = total
+                    chat_totals[user_id] += total
+
+            for user_id in chunk:
+                values[cls._notifications_key(user_id)] = notifications.get(user_id, 0)
+                values[cls._chat_total_key(user_id)] = chat_totals[user_id]
+            cache.set_many(values, cls.timeout())
+
+            # Salles sans message non lu : remettre leurs compteurs à zéro
+            stale = {}
+            rooms = ChatRoom.objects.filter(
+                Q(customer_id__in=chunk)
+                | Q(vendor_id__in=chunk)
+                | Q(admin_id__in=chunk)
+            ).values_list("pk", "customer_id", "vendor_id", "admin_id")
+            for room_id, *participant_ids in rooms:
+                for user_id in participant_ids:
+                    key = cls._chat_room_key(room_id, user_id)
+                    if user_id in chat_totals and key not in values:
+                        stale[key] = 0
+            cache.set_many(stale, cls.timeout())
+
+        return len(user_ids)
@@ -0,0 +1,28 @@
+"""
+Commande Django pour resynchroniser les compteurs de non-lus avec la base
+À exécuter périodiquement via cron ou task scheduler
+"""
+from django.core.management.base import BaseCommand
+
+from notifications.counters import UnreadCounterService
+
+
+class Command(BaseCommand):
+    help = "Recalcule les compteurs de notifications et de messages non lus en cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            type=int,
+            action="append",
+            dest="user_ids",
+            help="Identifiant d'un utilisateur à resynchroniser (répétable)",
+        )
+
+    def handle(self, *args, **options):
+        count = UnreadCounterService.reconcile(options["user_ids"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✓ Compteurs resynchronisés pour {count} utilisateur(s)."
+            )
+        )
@@ -0,0 +1,35 @@
+"""
+Commande Django pour envoyer les emails de la file d'attente
+À exécuter régulièrement via cron ou task scheduler
+"""
+from django.core.management.base import BaseCommand
+
+from notifications.services import EmailQueueService
+
+
+class Command(BaseCommand):
+    help = "Envoie les emails en attente (EmailQueue) par lots"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit",
+            type=int,
+            help="Nombre maximum d'emails par lot (défaut : EMAIL_BATCH_SIZE)",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Enchaîner les lots jusqu'à vider la file",
+        )
+
+    def handle(self, *args, **options):
+        sent = failed = 0
+        while True:
+            result = EmailQueueService.send_pending(options["limit"])
+            sent += result["sent"]
+            failed += result["failed"]
+            if not options["loop"] or not (result["sent"] + result["failed"]):
+                break
+        self.stdout.write(
+            self.style.SUCCESS(f"✓ {sent} email(s) envoyé(s), {failed} en échec.")
+        )
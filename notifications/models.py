@@ -118,11 +118,12 @@ class Notification(models.Model):
 
     def mark_as_read(self):
         """Marquer comme lu"""
-        from django.utils import timezone
+        from .counters import UnreadCounterService
 
-        self.is_read = True
-        self.read_at = timezone.now()
-        self.save()
+        UnreadCounterService.mark_notifications_read(
+            self.user, Notification.objects.filter(pk=self.pk)
+        )
+        self.refresh_from_db(fields=["is_read", "read_at"])
 
 
 class NotificationPreference(models.Model):
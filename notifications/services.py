@@ -4,11 +4,11 @@ Services de notification pour l'envoi d'emails et SMS
 import json
 import logging
 
-import requests
 from django.conf import settings
 from django.core.mail import EmailMultiAlternatives, send_mail
 from django.db import transaction
 from django.template.loader import render_to_string
+from django.urls import reverse
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
@@ -585,3 +585,117 @@ class SMSService:
         except Exception as e:
             logger.error(f"Erreur lors de l'envoi du SMS: {str(e)}")
             return False
+
+
+class EmailQueueService:
+    """
+    File d'attente des emails (EmailQueue).
+
+    Les changements de statut en masse ajoutent leurs emails à la file en un
+    seul ``bulk_create`` ; la commande ``send_queued_emails`` les envoie
+    ensuite par lots sur une seule connexion, avec nouvelles tentatives.
+    """
+
+    STATUS_MESSAGES = {
+        "confirmed": "Votre commande a été confirmée.",
+        "processing": "Votre commande est en cours de traitement.",
+        "shipped": "Votre commande a été expédiée.",
+        "delivered": "Votre commande a été livrée.",
+        "cancelled": "Votre commande a été annulée.",
+        "refunded": "Votre commande a été remboursée.",
+    }
+
+    @classmethod
+    def enqueue_order_status(cls, order_ids, status):
+        """
+        Ajoute à la file l'email de changement de statut des commandes
+        données (clients ayant accepté les emails de commande).
+        Retourne le nombre d'emails ajoutés.
+        """
+        message = cls.STATUS_MESSAGES.get(status)
+        if not message:
+            return 0
+
+        rows = (
+            Order.objects.filter(pk__in=order_ids)
+            .exclude(user__email="")
+            .exclude(user__notification_preferences__email_order_updates=False)
+            .values_list("pk", "order_number", "shipping_first_name", "user__email")
+        )
+        emails = [
+            EmailQueue(
+                to_email=email,
+                subject=f"Mise à jour de votre commande {order_number}",
+                content=(
+                    f"Bonjour {first_name},\n\n{message}\n\n"
+                    f"Numéro de commande : {order_number}\n"
+                    f"Suivi : {settings.SITE_URL}"
+                    f"{reverse('orders:order_detail', args=[order_number])}\n\n"
+                    "Cordialement,\nL'équipe KefyStore"
+                ),
+                priority=2,
+                metadata={"order_id": order_id, "status": status},
+            )
+            for order_id, order_number, first_name, email in rows
+        ]
+        EmailQueue.objects.bulk_create(emails, batch_size=500)
+        return len(emails)
+
+    @staticmethod
+    def send_pending(limit=None):
+        """
+        Envoie un lot d'emails en attente sur une seule connexion.
+        Retourne le nombre d'emails envoyés et en échec.
+        """
+        from django.core.mail import get_connection
+
+        limit = limit or settings.NOTIFICATION_SETTINGS["EMAIL_BATCH_SIZE"]
+        now = timezone.now()
+        with transaction.atomic():
+            batch = list(
+                EmailQueue.objects.select_for_update(skip_locked=True)
+                .filter(status="pending")
+                .exclude(scheduled_at__gt=now)
+                .order_by("priority", "created_at")[:limit]
+            )
+            EmailQueue.objects.filter(pk__in=[email.pk for email in batch]).update(
+                status="processing", updated_at=now
+            )
+
+        sent = failed = 0
+        connection = get_connection()
+        connection.open()
+        try:
+            for email in batch:
+                msg = EmailMultiAlternatives(
+                    subject=email.subject,
+                    body=email.content,
+                    from_email=settings.DEFAULT_FROM_EMAIL,
+                    to=[email.to_email],
+                    connection=connection,
+                )
+                if email.html_content:
+                    msg.attach_alternative(email.html_content, "text/html")
+                try:
+                    msg.send()
+                except Exception as e:
+                    email.retry_count += 1
+                    email.error_message = str(e)
+                    email.status = (
+                        "failed"
+                        if email.retry_count >= email.max_retries
+                        else "pending"
+                    )
+                    failed += 1
+                else:
+                    email.status = "sent"
+                    email.sent_at = timezone.now()
+                    sent += 1
+                email.updated_at = timezone.now()
+        finally:
+            connection.close()
+
+        EmailQueue.objects.bulk_update(
+            batch, ["status", "sent_at", "retry_count", "error_message", "updated_at"]
+        )
+        return {"sent": sent, "failed": failed}
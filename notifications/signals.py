@@ -0,0 +1,34 @@
+"""
+Signaux Django pour l'application notifications
+"""
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from chat.models import ChatMessage
+
+from .counters import UnreadCounterService
+from .models import Notification
+
+
+@receiver(post_save, sender=Notification)
+def update_notification_counter(sender, instance, created, raw=False, **kwargs):
+    """
+    Incrémente le compteur de non-lus à la création d'une notification
+    """
+    if raw:
+        return
+    if created:
+        UnreadCounterService.notification_created(instance)
+    else:
+        # Modification directe (admin, etc.) : le compteur sera recalculé
+        UnreadCounterService.invalidate_notifications(instance.user_id)
+
+
+@receiver(post_save, sender=ChatMessage)
+def update_chat_counters(sender, instance, created, raw=False, **kwargs):
+    """
+    Incrémente les compteurs des destinataires à la création d'un message
+    """
+    if raw or not created:
+        return
+    UnreadCounterService.chat_message_created(instance)
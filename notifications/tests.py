@@ -0,0 +1,141 @@
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from chat.models import ChatMessage, ChatRoom
+
+from .counters import UnreadCounterService
+from .models import EmailQueue, Notification, NotificationTemplate
+from .services import EmailQueueService
+
+User = get_user_model()
+
+
+class UnreadCounterServiceTest(TestCase):
+    """Tests pour les compteurs de non-lus en cache"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="badgeclient", email="badge@example.com", password="testpass123"
+        )
+        self.vendor = User.objects.create_user(
+            username="badgevendor", email="vendor@example.com", password="testpass123"
+        )
+        self.template = NotificationTemplate.objects.create(
+            name="Commande",
+            type="in_app",
+            trigger_type="order_placed",
+            subject="Commande",
+            content="Votre commande",
+        )
+
+    def notify(self, count=1):
+        with self.captureOnCommitCallbacks(execute=True):
+            for index in range(count):
+                Notification.objects.create(
+                    user=self.user,
+                    template=self.template,
+                    type="in_app",
+                    subject=f"Notification {index}",
+                    content="Contenu",
+                )
+
+    def test_counters_expire_quickly_with_a_process_local_cache(self):
+        """Sans cache partagé, les compteurs sont recalculés depuis la base"""
+        from django.test import override_settings
+
+        self.assertEqual(
+            UnreadCounterService.timeout(), UnreadCounterService.LOCAL_CACHE_TIMEOUT
+        )
+        redis = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache"}}
+        with override_settings(CACHES=redis):
+            self.assertEqual(
+                UnreadCounterService.timeout(), UnreadCounterService.CACHE_TIMEOUT
+            )
+
+    def test_notification_counter_follows_create_read_and_delete(self):
+        """Le compteur suit les créations, lectures et suppressions"""
+        self.assertEqual(UnreadCounterService.get_notifications_unread(self.user), 0)
+        self.notify(3)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                UnreadCounterService.get_notifications_unread(self.user), 3
+            )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.filter(user=self.user).first().mark_as_read()
+        self.assertEqual(UnreadCounterService.get_notifications_unread(self.user), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            UnreadCounterService.delete_notifications(
+                self.user, Notification.objects.all()
+            )
+        self.assertEqual(UnreadCounterService.get_notifications_unread(self.user), 0)
+
+    def test_mark_all_as_read_view(self):
+        """Marquer tout comme lu remet le compteur à zéro"""
+        self.notify(2)
+        self.client.force_login(self.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("notifications:mark_all_read"))
+
+        response = self.client.get(reverse("notifications:badges"))
+        self.assertEqual(response.json(), {"notifications": 0, "chat": 0})
+
+    def test_chat_counters(self):
+        """Les compteurs de chat suivent les messages et leur lecture"""
+        room = ChatRoom.objects.create(
+            room_id="room-1", customer=self.user, vendor=self.vendor
+        )
+        self.assertEqual(room.get_unread_count(self.user), 0)
+        self.assertEqual(UnreadCounterService.get_chat_unread(self.user), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ChatMessage.objects.create(room=room, sender=self.vendor, message="Bonjour")
+            ChatMessage.objects.create(room=room, sender=self.vendor, message="Merci")
+            ChatMessage.objects.create(room=room, sender=self.user, message="Salut")
+
+        self.assertEqual(room.get_unread_count(self.user), 2)
+        self.assertEqual(UnreadCounterService.get_chat_unread(self.vendor), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            room.mark_as_read(self.user)
+        self.assertEqual(room.get_unread_count(self.user), 0)
+        self.assertEqual(UnreadCounterService.get_chat_unread(self.user), 0)
+        self.assertEqual(UnreadCounterService.get_chat_unread(self.vendor), 1)
+
+    def test_reconcile_fixes_drifted_counters(self):
+        """La réconciliation corrige un compteur désynchronisé"""
+        self.notify(2)
+        cache.set(UnreadCounterService._notifications_key(self.user.pk), 7)
+
+        UnreadCounterService.reconcile([self.user.pk, self.vendor.pk])
+
+        self.assertEqual(UnreadCounterService.get_notifications_unread(self.user), 2)
+        self.assertEqual(UnreadCounterService.get_chat_unread(self.vendor), 0)
+
+
+class EmailQueueServiceTest(TestCase):
+    """Tests pour l'envoi par lots de la file d'emails"""
+
+    def test_send_pending(self):
+        EmailQueue.objects.bulk_create(
+            [
+                EmailQueue(
+                    to_email=f"client{index}@example.com", subject="S", content="C"
+                )
+                for index in range(3)
+            ]
+        )
+        result = EmailQueueService.send_pending(limit=2)
+
+        self.assertEqual(result, {"sent": 2, "failed": 0})
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(EmailQueue.objects.filter(status="sent").count(), 2)
+        self.assertEqual(EmailQueueService.send_pending()["sent"], 1)
+        self.assertFalse(EmailQueue.objects.exclude(status="sent").exists())
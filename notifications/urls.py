@@ -6,6 +6,7 @@ app_name = "notifications"
 
 urlpatterns = [
     path("", views.notification_list, name="list"),
+    path("badges/", views.badges, name="badges"),
     path("<uuid:notification_id>/read/", views.mark_as_read, name="mark_as_read"),
     path("mark-all-read/", views.mark_all_as_read, name="mark_all_read"),
     path("<uuid:notification_id>/delete/", views.delete_notification, name="delete"),
@@ -7,6 +7,7 @@ from django.shortcuts import get_object_or_404, redirect, render
 from django.utils.translation import gettext_lazy as _
 from django.views.decorators.http import require_http_methods, require_POST
 
+from .counters import UnreadCounterService
 from .models import Notification
 
 
@@ -31,10 +32,19 @@ def notification_list(request):
     page_number = request.GET.get("page")
     page_obj = paginator.get_page(page_number)
 
-    # Statistiques
-    total_count = Notification.objects.filter(user=request.user).count()
-    unread_count = Notification.objects.filter(user=request.user, is_read=False).count()
-    read_count = total_count - unread_count
+    # Statistiques : le compteur de non-lus est en cache et le total
+    # de la page courante est déjà calculé par la pagination
+    unread_count = UnreadCounterService.get_notifications_unread(request.user)
+    if filter_status == "unread":
+        unread_count = paginator.count
+        total_count = Notification.objects.filter(user=request.user).count()
+        read_count = total_count - unread_count
+    elif filter_status == "read":
+        read_count = paginator.count
+        total_count = read_count + unread_count
+    else:
+        total_count = paginator.count
+        read_count = total_count - unread_count
 
     context = {
         "notifications": page_obj,
@@ -58,11 +68,7 @@ def mark_as_read(request, notification_id):
     )
 
     if not notification.is_read:
-        from django.utils import timezone
-
-        notification.is_read = True
-        notification.read_at = timezone.now()
-        notification.save()
+        notification.mark_as_read()
 
     if request.headers.get("X-Requested-With") == "XMLHttpRequest":
         return JsonResponse(
@@ -79,11 +85,7 @@ def mark_all_as_read(request):
     """
     Marquer toutes les notifications comme lues
     """
-    from django.utils import timezone
-
-    updated = Notification.objects.filter(user=request.user, is_read=False).update(
-        is_read=True, read_at=timezone.now()
-    )
+    updated = UnreadCounterService.mark_notifications_read(request.user)
 
     if request.headers.get("X-Requested-With") == "XMLHttpRequest":
         return JsonResponse(
@@ -103,10 +105,10 @@ def delete_notification(request, notification_id):
     """
     Supprimer une notification individuelle
     """
-    notification = get_object_or_404(
-        Notification, id=notification_id, user=request.user
+    get_object_or_404(Notification, id=notification_id, user=request.user)
+    UnreadCounterService.delete_notifications(
+        request.user, Notification.objects.filter(id=notification_id)
     )
-    notification.delete()
 
     if request.headers.get("X-Requested-With") == "XMLHttpRequest":
         return JsonResponse({"success": True, "message": "Notification supprimée"})
@@ -127,9 +129,9 @@ def delete_selected_notifications(request):
         messages.error(request, _("Aucune notification sélectionnée."))
         return redirect("notifications:list")
 
-    deleted_count = Notification.objects.filter(
-        id__in=notification_ids, user=request.user
-    ).delete()[0]
+    deleted_count = UnreadCounterService.delete_notifications(
+        request.user, Notification.objects.filter(id__in=notification_ids)
+    )
 
     if request.headers.get("X-Requested-With") == "XMLHttpRequest":
         return JsonResponse(
@@ -158,7 +160,9 @@ def delete_all_notifications(request):
     else:
         notifications = Notification.objects.filter(user=request.user)
 
-    deleted_count = notifications.delete()[0]
+    deleted_count = UnreadCounterService.delete_notifications(
+        request.user, notifications
+    )
 
     if request.headers.get("X-Requested-With") == "XMLHttpRequest":
         return JsonResponse(
@@ -170,3 +174,11 @@ def delete_all_notifications(request):
 
     messages.success(request, _(f"{deleted_count} notification(s) supprimée(s)."))
     return redirect("notifications:list")
+
+
+@login_required
+def badges(request):
+    """
+    Compteurs des badges (notifications et chat) en un seul appel
+    """
+    return JsonResponse(UnreadCounterService.get_badges(request.user))
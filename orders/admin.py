@@ -1,8 +1,10 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.urls import reverse
 from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
 
+from search.services import AdminSearchService
+
 from .models import (
     Cart,
     CartItem,
@@ -11,6 +13,7 @@ from .models import (
     OrderStatusHistory,
     ShippingAddress,
 )
+from .services import OrderStatusService, VendorOrderService
 
 
 class OrderItemInline(admin.TabularInline):
@@ -128,44 +131,59 @@ class OrderAdmin(admin.ModelAdmin):
         "mark_as_cancelled",
     ]
 
+    # La liste filtrée s'affiche sans COUNT(*) sur toute la table
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        """Recherche sur le texte normalisé (et préfixe CMD-) plutôt que par jointures"""
+        if not search_term:
+            return queryset, False
+        return AdminSearchService.search_orders(search_term, queryset), False
+
+    def _transition(self, request, queryset, status, done):
+        """Applique la transition aux commandes sélectionnées qui l'autorisent"""
+        result = OrderStatusService.transition(queryset, status, user=request.user)
+        self.message_user(request, f"{len(result['updated'])} commande(s) {done}.")
+        if result["rejected"]:
+            self.message_user(
+                request,
+                f"{len(result['rejected'])} commande(s) ignorée(s) : transition "
+                "non autorisée depuis leur statut actuel.",
+                level=messages.WARNING,
+            )
+
     def mark_as_confirmed(self, request, queryset):
         """Marquer comme confirmées"""
-        updated = queryset.update(status="confirmed")
-        self.message_user(request, f"{updated} commande(s) confirmée(s) avec succès.")
+        self._transition(request, queryset, "confirmed", "confirmée(s) avec succès")
 
     mark_as_confirmed.short_description = "Marquer comme confirmées"
 
     def mark_as_processing(self, request, queryset):
         """Marquer comme en cours de traitement"""
-        updated = queryset.update(status="processing")
-        self.message_user(
-            request, f"{updated} commande(s) marquée(s) comme en cours de traitement."
+        self._transition(
+            request,
+            queryset,
+            "processing",
+            "marquée(s) comme en cours de traitement",
         )
 
     mark_as_processing.short_description = "Marquer comme en cours de traitement"
 
     def mark_as_shipped(self, request, queryset):
         """Marquer comme expédiées"""
-        from django.utils import timezone
-
-        updated = queryset.update(status="shipped", shipped_at=timezone.now())
-        self.message_user(request, f"{updated} commande(s) marquée(s) comme expédiées.")
+        self._transition(request, queryset, "shipped", "marquée(s) comme expédiées")
 
     mark_as_shipped.short_description = "Marquer comme expédiées"
 
     def mark_as_delivered(self, request, queryset):
         """Marquer comme livrées"""
-        from django.utils import timezone
-
-        updated = queryset.update(status="delivered", delivered_at=timezone.now())
-        self.message_user(request, f"{updated} commande(s) marquée(s) comme livrées.")
+        self._transition(request, queryset, "delivered", "marquée(s) comme livrées")
 
     mark_as_delivered.short_description = "Marquer comme livrées"
 
     def mark_as_cancelled(self, request, queryset):
         """Marquer comme annulées"""
-        updated = queryset.update(status="cancelled")
-        self.message_user(request, f"{updated} commande(s) marquée(s) comme annulées.")
+        self._transition(request, queryset, "cancelled", "marquée(s) comme annulées")
 
     mark_as_cancelled.short_description = "Marquer comme annulées"
 
@@ -177,6 +195,11 @@ class OrderAdmin(admin.ModelAdmin):
             .prefetch_related("items__product")
         )
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Les articles ont pu changer : recalculer la projection vendeur
+        VendorOrderService.rebuild_orders([form.instance.pk])
+
 
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
@@ -202,6 +225,19 @@ class OrderItemAdmin(admin.ModelAdmin):
             super().get_queryset(request).select_related("order", "product", "variant")
         )
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        VendorOrderService.rebuild_orders([obj.order_id])
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        VendorOrderService.rebuild_orders([obj.order_id])
+
+    def delete_queryset(self, request, queryset):
+        order_ids = set(queryset.values_list("order_id", flat=True))
+        super().delete_queryset(request, queryset)
+        VendorOrderService.rebuild_orders(order_ids)
+
 
 @admin.register(Cart)
 class CartAdmin(admin.ModelAdmin):
@@ -1,11 +1,16 @@
 import json
+from datetime import datetime, timedelta
 
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 
 from delivery_system.models import City, Region
-from delivery_system.services import DeliveryService
+from delivery_system.services import (
+    COUNTRY_DELIVERY_FEES,
+    DeliveryService,
+    country_delivery_days,
+)
 
 
 @require_http_methods(["GET"])
@@ -34,44 +39,15 @@ def get_cities(request, region_id):
 @login_required
 def calculate_delivery_fee(request):
     """API pour calculer les frais de livraison"""
-    from decimal import Decimal
-
     try:
         data = json.loads(request.body)
         city = data.get("city", "")
         country = data.get("country", "Côte d'Ivoire")
 
-        # Tarifs de livraison pour les pays hors Côte d'Ivoire
-        country_delivery_fees = {
-            # Pays proches : 10 000 FCFA
-            "Mali": Decimal("10000"),
-            "Burkina Faso": Decimal("10000"),
-            "Sénégal": Decimal("10000"),
-            "Guinée": Decimal("10000"),
-            # Pays un peu plus éloignés : 15 000 FCFA
-            "Ghana": Decimal("15000"),
-            "Togo": Decimal("15000"),
-            "Bénin": Decimal("15000"),
-            "Niger": Decimal("15000"),
-            "Nigeria": Decimal("15000"),
-            "Cameroun": Decimal("15000"),
-            "Congo": Decimal("15000"),
-            "Gabon": Decimal("15000"),
-            "Tchad": Decimal("15000"),
-            "RCA": Decimal("15000"),
-            "Tunisie": Decimal("15000"),
-            "Maroc": Decimal("15000"),
-            "Algérie": Decimal("15000"),
-            "France": Decimal("15000"),
-            "Belgique": Decimal("15000"),
-        }
-
         # Si c'est hors Côte d'Ivoire, utiliser les tarifs fixes
-        if country in country_delivery_fees:
-            from datetime import datetime, timedelta
-
-            fee = country_delivery_fees[country]
-            estimated_days = 7 if fee == Decimal("10000") else 10
+        if country in COUNTRY_DELIVERY_FEES:
+            fee = COUNTRY_DELIVERY_FEES[country]
+            estimated_days = country_delivery_days(fee)
 
             return JsonResponse(
                 {
@@ -91,10 +67,6 @@ def calculate_delivery_fee(request):
             )
 
         # Pour la Côte d'Ivoire, utiliser le service DeliveryService
-        from datetime import datetime, timedelta
-
-        from delivery_system.services import DeliveryService
-
         try:
             delivery_info = DeliveryService.calculate_delivery_fee(city, country)
 
@@ -283,6 +255,7 @@ def create_order_ajax(request):
 
     from .forms import CheckoutForm
     from .models import Cart, Order, OrderItem, OrderStatusHistory
+    from .services import VendorOrderService
 
     try:
         # Parser les données JSON
@@ -377,6 +350,9 @@ def create_order_ajax(request):
                     cart_item.product.sales_count += cart_item.quantity
                     cart_item.product.save()
 
+            # Projection des commandes par vendeur
+            VendorOrderService.rebuild_orders([order.pk])
+
             # Vider le panier
             cart.clear()
 
@@ -411,7 +387,8 @@ def create_order_ajax(request):
 @login_required
 def cancel_order_ajax(request, order_number):
     """API pour annuler une commande via AJAX"""
-    from .models import Order, OrderStatusHistory
+    from .models import Order
+    from .services import OrderStatusService
 
     try:
         order = Order.objects.get(order_number=order_number, user=request.user)
@@ -423,27 +400,20 @@ def cancel_order_ajax(request, order_number):
                 status=400,
             )
 
-        # Annuler la commande
-        order.status = "cancelled"
-        order.save()
-
-        # Créer l'historique de statut
-        OrderStatusHistory.objects.create(
-            order=order,
-            status="cancelled",
+        # Annuler la commande (historique, stock et notification)
+        result = OrderStatusService.transition(
+            [order],
+            "cancelled",
+            user=request.user,
             notes="Commande annulée par le client",
-            created_by=request.user,
         )
-
-        # Restaurer le stock
-        for item in order.items.all():
-            if item.variant:
-                item.variant.stock += item.quantity
-                item.variant.save()
-            else:
-                item.product.stock += item.quantity
-                item.product.sales_count -= item.quantity
-                item.product.save()
+        if not result["updated"]:
+            # Statut modifié entre-temps (expédiée, déjà annulée...)
+            return JsonResponse(
+                {"success": False, "error": "Cette commande ne peut pas être annulée."},
+                status=400,
+            )
+        order.status = "cancelled"
 
         return JsonResponse(
             {
@@ -6,6 +6,7 @@ from delivery_system.models import DeliveryAddress, DeliveryZone
 from delivery_system.services import DeliveryService
 
 from .models import Order, ShippingAddress
+from .services import OrderStatusService
 
 
 class CheckoutForm(forms.Form):
@@ -129,6 +130,15 @@ class CheckoutForm(forms.Form):
         ),
     )
 
+    coupon_code = forms.CharField(
+        max_length=20,
+        required=False,
+        label=_("Code promo"),
+        widget=forms.TextInput(
+            attrs={"class": "form-control", "placeholder": _("Code promo (optionnel)")}
+        ),
+    )
+
     def __init__(self, *args, **kwargs):
         self.user = kwargs.pop("user", None)
         super().__init__(*args, **kwargs)
@@ -401,6 +411,18 @@ class OrderStatusUpdateForm(forms.ModelForm):
         ),
     )
 
+    def clean_status(self):
+        status = self.cleaned_data["status"]
+        if not OrderStatusService.can_transition(self.instance.status, status):
+            raise forms.ValidationError(
+                _("Transition non autorisée de « %(current)s » à « %(status)s ».")
+                % {
+                    "current": self.instance.get_status_display(),
+                    "status": dict(Order.STATUS_CHOICES).get(status, status),
+                }
+            )
+        return status
+
 
 class OrderSearchForm(forms.Form):
     """
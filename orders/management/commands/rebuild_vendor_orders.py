@@ -0,0 +1,17 @@
+"""
+Commande Django pour reconstruire la projection des commandes par vendeur
+À exécuter après un import de données ou pour corriger une projection désynchronisée
+"""
+from django.core.management.base import BaseCommand
+
+from orders.services import VendorOrderService
+
+
+class Command(BaseCommand):
+    help = "Reconstruit la table VendorOrder à partir des articles de commande"
+
+    def handle(self, *args, **options):
+        written = VendorOrderService.rebuild_all()
+        self.stdout.write(
+            self.style.SUCCESS(f"✓ {written} ligne(s) de commandes vendeur écrites.")
+        )
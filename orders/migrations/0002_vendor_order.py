@@ -0,0 +1,127 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:47
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Sum
+
+
+def backfill_vendor_orders(apps, schema_editor):
+    """
+    Construit la projection VendorOrder à partir des articles existants
+    """
+    OrderItem = apps.get_model("orders", "OrderItem")
+    VendorOrder = apps.get_model("orders", "VendorOrder")
+    rows = (
+        OrderItem.objects.values(
+            "order_id", "order__status", "order__created_at", "product__vendor_id"
+        )
+        .annotate(subtotal=Sum("total_price"), item_count=Sum("quantity"))
+        .order_by()
+    )
+    VendorOrder.objects.bulk_create(
+        (
+            VendorOrder(
+                vendor_id=row["product__vendor_id"],
+                order_id=row["order_id"],
+                subtotal=row["subtotal"] or 0,
+                item_count=row["item_count"] or 0,
+                status=row["order__status"],
+                created_at=row["order__created_at"],
+            )
+            for row in rows.iterator()
+        ),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("orders", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="VendorOrder",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "subtotal",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=10,
+                        verbose_name="Sous-total vendeur",
+                    ),
+                ),
+                (
+                    "item_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Nombre d'articles"
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "En attente"),
+                            ("confirmed", "Confirmée"),
+                            ("processing", "En cours de traitement"),
+                            ("shipped", "Expédiée"),
+                            ("delivered", "Livrée"),
+                            ("cancelled", "Annulée"),
+                            ("refunded", "Remboursée"),
+                        ],
+                        max_length=20,
+                        verbose_name="Statut",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(verbose_name="Date de commande")),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "order",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="vendor_orders",
+                        to="orders.order",
+                        verbose_name="Commande",
+                    ),
+                ),
+                (
+                    "vendor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="vendor_orders",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Vendeur",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Commande vendeur",
+                "verbose_name_plural": "Commandes vendeur",
+                "ordering": ["-created_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["vendor", "created_at"],
+                        name="orders_vend_vendor__85731c_idx",
+                    ),
+                    models.Index(
+                        fields=["vendor", "status", "created_at"],
+                        name="orders_vend_vendor__31e3f9_idx",
+                    ),
+                ],
+                "unique_together": {("vendor", "order")},
+            },
+        ),
+        migrations.RunPython(backfill_vendor_orders, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:53
+
+from django.db import migrations, models
+
+from search.utils import normalize_search_text
+
+
+def backfill_search_text(apps, schema_editor):
+    Order = apps.get_model("orders", "Order")
+    batch = []
+    for order in Order.objects.select_related("user").iterator(chunk_size=500):
+        order.search_text = normalize_search_text(
+            order.order_number,
+            order.user.username,
+            order.user.email,
+            order.user.first_name,
+            order.user.last_name,
+            order.shipping_first_name,
+            order.shipping_last_name,
+        )
+        batch.append(order)
+        if len(batch) >= 500:
+            Order.objects.bulk_update(batch, ["search_text"])
+            batch = []
+    if batch:
+        Order.objects.bulk_update(batch, ["search_text"])
+
+
+def create_trigram_index(apps, schema_editor):
+    """Index trigrammes pour les recherches LIKE '%...%' (PostgreSQL uniquement)"""
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS orders_order_search_text_trgm "
+        "ON orders_order USING gin (search_text gin_trgm_ops)"
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS orders_order_search_text_trgm")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("orders", "0002_vendor_order"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="search_text",
+            field=models.TextField(blank=True, default="", editable=False),
+        ),
+        migrations.RunPython(backfill_search_text, migrations.RunPython.noop),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
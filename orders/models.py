@@ -137,6 +137,9 @@ class Order(models.Model):
         blank=True, null=True, verbose_name=_("Date de paiement")
     )
 
+    # Texte de recherche normalisé (numéro, client, destinataire)
+    search_text = models.TextField(blank=True, default="", editable=False)
+
     # Dates
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -324,11 +327,9 @@ class CartItem(models.Model):
 
     def get_unit_price(self):
         """Retourne le prix unitaire"""
-        from decimal import Decimal
-
         if self.variant:
-            return Decimal(str(self.variant.price))
-        return Decimal(str(self.product.price))
+            return self.variant.get_display_price()
+        return self.product.get_display_price()
 
     def get_total_price(self):
         """Retourne le prix total pour cet article"""
@@ -425,3 +426,51 @@ class OrderStatusHistory(models.Model):
 
     def __str__(self):
         return f"{self.order.order_number} - {self.get_status_display()}"
+
+
+class VendorOrder(models.Model):
+    """
+    Projection dénormalisée des commandes par vendeur : une ligne par
+    (vendeur, commande), maintenue par VendorOrderService
+    """
+
+    vendor = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="vendor_orders",
+        verbose_name=_("Vendeur"),
+    )
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.CASCADE,
+        related_name="vendor_orders",
+        verbose_name=_("Commande"),
+    )
+    subtotal = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        verbose_name=_("Sous-total vendeur"),
+    )
+    item_count = models.PositiveIntegerField(
+        default=0, verbose_name=_("Nombre d'articles")
+    )
+    # Copies des champs de la commande, pour filtrer et trier sans jointure
+    status = models.CharField(
+        max_length=20, choices=Order.STATUS_CHOICES, verbose_name=_("Statut")
+    )
+    created_at = models.DateTimeField(verbose_name=_("Date de commande"))
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _("Commande vendeur")
+        verbose_name_plural = _("Commandes vendeur")
+        ordering = ["-created_at"]
+        unique_together = ["vendor", "order"]
+        indexes = [
+            models.Index(fields=["vendor", "created_at"]),
+            models.Index(fields=["vendor", "status", "created_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.order.order_number} - {self.vendor.get_display_name()}"
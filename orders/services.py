@@ -0,0 +1,280 @@
+"""
+Services de l'application orders
+"""
+from django.db import models, transaction
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+
+from .models import Order, OrderItem, OrderStatusHistory, VendorOrder
+
+
+class VendorOrderService:
+    """
+    Maintient et interroge la projection VendorOrder.
+
+    La projection est écrite au passage de commande (rebuild_orders) et son
+    statut est recopié à chaque changement de statut de la commande
+    (sync_status). Les listes et statistiques vendeur la lisent directement,
+    sans la jointure commandes/articles/produits ni DISTINCT.
+    """
+
+    BATCH_SIZE = 500
+
+    @classmethod
+    def rebuild_orders(cls, order_ids):
+        """
+        Recalcule les lignes de projection des commandes données.
+        Retourne le nombre de lignes écrites.
+        """
+        order_ids = list(order_ids)
+        written = 0
+        for start in range(0, len(order_ids), cls.BATCH_SIZE):
+            chunk = order_ids[start : start + cls.BATCH_SIZE]
+            orders = {
+                pk: (status, created_at)
+                for pk, status, created_at in Order.objects.filter(
+                    pk__in=chunk
+                ).values_list("pk", "status", "created_at")
+            }
+            totals = (
+                OrderItem.objects.filter(order_id__in=chunk)
+                .values("order_id", "product__vendor_id")
+                .annotate(subtotal=Sum("total_price"), item_count=Sum("quantity"))
+                .order_by()
+            )
+            rows = [
+                VendorOrder(
+                    vendor_id=row["product__vendor_id"],
+                    order_id=row["order_id"],
+                    subtotal=row["subtotal"] or 0,
+                    item_count=row["item_count"] or 0,
+                    status=orders[row["order_id"]][0],
+                    created_at=orders[row["order_id"]][1],
+                )
+                for row in totals
+                if row["order_id"] in orders
+            ]
+            with transaction.atomic():
+                VendorOrder.objects.filter(order_id__in=chunk).delete()
+                VendorOrder.objects.bulk_create(rows, batch_size=cls.BATCH_SIZE)
+            written += len(rows)
+        return written
+
+    @classmethod
+    def rebuild_all(cls):
+        """Reconstruit toute la projection, par lots de commandes"""
+        order_ids = Order.objects.order_by("pk").values_list("pk", flat=True)
+        return cls.rebuild_orders(order_ids.iterator(chunk_size=cls.BATCH_SIZE))
+
+    @staticmethod
+    def sync_status(order):
+        """Recopie le statut de la commande dans ses lignes de projection"""
+        return (
+            VendorOrder.objects.filter(order_id=order.pk)
+            .exclude(status=order.status)
+            .update(status=order.status, updated_at=timezone.now())
+        )
+
+    @staticmethod
+    def set_status(orders, status):
+        """
+        Recopie un statut appliqué en masse (``queryset.update``) aux lignes
+        de projection des commandes concernées
+        """
+        return VendorOrder.objects.filter(order__in=orders).update(
+            status=status, updated_at=timezone.now()
+        )
+
+    @staticmethod
+    def orders_for_vendor(vendor, status=None, date_from=None, date_to=None):
+        """
+        Commandes d'un vendeur, les plus récentes d'abord, annotées avec le
+        sous-total et le nombre d'articles du vendeur. Tous les critères
+        portent sur la même ligne de projection (index vendor, status, created_at).
+        """
+        lookups = {"vendor_orders__vendor": vendor}
+        if status:
+            lookups["vendor_orders__status"] = status
+        if date_from:
+            lookups["vendor_orders__created_at__date__gte"] = date_from
+        if date_to:
+            lookups["vendor_orders__created_at__date__lte"] = date_to
+        return (
+            Order.objects.filter(**lookups)
+            .annotate(
+                vendor_subtotal=F("vendor_orders__subtotal"),
+                vendor_item_count=F("vendor_orders__item_count"),
+            )
+            .order_by("-vendor_orders__created_at")
+        )
+
+    @staticmethod
+    def stats(vendor, since=None):
+        """
+        Compteurs et chiffre d'affaires d'un vendeur en une seule requête
+        (le chiffre d'affaires ne compte que les commandes livrées)
+        """
+        queryset = VendorOrder.objects.filter(vendor=vendor)
+        if since is not None:
+            queryset = queryset.filter(created_at__gte=since)
+        stats = queryset.aggregate(
+            total_orders=Count("id"),
+            pending_orders=Count("id", filter=Q(status="pending")),
+            processing_orders=Count("id", filter=Q(status="processing")),
+            completed_orders=Count("id", filter=Q(status="delivered")),
+            shipped_orders=Count("id", filter=Q(status__in=["shipped", "delivered"])),
+            total_revenue=Sum("subtotal", filter=Q(status="delivered")),
+        )
+        stats["total_revenue"] = stats["total_revenue"] or 0
+        return stats
+
+    @staticmethod
+    def monthly_stats(vendor, since):
+        """Commandes livrées et chiffre d'affaires du vendeur, par mois"""
+        return (
+            VendorOrder.objects.filter(
+                vendor=vendor, status="delivered", created_at__gte=since
+            )
+            .annotate(month=TruncMonth("created_at"))
+            .values("month")
+            .annotate(order_count=Count("id"), revenue=Sum("subtotal"))
+            .order_by("month")
+        )
+
+
+class OrderStatusService:
+    """
+    Machine à états des commandes, appliquée à un ensemble de commandes.
+
+    Toutes les transitions (actions d'administration, API, vues vendeur et
+    client) passent par ``transition`` : les commandes sont verrouillées et
+    filtrées selon les transitions autorisées, puis le statut est écrit en un
+    UPDATE, l'historique en un ``bulk_create`` et la projection vendeur en un
+    UPDATE. Les effets de bord sont regroupés : stock restauré en une requête
+    par table à l'annulation, points de fidélité crédités à la livraison et
+    emails ajoutés à la file d'attente en un lot.
+    """
+
+    BATCH_SIZE = 500
+
+    # Statut cible -> statuts de départ autorisés
+    TRANSITIONS = {
+        "confirmed": {"pending"},
+        "processing": {"pending", "confirmed"},
+        "shipped": {"confirmed", "processing"},
+        "delivered": {"shipped"},
+        "cancelled": {"pending", "confirmed", "processing"},
+        "refunded": {"delivered", "cancelled"},
+    }
+
+    @classmethod
+    def can_transition(cls, current, status):
+        """Vérifie si le passage de ``current`` à ``status`` est autorisé"""
+        return current in cls.TRANSITIONS.get(status, ())
+
+    @classmethod
+    def transition(cls, orders, status, user=None, notes=""):
+        """
+        Applique ``status`` aux commandes données (queryset, instances ou
+        identifiants). Les commandes dont le statut courant ne permet pas la
+        transition sont ignorées. Retourne {"updated": [ids],
+        "rejected": {id: statut courant}}.
+        """
+        if status not in cls.TRANSITIONS:
+            raise ValueError(f"Statut de commande inconnu : {status}")
+
+        if isinstance(orders, models.QuerySet):
+            orders = orders.values("pk")
+        else:
+            orders = [getattr(order, "pk", order) for order in orders]
+
+        now = timezone.now()
+        with transaction.atomic():
+            current = dict(
+                Order.objects.select_for_update()
+                .filter(pk__in=orders)
+                .order_by("pk")
+                .values_list("pk", "status")
+            )
+            sources = cls.TRANSITIONS[status]
+            updated = [pk for pk, previous in current.items() if previous in sources]
+            rejected = {
+                pk: previous
+                for pk, previous in current.items()
+                if previous not in sources
+            }
+            if not updated:
+                return {"updated": [], "rejected": rejected}
+
+            fields = {"status": status, "updated_at": now}
+            if status in ("shipped", "delivered"):
+                fields["shipped_at"] = Coalesce("shipped_at", Value(now))
+            if status == "delivered":
+                fields["delivered_at"] = Coalesce("delivered_at", Value(now))
+
+            for chunk in cls._chunks(updated):
+                Order.objects.filter(pk__in=chunk).update(**fields)
+                VendorOrderService.set_status(chunk, status)
+
+            OrderStatusHistory.objects.bulk_create(
+                [
+                    OrderStatusHistory(
+                        order_id=pk,
+                        status=status,
+                        notes=notes or f"Statut changé de {current[pk]} à {status}",
+                        created_by=user,
+                    )
+                    for pk in updated
+                ],
+                batch_size=cls.BATCH_SIZE,
+            )
+
+            if status == "cancelled":
+                cls.restore_stock(updated, user=user)
+            elif status == "delivered":
+                from loyalty.services import LoyaltyLedger
+
+                LoyaltyLedger.accrue_orders(Order.objects.filter(pk__in=updated))
+
+            from notifications.services import EmailQueueService
+
+            EmailQueueService.enqueue_order_status(updated, status)
+
+        return {"updated": updated, "rejected": rejected}
+
+    @classmethod
+    def restore_stock(cls, order_ids, user=None):
+        """
+        Remet en stock les articles des commandes données : une requête
+        d'agrégation puis une écriture par lot de produits et de variantes
+        """
+        from inventory.services import RestockService
+
+        products, variants = {}, {}
+        for product_id, variant_id, quantity in (
+            OrderItem.objects.filter(order_id__in=order_ids)
+            .values("product_id", "variant_id")
+            .annotate(quantity=Sum("quantity"))
+            .order_by()
+            .values_list("product_id", "variant_id", "quantity")
+        ):
+            if variant_id:
+                variants[variant_id] = variants.get(variant_id, 0) + quantity
+            else:
+                products[product_id] = products.get(product_id, 0) + quantity
+
+        # Seules les ventes sans variante sont comptées au passage de commande
+        return RestockService.restock(
+            products,
+            variants,
+            user=user,
+            reference="Annulation de commande",
+            notes=f"{len(order_ids)} commande(s) annulée(s)",
+            sales=products,
+        )
+
+    @classmethod
+    def _chunks(cls, ids):
+        for start in range(0, len(ids), cls.BATCH_SIZE):
+            yield ids[start : start + cls.BATCH_SIZE]
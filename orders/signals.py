@@ -7,6 +7,7 @@ from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
 
 from .models import Order
+from .services import VendorOrderService
 
 logger = logging.getLogger(__name__)
 
@@ -72,3 +73,16 @@ def send_order_confirmation_email_signal(sender, instance, created, **kwargs):
                 logger.error(
                     f"Erreur lors de l'envoi de l'email de changement de statut pour la commande {instance.order_number}: {e}"
                 )
+
+
+@receiver(post_save, sender=Order)
+def sync_vendor_order_status(sender, instance, created, raw=False, **kwargs):
+    """
+    Recopier le statut de la commande dans la projection VendorOrder
+    """
+    if created or raw:
+        return
+    update_fields = kwargs.get("update_fields")
+    if update_fields and "status" not in update_fields:
+        return
+    VendorOrderService.sync_status(instance)
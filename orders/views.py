@@ -7,10 +7,10 @@ from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.core.mail import send_mail
 from django.core.paginator import Paginator
 from django.db import transaction
-from django.db.models import Count, Q, Sum
+from django.db.models import Count, Sum
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.urls import reverse, reverse_lazy
+from django.urls import reverse_lazy
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.views.decorators.http import require_http_methods
@@ -27,6 +27,9 @@ from delivery_system.forms import DeliveryAddressForm
 from delivery_system.services import DeliveryService
 from notifications.services import EmailService
 from products.models import Product
+from promotions.services import CouponService
+from search.pagination import CountlessPaginator
+from search.services import AdminSearchService
 
 from .forms import CheckoutForm, OrderSearchForm, OrderStatusUpdateForm
 from .models import (
@@ -37,6 +40,7 @@ from .models import (
     OrderStatusHistory,
     ShippingAddress,
 )
+from .services import OrderStatusService, VendorOrderService
 
 
 class CartView(LoginRequiredMixin, ListView):
@@ -60,9 +64,24 @@ class CartView(LoginRequiredMixin, ListView):
             cart = self.request.user.cart
             context["cart_total"] = cart.get_total_price()
             context["cart_count"] = cart.get_total_items()
+            # Coupons appliqués automatiquement, évalués en lot sur le panier
+            context["auto_coupons"] = CouponService.evaluate_cart(
+                context["cart_items"], user=self.request.user
+            )
+            # Total affiché : meilleur coupon automatique déduit, comme au paiement
+            context["cart_discount"] = (
+                context["auto_coupons"][0]["discount"]
+                if context["auto_coupons"]
+                else Decimal("0.00")
+            )
+            context["cart_grand_total"] = (
+                context["cart_total"] - context["cart_discount"]
+            )
         except Cart.DoesNotExist:
             context["cart_total"] = 0
             context["cart_count"] = 0
+            context["cart_discount"] = 0
+            context["cart_grand_total"] = 0
         return context
 
 
@@ -131,8 +150,32 @@ class CheckoutView(LoginRequiredMixin, FormView):
         )
         tax_amount = Decimal("0.00")
 
-        # Le total est le sous-total + frais de livraison
-        total_amount = subtotal + shipping_cost
+        # Coupon : validé une seule fois pour toute la commande
+        coupon_evaluation = None
+        discount_amount = Decimal("0.00")
+        coupon_code = form.cleaned_data.get("coupon_code")
+        if coupon_code:
+            coupon_evaluation = CouponService.evaluate(
+                coupon_code,
+                user=self.request.user,
+                order_amount=subtotal,
+                cart_items=cart_items,
+            )
+            if not coupon_evaluation["valid"]:
+                messages.error(self.request, coupon_evaluation["message"])
+                return self.form_invalid(form)
+            discount_amount = coupon_evaluation["discount"]
+        else:
+            # Sinon, appliquer le meilleur coupon automatique éligible
+            auto_evaluations = CouponService.evaluate_cart(
+                cart_items, user=self.request.user
+            )
+            if auto_evaluations:
+                coupon_evaluation = auto_evaluations[0]
+                discount_amount = coupon_evaluation["discount"]
+
+        # Le total est le sous-total + frais de livraison - réduction du coupon
+        total_amount = subtotal + shipping_cost - discount_amount
 
         # Créer la commande
         with transaction.atomic():
@@ -163,6 +206,16 @@ class CheckoutView(LoginRequiredMixin, FormView):
                 total_amount=total_amount,
             )
 
+            # Consommer le coupon (incrément atomique, annule la commande si épuisé)
+            if coupon_evaluation:
+                redeemed, message = CouponService.redeem(
+                    coupon_evaluation, self.request.user, order
+                )
+                if not redeemed:
+                    transaction.set_rollback(True)
+                    messages.error(self.request, message)
+                    return self.form_invalid(form)
+
             # Créer les articles de commande
             for cart_item in cart_items:
                 OrderItem.objects.create(
@@ -183,6 +236,9 @@ class CheckoutView(LoginRequiredMixin, FormView):
                     cart_item.product.sales_count += cart_item.quantity
                     cart_item.product.save()
 
+            # Projection des commandes par vendeur
+            VendorOrderService.rebuild_orders([order.pk])
+
             # Vider le panier
             cart.clear()
 
@@ -364,27 +420,13 @@ class OrderCancelView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
 
     def form_valid(self, form):
         order = self.get_object()
-        order.status = "cancelled"
-        order.save()
-
-        # Créer l'historique de statut
-        OrderStatusHistory.objects.create(
-            order=order,
-            status="cancelled",
+        OrderStatusService.transition(
+            [order],
+            "cancelled",
+            user=self.request.user,
             notes="Commande annulée par le client",
-            created_by=self.request.user,
         )
 
-        # Restaurer le stock
-        for item in order.items.all():
-            if item.variant:
-                item.variant.stock += item.quantity
-                item.variant.save()
-            else:
-                item.product.stock += item.quantity
-                item.product.sales_count -= item.quantity
-                item.product.save()
-
         messages.success(self.request, _("Votre commande a été annulée."))
         return redirect("orders:order_detail", order_number=order.order_number)
 
@@ -460,12 +502,8 @@ class VendorOrderListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
         return self.request.user.user_type == "vendeur"
 
     def get_queryset(self):
-        # Récupérer les commandes contenant des produits du vendeur
-        return (
-            Order.objects.filter(items__product__vendor=self.request.user)
-            .distinct()
-            .order_by("-created_at")
-        )
+        # Commandes du vendeur lues dans la projection VendorOrder
+        return VendorOrderService.orders_for_vendor(self.request.user)
 
 
 class AdminOrderListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
@@ -477,12 +515,13 @@ class AdminOrderListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
     template_name = "orders/admin_order_list.html"
     context_object_name = "orders"
     paginate_by = 20
+    paginator_class = CountlessPaginator
 
     def test_func(self):
         return self.request.user.is_staff
 
     def get_queryset(self):
-        queryset = Order.objects.all().order_by("-created_at")
+        queryset = Order.objects.select_related("user").order_by("-created_at")
 
         # Filtres
         search_form = OrderSearchForm(self.request.GET)
@@ -493,13 +532,7 @@ class AdminOrderListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
             date_to = search_form.cleaned_data.get("date_to")
 
             if query:
-                queryset = queryset.filter(
-                    Q(order_number__icontains=query)
-                    | Q(user__username__icontains=query)
-                    | Q(user__email__icontains=query)
-                    | Q(shipping_first_name__icontains=query)
-                    | Q(shipping_last_name__icontains=query)
-                )
+                queryset = AdminSearchService.search_orders(query, queryset)
 
             if status:
                 queryset = queryset.filter(status=status)
@@ -533,85 +566,25 @@ class OrderStatusUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView)
         order = self.get_object()
         return self.request.user.is_staff or (
             self.request.user.user_type == "vendeur"
-            and order.items.filter(product__vendor=self.request.user).exists()
+            and order.vendor_orders.filter(vendor=self.request.user).exists()
         )
 
     def form_valid(self, form):
         order = self.get_object()
-        old_status = order.status
-        new_status = form.cleaned_data["status"]
-        notes = form.cleaned_data.get("notes", "")
-
-        order.status = new_status
-
-        # Mettre à jour les dates selon le statut
-        if new_status == "shipped" and not order.shipped_at:
-            order.shipped_at = timezone.now()
-        elif new_status == "delivered" and not order.delivered_at:
-            order.delivered_at = timezone.now()
-
-        order.save()
-
-        # Créer l'historique de statut
-        OrderStatusHistory.objects.create(
-            order=order,
-            status=new_status,
-            notes=notes or f"Statut changé de {old_status} à {new_status}",
-            created_by=self.request.user,
+        result = OrderStatusService.transition(
+            [order],
+            form.cleaned_data["status"],
+            user=self.request.user,
+            notes=form.cleaned_data.get("notes", ""),
         )
-
-        # Envoyer un email de notification
-        # send_order_status_update_email(order, old_status, new_status)
-
-        # Si la commande est livrée, envoyer un email de confirmation de livraison
-        # if new_status == 'delivered':
-        #     send_delivery_confirmation_email(order)
+        if not result["updated"]:
+            # Statut modifié entre l'affichage du formulaire et l'envoi
+            messages.error(self.request, _("Transition non autorisée."))
+            return redirect("orders:order_detail", order_number=order.order_number)
 
         messages.success(self.request, _("Le statut de la commande a été mis à jour."))
         return redirect("orders:order_detail", order_number=order.order_number)
 
-    def send_status_notification_email(self, order, new_status):
-        """Envoie un email de notification de changement de statut"""
-        status_messages = {
-            "confirmed": "Votre commande a été confirmée.",
-            "processing": "Votre commande est en cours de traitement.",
-            "shipped": "Votre commande a été expédiée.",
-            "delivered": "Votre commande a été livrée.",
-            "cancelled": "Votre commande a été annulée.",
-        }
-
-        if new_status in status_messages:
-            subject = f"Mise à jour de votre commande {order.order_number}"
-            message = f"""
-            Bonjour {order.shipping_first_name},
-
-            {status_messages[new_status]}
-
-            Numéro de commande: {order.order_number}
-            Nouveau statut: {order.get_status_display()}
-
-            Vous pouvez suivre votre commande en cliquant sur le lien suivant:
-            {self.request.build_absolute_uri(reverse('orders:order_detail', kwargs={'order_number': order.order_number}))}
-
-            Cordialement,
-            L'équipe e-commerce
-            """
-
-            try:
-                send_mail(
-                    subject,
-                    message,
-                    settings.DEFAULT_FROM_EMAIL,
-                    [order.user.email],
-                    fail_silently=True,
-                )
-            except Exception as e:
-                # Ne pas bloquer si l'email échoue
-                import logging
-
-                logger = logging.getLogger(__name__)
-                logger.error(f"Erreur lors de l'envoi de l'email de statut: {e}")
-
 
 @login_required
 def order_statistics(request):
@@ -5,7 +5,6 @@ import logging
 import time
 from decimal import Decimal
 
-import requests
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class PopupsConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "popups"
+
+    def ready(self):
+        import popups.signals  # Activer les signaux (ciblage compilé des popups)
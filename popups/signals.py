@@ -0,0 +1,25 @@
+"""
+Signaux Django pour l'application popups
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Popup
+from .targeting import invalidate_popup_rules, reset_popup_rules
+
+# Champs sans effet sur le ciblage (compteurs)
+COUNTER_FIELDS = {"show_count", "conversion_count", "updated_at"}
+
+
+@receiver(post_save, sender=Popup)
+@receiver(post_delete, sender=Popup)
+def reload_popup_rules(sender, raw=False, update_fields=None, **kwargs):
+    """
+    Popup modifié ou supprimé (hors compteurs d'affichage) : le ciblage est
+    recompilé
+    """
+    if raw or (update_fields and set(update_fields) <= COUNTER_FIELDS):
+        return
+    reset_popup_rules()
+    transaction.on_commit(invalidate_popup_rules)
@@ -0,0 +1,203 @@
+"""
+Ciblage compilé des popups
+
+Les popups actifs dont la fenêtre de diffusion est ouverte sont compilés en
+un jeu de règles en mémoire (audience, types d'utilisateur, motifs de pages)
+avec leur charge JSON déjà préparée : l'évaluation d'une requête ne touche
+pas la base.
+
+Le jeu de règles est recompilé :
+- à la prochaine borne de fenêtre (début ou fin d'un popup programmé) ;
+- quand sa version change après une modification d'un popup (signal,
+  ``ecommerce_site.caching.CacheVersion``).
+
+Motifs de pages (champ ``pages``) : chemin exact (``/panier/``), préfixe
+(``/produits/*``) ou motif glob (``/*/checkout/``). Le préfixe de langue
+(``/en/``) est ignoré. Une liste vide cible toutes les pages.
+"""
+import fnmatch
+import hashlib
+import json
+import re
+import threading
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from ecommerce_site.caching import CacheVersion
+
+_LANGUAGE_PREFIX = re.compile(
+    r"^/(%s)(?=/)" % "|".join(re.escape(code) for code, _ in settings.LANGUAGES)
+)
+
+
+def normalize_path(page):
+    """Chemin d'une page (URL complète acceptée), sans préfixe de langue"""
+    path = urlparse(page or "").path or "/"
+    if not path.startswith("/"):
+        path = "/" + path
+    return _LANGUAGE_PREFIX.sub("", path) or "/"
+
+
+def compile_pages(pages):
+    """Expression régulière des motifs de pages d'un popup (None : toutes)"""
+    patterns = [
+        normalize_path(str(page).strip())
+        for page in pages or []
+        if str(page or "").strip()
+    ]
+    if not patterns:
+        return None
+    return re.compile(
+        "|".join(fnmatch.translate(pattern) for pattern in patterns), re.IGNORECASE
+    )
+
+
+class PopupRule:
+    """Règle compilée d'un popup (lecture seule)"""
+
+    __slots__ = (
+        "popup_id",
+        "authenticated",
+        "anonymous",
+        "user_types",
+        "pages",
+        "payload",
+    )
+
+    def __init__(self, popup):
+        self.popup_id = popup.pk
+        self.authenticated = popup.show_to_authenticated
+        self.anonymous = popup.show_to_anonymous
+        self.user_types = frozenset(popup.user_types or ())
+        self.pages = compile_pages(popup.pages)
+        self.payload = {
+            "id": popup.pk,
+            "type": popup.popup_type,
+            "title": popup.title,
+            "content": popup.content,
+            "button_text": popup.button_text,
+            "button_url": popup.button_url,
+            "trigger_type": popup.trigger_type,
+            "trigger_delay": popup.trigger_delay,
+            "trigger_scroll": popup.trigger_scroll,
+            "trigger_time": popup.trigger_time,
+            "trigger_page_views": popup.trigger_page_views,
+            "background_color": popup.background_color,
+            "text_color": popup.text_color,
+            "button_color": popup.button_color,
+            "overlay_opacity": float(popup.overlay_opacity),
+        }
+
+    def matches(self, audience, path):
+        user_type, authenticated = audience
+        if authenticated:
+            if not self.authenticated:
+                return False
+            if self.user_types and user_type not in self.user_types:
+                return False
+        elif not self.anonymous or self.user_types:
+            return False
+        return self.pages is None or self.pages.match(path) is not None
+
+
+class PopupRuleSet:
+    """Jeu de règles compilé, valable jusqu'à ``expires_at``"""
+
+    def __init__(self, popups, expires_at=None, version=None):
+        self.version = version
+        self.expires_at = expires_at
+        self.rules = tuple(PopupRule(popup) for popup in popups)
+        self.popup_ids = frozenset(rule.popup_id for rule in self.rules)
+        digest = hashlib.sha1()
+        for rule in self.rules:
+            digest.update(json.dumps(rule.payload, sort_keys=True).encode())
+        self.signature = digest.hexdigest()
+
+    @staticmethod
+    def audience(user):
+        """Clé d'audience d'un utilisateur : (type, connecté)"""
+        if user is None or not user.is_authenticated:
+            return (None, False)
+        if user.is_superuser:
+            return ("admin", True)
+        return (getattr(user, "user_type", None), True)
+
+    def match(self, user, page):
+        """Règles applicables à un utilisateur sur une page, sans requête"""
+        audience = self.audience(user)
+        path = normalize_path(page)
+        return [rule for rule in self.rules if rule.matches(audience, path)]
+
+    def etag(self, rules):
+        """ETag d'une réponse : contenu compilé et popups retenus"""
+        ids = ",".join(str(rule.popup_id) for rule in rules)
+        return '"%s"' % hashlib.sha1(f"{self.signature}:{ids}".encode()).hexdigest()
+
+    @classmethod
+    def build(cls, version=None):
+        """Compile les popups dont la fenêtre est ouverte ou à venir (une requête)"""
+        from .models import Popup
+
+        now = timezone.now()
+        popups = list(
+            Popup.objects.filter(is_active=True)
+            .filter(Q(end_date__isnull=True) | Q(end_date__gte=now))
+            .order_by("-created_at", "-pk")
+        )
+        live = [
+            popup
+            for popup in popups
+            if popup.start_date is None or popup.start_date <= now
+        ]
+        # Prochaine borne : début d'un popup programmé ou fin d'un popup diffusé
+        boundaries = [
+            date
+            for popup in popups
+            for date in (popup.start_date, popup.end_date)
+            if date is not None and date > now
+        ]
+        return cls(live, min(boundaries, default=None), version=version)
+
+
+VERSION = CacheVersion("popups:rules:version")
+
+_state = {"rules": None}
+_lock = threading.Lock()
+
+
+def get_popup_rules():
+    """
+    Jeu de règles du processus, recompilé quand sa version change ou à sa
+    prochaine borne de fenêtre ; la base n'est lue qu'à la recompilation.
+    """
+    version = VERSION.get()
+
+    def stale(rules):
+        return (
+            rules is None
+            or rules.version != version
+            or (rules.expires_at is not None and timezone.now() >= rules.expires_at)
+        )
+
+    rules = _state["rules"]
+    if stale(rules):
+        with _lock:
+            rules = _state["rules"]
+            if stale(rules):
+                rules = _state["rules"] = PopupRuleSet.build(version)
+    return rules
+
+
+def reset_popup_rules():
+    """Vide le jeu de règles du processus courant (recompilé au prochain appel)"""
+    _state["rules"] = None
+    VERSION.forget()
+
+
+def invalidate_popup_rules():
+    """Change la version du jeu de règles (après une modification validée)"""
+    VERSION.bump()
+    reset_popup_rules()
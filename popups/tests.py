@@ -0,0 +1,122 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from analytics.buffers import flush_write_buffer
+
+from .models import Popup
+from .targeting import get_popup_rules, reset_popup_rules
+
+User = get_user_model()
+
+
+def create_popup(name, **kwargs):
+    data = {
+        "name": name,
+        "popup_type": "promotion",
+        "title": name,
+        "content": "Contenu",
+    }
+    data.update(kwargs)
+    return Popup.objects.create(**data)
+
+
+class PopupTargetingTest(TestCase):
+    """Tests pour le ciblage compilé des popups"""
+
+    def setUp(self):
+        cache.clear()
+        reset_popup_rules()
+        self.vendor = User.objects.create_user(
+            username="popupvendor",
+            email="popup@example.com",
+            password="testpass123",
+            user_type="vendeur",
+        )
+        self.everywhere = create_popup("Partout")
+        self.products = create_popup(
+            "Produits", pages=["/produits/*"], show_to_authenticated=False
+        )
+        self.vendors = create_popup("Vendeurs", user_types=["vendeur"])
+
+    def tearDown(self):
+        reset_popup_rules()
+
+    def ids(self, user, page):
+        return [rule.popup_id for rule in get_popup_rules().match(user, page)]
+
+    def test_audience_pages_and_user_types(self):
+        """Connexion, type d'utilisateur et motif de page sont respectés"""
+        get_popup_rules()
+        with self.assertNumQueries(0):
+            anonymous = self.ids(None, "http://testserver/en/produits/sac/")
+            vendor = self.ids(self.vendor, "/produits/sac/")
+
+        self.assertEqual(anonymous, [self.products.pk, self.everywhere.pk])
+        self.assertEqual(vendor, [self.vendors.pk, self.everywhere.pk])
+        self.assertEqual(self.ids(None, "/panier/"), [self.everywhere.pk])
+
+    def test_time_windows_and_admin_changes(self):
+        """Les bornes de fenêtre et les modifications recompilent les règles"""
+        now = timezone.now()
+        create_popup("Bientôt", start_date=now + timedelta(hours=1))
+        ended = create_popup("Fini", end_date=now - timedelta(minutes=1))
+        rules = get_popup_rules()
+        self.assertEqual(rules.expires_at, now + timedelta(hours=1))
+        self.assertNotIn(ended.pk, self.ids(None, "/"))
+
+        rules.expires_at = now
+        self.assertIsNot(get_popup_rules(), rules)
+
+        self.everywhere.is_active = False
+        self.everywhere.save()
+        self.assertNotIn(self.everywhere.pk, self.ids(None, "/"))
+
+        # Les compteurs d'affichage ne recompilent pas le ciblage
+        rules = get_popup_rules()
+        self.products.show_count = 5
+        self.products.save(update_fields=["show_count"])
+        self.assertIs(get_popup_rules(), rules)
+
+    def test_etag_response(self):
+        """La réponse porte un ETag ; une revalidation reçoit un 304"""
+        url = reverse("popups:get_popups")
+        response = self.client.get(url, {"page": "/produits/sac/"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], "success")
+        self.assertEqual(len(response.json()["popups"]), 2)
+
+        response = self.client.get(
+            url, {"page": "/produits/sac/"}, HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(
+            url, {"page": "/panier/"}, HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(WRITE_BUFFER_FLUSH_INTERVAL=0)
+    def test_interaction_tracking_is_buffered(self):
+        """Une impression ne coûte aucune écriture synchrone"""
+        flush_write_buffer()
+        url = reverse("popups:track_popup_interaction")
+        get_popup_rules()
+
+        with self.assertNumQueries(0):
+            response = self.client.post(
+                url,
+                {"popup_id": self.everywhere.pk, "action": "shown"},
+                content_type="application/json",
+            )
+        self.assertEqual(response.json()["status"], "success")
+
+        flush_write_buffer()
+        self.everywhere.refresh_from_db()
+        self.assertEqual(self.everywhere.show_count, 1)
+        self.assertEqual(self.everywhere.interactions.count(), 1)
@@ -12,11 +12,14 @@ from django.db.models import Q
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, render
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_vary_headers
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.views.generic import TemplateView
 
+from analytics.buffers import get_write_buffer
+
 from .models import (
     CaptchaChallenge,
     CaptchaSession,
@@ -27,6 +30,7 @@ from .models import (
     TermsOfService,
     UserConsent,
 )
+from .targeting import get_popup_rules
 
 
 class PopupView(TemplateView):
@@ -45,32 +49,46 @@ class PopupView(TemplateView):
 @csrf_exempt
 @require_http_methods(["POST"])
 def track_popup_interaction(request):
-    """Tracker les interactions avec les popups"""
+    """
+    Tracker les interactions avec les popups. L'interaction et les compteurs
+    sont déposés dans le tampon d'écritures (analytics.buffers) : aucune
+    écriture en base pendant la requête.
+    """
     try:
         data = json.loads(request.body)
-        popup_id = data.get("popup_id")
+        popup_id = int(data.get("popup_id"))
         action = data.get("action")
 
-        popup = get_object_or_404(Popup, id=popup_id)
+        if action not in dict(PopupInteraction._meta.get_field("action").choices):
+            return JsonResponse(
+                {"status": "error", "message": "Action inconnue"}, status=400
+            )
+        # Popup diffusé : connu du ciblage compilé, sans requête
+        if (
+            popup_id not in get_popup_rules().popup_ids
+            and not Popup.objects.filter(pk=popup_id).exists()
+        ):
+            return JsonResponse(
+                {"status": "error", "message": "Popup introuvable"}, status=404
+            )
 
-        # Créer l'interaction
-        interaction = PopupInteraction.objects.create(
-            popup=popup,
-            user=request.user if request.user.is_authenticated else None,
-            session_key=request.session.session_key or "",
-            action=action,
-            ip_address=request.META.get("REMOTE_ADDR"),
-            user_agent=request.META.get("HTTP_USER_AGENT", ""),
-            page_url=request.META.get("HTTP_REFERER", ""),
+        buffer = get_write_buffer()
+        buffer.append(
+            PopupInteraction(
+                popup_id=popup_id,
+                user=request.user if request.user.is_authenticated else None,
+                session_key=request.session.session_key or "",
+                action=action,
+                ip_address=request.META.get("REMOTE_ADDR"),
+                user_agent=request.META.get("HTTP_USER_AGENT", ""),
+                page_url=request.META.get("HTTP_REFERER", "")[:200],
+            )
         )
 
-        # Mettre à jour les compteurs
-        if action == "shown":
-            popup.show_count += 1
-        elif action == "converted":
-            popup.conversion_count += 1
-
-        popup.save()
+        # Compteurs cumulés et appliqués par F() (sans recompiler le ciblage)
+        counters = {"shown": "show_count", "converted": "conversion_count"}
+        if action in counters:
+            buffer.increment(Popup, popup_id, counters[action])
 
         return JsonResponse({"status": "success"})
 
@@ -81,60 +99,25 @@ def track_popup_interaction(request):
 @csrf_exempt
 @require_http_methods(["GET", "POST"])
 def get_popups(request):
-    """Récupérer les popups à afficher"""
-    try:
-        # Vérifier les conditions d'affichage
-        user = request.user if request.user.is_authenticated else None
-        current_page = request.META.get("HTTP_REFERER", "")
-
-        # Récupérer les popups actifs
-        popups = Popup.objects.filter(
-            is_active=True, start_date__lte=timezone.now(), end_date__gte=timezone.now()
-        ).filter(
-            Q(start_date__isnull=True) | Q(start_date__lte=timezone.now()),
-            Q(end_date__isnull=True) | Q(end_date__gte=timezone.now()),
+    """
+    Récupérer les popups à afficher sur une page (``?page=`` ou, à défaut,
+    le Referer). Évalué sur le ciblage compilé, sans requête ; la réponse
+    porte un ETag et une requête conditionnelle reçoit un 304.
+    """
+    page = request.GET.get("page") or request.META.get("HTTP_REFERER", "")
+    rules = get_popup_rules()
+    matched = rules.match(request.user, page)
+
+    etag = rules.etag(matched)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse(
+            {"status": "success", "popups": [rule.payload for rule in matched]}
         )
-
-        # Filtrer selon le type d'utilisateur
-        if user:
-            if not popups.filter(show_to_authenticated=True).exists():
-                popups = popups.none()
-        else:
-            if not popups.filter(show_to_anonymous=True).exists():
-                popups = popups.none()
-
-        # Filtrer selon les pages
-        if current_page:
-            popups = popups.filter(
-                Q(pages__isnull=True) | Q(pages__contains=[current_page])
-            )
-
-        # Convertir en JSON
-        popups_data = []
-        for popup in popups:
-            popups_data.append(
-                {
-                    "id": popup.id,
-                    "type": popup.popup_type,
-                    "title": popup.title,
-                    "content": popup.content,
-                    "button_text": popup.button_text,
-                    "button_url": popup.button_url,
-                    "trigger_type": popup.trigger_type,
-                    "trigger_delay": popup.trigger_delay,
-                    "trigger_scroll": popup.trigger_scroll,
-                    "trigger_time": popup.trigger_time,
-                    "background_color": popup.background_color,
-                    "text_color": popup.text_color,
-                    "button_color": popup.button_color,
-                    "overlay_opacity": float(popup.overlay_opacity),
-                }
-            )
-
-        return JsonResponse({"popups": popups_data})
-
-    except Exception as e:
-        return JsonResponse({"status": "error", "message": str(e)})
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, no-cache"
+    patch_vary_headers(response, ["Cookie"])
+    return response
 
 
 @csrf_exempt
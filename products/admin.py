@@ -2,7 +2,18 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
 
-from .models import Category, Product, ProductImage, ProductReview, ProductVariant, Tag
+from search.services import AdminSearchService
+
+from .models import (
+    Category,
+    PriceHistory,
+    Product,
+    ProductImage,
+    ProductImportJob,
+    ProductReview,
+    ProductVariant,
+    Tag,
+)
 
 
 @admin.register(Category)
@@ -160,6 +171,15 @@ class ProductAdmin(admin.ModelAdmin):
         "unfeature_products",
     ]
 
+    # La liste filtrée s'affiche sans COUNT(*) sur toute la table
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        """Recherche sur le texte normalisé (et préfixe SKU-) plutôt que par jointures"""
+        if not search_term:
+            return queryset, False
+        return AdminSearchService.search_products(search_term, queryset), False
+
     def publish_products(self, request, queryset):
         """Publier les produits sélectionnés"""
         from django.utils import timezone
@@ -248,6 +268,38 @@ class ProductVariantAdmin(admin.ModelAdmin):
         return super().get_queryset(request).select_related("product")
 
 
+@admin.register(ProductImportJob)
+class ProductImportJobAdmin(admin.ModelAdmin):
+    """
+    Administration des imports de produits
+    """
+
+    list_display = (
+        "id",
+        "vendor",
+        "status",
+        "processed_rows",
+        "created_count",
+        "variant_count",
+        "error_count",
+        "created_at",
+        "finished_at",
+    )
+    list_filter = ("status", "created_at")
+    search_fields = ("vendor__username", "file")
+    readonly_fields = (
+        "processed_rows",
+        "created_count",
+        "variant_count",
+        "error_count",
+        "errors",
+        "error_message",
+        "created_at",
+        "started_at",
+        "finished_at",
+    )
+
+
 @admin.register(ProductReview)
 class ProductReviewAdmin(admin.ModelAdmin):
     """
@@ -296,3 +348,27 @@ class ProductReviewAdmin(admin.ModelAdmin):
 
     def get_queryset(self, request):
         return super().get_queryset(request).select_related("product", "user")
+
+
+@admin.register(PriceHistory)
+class PriceHistoryAdmin(admin.ModelAdmin):
+    """
+    Consultation de l'historique des prix (lignes en ajout seul)
+    """
+
+    list_display = (
+        "product",
+        "variant",
+        "price",
+        "effective_price",
+        "previous_effective_price",
+        "resolution",
+        "recorded_at",
+    )
+    list_filter = ("resolution", "recorded_at")
+    search_fields = ("product__name",)
+    raw_id_fields = ("product", "variant")
+    date_hierarchy = "recorded_at"
+
+    def has_change_permission(self, request, obj=None):
+        return False
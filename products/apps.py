@@ -9,11 +9,12 @@ class ProductsConfig(AppConfig):
         """
         Vérifie et publie automatiquement les produits programmés au démarrage
         """
-        # Publier automatiquement les produits programmés dont la date est passée
         from django.utils import timezone
 
+        import products.signals  # Activer les signaux (prix effectifs)
         from products.models import Product
 
+        # Publier automatiquement les produits programmés dont la date est passée
         try:
             scheduled_products = Product.objects.filter(
                 scheduled_publish_at__lte=timezone.now(),
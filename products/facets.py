@@ -0,0 +1,415 @@
+"""
+Navigation à facettes du catalogue
+
+Pour chaque catégorie, les produits publiés sont indexés en mémoire sous
+forme de bitsets (un entier Python, un bit par produit) : un bitset par
+étiquette, par tranche de prix et par vendeur, plus « en promotion » et « en
+stock ». Les filtres d'une requête sont intersectés en mémoire (OU entre les
+valeurs d'une facette, ET entre facettes) et les compteurs de toutes les
+valeurs de facettes sont calculés en une passe, sans GROUP BY. Le compteur
+d'une valeur tient compte des filtres des autres facettes, pas de ceux de sa
+propre facette (les valeurs d'une facette restent cumulables).
+
+Un index est construit à sa première utilisation (deux requêtes par
+catégorie) puis tenu à jour :
+- dans le processus courant, en place, pour les seuls produits modifiés
+  (signaux, écritures en masse) : le commit les note sans requête, leurs
+  lignes sont relues à la prochaine lecture des facettes ;
+- dans les autres processus, par reconstruction des catégories modifiées
+  quand leur version (``CacheVersion``) change. Avec un cache partagé, c'est
+  au plus une seconde après le commit ; avec ``LocMemCache``, la nouvelle
+  version n'est vue que du processus courant et les autres attendent
+  l'expiration de la leur ;
+- dans tous les cas au bout de ``MAX_AGE`` secondes (par exemple quand un
+  produit change de catégorie dans un processus qui n'en avait pas l'index).
+"""
+import threading
+import time
+from bisect import bisect_right
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from ecommerce_site.caching import CacheVersion
+
+FACETS = ("tags", "price", "vendor", "on_sale", "in_stock")
+
+# Bornes des tranches de prix (prix effectif), surchargeables par
+# FACET_PRICE_BUCKETS
+DEFAULT_PRICE_BUCKETS = (5000, 10000, 25000, 50000, 100000)
+
+
+def _popcount(bits):
+    return bin(bits).count("1")
+
+
+def _mask(flags):
+    """Bitset dont le bit i vaut flags[i]"""
+    if not flags:
+        return 0
+    return int("".join("1" if flag else "0" for flag in reversed(flags)), 2)
+
+
+class CategoryFacets:
+    """
+    Index à bitsets des produits publiés d'une catégorie. Les positions des
+    produits retirés restent libres jusqu'à la prochaine reconstruction.
+    """
+
+    def __init__(self, category_id, version):
+        self.category_id = category_id
+        self.version = version
+        self.built_at = time.monotonic()
+        self.positions = {}
+        self.prices = []
+        self.live = 0
+        self.bitsets = {facet: {} for facet in FACETS}
+
+    @classmethod
+    def build(cls, category_id, version):
+        index = cls(category_id, version)
+        for row, tag_ids in FacetEngine.load_rows(category_id=category_id):
+            index.add(row, tag_ids)
+        return index
+
+    def copy(self):
+        """Copie modifiable (les lecteurs concurrents gardent l'ancienne)"""
+        index = CategoryFacets(self.category_id, self.version)
+        index.built_at = self.built_at
+        index.positions = dict(self.positions)
+        index.prices = list(self.prices)
+        index.live = self.live
+        index.bitsets = {
+            facet: dict(bitsets) for facet, bitsets in self.bitsets.items()
+        }
+        return index
+
+    def add(self, row, tag_ids):
+        """Indexe un produit (ligne de FacetEngine.load_rows)"""
+        self.remove(row["id"])
+        position = self.positions[row["id"]] = len(self.prices)
+        price = row["effective_price"]
+        if price is None:
+            price = row["price"]
+        self.prices.append(price)
+        bit = 1 << position
+        self.live |= bit
+        values = {
+            "tags": tag_ids,
+            "price": (FacetEngine.bucket_for(price),),
+            "vendor": (row["vendor_id"],),
+            "on_sale": (True,) if price < FacetEngine.reference_price(row) else (),
+            "in_stock": (True,) if row["stock"] > 0 else (),
+        }
+        for facet, keys in values.items():
+            bitsets = self.bitsets[facet]
+            for key in keys:
+                bitsets[key] = bitsets.get(key, 0) | bit
+
+    def remove(self, product_id):
+        position = self.positions.pop(product_id, None)
+        if position is None:
+            return
+        keep = ~(1 << position)
+        self.live &= keep
+        self.prices[position] = None
+        for bitsets in self.bitsets.values():
+            for key in [key for key, bits in bitsets.items() if bits >> position & 1]:
+                bits = bitsets[key] & keep
+                if bits:
+                    bitsets[key] = bits
+                else:
+                    del bitsets[key]
+
+    def _base_mask(self, filters):
+        """Produits vivants satisfaisant les filtres hors facettes"""
+        mask = self.live
+        low, high = filters.get("min_price"), filters.get("max_price")
+        if low is not None or high is not None:
+            mask &= _mask(
+                [
+                    price is not None
+                    and (low is None or price >= low)
+                    and (high is None or price <= high)
+                    for price in self.prices
+                ]
+            )
+        product_ids = filters.get("product_ids")
+        if product_ids is not None:
+            selected = [False] * len(self.prices)
+            for product_id in product_ids:
+                position = self.positions.get(product_id)
+                if position is not None:
+                    selected[position] = True
+            mask &= _mask(selected)
+        return mask
+
+    def count(self, filters, totals):
+        """Ajoute aux totaux le nombre de résultats et les compteurs de facettes"""
+        base = self._base_mask(filters)
+        selections = {}
+        for facet in FACETS:
+            wanted = filters.get(facet)
+            if wanted:
+                bitsets = self.bitsets[facet]
+                union = 0
+                for key in wanted:
+                    union |= bitsets.get(key, 0)
+                selections[facet] = union
+
+        matched = base
+        for union in selections.values():
+            matched &= union
+        totals["total"] += _popcount(matched)
+
+        for facet in FACETS:
+            mask = base
+            if facet in selections:
+                for other, union in selections.items():
+                    if other != facet:
+                        mask &= union
+            else:
+                mask = matched
+            counts = totals[facet]
+            for key, bits in self.bitsets[facet].items():
+                found = _popcount(mask & bits)
+                if found:
+                    counts[key] = counts.get(key, 0) + found
+
+
+class FacetEngine:
+    """
+    Compteurs de facettes de la liste des produits
+    """
+
+    VERSION = CacheVersion("products:facets:version")
+    MAX_AGE = 600
+
+    _indexes = {}
+    # Produits modifiés dont les lignes sont à relire avant la prochaine lecture
+    _stale = set()
+    _lock = threading.Lock()
+    _local = threading.local()
+
+    # Tranches de prix
+
+    @staticmethod
+    def price_buckets():
+        return tuple(getattr(settings, "FACET_PRICE_BUCKETS", DEFAULT_PRICE_BUCKETS))
+
+    @classmethod
+    def bucket_for(cls, price):
+        """Indice de la tranche de prix (0 : sous la première borne)"""
+        return bisect_right(cls.price_buckets(), price)
+
+    @classmethod
+    def price_ranges(cls):
+        """[(indice, minimum, maximum)] ; None pour une borne ouverte"""
+        bounds = (None,) + cls.price_buckets() + (None,)
+        return [
+            (index, bounds[index], bounds[index + 1])
+            for index in range(len(bounds) - 1)
+        ]
+
+    @staticmethod
+    def reference_price(row):
+        """
+        Prix barré d'un produit : le prix original pendant une vente, le prix
+        sinon. Le produit est en promotion si son prix effectif est inférieur.
+        """
+        if row["is_on_sale"] and row["original_price"]:
+            return max(row["price"], row["original_price"])
+        return row["price"]
+
+    # Index
+
+    @staticmethod
+    def load_rows(category_id=None, product_ids=None):
+        """
+        Lignes indexables des produits publiés (d'une catégorie ou d'une
+        liste de produits) et leurs étiquettes : deux requêtes
+        """
+        from .models import Product
+
+        products = Product.objects.filter(status="published")
+        links = Product.tags.through.objects.filter(product__status="published")
+        if category_id is not None:
+            products = products.filter(category_id=category_id)
+            links = links.filter(product__category_id=category_id)
+        if product_ids is not None:
+            products = products.filter(pk__in=product_ids)
+            links = links.filter(product_id__in=product_ids)
+
+        tags = defaultdict(list)
+        for product_id, tag_id in links.values_list("product_id", "tag_id"):
+            tags[product_id].append(tag_id)
+        return [
+            (row, tags.get(row["id"], ()))
+            for row in products.values(
+                "id",
+                "category_id",
+                "vendor_id",
+                "price",
+                "original_price",
+                "is_on_sale",
+                "effective_price",
+                "stock",
+            )
+        ]
+
+    @classmethod
+    def indexes(cls, category_ids):
+        """
+        Index des catégories, reconstruits seulement si leur version a changé
+        ou s'ils ont dépassé ``MAX_AGE``
+        """
+        if cls._stale:
+            cls._reindex_stale()
+        now = time.monotonic()
+        versions = cls.VERSION.get_many(category_ids)
+        indexes = []
+        for category_id in category_ids:
+            version = versions[category_id]
+
+            def stale(index):
+                return (
+                    index is None
+                    or index.version != version
+                    or now - index.built_at >= cls.MAX_AGE
+                )
+
+            index = cls._indexes.get(category_id)
+            if stale(index):
+                with cls._lock:
+                    index = cls._indexes.get(category_id)
+                    if stale(index):
+                        index = CategoryFacets.build(category_id, version)
+                        cls._indexes[category_id] = index
+            indexes.append(index)
+        return indexes
+
+    @classmethod
+    def counts(cls, category_ids, filters):
+        """
+        Nombre de résultats et compteurs de chaque valeur de facette pour les
+        catégories données. ``filters`` : ``tags``, ``vendor``, ``price``
+        (indices de tranches), ``on_sale`` et ``in_stock`` (ensembles de
+        valeurs), ``min_price``, ``max_price`` et ``product_ids`` (restriction,
+        par exemple aux résultats d'une recherche).
+        """
+        totals = {"total": 0}
+        totals.update({facet: {} for facet in FACETS})
+        for index in cls.indexes(category_ids):
+            index.count(filters, totals)
+        return totals
+
+    # Mises à jour
+
+    @classmethod
+    def products_changed(cls, product_ids, category_ids=None):
+        """
+        Programme la réindexation des produits après le commit de la
+        transaction courante (immédiatement hors transaction). ``category_ids``
+        : catégories de ces produits si l'appelant les connaît, ce qui évite
+        de les relire.
+        """
+        pending = cls._pending()
+        if category_ids is None:
+            pending["lookup"].update(product_ids)
+        else:
+            pending["products"].update(product_ids)
+            pending["categories"].update(category_ids)
+        transaction.on_commit(cls.flush)
+
+    @classmethod
+    def _pending(cls):
+        if not hasattr(cls._local, "pending"):
+            cls._local.pending = {
+                "products": set(),
+                "categories": set(),
+                "lookup": set(),
+            }
+        return cls._local.pending
+
+    @classmethod
+    def flush(cls):
+        """
+        Note les produits en attente comme à relire et change la version de
+        leurs catégories. Les rappels suivants de la même transaction trouvent
+        l'ensemble vide.
+        """
+        pending = cls._pending()
+        if not pending["products"] and not pending["lookup"]:
+            return
+        cls._local.pending = {"products": set(), "categories": set(), "lookup": set()}
+        categories = pending["categories"]
+        if pending["lookup"]:
+            from .models import Product
+
+            categories.update(
+                Product.objects.filter(pk__in=pending["lookup"]).values_list(
+                    "category_id", flat=True
+                )
+            )
+        cls.update_products(pending["products"] | pending["lookup"], categories)
+
+    @classmethod
+    def update_products(cls, product_ids, category_ids=()):
+        """
+        Marque des produits modifiés comme à relire dans ce processus et
+        change la version de leurs catégories (et de celles dont l'index local
+        les contient) pour les autres, sans requête
+        """
+        product_ids = set(product_ids)
+        if not product_ids:
+            return
+        with cls._lock:
+            # Sans index local, rien à relire : le premier appel construira
+            if cls._indexes:
+                cls._stale |= product_ids
+            touched = set(category_ids)
+            for category_id, index in cls._indexes.items():
+                if product_ids & index.positions.keys():
+                    touched.add(category_id)
+            touched.discard(None)
+            if not touched:
+                return
+            versions = cls.VERSION.bump(*touched)
+            # L'index local reste valable : les produits notés y seront relus
+            for category_id, version in versions.items():
+                index = cls._indexes.get(category_id)
+                if index is not None:
+                    index.version = version
+
+    @classmethod
+    def _reindex_stale(cls):
+        """Réindexe en place les produits modifiés (deux requêtes)"""
+        with cls._lock:
+            product_ids, cls._stale = cls._stale, set()
+            if not product_ids:
+                return
+            rows = cls.load_rows(product_ids=product_ids)
+            updated = {}
+            for category_id, index in cls._indexes.items():
+                present = product_ids & index.positions.keys()
+                if present:
+                    updated[category_id] = index = index.copy()
+                    for product_id in present:
+                        index.remove(product_id)
+            for row, tag_ids in rows:
+                category_id = row["category_id"]
+                index = updated.get(category_id) or cls._indexes.get(category_id)
+                if index is not None:
+                    if category_id not in updated:
+                        updated[category_id] = index = index.copy()
+                    index.add(row, tag_ids)
+            cls._indexes.update(updated)
+
+    @classmethod
+    def reset(cls):
+        """Vide les index du processus courant (reconstruits au prochain appel)"""
+        with cls._lock:
+            cls._indexes.clear()
+            cls._stale.clear()
+        cls.VERSION.forget()
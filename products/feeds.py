@@ -0,0 +1,442 @@
+"""
+Flux produits (Google Merchant, catalogue Facebook) et sitemaps XML
+
+Le catalogue publié est lu en flux (``values()`` + ``.iterator()``) par
+paquets de ``CHUNK_SIZE`` lignes : aucune instance de modèle n'est créée,
+les traductions sont chargées en une requête par paquet et les URL sont
+construites à partir d'un gabarit résolu une fois par langue (pas de
+``get_absolute_url()`` par ligne). La mémoire reste bornée quelle que soit
+la taille du catalogue.
+
+Les fichiers sont écrits dans ``FEEDS_ROOT`` (écriture dans un fichier
+temporaire puis renommage atomique) et servis tels quels :
+
+- ``/feeds/products-<langue>.<csv|xml|json>`` : flux produits ;
+- ``/sitemap.xml`` : index des sitemaps, ``/sitemap-<section>-<n>.xml.gz``
+  : sitemaps compressés d'au plus ``MAX_URLS`` URL, avec les alternatives
+  ``hreflang`` de chaque langue.
+
+Les sitemaps sont régénérés de façon incrémentale : chaque fichier couvre
+une plage d'identifiants, et seul un fichier dont le nombre d'URL ou le
+``updated_at`` maximal a changé depuis le manifeste est réécrit.
+"""
+import csv
+import gzip
+import json
+import os
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from xml.sax.saxutils import escape, quoteattr
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import Count, Max
+from django.urls import reverse
+from django.utils import timezone, translation
+from django.utils.html import strip_tags
+from django.views.static import serve
+
+from i18n.services import TranslationService
+
+from .models import Category, Product
+
+CHUNK_SIZE = 2000
+GOOGLE_NS = "http://base.google.com/ns/1.0"
+SITEMAP_NS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+XHTML_NS = "http://www.w3.org/1999/xhtml"
+
+
+def feeds_root():
+    """Répertoire des flux et sitemaps générés"""
+    return Path(getattr(settings, "FEEDS_ROOT", Path(settings.MEDIA_ROOT) / "feeds"))
+
+
+def site_url():
+    return settings.SITE_URL.rstrip("/")
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class _AtomicFile:
+    """Fichier écrit à côté de sa destination puis renommé à la fermeture"""
+
+    def __init__(self, path, compress=False):
+        self.path = Path(path)
+        self.tmp = self.path.with_name(f".{self.path.name}.tmp")
+        self.compress = compress
+
+    def __enter__(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.compress:
+            self.handle = gzip.open(self.tmp, "wt", encoding="utf-8", newline="")
+        else:
+            self.handle = open(self.tmp, "w", encoding="utf-8", newline="")
+        return self.handle
+
+    def __exit__(self, exc_type, exc, tb):
+        self.handle.close()
+        if exc_type is None:
+            os.replace(self.tmp, self.path)
+        else:
+            self.tmp.unlink(missing_ok=True)
+        return False
+
+
+class CatalogExporter:
+    """
+    Lecture en flux des produits publiés pour une langue, sous forme de
+    dictionnaires prêts à écrire (titre et description traduits, lien,
+    image, prix effectif, disponibilité)
+    """
+
+    PRODUCT_FIELDS = (
+        "pk",
+        "name",
+        "slug",
+        "sku",
+        "description",
+        "short_description",
+        "price",
+        "effective_price",
+        "stock",
+        "is_digital",
+        "main_image",
+        "category_id",
+        "category__name",
+        "vendor__username",
+    )
+
+    def __init__(self, language=None, base_url=None):
+        self.language = language or settings.LANGUAGE_CODE
+        self.base_url = (base_url or site_url()).rstrip("/")
+        self.currency = getattr(settings, "FEEDS_CURRENCY", "XOF")
+        with translation.override(self.language):
+            self.product_url = self.base_url + reverse(
+                "products:product_detail", kwargs={"slug": "__slug__"}
+            )
+        # Peu de catégories : leurs noms traduits sont chargés une fois
+        self.category_names = {
+            pk: values["name"]
+            for pk, values in TranslationService.lookup(
+                "products.category",
+                Category.objects.values_list("pk", flat=True),
+                self.language,
+                fields=("name",),
+            ).items()
+            if "name" in values
+        }
+
+    def queryset(self):
+        return (
+            Product.objects.filter(status="published")
+            .order_by("pk")
+            .values(*self.PRODUCT_FIELDS)
+        )
+
+    def items(self, queryset=None):
+        rows = (queryset if queryset is not None else self.queryset()).iterator(
+            chunk_size=CHUNK_SIZE
+        )
+        for chunk in _chunks(rows, CHUNK_SIZE):
+            translations = TranslationService.lookup(
+                "products.product",
+                [row["pk"] for row in chunk],
+                self.language,
+                fields=("name", "short_description", "description"),
+            )
+            for row in chunk:
+                yield self.item(row, translations.get(row["pk"], {}))
+
+    def item(self, row, translated):
+        price = row["price"]
+        effective = (
+            row["effective_price"] if row["effective_price"] is not None else price
+        )
+        description = (
+            translated.get("short_description")
+            or translated.get("description")
+            or row["short_description"]
+            or row["description"]
+            or ""
+        )
+        image = ""
+        if row["main_image"]:
+            image = default_storage.url(row["main_image"])
+            if not image.startswith(("http://", "https://")):
+                image = self.base_url + image
+        return {
+            "id": row["sku"] or str(row["pk"]),
+            "title": translated.get("name") or row["name"],
+            "description": " ".join(strip_tags(description).split())[:5000],
+            "link": self.product_url.replace("__slug__", row["slug"]),
+            "image_link": image,
+            "availability": (
+                "in stock" if row["stock"] > 0 or row["is_digital"] else "out of stock"
+            ),
+            "price": f"{price:.2f} {self.currency}",
+            "sale_price": (
+                f"{effective:.2f} {self.currency}" if effective < price else ""
+            ),
+            "brand": row["vendor__username"] or "",
+            "condition": "new",
+            "product_type": self.category_names.get(
+                row["category_id"], row["category__name"] or ""
+            ),
+        }
+
+
+class FeedGenerator:
+    """Écriture des flux produits CSV, XML (RSS Google Merchant) et JSON"""
+
+    FORMATS = ("csv", "xml", "json")
+    COLUMNS = (
+        "id",
+        "title",
+        "description",
+        "link",
+        "image_link",
+        "availability",
+        "price",
+        "sale_price",
+        "brand",
+        "condition",
+        "product_type",
+    )
+
+    def __init__(self, root=None, base_url=None):
+        self.root = Path(root) if root else feeds_root()
+        self.base_url = base_url
+
+    def path(self, language, fmt):
+        return self.root / f"products-{language}.{fmt}"
+
+    def generate(self, formats=None, languages=None):
+        """
+        Écrit les flux demandés (par défaut : tous les formats, toutes les
+        langues). Retourne {nom de fichier: nombre de produits}
+        """
+        written = {}
+        for language in languages or [code for code, _ in settings.LANGUAGES]:
+            exporter = CatalogExporter(language, self.base_url)
+            for fmt in formats or self.FORMATS:
+                path = self.path(language, fmt)
+                with _AtomicFile(path) as handle:
+                    count = getattr(self, f"write_{fmt}")(
+                        handle, exporter.items(), language
+                    )
+                written[path.name] = count
+        return written
+
+    def write_csv(self, handle, items, language):
+        writer = csv.DictWriter(handle, fieldnames=self.COLUMNS)
+        writer.writeheader()
+        count = 0
+        for item in items:
+            writer.writerow(item)
+            count += 1
+        return count
+
+    def write_xml(self, handle, items, language):
+        handle.write(
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            f'<rss version="2.0" xmlns:g="{GOOGLE_NS}">\n<channel>\n'
+            f"<title>{escape(getattr(settings, 'SITE_NAME', 'KefyStore'))}</title>\n"
+            f"<link>{escape(self.base_url or site_url())}</link>\n"
+            f"<description>Catalogue ({escape(language)})</description>\n"
+        )
+        count = 0
+        for item in items:
+            handle.write("<item>")
+            for column in self.COLUMNS:
+                if item[column]:
+                    handle.write(f"<g:{column}>{escape(item[column])}</g:{column}>")
+            handle.write("</item>\n")
+            count += 1
+        handle.write("</channel>\n</rss>\n")
+        return count
+
+    def write_json(self, handle, items, language):
+        handle.write(
+            f'{{"language": {json.dumps(language)}, '
+            f'"generated_at": {json.dumps(timezone.now().isoformat())}, '
+            '"items": [\n'
+        )
+        count = 0
+        for item in items:
+            if count:
+                handle.write(",\n")
+            handle.write(json.dumps(item, ensure_ascii=False))
+            count += 1
+        handle.write("\n]}\n")
+        return count
+
+
+class SitemapGenerator:
+    """
+    Sitemaps XML compressés, découpés à ``MAX_URLS`` URL, et leur index
+
+    Le manifeste (``sitemap-manifest.json``) garde pour chaque fichier le
+    dernier identifiant couvert, le nombre d'URL et le ``updated_at``
+    maximal ; une régénération ne réécrit que les fichiers dont l'agrégat
+    a changé (une requête d'agrégat par fichier).
+    """
+
+    MAX_URLS = 50000
+    INDEX_NAME = "sitemap.xml"
+    MANIFEST_NAME = "sitemap-manifest.json"
+
+    def __init__(self, root=None, base_url=None, max_urls=None):
+        self.root = Path(root) if root else feeds_root()
+        self.base_url = (base_url or site_url()).rstrip("/")
+        self.max_urls = max_urls or self.MAX_URLS
+        self.languages = [code for code, _ in settings.LANGUAGES]
+
+    def sections(self):
+        """Section → (queryset des objets publiés, nom de la route)"""
+        return {
+            "products": (
+                Product.objects.filter(status="published"),
+                "products:product_detail",
+            ),
+            "categories": (
+                Category.objects.filter(is_active=True),
+                "products:category_detail",
+            ),
+        }
+
+    def generate(self, full=False):
+        """
+        Régénère les sitemaps (tous si ``full``) et l'index. Retourne le
+        résumé : fichiers écrits, conservés, supprimés et nombre d'URL
+        """
+        manifest = {} if full else self._read_manifest()
+        summary = {"written": [], "kept": [], "removed": [], "urls": 0}
+        sections = {}
+        for name, (queryset, route) in self.sections().items():
+            entries = self._section(
+                name, queryset, route, manifest.get(name, []), summary
+            )
+            sections[name] = entries
+            summary["urls"] += sum(entry["count"] for entry in entries)
+
+        previous = {entry["file"] for entries in manifest.values() for entry in entries}
+        current = {entry["file"] for entries in sections.values() for entry in entries}
+        for name in sorted(previous - current):
+            (self.root / name).unlink(missing_ok=True)
+            summary["removed"].append(name)
+
+        self._write_index(sections)
+        with _AtomicFile(self.root / self.MANIFEST_NAME) as handle:
+            json.dump(sections, handle, indent=1)
+        return summary
+
+    # Sections
+
+    def _section(self, name, queryset, route, previous, summary):
+        queryset = queryset.order_by("pk")
+        if not previous:
+            return self._write_range(name, queryset, route, summary)
+
+        entries = []
+        lower = None
+        for index, entry in enumerate(previous):
+            last = index == len(previous) - 1
+            scope = queryset if lower is None else queryset.filter(pk__gt=lower)
+            if not last:
+                scope = scope.filter(pk__lte=entry["last_pk"])
+            stats = scope.aggregate(count=Count("pk"), lastmod=Max("updated_at"))
+            lastmod = stats["lastmod"].isoformat() if stats["lastmod"] else None
+            if stats["count"] == entry["count"] and lastmod == entry["lastmod"]:
+                entries.append(entry)
+                summary["kept"].append(entry["file"])
+            elif stats["count"]:
+                entries.extend(self._write_range(name, scope, route, summary))
+            lower = entry["last_pk"]
+        return entries
+
+    def _write_range(self, name, queryset, route, summary):
+        """Écrit les objets de la plage, un fichier par ``max_urls`` URL"""
+        templates = {}
+        for language in self.languages:
+            with translation.override(language):
+                templates[language] = self.base_url + reverse(
+                    route, kwargs={"slug": "__slug__"}
+                )
+
+        entries = []
+        rows = queryset.values_list("pk", "slug", "updated_at").iterator(
+            chunk_size=CHUNK_SIZE
+        )
+        for chunk in _chunks(rows, self.max_urls):
+            filename = f"sitemap-{name}-{chunk[0][0]}.xml.gz"
+            with _AtomicFile(self.root / filename, compress=True) as handle:
+                handle.write(
+                    '<?xml version="1.0" encoding="UTF-8"?>\n'
+                    f'<urlset xmlns="{SITEMAP_NS}" xmlns:xhtml="{XHTML_NS}">\n'
+                )
+                for _, slug, updated_at in chunk:
+                    handle.write(self._url(templates, slug, updated_at))
+                handle.write("</urlset>\n")
+            lastmod = max(row[2] for row in chunk)
+            entries.append(
+                {
+                    "file": filename,
+                    "last_pk": chunk[-1][0],
+                    "count": len(chunk),
+                    "lastmod": lastmod.isoformat(),
+                }
+            )
+            summary["written"].append(filename)
+        return entries
+
+    def _url(self, templates, slug, updated_at):
+        links = "".join(
+            f'<xhtml:link rel="alternate" hreflang="{language}" '
+            f"href={quoteattr(template.replace('__slug__', slug))}/>"
+            for language, template in templates.items()
+        )
+        loc = templates[self.languages[0]].replace("__slug__", slug)
+        return (
+            f"<url><loc>{escape(loc)}</loc>"
+            f"<lastmod>{updated_at.date().isoformat()}</lastmod>{links}</url>\n"
+        )
+
+    # Index et manifeste
+
+    def _write_index(self, sections):
+        with _AtomicFile(self.root / self.INDEX_NAME) as handle:
+            handle.write(
+                '<?xml version="1.0" encoding="UTF-8"?>\n'
+                f'<sitemapindex xmlns="{SITEMAP_NS}">\n'
+            )
+            for entries in sections.values():
+                for entry in entries:
+                    lastmod = datetime.fromisoformat(entry["lastmod"]).date()
+                    handle.write(
+                        f"<sitemap><loc>{escape(self.base_url)}/{entry['file']}</loc>"
+                        f"<lastmod>{lastmod.isoformat()}</lastmod></sitemap>\n"
+                    )
+            handle.write("</sitemapindex>\n")
+
+    def _read_manifest(self):
+        try:
+            with open(self.root / self.MANIFEST_NAME, encoding="utf-8") as handle:
+                return json.load(handle)
+        except (OSError, ValueError):
+            return {}
+
+
+def feed_file_view(request, path):
+    """Sert un flux ou un sitemap généré (en production, le serveur web peut
+    servir ``FEEDS_ROOT`` directement)"""
+    response = serve(request, path, document_root=str(feeds_root()))
+    response["Cache-Control"] = "public, max-age=3600"
+    return response
@@ -0,0 +1,516 @@
+"""
+Import en masse du catalogue (CSV/XLSX).
+
+Un vendeur dépose un fichier : un ``ProductImportJob`` est créé et traité en
+arrière-plan par la commande ``process_product_imports``. Le fichier est lu en
+flux (voir ``BulkStockImporter.read_upload``) et traité par lots de
+``BATCH_SIZE`` lignes : slugs et SKU sont alloués en mémoire contre des
+ensembles préchargés en une requête par lot, puis produits, images, variantes
+et étiquettes sont écrits par ``bulk_create``. La progression est enregistrée
+après chaque lot et chaque ligne refusée figure dans le rapport d'erreurs.
+"""
+import csv
+import io
+import re
+import uuid
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from functools import reduce
+from operator import or_
+
+from django.db import DatabaseError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.text import slugify
+
+from inventory.services import BulkStockImporter, StockAlertService, StockImportError
+from search.utils import normalize_search_text
+
+from .facets import FacetEngine
+from .models import (
+    Category,
+    Product,
+    ProductImage,
+    ProductImportJob,
+    ProductVariant,
+    Tag,
+)
+from .pricing import PriceEngine
+
+_LIST_SEPARATORS = re.compile(r"[|;,]")
+
+
+class ProductImporter:
+    """
+    Crée en masse les produits d'un vendeur.
+
+    Colonnes reconnues (en-têtes insensibles à la casse) :
+
+    - produit : ``name``, ``price`` et ``category`` (slug ou nom) requis ;
+      ``sku``, ``description``, ``short_description``, ``original_price``,
+      ``compare_price``, ``stock``, ``min_stock``, ``status`` (draft ou
+      published, draft par défaut), ``tags`` (noms séparés par ``|``, ``;``
+      ou ``,``, créés au besoin), ``image`` (image principale) et ``images``
+      (images supplémentaires), chemins relatifs au stockage des médias ;
+    - variante : une ligne avec ``parent_sku`` crée une variante (``name``,
+      ``price``, ``sku``, ``stock``) du produit de ce SKU, importé plus haut
+      dans le fichier ou déjà présent dans le catalogue du vendeur.
+
+    Les lignes valides d'un lot sont écrites même si d'autres sont refusées.
+    Les signaux de sauvegarde n'étant pas envoyés par ``bulk_create``, le
+    texte de recherche et la date de publication sont calculés ici, les prix
+    effectifs et les alertes de stock sont déclenchés après chaque lot.
+    """
+
+    BATCH_SIZE = 500
+    STATUSES = ("draft", "published")
+
+    def __init__(self, vendor):
+        self.vendor = vendor
+        self.categories = {}
+        for pk, slug, name in Category.objects.values_list("pk", "slug", "name"):
+            self.categories[slug] = pk
+            self.categories.setdefault(name.strip().lower(), pk)
+        self.tags = {
+            name.lower(): pk for pk, name in Tag.objects.values_list("pk", "name")
+        }
+        # Allocations de l'import en cours (complétées lot par lot)
+        self.slugs = set()
+        self.slug_bases = set()
+        self.skus = set()
+        self.variant_skus = set()
+        self.parents = {}
+
+    # Lecture et validation
+
+    @staticmethod
+    def _text(row, key):
+        value = row.get(key)
+        return "" if value is None else str(value).strip()
+
+    @classmethod
+    def _decimal(cls, row, key, required=False):
+        value = cls._text(row, key).replace(" ", "").replace(",", ".")
+        if not value:
+            if required:
+                raise ValueError(f"{key} requis")
+            return None
+        try:
+            amount = Decimal(value).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+        except InvalidOperation:
+            raise ValueError(f"{key} invalide")
+        if amount < 0:
+            raise ValueError(f"{key} ne peut pas être négatif")
+        return amount
+
+    @classmethod
+    def _integer(cls, row, key, default=0):
+        value = cls._text(row, key)
+        if not value:
+            return default
+        try:
+            number = float(value.replace(",", "."))
+        except ValueError:
+            raise ValueError(f"{key} invalide")
+        if not number.is_integer() or number < 0:
+            raise ValueError(f"{key} invalide")
+        return int(number)
+
+    @staticmethod
+    def _split(value):
+        return [item.strip() for item in _LIST_SEPARATORS.split(value) if item.strip()]
+
+    def _parse_row(self, row):
+        """Retourne les champs validés de la ligne ou lève ValueError"""
+        name = self._text(row, "name")
+        if not name:
+            raise ValueError("name requis")
+        if len(name) > 200:
+            raise ValueError("name trop long (200 caractères maximum)")
+        sku = self._text(row, "sku")
+        if len(sku) > 100:
+            raise ValueError("sku trop long (100 caractères maximum)")
+        data = {
+            "name": name,
+            "sku": sku,
+            "price": self._decimal(row, "price", required=True),
+            "stock": self._integer(row, "stock"),
+        }
+
+        parent_sku = self._text(row, "parent_sku")
+        if parent_sku:
+            if len(name) > 100:
+                raise ValueError("name trop long pour une variante (100 maximum)")
+            data["parent_sku"] = parent_sku
+            return data
+
+        category = self._text(row, "category")
+        category_id = self.categories.get(category) or self.categories.get(
+            category.lower()
+        )
+        if not category_id:
+            raise ValueError(f"catégorie inconnue : {category or '(vide)'}")
+        status = self._text(row, "status").lower() or "draft"
+        if status not in self.STATUSES:
+            raise ValueError(f"statut invalide : {status}")
+        images = self._split(self._text(row, "images"))
+        data.update(
+            category_id=category_id,
+            status=status,
+            description=self._text(row, "description"),
+            short_description=self._text(row, "short_description")[:500] or None,
+            original_price=self._decimal(row, "original_price"),
+            compare_price=self._decimal(row, "compare_price"),
+            min_stock=self._integer(row, "min_stock", default=5),
+            tags=self._split(self._text(row, "tags")),
+            main_image=self._text(row, "image") or (images[0] if images else ""),
+            images=images,
+        )
+        return data
+
+    # Allocation des slugs et SKU
+
+    def _preload_slugs(self, names):
+        """Charge en une requête les slugs existants des bases encore inconnues"""
+        bases = {slugify(name)[:190] or "produit" for name in names}
+        bases -= self.slug_bases
+        if bases:
+            self.slug_bases |= bases
+            self.slugs.update(
+                Product.objects.filter(
+                    reduce(
+                        or_,
+                        (
+                            Q(slug=base) | Q(slug__startswith=f"{base}-")
+                            for base in bases
+                        ),
+                    )
+                ).values_list("slug", flat=True)
+            )
+
+    def _allocate_slug(self, name):
+        """Même règle que Product.save : base, puis base-1, base-2..."""
+        base = slugify(name)[:190] or "produit"
+        slug, counter = base, 1
+        while slug in self.slugs:
+            slug = f"{base}-{counter}"
+            counter += 1
+        self.slugs.add(slug)
+        return slug
+
+    @staticmethod
+    def _allocate_skus(model, prefix, count, taken):
+        """SKU générés, vérifiés contre la base en une requête par tirage"""
+        allocated = []
+        while len(allocated) < count:
+            candidates = {
+                f"{prefix}{uuid.uuid4().hex[:8].upper()}"
+                for _ in range(count - len(allocated))
+            } - taken
+            candidates -= set(
+                model.objects.filter(sku__in=candidates).values_list("sku", flat=True)
+            )
+            taken |= candidates
+            allocated.extend(candidates)
+        return allocated
+
+    def _reserve_skus(self, model, entries, taken, label):
+        """
+        Réserve les SKU explicites du lot (doublons du fichier ou de la base
+        refusés) et alloue les SKU manquants
+        """
+        explicit = {data["sku"] for _, data in entries if data["sku"]}
+        existing = set(
+            model.objects.filter(sku__in=explicit).values_list("sku", flat=True)
+        )
+        accepted, missing = [], []
+        for result, data in entries:
+            sku = data["sku"]
+            if not sku:
+                missing.append(data)
+            elif sku in existing or sku in taken:
+                result["message"] = f"{label} {sku} déjà utilisé"
+                continue
+            else:
+                taken.add(sku)
+            accepted.append((result, data))
+        prefix = "SKU-" if model is Product else "VAR-"
+        for data, sku in zip(
+            missing, self._allocate_skus(model, prefix, len(missing), taken)
+        ):
+            data["sku"] = sku
+        return accepted
+
+    # Écriture
+
+    def _ensure_tags(self, names):
+        """Identifiants des étiquettes, créées en une requête si nécessaire"""
+        missing = {}
+        for name in names:
+            if name.lower() not in self.tags:
+                missing.setdefault(name.lower(), name[:50])
+        if missing:
+            Tag.objects.bulk_create(
+                [Tag(name=name, slug=slugify(name)[:50]) for name in missing.values()],
+                ignore_conflicts=True,
+            )
+            for pk, name in Tag.objects.filter(name__in=missing.values()).values_list(
+                "pk", "name"
+            ):
+                self.tags[name.lower()] = pk
+
+    def _create_products(self, entries, now):
+        entries = self._reserve_skus(Product, entries, self.skus, "SKU")
+        self._preload_slugs(data["name"] for _, data in entries)
+        self._ensure_tags(name for _, data in entries for name in data["tags"])
+
+        products = [
+            Product(
+                vendor=self.vendor,
+                name=data["name"],
+                slug=self._allocate_slug(data["name"]),
+                sku=data["sku"],
+                category_id=data["category_id"],
+                description=data["description"],
+                short_description=data["short_description"],
+                price=data["price"],
+                original_price=data["original_price"],
+                compare_price=data["compare_price"],
+                stock=data["stock"],
+                min_stock=data["min_stock"],
+                status=data["status"],
+                main_image=data["main_image"] or None,
+                published_at=now if data["status"] == "published" else None,
+                search_text=normalize_search_text(
+                    data["name"], data["sku"], self.vendor.username
+                ),
+            )
+            for _, data in entries
+        ]
+        Product.objects.bulk_create(products, batch_size=self.BATCH_SIZE)
+
+        images, tag_links = [], []
+        for (result, data), product in zip(entries, products):
+            result.update(status="created", product_id=product.pk, sku=product.sku)
+            self.parents[product.sku] = product.pk
+            images.extend(
+                ProductImage(product=product, image=path, order=position)
+                for position, path in enumerate(data["images"][1:], 1)
+            )
+            tag_ids = {
+                self.tags[name.lower()]
+                for name in data["tags"]
+                if name.lower() in self.tags
+            }
+            tag_links.extend(
+                Product.tags.through(product_id=product.pk, tag_id=tag_id)
+                for tag_id in tag_ids
+            )
+        ProductImage.objects.bulk_create(images, batch_size=self.BATCH_SIZE)
+        Product.tags.through.objects.bulk_create(tag_links, batch_size=self.BATCH_SIZE)
+        return [product.pk for product in products]
+
+    def _create_variants(self, entries):
+        unknown = {
+            data["parent_sku"]
+            for _, data in entries
+            if data["parent_sku"] not in self.parents
+        }
+        if unknown:
+            self.parents.update(
+                Product.objects.filter(vendor=self.vendor, sku__in=unknown).values_list(
+                    "sku", "pk"
+                )
+            )
+        parented = []
+        for result, data in entries:
+            data["product_id"] = self.parents.get(data["parent_sku"])
+            if data["product_id"] is None:
+                result["message"] = f"produit parent introuvable : {data['parent_sku']}"
+            else:
+                parented.append((result, data))
+
+        names = set(
+            ProductVariant.objects.filter(
+                product_id__in={data["product_id"] for _, data in parented}
+            ).values_list("product_id", "name")
+        )
+        unique = []
+        for result, data in parented:
+            key = (data["product_id"], data["name"])
+            if key in names:
+                result["message"] = f"variante « {data['name']} » déjà présente"
+                continue
+            names.add(key)
+            unique.append((result, data))
+
+        entries = self._reserve_skus(ProductVariant, unique, self.variant_skus, "SKU")
+        variants = [
+            ProductVariant(
+                product_id=data["product_id"],
+                name=data["name"],
+                sku=data["sku"],
+                price=data["price"],
+                stock=data["stock"],
+            )
+            for _, data in entries
+        ]
+        ProductVariant.objects.bulk_create(variants, batch_size=self.BATCH_SIZE)
+        for (result, data), variant in zip(entries, variants):
+            result.update(
+                status="variant", product_id=data["product_id"], sku=variant.sku
+            )
+        return variants
+
+    def _process_batch(self, batch):
+        products, variants = [], []
+        for result, row in batch:
+            try:
+                data = self._parse_row(row)
+            except ValueError as exc:
+                result["message"] = str(exc)
+                continue
+            (variants if "parent_sku" in data else products).append((result, data))
+
+        with transaction.atomic():
+            product_ids = self._create_products(products, timezone.now())
+            created_variants = self._create_variants(variants)
+            variant_ids = [variant.pk for variant in created_variants]
+            # bulk_create n'envoie pas post_save : prévenir le veilleur d'alertes
+            StockAlertService.watch(product_ids=product_ids, variant_ids=variant_ids)
+            FacetEngine.products_changed(product_ids)
+        return set(product_ids) | {variant.product_id for variant in created_variants}
+
+    def import_rows(self, rows, progress=None):
+        """
+        Importe les lignes par lots et retourne le rapport. ``progress`` est
+        appelé avec le rapport partiel après chaque lot.
+        """
+        results = []
+        batch = []
+        for line, row in enumerate(rows, 2):  # ligne 1 : en-têtes
+            result = {"row": line, "status": "error", "sku": self._text(row, "sku")}
+            results.append(result)
+            batch.append((result, row))
+            if len(batch) >= self.BATCH_SIZE:
+                self._run_batch(batch)
+                batch = []
+                if progress:
+                    progress(self._report(results))
+        if batch:
+            self._run_batch(batch)
+        report = self._report(results)
+        if progress:
+            progress(report)
+        return report
+
+    def _run_batch(self, batch):
+        try:
+            priced = self._process_batch(batch)
+        except DatabaseError as exc:
+            # Conflit d'écriture concurrent : le lot entier est annulé
+            for result, _ in batch:
+                if result["status"] == "created":
+                    self.parents.pop(result["sku"], None)
+                result.update(status="error", message=f"lot annulé : {exc}")
+                result.pop("product_id", None)
+            return
+        if priced:
+            PriceEngine.refresh_products(Product.objects.filter(pk__in=priced))
+
+    @staticmethod
+    def _report(results):
+        counts = {"created": 0, "variant": 0, "error": 0}
+        for result in results:
+            counts[result["status"]] += 1
+        return {
+            "total": len(results),
+            "created": counts["created"],
+            "variants": counts["variant"],
+            "errors": counts["error"],
+            "rows": results,
+        }
+
+    # Tâches d'arrière-plan
+
+    @staticmethod
+    def enqueue(vendor, uploaded_file):
+        """Enregistre le fichier et crée la tâche d'import (en attente)"""
+        if not uploaded_file.name.lower().endswith((".csv", ".xlsx")):
+            raise StockImportError("Format non pris en charge (CSV ou XLSX attendu)")
+        return ProductImportJob.objects.create(vendor=vendor, file=uploaded_file)
+
+    @classmethod
+    def run(cls, job):
+        """Exécute une tâche d'import en enregistrant sa progression"""
+
+        def progress(report):
+            ProductImportJob.objects.filter(pk=job.pk).update(
+                processed_rows=report["total"],
+                created_count=report["created"],
+                variant_count=report["variants"],
+                error_count=report["errors"],
+            )
+
+        try:
+            with job.file.open("rb") as uploaded_file:
+                report = cls(job.vendor).import_rows(
+                    BulkStockImporter.read_upload(uploaded_file), progress=progress
+                )
+        except Exception as exc:
+            job.status = "failed"
+            job.error_message = str(exc)
+            job.finished_at = timezone.now()
+            job.save(update_fields=["status", "error_message", "finished_at"])
+            return None
+
+        job.processed_rows = report["total"]
+        job.created_count = report["created"]
+        job.variant_count = report["variants"]
+        job.error_count = report["errors"]
+        job.errors = [
+            {"row": row["row"], "sku": row["sku"], "message": row.get("message", "")}
+            for row in report["rows"]
+            if row["status"] == "error"
+        ]
+        job.status = "completed"
+        job.finished_at = timezone.now()
+        job.save()
+        return report
+
+    @classmethod
+    def process_pending(cls, limit=1):
+        """
+        Traite les tâches en attente ; plusieurs workers peuvent tourner en
+        parallèle sans prendre la même tâche. Retourne le nombre de tâches
+        traitées et en échec.
+        """
+        with transaction.atomic():
+            jobs = list(
+                ProductImportJob.objects.select_for_update(skip_locked=True)
+                .filter(status="pending")
+                .order_by("created_at")[:limit]
+            )
+            now = timezone.now()
+            ProductImportJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+                status="processing", started_at=now
+            )
+            for job in jobs:
+                job.status, job.started_at = "processing", now
+
+        done = failed = 0
+        for job in jobs:
+            if cls.run(job) is None:
+                failed += 1
+            else:
+                done += 1
+        return {"processed": done, "failed": failed}
+
+    @staticmethod
+    def error_report(job):
+        """Rapport d'erreurs de la tâche au format CSV"""
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(["row", "sku", "message"])
+        for error in job.errors:
+            writer.writerow([error["row"], error["sku"], error["message"]])
+        return output.getvalue()
@@ -0,0 +1,22 @@
+"""
+Commande Django de regroupement de l'historique des prix
+À exécuter quotidiennement via cron ou task scheduler.
+
+    python manage.py downsample_price_history
+"""
+from django.core.management.base import BaseCommand
+
+from products.price_history import PriceHistoryService
+
+
+class Command(BaseCommand):
+    help = "Regroupe les lignes anciennes de l'historique des prix (jour, semaine)"
+
+    def handle(self, *args, **options):
+        result = PriceHistoryService.downsample()
+        for resolution, counts in result.items():
+            self.stdout.write(
+                f"{resolution} : {counts['read']} ligne(s) regroupée(s) "
+                f"en {counts['written']}"
+            )
+        self.stdout.write(self.style.SUCCESS("✓ Historique des prix regroupé."))
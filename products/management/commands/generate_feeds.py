@@ -0,0 +1,74 @@
+"""
+Commande Django de génération des flux produits et des sitemaps
+À exécuter via cron ou task scheduler (par exemple toutes les heures) : les
+flux sont réécrits en flux continu, les sitemaps seulement pour les plages
+de produits modifiées depuis la dernière exécution.
+
+    python manage.py generate_feeds
+    python manage.py generate_feeds --format xml --language fr --no-sitemaps
+    python manage.py generate_feeds --full
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from products.feeds import FeedGenerator, SitemapGenerator
+
+
+class Command(BaseCommand):
+    help = "Génère les flux produits (CSV, XML, JSON) et les sitemaps XML"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--format",
+            action="append",
+            dest="formats",
+            choices=FeedGenerator.FORMATS,
+            help="Format de flux (répétable ; défaut : tous)",
+        )
+        parser.add_argument(
+            "--language",
+            action="append",
+            dest="languages",
+            help="Langue des flux (répétable ; défaut : toutes)",
+        )
+        parser.add_argument(
+            "--no-feeds", action="store_true", help="Ne pas générer les flux"
+        )
+        parser.add_argument(
+            "--no-sitemaps", action="store_true", help="Ne pas générer les sitemaps"
+        )
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Réécrire tous les sitemaps (sinon : seulement les plages modifiées)",
+        )
+        parser.add_argument(
+            "--output", help="Répertoire de sortie (défaut : FEEDS_ROOT)"
+        )
+        parser.add_argument("--base-url", help="URL du site (défaut : SITE_URL)")
+
+    def handle(self, *args, **options):
+        known = {code for code, _ in settings.LANGUAGES}
+        unknown = set(options["languages"] or []) - known
+        if unknown:
+            raise CommandError(f"Langue(s) inconnue(s) : {', '.join(sorted(unknown))}")
+
+        if not options["no_feeds"]:
+            written = FeedGenerator(options["output"], options["base_url"]).generate(
+                options["formats"], options["languages"]
+            )
+            for name, count in written.items():
+                self.stdout.write(f"  {name} : {count} produit(s)")
+
+        if not options["no_sitemaps"]:
+            summary = SitemapGenerator(options["output"], options["base_url"]).generate(
+                full=options["full"]
+            )
+            self.stdout.write(
+                f"  Sitemaps : {summary['urls']} URL, "
+                f"{len(summary['written'])} fichier(s) écrit(s), "
+                f"{len(summary['kept'])} conservé(s), "
+                f"{len(summary['removed'])} supprimé(s)"
+            )
+
+        self.stdout.write(self.style.SUCCESS("✓ Flux et sitemaps générés"))
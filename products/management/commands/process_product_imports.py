@@ -0,0 +1,40 @@
+"""
+Commande Django de traitement des imports de produits en attente
+À exécuter régulièrement via cron ou task scheduler (ou en continu avec
+--loop) ; plusieurs workers peuvent tourner en parallèle.
+
+    python manage.py process_product_imports
+    python manage.py process_product_imports --loop
+"""
+from django.core.management.base import BaseCommand
+
+from products.importer import ProductImporter
+
+
+class Command(BaseCommand):
+    help = "Traite les imports de produits en attente (ProductImportJob)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=1,
+            help="Nombre maximum d'imports par lot (défaut : 1)",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Enchaîner les imports jusqu'à vider la file",
+        )
+
+    def handle(self, *args, **options):
+        processed = failed = 0
+        while True:
+            result = ProductImporter.process_pending(options["limit"])
+            processed += result["processed"]
+            failed += result["failed"]
+            if not options["loop"] or not (result["processed"] + result["failed"]):
+                break
+        self.stdout.write(
+            self.style.SUCCESS(f"✓ {processed} import(s) traité(s), {failed} en échec.")
+        )
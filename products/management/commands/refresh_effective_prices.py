@@ -0,0 +1,34 @@
+"""
+Commande Django pour recalculer les prix effectifs des produits
+À exécuter via cron ou task scheduler pour appliquer les bornes des fenêtres de promotion
+"""
+from django.core.management.base import BaseCommand
+
+from products.pricing import PriceEngine
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcule les prix effectifs (promotions et ventes) dont la fenêtre est échue"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Recalculer le prix effectif de tout le catalogue",
+        )
+
+    def handle(self, *args, **options):
+        if options["all"]:
+            updated = PriceEngine.refresh_products()
+        else:
+            # Ignorer la borne en cache : la commande fait toujours le contrôle
+            from django.core.cache import cache
+
+            cache.delete(PriceEngine.NEXT_BOUNDARY_CACHE_KEY)
+            updated = PriceEngine.refresh_expired()
+
+        self.stdout.write(
+            self.style.SUCCESS(f"✓ {updated} prix effectif(s) mis à jour.")
+        )
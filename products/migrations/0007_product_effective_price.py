@@ -0,0 +1,82 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:19
+
+from django.db import migrations, models
+from django.db.models import F
+from django.utils import timezone
+
+
+def seed_effective_prices(apps, schema_editor):
+    """
+    Initialise le prix effectif avec le prix de base et le marque comme expiré,
+    pour que PriceEngine.refresh_expired() applique les promotions au prochain passage
+    """
+    Product = apps.get_model("products", "Product")
+    ProductVariant = apps.get_model("products", "ProductVariant")
+    now = timezone.now()
+    Product.objects.update(effective_price=F("price"), effective_price_valid_until=now)
+    ProductVariant.objects.update(
+        effective_price=F("price"), effective_price_valid_until=now
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0006_product_scheduled_publish_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="effective_price",
+            field=models.DecimalField(
+                blank=True,
+                decimal_places=2,
+                editable=False,
+                max_digits=10,
+                null=True,
+                verbose_name="Prix effectif",
+            ),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="effective_price_valid_until",
+            field=models.DateTimeField(
+                blank=True,
+                db_index=True,
+                editable=False,
+                null=True,
+                verbose_name="Prix effectif valide jusqu'au",
+            ),
+        ),
+        migrations.AddField(
+            model_name="productvariant",
+            name="effective_price",
+            field=models.DecimalField(
+                blank=True,
+                decimal_places=2,
+                editable=False,
+                max_digits=10,
+                null=True,
+                verbose_name="Prix effectif",
+            ),
+        ),
+        migrations.AddField(
+            model_name="productvariant",
+            name="effective_price_valid_until",
+            field=models.DateTimeField(
+                blank=True,
+                db_index=True,
+                editable=False,
+                null=True,
+                verbose_name="Prix effectif valide jusqu'au",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["status", "effective_price"],
+                name="products_pr_status_64c238_idx",
+            ),
+        ),
+        migrations.RunPython(seed_effective_prices, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:53
+
+from django.db import migrations, models
+
+from search.utils import normalize_search_text
+
+
+def backfill_search_text(apps, schema_editor):
+    Product = apps.get_model("products", "Product")
+    batch = []
+    for product in Product.objects.select_related("vendor").iterator(chunk_size=500):
+        product.search_text = normalize_search_text(
+            product.name, product.sku, product.vendor.username
+        )
+        batch.append(product)
+        if len(batch) >= 500:
+            Product.objects.bulk_update(batch, ["search_text"])
+            batch = []
+    if batch:
+        Product.objects.bulk_update(batch, ["search_text"])
+
+
+def create_trigram_index(apps, schema_editor):
+    """Index trigrammes pour les recherches LIKE '%...%' (PostgreSQL uniquement)"""
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS products_product_search_text_trgm "
+        "ON products_product USING gin (search_text gin_trgm_ops)"
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS products_product_search_text_trgm")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0007_product_effective_price"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="search_text",
+            field=models.TextField(blank=True, default="", editable=False),
+        ),
+        migrations.RunPython(backfill_search_text, migrations.RunPython.noop),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -0,0 +1,99 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:35
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("products", "0008_product_search_text"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductImportJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "file",
+                    models.FileField(
+                        upload_to="imports/products/", verbose_name="Fichier"
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "En attente"),
+                            ("processing", "En cours"),
+                            ("completed", "Terminé"),
+                            ("failed", "Échoué"),
+                        ],
+                        db_index=True,
+                        default="pending",
+                        max_length=20,
+                        verbose_name="Statut",
+                    ),
+                ),
+                (
+                    "processed_rows",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Lignes traitées"
+                    ),
+                ),
+                (
+                    "created_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Produits créés"
+                    ),
+                ),
+                (
+                    "variant_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Variantes créées"
+                    ),
+                ),
+                (
+                    "error_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Lignes en erreur"
+                    ),
+                ),
+                (
+                    "errors",
+                    models.JSONField(blank=True, default=list, verbose_name="Erreurs"),
+                ),
+                (
+                    "error_message",
+                    models.TextField(blank=True, verbose_name="Message d'erreur"),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("started_at", models.DateTimeField(blank=True, null=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "vendor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="product_imports",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Vendeur",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Import de produits",
+                "verbose_name_plural": "Imports de produits",
+                "ordering": ["-created_at"],
+            },
+        ),
+    ]
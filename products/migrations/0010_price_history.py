@@ -0,0 +1,122 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0009_product_import_job"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PriceHistory",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "price",
+                    models.DecimalField(
+                        decimal_places=2, max_digits=10, verbose_name="Prix"
+                    ),
+                ),
+                (
+                    "original_price",
+                    models.DecimalField(
+                        blank=True,
+                        decimal_places=2,
+                        max_digits=10,
+                        null=True,
+                        verbose_name="Prix original",
+                    ),
+                ),
+                (
+                    "compare_price",
+                    models.DecimalField(
+                        blank=True,
+                        decimal_places=2,
+                        max_digits=10,
+                        null=True,
+                        verbose_name="Prix de comparaison",
+                    ),
+                ),
+                (
+                    "effective_price",
+                    models.DecimalField(
+                        blank=True,
+                        decimal_places=2,
+                        max_digits=10,
+                        null=True,
+                        verbose_name="Prix effectif",
+                    ),
+                ),
+                (
+                    "previous_effective_price",
+                    models.DecimalField(
+                        blank=True,
+                        decimal_places=2,
+                        max_digits=10,
+                        null=True,
+                        verbose_name="Prix effectif précédent",
+                    ),
+                ),
+                (
+                    "resolution",
+                    models.CharField(
+                        choices=[
+                            ("change", "Changement"),
+                            ("day", "Jour"),
+                            ("week", "Semaine"),
+                        ],
+                        default="change",
+                        max_length=10,
+                        verbose_name="Résolution",
+                    ),
+                ),
+                ("recorded_at", models.DateTimeField(verbose_name="Enregistré le")),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="price_history",
+                        to="products.product",
+                        verbose_name="Produit",
+                    ),
+                ),
+                (
+                    "variant",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="price_history",
+                        to="products.productvariant",
+                        verbose_name="Variante",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Historique de prix",
+                "verbose_name_plural": "Historique des prix",
+                "ordering": ["-recorded_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["product", "variant", "recorded_at"],
+                        name="products_pr_product_1d8049_idx",
+                    ),
+                    models.Index(
+                        fields=["resolution", "recorded_at"],
+                        name="products_pr_resolut_3e55c4_idx",
+                    ),
+                ],
+            },
+        ),
+    ]
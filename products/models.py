@@ -10,6 +10,8 @@ from django.utils.text import slugify
 from django.utils.translation import gettext_lazy as _
 from django_ckeditor_5.fields import CKEditor5Field
 
+from .price_history import CATALOGUE_PRICE_FIELDS
+
 User = get_user_model()
 
 
@@ -209,6 +211,24 @@ class Product(models.Model):
         verbose_name=_("Prix de comparaison"),
     )
 
+    # Prix effectif matérialisé (remises et promotions incluses), voir products.pricing
+    effective_price = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name=_("Prix effectif"),
+    )
+
+    effective_price_valid_until = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=True,
+        verbose_name=_("Prix effectif valide jusqu'au"),
+    )
+
     stock = models.PositiveIntegerField(default=0, verbose_name=_("Stock"))
 
     min_stock = models.PositiveIntegerField(default=5, verbose_name=_("Stock minimum"))
@@ -244,6 +264,9 @@ class Product(models.Model):
         default=0, verbose_name=_("Nombre d'avis")
     )
 
+    # Texte de recherche normalisé (nom, SKU, vendeur)
+    search_text = models.TextField(blank=True, default="", editable=False)
+
     # Dates
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -265,11 +288,24 @@ class Product(models.Model):
             models.Index(fields=["status", "is_featured"]),
             models.Index(fields=["category", "status"]),
             models.Index(fields=["vendor", "status"]),
+            models.Index(fields=["status", "effective_price"]),
         ]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Prix catalogue chargés : l'historique des prix les compare aux prix
+        # sauvegardés sans relire la ligne (products.signals)
+        loaded = instance.__dict__
+        if all(field in loaded for field in CATALOGUE_PRICE_FIELDS):
+            instance._loaded_catalogue_prices = {
+                field: loaded[field] for field in CATALOGUE_PRICE_FIELDS
+            }
+        return instance
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
@@ -351,18 +387,36 @@ class Product(models.Model):
 
     def calculate_sale_price(self):
         """Calcule le prix de vente avec remise"""
-        from decimal import Decimal
-
-        if self.is_currently_on_sale() and self.original_price:
-            return Decimal(str(self.price))
-        return Decimal(str(self.price))
+        return self.get_display_price()
 
     def get_display_price(self):
-        """Retourne le prix avec préservation des décimales"""
+        """Retourne le prix effectif (promotions incluses) avec préservation des décimales"""
         from decimal import Decimal
 
+        # Prix matérialisé : les fenêtres échues sont recalculées par les
+        # signaux et la commande refresh_effective_prices, jamais à l'affichage
+        if self.effective_price is not None:
+            return Decimal(str(self.effective_price))
         return Decimal(str(self.price))
 
+    def shows_reduction(self):
+        """Un prix barré (original ou de comparaison) est-il affiché ?"""
+        return bool(
+            self.get_original_price()
+            or (self.original_price and self.original_price > self.price)
+        )
+
+    def status_for_stock(self, previous_stock):
+        """
+        Statut après un passage du stock de ``previous_stock`` à ``stock`` :
+        archivé à la rupture, republié au réassort d'un produit archivé
+        """
+        if self.stock == 0 and previous_stock > 0:
+            return "archived"
+        if self.stock > 0 and previous_stock == 0 and self.status == "archived":
+            return "published"
+        return self.status
+
     def is_in_stock(self):
         """Vérifie si le produit est en stock"""
         return self.stock > 0
@@ -465,6 +519,23 @@ class ProductVariant(models.Model):
         verbose_name=_("Prix"),
     )
 
+    effective_price = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name=_("Prix effectif"),
+    )
+
+    effective_price_valid_until = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=True,
+        verbose_name=_("Prix effectif valide jusqu'au"),
+    )
+
     stock = models.PositiveIntegerField(default=0, verbose_name=_("Stock"))
 
     is_active = models.BooleanField(default=True, verbose_name=_("Active"))
@@ -486,9 +557,11 @@ class ProductVariant(models.Model):
         super().save(*args, **kwargs)
 
     def get_display_price(self):
-        """Retourne le prix avec préservation des décimales"""
+        """Retourne le prix effectif (promotions incluses) avec préservation des décimales"""
         from decimal import Decimal
 
+        if self.effective_price is not None:
+            return Decimal(str(self.effective_price))
         return Decimal(str(self.price))
 
 
@@ -595,6 +668,158 @@ class ProductViewHistory(models.Model):
         return f"Visiteur a vu {self.product.name}"
 
 
+class ProductImportJob(models.Model):
+    """
+    Import en masse de produits (CSV/XLSX), traité en arrière-plan par la
+    commande ``process_product_imports`` (voir products.importer)
+    """
+
+    STATUS_CHOICES = [
+        ("pending", "En attente"),
+        ("processing", "En cours"),
+        ("completed", "Terminé"),
+        ("failed", "Échoué"),
+    ]
+
+    vendor = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="product_imports",
+        verbose_name=_("Vendeur"),
+    )
+
+    file = models.FileField(upload_to="imports/products/", verbose_name=_("Fichier"))
+
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default="pending",
+        db_index=True,
+        verbose_name=_("Statut"),
+    )
+
+    # Progression (mise à jour après chaque lot)
+    processed_rows = models.PositiveIntegerField(
+        default=0, verbose_name=_("Lignes traitées")
+    )
+    created_count = models.PositiveIntegerField(
+        default=0, verbose_name=_("Produits créés")
+    )
+    variant_count = models.PositiveIntegerField(
+        default=0, verbose_name=_("Variantes créées")
+    )
+    error_count = models.PositiveIntegerField(
+        default=0, verbose_name=_("Lignes en erreur")
+    )
+
+    # Rapport des lignes en erreur : [{"row", "sku", "message"}, ...]
+    errors = models.JSONField(default=list, blank=True, verbose_name=_("Erreurs"))
+    error_message = models.TextField(blank=True, verbose_name=_("Message d'erreur"))
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        verbose_name = _("Import de produits")
+        verbose_name_plural = _("Imports de produits")
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return (
+            f"Import #{self.pk} ({self.vendor.username}) - {self.get_status_display()}"
+        )
+
+
+class PriceHistory(models.Model):
+    """
+    Historique des prix (lignes ajoutées, jamais modifiées), voir
+    products.price_history. Les lignes anciennes sont regroupées par jour puis
+    par semaine par la commande ``downsample_price_history``.
+    """
+
+    RESOLUTION_CHOICES = [
+        ("change", "Changement"),
+        ("day", "Jour"),
+        ("week", "Semaine"),
+    ]
+
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name="price_history",
+        verbose_name=_("Produit"),
+    )
+
+    variant = models.ForeignKey(
+        ProductVariant,
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        related_name="price_history",
+        verbose_name=_("Variante"),
+    )
+
+    # Prix après le changement (pour une ligne regroupée : prix catalogue de
+    # fin de période et prix effectif le plus bas de la période)
+    price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name=_("Prix"))
+    original_price = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        blank=True,
+        null=True,
+        verbose_name=_("Prix original"),
+    )
+    compare_price = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        blank=True,
+        null=True,
+        verbose_name=_("Prix de comparaison"),
+    )
+    effective_price = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        blank=True,
+        null=True,
+        verbose_name=_("Prix effectif"),
+    )
+
+    # Prix effectif en vigueur avant le changement (pour une ligne regroupée :
+    # celui d'avant la période) ; le prix le plus bas d'une fenêtre se lit
+    # ainsi sur ses seules lignes
+    previous_effective_price = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        blank=True,
+        null=True,
+        verbose_name=_("Prix effectif précédent"),
+    )
+
+    resolution = models.CharField(
+        max_length=10,
+        choices=RESOLUTION_CHOICES,
+        default="change",
+        verbose_name=_("Résolution"),
+    )
+
+    recorded_at = models.DateTimeField(verbose_name=_("Enregistré le"))
+
+    class Meta:
+        verbose_name = _("Historique de prix")
+        verbose_name_plural = _("Historique des prix")
+        ordering = ["-recorded_at"]
+        indexes = [
+            models.Index(fields=["product", "variant", "recorded_at"]),
+            models.Index(fields=["resolution", "recorded_at"]),
+        ]
+
+    def __str__(self):
+        return (
+            f"{self.product_id} : {self.effective_price} ({self.recorded_at:%Y-%m-%d})"
+        )
+
+
 # Signaux pour gérer la rupture de stock automatiquement
 
 
@@ -604,18 +829,7 @@ def check_stock_before_save(sender, instance, **kwargs):
     if instance.pk:  # Si c'est une mise à jour (pas une création)
         try:
             old_instance = sender.objects.get(pk=instance.pk)
-
-            # Si le stock passe à 0, mettre le produit en archive
-            if instance.stock == 0 and old_instance.stock > 0:
-                instance.status = "archived"
-
-            # Si le stock repasse au-dessus de 0, remettre le produit en publié
-            if (
-                instance.stock > 0
-                and old_instance.stock == 0
-                and instance.status == "archived"
-            ):
-                instance.status = "published"
+            instance.status = instance.status_for_stock(old_instance.stock)
         except sender.DoesNotExist:
             pass  # Produit n'existe pas encore
 
@@ -0,0 +1,262 @@
+"""
+Historique des prix des produits et des variantes
+
+Chaque changement de prix ajoute une ligne ``PriceHistory`` (jamais modifiée)
+avec les prix après le changement et le prix effectif d'avant :
+- les changements de prix effectif sont enregistrés par le moteur de prix
+  (products.pricing), y compris lors des recalculs en masse ;
+- les changements de prix catalogue sans effet sur le prix effectif (prix
+  original, prix de comparaison...) sont détectés au pre_save (signaux).
+
+Le prix le plus bas à afficher lors d'une réduction de prix est le minimum
+des prix en vigueur pendant les 30 jours (par défaut) précédant le début de
+la réduction, prix réduit exclu : une requête groupée sur l'index (produit,
+variante, date) pour toute une page de produits.
+
+Les lignes anciennes sont regroupées par la commande
+``downsample_price_history`` : par jour au-delà de ``PRICE_HISTORY_RAW_DAYS``
+jours, par semaine au-delà de ``PRICE_HISTORY_DAILY_DAYS`` jours.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Min, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+CATALOGUE_PRICE_FIELDS = ("price", "original_price", "compare_price")
+
+
+def _decimal(value):
+    return None if value is None else Decimal(str(value))
+
+
+class PriceHistoryService:
+    """
+    Enregistrement et lecture de l'historique des prix
+    """
+
+    BATCH_SIZE = 500
+    LOWEST_PRICE_DAYS = 30
+
+    # Enregistrement
+
+    @staticmethod
+    def entry(obj, previous_effective_price, now=None):
+        """Ligne d'historique (non enregistrée) d'un produit ou d'une variante"""
+        from .models import PriceHistory, ProductVariant
+
+        values = {
+            "price": obj.price,
+            "effective_price": obj.effective_price,
+            "previous_effective_price": previous_effective_price,
+            "recorded_at": now or timezone.now(),
+        }
+        if isinstance(obj, ProductVariant):
+            return PriceHistory(product_id=obj.product_id, variant_id=obj.pk, **values)
+        return PriceHistory(
+            product_id=obj.pk,
+            original_price=obj.original_price,
+            compare_price=obj.compare_price,
+            **values,
+        )
+
+    @classmethod
+    def record(cls, entries):
+        """Ajoute les lignes d'historique (une requête par lot)"""
+        from .models import PriceHistory
+
+        if entries:
+            PriceHistory.objects.bulk_create(entries, batch_size=cls.BATCH_SIZE)
+
+    @staticmethod
+    def catalogue_prices_changed(previous, product):
+        """Les prix catalogue du produit diffèrent-ils de ``previous`` ?"""
+        return any(
+            _decimal(previous[field]) != _decimal(getattr(product, field))
+            for field in CATALOGUE_PRICE_FIELDS
+        )
+
+    # Lecture
+
+    @classmethod
+    def lowest_prices(cls, products, days=None, reduced_only=False):
+        """
+        Prix effectif le plus bas des ``days`` jours précédant la réduction
+        en cours de chaque produit, prix réduit exclu, en une requête. La
+        réduction commence à la dernière baisse du prix effectif jusqu'au prix
+        courant ; sans baisse enregistrée, le résultat est None. Avec
+        ``reduced_only``, les produits sans prix barré affiché ne sont pas
+        interrogés (None). Le résultat est aussi posé sur les produits
+        (``lowest_recent_price``).
+        """
+        from .models import PriceHistory, Product
+
+        products = list(products)
+        result = {product.pk: None for product in products}
+        product_ids = [
+            product.pk
+            for product in products
+            if not reduced_only or product.shows_reduction()
+        ]
+        if product_ids:
+            window = timedelta(days=days or cls.LOWEST_PRICE_DAYS)
+            reduced_at = (
+                PriceHistory.objects.filter(
+                    product_id=OuterRef("pk"),
+                    variant__isnull=True,
+                    effective_price=OuterRef("current_price"),
+                    previous_effective_price__gt=F("effective_price"),
+                )
+                .order_by("-recorded_at", "-pk")
+                .values("recorded_at")[:1]
+            )
+            history = Q(price_history__variant__isnull=True)
+            rows = (
+                Product.objects.filter(pk__in=product_ids)
+                .annotate(current_price=Coalesce("effective_price", "price"))
+                .annotate(reduced_at=Subquery(reduced_at))
+                .values("pk")
+                .annotate(
+                    # Prix fixés dans la fenêtre, avant le début de la réduction
+                    low=Min(
+                        "price_history__effective_price",
+                        filter=history
+                        & Q(
+                            price_history__recorded_at__gte=F("reduced_at") - window,
+                            price_history__recorded_at__lt=F("reduced_at"),
+                        ),
+                    ),
+                    # Prix remplacés dans la fenêtre, dont celui d'avant la
+                    # réduction : ils étaient encore en vigueur
+                    previous_low=Min(
+                        "price_history__previous_effective_price",
+                        filter=history
+                        & Q(
+                            price_history__recorded_at__gt=F("reduced_at") - window,
+                            price_history__recorded_at__lte=F("reduced_at"),
+                        ),
+                    ),
+                )
+                .values_list("pk", "low", "previous_low")
+            )
+            for product_id, low, previous_low in rows:
+                lows = [
+                    _decimal(value)
+                    for value in (low, previous_low)
+                    if value is not None
+                ]
+                result[product_id] = min(lows) if lows else None
+
+        for product in products:
+            product.lowest_recent_price = result[product.pk]
+        return result
+
+    @staticmethod
+    def series(product, days=90, variant=None, now=None):
+        """
+        Points de l'historique d'un produit (ou d'une de ses variantes) sur
+        ``days`` jours, du plus ancien au plus récent, pour les graphiques
+        """
+        from .models import PriceHistory
+
+        since = (now or timezone.now()) - timedelta(days=days)
+        return list(
+            PriceHistory.objects.filter(
+                product=product, variant=variant, recorded_at__gte=since
+            )
+            .order_by("recorded_at")
+            .values(
+                "recorded_at",
+                "resolution",
+                "price",
+                "original_price",
+                "compare_price",
+                "effective_price",
+            )
+        )
+
+    # Regroupement
+
+    @staticmethod
+    def period_start(moment, resolution):
+        day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+        if resolution == "week":
+            return day - timedelta(days=day.weekday())
+        return day
+
+    @classmethod
+    def downsample(cls, now=None):
+        """
+        Regroupe les lignes anciennes. Retourne, par résolution cible, le
+        nombre de lignes lues et de lignes écrites.
+        """
+        now = now or timezone.now()
+        policy = (
+            ("change", "day", getattr(settings, "PRICE_HISTORY_RAW_DAYS", 35)),
+            ("day", "week", getattr(settings, "PRICE_HISTORY_DAILY_DAYS", 365)),
+        )
+        return {
+            target: cls._downsample(source, target, now - timedelta(days=days))
+            for source, target, days in policy
+        }
+
+    @classmethod
+    def _downsample(cls, source, target, cutoff):
+        from .models import PriceHistory
+
+        history = PriceHistory.objects.filter(resolution=source, recorded_at__lt=cutoff)
+        product_ids = list(
+            history.order_by().values_list("product_id", flat=True).distinct()
+        )
+        read = written = 0
+        for start in range(0, len(product_ids), cls.BATCH_SIZE):
+            chunk = history.filter(
+                product_id__in=product_ids[start : start + cls.BATCH_SIZE]
+            )
+            with transaction.atomic():
+                groups = {}
+                for row in chunk.order_by("product_id", "variant_id", "recorded_at"):
+                    key = (
+                        row.product_id,
+                        row.variant_id,
+                        cls.period_start(row.recorded_at, target),
+                    )
+                    groups.setdefault(key, []).append(row)
+                merged = [cls._merge(key, rows, target) for key, rows in groups.items()]
+                read += sum(len(rows) for rows in groups.values())
+                chunk.delete()
+                PriceHistory.objects.bulk_create(merged, batch_size=cls.BATCH_SIZE)
+                written += len(merged)
+        return {"read": read, "written": written}
+
+    @staticmethod
+    def _merge(key, rows, resolution):
+        """
+        Ligne regroupée : prix catalogue de fin de période, prix effectif le
+        plus bas de la période, prix effectif d'avant la période
+        """
+        from .models import PriceHistory
+
+        product_id, variant_id, period = key
+        last = rows[-1]
+        return PriceHistory(
+            product_id=product_id,
+            variant_id=variant_id,
+            price=last.price,
+            original_price=last.original_price,
+            compare_price=last.compare_price,
+            effective_price=min(
+                (
+                    row.effective_price
+                    for row in rows
+                    if row.effective_price is not None
+                ),
+                default=None,
+            ),
+            previous_effective_price=rows[0].previous_effective_price,
+            resolution=resolution,
+            recorded_at=period,
+        )
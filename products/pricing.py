@@ -0,0 +1,380 @@
+"""
+Moteur de prix effectif pour les produits et leurs variantes
+
+Le prix effectif (celui réellement vu et payé par le client) est matérialisé dans
+les colonnes indexées ``effective_price`` de ``Product`` et ``ProductVariant``.
+Il tient compte de la fenêtre de vente du produit (``is_on_sale``,
+``sale_start_date``, ``sale_end_date``) et de la meilleure ``Promotion`` active.
+``effective_price_valid_until`` mémorise la prochaine borne de fenêtre à laquelle
+le prix doit être recalculé.
+"""
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Min, Q
+from django.utils import timezone
+
+CENT = Decimal("0.01")
+HUNDRED = Decimal("100")
+
+
+class PriceEngine:
+    """
+    Service de calcul et de matérialisation des prix effectifs
+    """
+
+    BATCH_SIZE = 500
+
+    # Prochaine borne de fenêtre connue, pour éviter toute requête tant qu'elle
+    # n'est pas atteinte
+    NEXT_BOUNDARY_CACHE_KEY = "products:effective_price:next_boundary"
+    NEXT_BOUNDARY_CACHE_TIMEOUT = 300
+
+    PRODUCT_PRICE_FIELDS = {
+        "price",
+        "original_price",
+        "is_on_sale",
+        "sale_start_date",
+        "sale_end_date",
+        "category",
+        "category_id",
+    }
+
+    @staticmethod
+    def apply_discount(price, percentage):
+        """
+        Applique un pourcentage de remise à un prix, arrondi au centime
+        """
+        price = Decimal(str(price))
+        if not percentage:
+            return price.quantize(CENT, rounding=ROUND_HALF_UP)
+        discounted = price * (HUNDRED - Decimal(str(percentage))) / HUNDRED
+        return discounted.quantize(CENT, rounding=ROUND_HALF_UP)
+
+    @staticmethod
+    def load_promotions(now=None):
+        """
+        Charge les promotions actives ou à venir, indexées par produit et par
+        catégorie (trois requêtes au total, quel que soit le nombre de catégories)
+        """
+        from promotions.models import Promotion
+
+        now = now or timezone.now()
+        promotions = {
+            promotion.pk: promotion
+            for promotion in Promotion.objects.filter(
+                is_active=True, valid_until__gte=now
+            ).only("id", "discount_percentage", "valid_from", "valid_until")
+        }
+
+        by_product = {}
+        by_category = {}
+        if promotions:
+            product_links = Promotion.applicable_products.through.objects.filter(
+                promotion_id__in=promotions.keys()
+            ).values_list("promotion_id", "product_id")
+            for promotion_id, product_id in product_links:
+                by_product.setdefault(product_id, []).append(promotions[promotion_id])
+
+            category_links = Promotion.applicable_categories.through.objects.filter(
+                promotion_id__in=promotions.keys(), category__is_active=True
+            ).values_list("promotion_id", "category_id")
+            for promotion_id, category_id in category_links:
+                by_category.setdefault(category_id, []).append(promotions[promotion_id])
+
+        return by_product, by_category
+
+    @staticmethod
+    def best_promotion(promotions, now):
+        """
+        Retourne (pourcentage, prochaine borne) pour une liste de promotions
+        """
+        percentage = Decimal("0")
+        boundaries = []
+        for promotion in promotions:
+            if promotion.valid_from > now:
+                boundaries.append(promotion.valid_from)
+            elif promotion.valid_until >= now:
+                percentage = max(percentage, promotion.discount_percentage)
+                boundaries.append(promotion.valid_until)
+        return percentage, min(boundaries, default=None)
+
+    @classmethod
+    def compute_product_price(cls, product, promotions, now):
+        """
+        Calcule (prix effectif, fin de validité) d'un produit
+        """
+        base_price = Decimal(str(product.price))
+        boundaries = []
+
+        # Hors de sa fenêtre de vente, un produit soldé revient à son prix original
+        if (
+            product.is_on_sale
+            and product.original_price
+            and Decimal(str(product.original_price)) > base_price
+        ):
+            in_window = True
+            if product.sale_start_date:
+                if now < product.sale_start_date:
+                    in_window = False
+                    boundaries.append(product.sale_start_date)
+            if product.sale_end_date:
+                if now > product.sale_end_date:
+                    in_window = False
+                elif in_window:
+                    boundaries.append(product.sale_end_date)
+            if not in_window:
+                base_price = Decimal(str(product.original_price))
+
+        percentage, promotion_boundary = cls.best_promotion(promotions, now)
+        if promotion_boundary:
+            boundaries.append(promotion_boundary)
+
+        return cls.apply_discount(base_price, percentage), min(boundaries, default=None)
+
+    @classmethod
+    def compute_variant_price(cls, variant, promotions, now):
+        """
+        Calcule (prix effectif, fin de validité) d'une variante
+        """
+        percentage, boundary = cls.best_promotion(promotions, now)
+        return cls.apply_discount(variant.price, percentage), boundary
+
+    @classmethod
+    def promotions_for_product(cls, product, now=None):
+        """
+        Retourne les promotions actives ou à venir applicables à un produit
+        """
+        from promotions.models import Promotion
+
+        now = now or timezone.now()
+        return list(
+            Promotion.objects.filter(is_active=True, valid_until__gte=now)
+            .filter(
+                Q(applicable_products=product.pk)
+                | Q(
+                    applicable_categories=product.category_id,
+                    applicable_categories__is_active=True,
+                )
+            )
+            .distinct()
+            .only("id", "discount_percentage", "valid_from", "valid_until")
+        )
+
+    @classmethod
+    def refresh_products(cls, queryset=None, now=None):
+        """
+        Recalcule et enregistre les prix effectifs des produits du queryset
+        (tous les produits par défaut) et de leurs variantes.
+        Retourne le nombre de lignes modifiées.
+        """
+        from .facets import FacetEngine
+        from .models import Product, ProductVariant
+        from .price_history import PriceHistoryService
+
+        now = now or timezone.now()
+        if queryset is None:
+            queryset = Product.objects.all()
+
+        by_product, by_category = cls.load_promotions(now)
+        product_ids = list(queryset.order_by().values_list("pk", flat=True))
+        updated = 0
+        next_boundary = None
+
+        for start in range(0, len(product_ids), cls.BATCH_SIZE):
+            chunk = product_ids[start : start + cls.BATCH_SIZE]
+            changed_products = []
+            history = []
+            product_promotions = {}
+
+            products = Product.objects.filter(pk__in=chunk).only(
+                "id",
+                "category_id",
+                "price",
+                "original_price",
+                "compare_price",
+                "is_on_sale",
+                "sale_start_date",
+                "sale_end_date",
+                "effective_price",
+                "effective_price_valid_until",
+            )
+            for product in products:
+                promotions = by_product.get(product.pk, []) + by_category.get(
+                    product.category_id, []
+                )
+                product_promotions[product.pk] = promotions
+                price, valid_until = cls.compute_product_price(product, promotions, now)
+                if valid_until and (
+                    next_boundary is None or valid_until < next_boundary
+                ):
+                    next_boundary = valid_until
+                if (
+                    product.effective_price != price
+                    or product.effective_price_valid_until != valid_until
+                ):
+                    previous = product.effective_price
+                    product.effective_price = price
+                    product.effective_price_valid_until = valid_until
+                    changed_products.append(product)
+                    if previous != price:
+                        history.append(
+                            PriceHistoryService.entry(product, previous, now)
+                        )
+
+            changed_variants = []
+            variants = ProductVariant.objects.filter(product_id__in=chunk).only(
+                "id",
+                "product_id",
+                "price",
+                "effective_price",
+                "effective_price_valid_until",
+            )
+            for variant in variants:
+                price, valid_until = cls.compute_variant_price(
+                    variant, product_promotions.get(variant.product_id, []), now
+                )
+                if (
+                    variant.effective_price != price
+                    or variant.effective_price_valid_until != valid_until
+                ):
+                    previous = variant.effective_price
+                    variant.effective_price = price
+                    variant.effective_price_valid_until = valid_until
+                    changed_variants.append(variant)
+                    if previous != price:
+                        history.append(
+                            PriceHistoryService.entry(variant, previous, now)
+                        )
+
+            with transaction.atomic():
+                fields = ["effective_price", "effective_price_valid_until"]
+                if changed_products:
+                    Product.objects.bulk_update(changed_products, fields)
+                    # bulk_update n'envoie pas post_save : tranches de prix
+                    FacetEngine.products_changed(
+                        [product.pk for product in changed_products],
+                        {product.category_id for product in changed_products},
+                    )
+                if changed_variants:
+                    ProductVariant.objects.bulk_update(changed_variants, fields)
+                PriceHistoryService.record(history)
+            updated += len(changed_products) + len(changed_variants)
+
+        if next_boundary:
+            cls._lower_next_boundary(next_boundary)
+        return updated
+
+    @classmethod
+    def refresh_product(cls, product, now=None):
+        """
+        Recalcule le prix effectif d'un seul produit (et de ses variantes)
+        sans déclencher les signaux de sauvegarde
+        """
+        from .models import Product, ProductVariant
+        from .price_history import PriceHistoryService
+
+        now = now or timezone.now()
+        promotions = cls.promotions_for_product(product, now)
+        price, valid_until = cls.compute_product_price(product, promotions, now)
+
+        history = []
+        if (
+            product.effective_price != price
+            or product.effective_price_valid_until != valid_until
+        ):
+            Product.objects.filter(pk=product.pk).update(
+                effective_price=price, effective_price_valid_until=valid_until
+            )
+            previous = product.effective_price
+            product.effective_price = price
+            product.effective_price_valid_until = valid_until
+            if previous != price:
+                history.append(PriceHistoryService.entry(product, previous, now))
+                # Évite une seconde ligne pour la même sauvegarde (signaux)
+                product._price_history_recorded = True
+
+        changed_variants = []
+        for variant in ProductVariant.objects.filter(product_id=product.pk):
+            variant_price, variant_until = cls.compute_variant_price(
+                variant, promotions, now
+            )
+            if (
+                variant.effective_price != variant_price
+                or variant.effective_price_valid_until != variant_until
+            ):
+                previous = variant.effective_price
+                variant.effective_price = variant_price
+                variant.effective_price_valid_until = variant_until
+                changed_variants.append(variant)
+                if previous != variant_price:
+                    history.append(PriceHistoryService.entry(variant, previous, now))
+        if changed_variants:
+            ProductVariant.objects.bulk_update(
+                changed_variants, ["effective_price", "effective_price_valid_until"]
+            )
+        PriceHistoryService.record(history)
+
+        if valid_until:
+            cls._lower_next_boundary(valid_until)
+        return price
+
+    @classmethod
+    def refresh_expired(cls, now=None):
+        """
+        Recalcule les prix dont la fenêtre de validité est échue (ou jamais
+        calculés). Ne fait aucune requête tant que la prochaine borne connue
+        n'est pas atteinte.
+        """
+        from .models import Product, ProductVariant
+
+        now = now or timezone.now()
+        next_boundary = cache.get(cls.NEXT_BOUNDARY_CACHE_KEY)
+        if next_boundary is not None and next_boundary > now:
+            return 0
+
+        expired = Q(effective_price__isnull=True) | Q(
+            effective_price_valid_until__lte=now
+        )
+        product_ids = set(Product.objects.filter(expired).values_list("pk", flat=True))
+        product_ids.update(
+            ProductVariant.objects.filter(expired).values_list("product_id", flat=True)
+        )
+
+        updated = 0
+        if product_ids:
+            updated = cls.refresh_products(
+                Product.objects.filter(pk__in=product_ids), now=now
+            )
+
+        boundaries = [
+            Product.objects.aggregate(boundary=Min("effective_price_valid_until"))[
+                "boundary"
+            ],
+            ProductVariant.objects.aggregate(
+                boundary=Min("effective_price_valid_until")
+            )["boundary"],
+        ]
+        boundaries = [
+            boundary for boundary in boundaries if boundary and boundary > now
+        ]
+        default_boundary = now + timedelta(seconds=cls.NEXT_BOUNDARY_CACHE_TIMEOUT)
+        cache.set(
+            cls.NEXT_BOUNDARY_CACHE_KEY,
+            min(boundaries, default=default_boundary),
+            cls.NEXT_BOUNDARY_CACHE_TIMEOUT,
+        )
+        return updated
+
+    @classmethod
+    def _lower_next_boundary(cls, boundary):
+        """
+        Avance la prochaine borne en cache si une fenêtre plus proche apparaît
+        """
+        current = cache.get(cls.NEXT_BOUNDARY_CACHE_KEY)
+        if current is not None and boundary < current:
+            cache.set(
+                cls.NEXT_BOUNDARY_CACHE_KEY, boundary, cls.NEXT_BOUNDARY_CACHE_TIMEOUT
+            )
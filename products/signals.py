@@ -0,0 +1,203 @@
+"""
+Signaux Django pour l'application products
+"""
+from django.db.models import Q
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from promotions.models import Promotion
+
+from .facets import FacetEngine
+from .models import Product, ProductVariant
+from .price_history import CATALOGUE_PRICE_FIELDS, PriceHistoryService
+from .pricing import PriceEngine
+
+# Champs sans effet sur les facettes (compteurs)
+FACET_IGNORED_FIELDS = {"views", "sales_count", "rating", "review_count", "updated_at"}
+
+
+def _products_for_promotion(promotion):
+    """Produits concernés par une promotion (directement ou via leur catégorie)"""
+    return Product.objects.filter(
+        Q(promotions=promotion) | Q(category__promotions=promotion)
+    ).distinct()
+
+
+@receiver(post_save, sender=Product)
+def refresh_product_effective_price(sender, instance, raw=False, **kwargs):
+    """
+    Recalcule le prix effectif quand un champ de prix du produit change
+    """
+    if raw:
+        return
+    update_fields = kwargs.get("update_fields")
+    if update_fields and not set(update_fields) & PriceEngine.PRODUCT_PRICE_FIELDS:
+        return
+    PriceEngine.refresh_product(instance)
+
+
+@receiver(pre_save, sender=Product)
+def remember_catalogue_prices(
+    sender, instance, raw=False, update_fields=None, **kwargs
+):
+    """
+    Mémorise les prix catalogue avant sauvegarde pour l'historique des prix
+    """
+    instance.__dict__.pop("_price_history_recorded", None)
+    instance.__dict__.pop("_catalogue_prices", None)
+    if raw or not instance.pk:
+        return
+    if update_fields and not set(update_fields) & set(CATALOGUE_PRICE_FIELDS):
+        return
+    # Prix chargés ou sauvegardés en dernier (Product.from_db), sinon relus
+    previous = instance.__dict__.get("_loaded_catalogue_prices")
+    if previous is None:
+        previous = (
+            Product.objects.filter(pk=instance.pk)
+            .values(*CATALOGUE_PRICE_FIELDS)
+            .first()
+        )
+    instance._catalogue_prices = previous
+
+
+@receiver(post_save, sender=Product)
+def record_catalogue_price_change(sender, instance, raw=False, **kwargs):
+    """
+    Historise les changements de prix catalogue sans effet sur le prix
+    effectif (ceux qui le modifient sont historisés par le moteur de prix)
+    """
+    previous = instance.__dict__.pop("_catalogue_prices", None)
+    recorded = instance.__dict__.pop("_price_history_recorded", False)
+    if raw:
+        return
+    # Les prix sauvegardés deviennent la référence de la sauvegarde suivante
+    update_fields = kwargs.get("update_fields")
+    saved = instance.__dict__.get("_loaded_catalogue_prices")
+    if not update_fields:
+        saved = instance._loaded_catalogue_prices = {}
+    if saved is not None:
+        for field in CATALOGUE_PRICE_FIELDS:
+            if not update_fields or field in update_fields:
+                saved[field] = getattr(instance, field)
+    if recorded or previous is None:
+        return
+    if PriceHistoryService.catalogue_prices_changed(previous, instance):
+        PriceHistoryService.record(
+            [PriceHistoryService.entry(instance, instance.effective_price)]
+        )
+
+
+@receiver(post_save, sender=ProductVariant)
+def refresh_variant_effective_price(sender, instance, raw=False, **kwargs):
+    """
+    Recalcule le prix effectif des variantes quand le prix d'une variante change
+    """
+    if raw:
+        return
+    update_fields = kwargs.get("update_fields")
+    if update_fields and "price" not in update_fields:
+        return
+    PriceEngine.refresh_product(instance.product)
+
+
+@receiver(post_save, sender=Promotion)
+def refresh_prices_on_promotion_save(sender, instance, raw=False, **kwargs):
+    """
+    Recalcule les prix des produits couverts par une promotion modifiée
+    """
+    if raw:
+        return
+    PriceEngine.refresh_products(_products_for_promotion(instance))
+
+
+@receiver(pre_delete, sender=Promotion)
+def collect_products_before_promotion_delete(sender, instance, **kwargs):
+    """
+    Mémorise les produits couverts avant que les liaisons ne soient supprimées
+    """
+    instance._affected_product_ids = list(
+        _products_for_promotion(instance).values_list("pk", flat=True)
+    )
+
+
+@receiver(post_delete, sender=Promotion)
+def refresh_prices_on_promotion_delete(sender, instance, **kwargs):
+    """
+    Recalcule les prix des produits qui bénéficiaient d'une promotion supprimée
+    """
+    product_ids = getattr(instance, "_affected_product_ids", None)
+    if product_ids:
+        PriceEngine.refresh_products(Product.objects.filter(pk__in=product_ids))
+
+
+@receiver(m2m_changed, sender=Promotion.applicable_products.through)
+@receiver(m2m_changed, sender=Promotion.applicable_categories.through)
+def refresh_prices_on_promotion_targets_change(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    """
+    Recalcule les prix quand les produits ou catégories d'une promotion changent
+    """
+    if action == "pre_clear":
+        if not reverse:
+            instance._affected_product_ids = list(
+                _products_for_promotion(instance).values_list("pk", flat=True)
+            )
+        return
+
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    by_category = sender is Promotion.applicable_categories.through
+    if action == "post_clear":
+        if reverse:
+            queryset = (
+                Product.objects.filter(category=instance)
+                if by_category
+                else Product.objects.filter(pk=instance.pk)
+            )
+        else:
+            queryset = Product.objects.filter(
+                pk__in=getattr(instance, "_affected_product_ids", [])
+            )
+    elif reverse:
+        # instance est un produit ou une catégorie, pk_set des promotions
+        queryset = (
+            Product.objects.filter(category=instance)
+            if by_category
+            else Product.objects.filter(pk=instance.pk)
+        )
+    elif by_category:
+        queryset = Product.objects.filter(category_id__in=pk_set or [])
+    else:
+        queryset = Product.objects.filter(pk__in=pk_set or [])
+
+    PriceEngine.refresh_products(queryset)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def reindex_product_facets(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Réindexe les facettes du produit après le commit de la modification"""
+    if raw or (update_fields and set(update_fields) <= FACET_IGNORED_FIELDS):
+        return
+    FacetEngine.products_changed([instance.pk], [instance.category_id])
+
+
+@receiver(m2m_changed, sender=Product.tags.through)
+def reindex_product_facets_on_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    """Réindexe les facettes des produits dont les étiquettes changent"""
+    if reverse:
+        # Depuis l'étiquette : pk_set contient les produits (vide pour clear)
+        if action == "pre_clear":
+            FacetEngine.products_changed(instance.products.values_list("pk", flat=True))
+        elif action in ("post_add", "post_remove"):
+            FacetEngine.products_changed(pk_set)
+    elif action in ("post_add", "post_remove", "post_clear"):
+        FacetEngine.products_changed([instance.pk], [instance.category_id])
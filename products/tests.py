@@ -1,5 +1,6 @@
 import os
 import tempfile
+from io import StringIO
 
 import pytest
 from django.contrib.auth import get_user_model
@@ -201,6 +202,108 @@ class ProductModelTest(TestCase):
         self.assertEqual(str(product), "Test Product")
 
 
+class PriceEngineTest(TestCase):
+    """Tests pour le moteur de prix effectif"""
+
+    def setUp(self):
+        from datetime import timedelta
+
+        from django.core.cache import cache
+        from django.utils import timezone
+
+        cache.clear()
+        self.now = timezone.now()
+        self.day = timedelta(days=1)
+        self.user = User.objects.create_user(
+            username="pricevendor",
+            email="price@example.com",
+            password="testpass123",
+            user_type="vendeur",
+        )
+        self.category = Category.objects.create(name="Promo")
+        self.other_category = Category.objects.create(name="Sans promo")
+        self.cheap = Product.objects.create(
+            name="Produit remisé",
+            description="Test",
+            vendor=self.user,
+            category=self.category,
+            price=100,
+            stock=5,
+            status="published",
+        )
+        self.regular = Product.objects.create(
+            name="Produit normal",
+            description="Test",
+            vendor=self.user,
+            category=self.other_category,
+            price=80,
+            stock=5,
+            status="published",
+        )
+
+    def create_promotion(self, **kwargs):
+        from promotions.models import Promotion
+
+        data = {
+            "name": "Soldes",
+            "description": "Test",
+            "promotion_type": "seasonal",
+            "discount_percentage": 50,
+            "valid_from": self.now - self.day,
+            "valid_until": self.now + self.day,
+            "created_by": self.user,
+        }
+        data.update(kwargs)
+        return Promotion.objects.create(**data)
+
+    def test_category_promotion_materializes_effective_price(self):
+        """Une promotion de catégorie met à jour le prix effectif"""
+        promotion = self.create_promotion()
+        promotion.applicable_categories.add(self.category)
+
+        self.cheap.refresh_from_db()
+        self.assertEqual(self.cheap.effective_price, 50)
+        self.assertEqual(self.cheap.effective_price_valid_until, promotion.valid_until)
+        self.assertEqual(self.cheap.get_display_price(), 50)
+        self.assertEqual(promotion.get_applicable_products(), [self.cheap])
+
+        promotion.delete()
+        self.cheap.refresh_from_db()
+        self.assertEqual(self.cheap.effective_price, 100)
+
+    def test_listing_sorts_and_filters_on_effective_price(self):
+        """Le tri et le filtre par prix utilisent le prix effectif"""
+        from django.test import RequestFactory
+
+        from .views import ProductListView
+
+        self.create_promotion().applicable_products.add(self.cheap)
+
+        view = ProductListView()
+        view.request = RequestFactory().get(
+            "/products/", {"sort_by": "price", "max_price": "60"}
+        )
+        self.assertEqual(list(view.get_queryset()), [self.cheap])
+
+        view.request = RequestFactory().get("/products/", {"sort_by": "price"})
+        self.assertEqual(list(view.get_queryset()), [self.cheap, self.regular])
+
+    def test_expired_sale_window_is_recomputed(self):
+        """À la fin de la fenêtre de vente, le prix original est rétabli"""
+        from .pricing import PriceEngine
+
+        self.cheap.original_price = 150
+        self.cheap.is_on_sale = True
+        self.cheap.sale_end_date = self.now + self.day
+        self.cheap.save()
+        self.cheap.refresh_from_db()
+        self.assertEqual(self.cheap.effective_price, 100)
+
+        PriceEngine.refresh_expired(now=self.now + 2 * self.day)
+        self.cheap.refresh_from_db()
+        self.assertEqual(self.cheap.effective_price, 150)
+
+
 class ProductFormTest(TestCase):
     """Tests pour les formulaires de produits"""
 
@@ -558,3 +661,513 @@ class ProductIntegrationTest(TestCase):
         products = Product.objects.filter(price__gte=500)
         self.assertEqual(products.count(), 1)
         self.assertEqual(products.first(), product1)
+
+
+class ProductFeedTest(TestCase):
+    """Tests pour les flux produits et les sitemaps"""
+
+    def setUp(self):
+        import shutil
+
+        from django.test import override_settings
+
+        from i18n.models import Language, ProductTranslation
+
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        settings_override = override_settings(
+            FEEDS_ROOT=self.root, SITE_URL="https://shop.example.com"
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        vendor = User.objects.create_user(
+            username="feedvendor", email="feed@example.com", password="x"
+        )
+        category = Category.objects.create(name="Maison")
+        self.products = [
+            Product.objects.create(
+                name=f"Lampe {index}",
+                description=f"<p>Lampe numéro {index}</p>",
+                vendor=vendor,
+                category=category,
+                price=1000,
+                stock=stock,
+                status="published",
+            )
+            for index, stock in enumerate([3, 0, 7])
+        ]
+        Product.objects.create(
+            name="Brouillon",
+            description="Pas publié",
+            vendor=vendor,
+            category=category,
+            price=10,
+            status="draft",
+        )
+        Product.objects.filter(pk=self.products[0].pk).update(effective_price=800)
+        english = Language.objects.create(
+            code="en", name="English", native_name="English"
+        )
+        ProductTranslation.objects.create(
+            product=self.products[0],
+            language=english,
+            name="Lamp 0",
+            description="Lamp number 0",
+        )
+
+    def test_feeds(self):
+        import csv
+        import json
+        from xml.etree import ElementTree
+
+        from .feeds import GOOGLE_NS, FeedGenerator
+
+        written = FeedGenerator().generate()
+        self.assertEqual(len(written), 6)
+        self.assertEqual(set(written.values()), {3})
+
+        with open(os.path.join(self.root, "products-fr.csv"), encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        first = rows[0]
+        self.assertEqual(first["title"], "Lampe 0")
+        self.assertEqual(first["description"], "Lampe numéro 0")
+        self.assertEqual(first["price"], "1000.00 XOF")
+        self.assertEqual(first["sale_price"], "800.00 XOF")
+        self.assertEqual(
+            first["link"], f"https://shop.example.com/{self.products[0].slug}/"
+        )
+        self.assertEqual(rows[1]["availability"], "out of stock")
+
+        with open(os.path.join(self.root, "products-en.json"), encoding="utf-8") as f:
+            feed = json.load(f)
+        self.assertEqual(feed["language"], "en")
+        self.assertEqual(feed["items"][0]["title"], "Lamp 0")
+        self.assertEqual(feed["items"][1]["title"], "Lampe 1")
+        self.assertIn("/en/", feed["items"][0]["link"])
+
+        tree = ElementTree.parse(os.path.join(self.root, "products-en.xml"))
+        titles = [node.text for node in tree.iter(f"{{{GOOGLE_NS}}}title")]
+        self.assertEqual(titles, ["Lamp 0", "Lampe 1", "Lampe 2"])
+
+    def test_sitemaps_are_split_and_incremental(self):
+        import gzip
+
+        from django.core.management import call_command
+
+        from .feeds import SitemapGenerator
+
+        summary = SitemapGenerator(max_urls=2).generate()
+        # 3 produits → 2 fichiers, plus 1 fichier de catégories
+        self.assertEqual(len(summary["written"]), 3)
+        self.assertEqual(summary["urls"], 4)
+        with gzip.open(
+            os.path.join(self.root, summary["written"][0]), "rt", encoding="utf-8"
+        ) as f:
+            content = f.read()
+        self.assertEqual(content.count("<url>"), 2)
+        self.assertIn('hreflang="en"', content)
+
+        # Rien n'a changé : aucun fichier réécrit
+        summary = SitemapGenerator(max_urls=2).generate()
+        self.assertEqual((len(summary["written"]), len(summary["kept"])), (0, 3))
+
+        # Seule la plage du produit dépublié est réécrite
+        self.products[2].status = "archived"
+        self.products[2].save()
+        summary = SitemapGenerator(max_urls=2).generate()
+        self.assertEqual((len(summary["kept"]), len(summary["removed"])), (2, 1))
+        self.assertEqual(summary["urls"], 3)
+
+        response = self.client.get("/sitemap.xml")
+        self.assertEqual(response.status_code, 200)
+        index = b"".join(response.streaming_content).decode()
+        self.assertEqual(index.count("<sitemap>"), 2)
+
+        call_command(
+            "generate_feeds", "--format=csv", "--no-sitemaps", stdout=StringIO()
+        )
+        response = self.client.get("/feeds/products-fr.csv")
+        self.assertEqual(response.status_code, 200)
+
+
+class ProductImportTest(TestCase):
+    """Tests pour l'import en masse du catalogue"""
+
+    def setUp(self):
+        import shutil
+
+        from django.test import override_settings
+
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.vendor = User.objects.create_user(
+            username="importer", password="secret-pass", user_type="vendeur"
+        )
+        self.category = Category.objects.create(name="Cuisine")
+        Product.objects.create(
+            name="Bol",
+            description="Existant",
+            vendor=self.vendor,
+            category=self.category,
+            price=500,
+            sku="BOL-1",
+        )
+
+    def test_upload_is_processed_in_background(self):
+        from django.core.management import call_command
+
+        from .models import ProductImportJob
+
+        content = "\n".join(
+            [
+                "name;sku;price;category;stock;status;tags;images;parent_sku",
+                "Bol;;1200;cuisine;4;published;Céramique|Nouveau;a.jpg|b.jpg;",
+                "Tasse;TAS-1;800,50;Cuisine;10;;céramique;;",
+                "Tasse rouge;TAS-1;900;cuisine;1;;;;",
+                "Assiette;;300;inconnue;1;;;;",
+                "Grande;;950;;2;;;;TAS-1",
+                "Petite;;450;;2;;;;BOL-1",
+                "Moyenne;;450;;2;;;;ABSENT",
+            ]
+        )
+        self.client.login(username="importer", password="secret-pass")
+        response = self.client.post(
+            reverse("products:product_import"),
+            {"file": SimpleUploadedFile("catalogue.csv", content.encode("utf-8"))},
+        )
+        self.assertEqual(response.status_code, 202)
+        status_url = response.json()["status_url"]
+        self.assertEqual(self.client.get(status_url).json()["status"], "pending")
+
+        call_command("process_product_imports", stdout=StringIO())
+
+        status = self.client.get(status_url).json()
+        self.assertEqual(status["status"], "completed")
+        self.assertEqual(
+            (status["processed_rows"], status["created"], status["variants"]),
+            (7, 2, 2),
+        )
+        self.assertEqual(status["errors"], 3)
+
+        bowl = Product.objects.get(name="Bol", sku__startswith="SKU-")
+        self.assertEqual(bowl.slug, "bol-1")
+        self.assertEqual(bowl.main_image.name, "a.jpg")
+        self.assertEqual(list(bowl.images.values_list("image", flat=True)), ["b.jpg"])
+        self.assertIsNotNone(bowl.published_at)
+        self.assertEqual(bowl.effective_price, 1200)
+        self.assertIn("bol", bowl.search_text)
+        self.assertEqual(
+            sorted(bowl.tags.values_list("name", flat=True)), ["Céramique", "Nouveau"]
+        )
+        cup = Product.objects.get(sku="TAS-1")
+        self.assertEqual(str(cup.price), "800.50")
+        self.assertEqual(list(cup.tags.values_list("name", flat=True)), ["Céramique"])
+        self.assertEqual(cup.variants.get().name, "Grande")
+        self.assertTrue(
+            ProductVariant.objects.filter(product__sku="BOL-1", name="Petite").exists()
+        )
+
+        report = self.client.get(status["report_url"]).content.decode()
+        self.assertIn("4,TAS-1,SKU TAS-1 déjà utilisé", report)
+        self.assertIn("catégorie inconnue : inconnue", report)
+        self.assertIn("produit parent introuvable : ABSENT", report)
+        self.assertEqual(ProductImportJob.objects.get().error_count, 3)
+
+        # Page d'import : formulaire et lien vers le rapport des imports récents
+        with self.settings(
+            STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage"
+        ):
+            page = self.client.get(reverse("products:product_import"))
+        self.assertContains(page, 'id="import-form"')
+        self.assertContains(page, status["report_url"])
+
+    def test_queries_do_not_grow_with_rows(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from .importer import ProductImporter
+
+        def run(count, prefix):
+            rows = [
+                {
+                    "name": f"{prefix} {index}",
+                    "price": "10",
+                    "category": "cuisine",
+                    "tags": "lot",
+                }
+                for index in range(count)
+            ]
+            importer = ProductImporter(self.vendor)
+            with CaptureQueriesContext(connection) as queries:
+                report = importer.import_rows(rows)
+            self.assertEqual(report["created"], count)
+            return len(queries)
+
+        run(1, "Chauffe")
+        self.assertEqual(run(5, "Verre"), run(25, "Carafe"))
+
+
+class FacetEngineTest(TestCase):
+    """Tests pour les compteurs de facettes en mémoire"""
+
+    def setUp(self):
+        from .facets import FacetEngine
+
+        FacetEngine.reset()
+        self.addCleanup(FacetEngine.reset)
+        self.alice = User.objects.create_user(username="alice", password="x")
+        self.bob = User.objects.create_user(username="bob", password="x")
+        self.category = Category.objects.create(name="Jardin")
+        self.red = Tag.objects.create(name="Rouge")
+        self.blue = Tag.objects.create(name="Bleu")
+
+        def product(name, vendor, price, stock, tags, original=None):
+            item = Product.objects.create(
+                name=name,
+                description=name,
+                vendor=vendor,
+                category=self.category,
+                price=price,
+                stock=stock,
+                status="published",
+                is_on_sale=original is not None,
+                original_price=original,
+            )
+            item.tags.set(tags)
+            return item
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pot = product("Pot", self.alice, 3000, 5, [self.red])
+            self.pelle = product("Pelle", self.alice, 12000, 0, [self.red, self.blue])
+            self.seau = product("Seau", self.bob, 7000, 2, [self.blue], original=8000)
+            Product.objects.create(
+                name="Brouillon",
+                description="Brouillon",
+                vendor=self.bob,
+                category=self.category,
+                price=1,
+                status="draft",
+            )
+
+    def test_counts_intersect_filters_in_memory(self):
+        from .facets import FacetEngine
+
+        facets = FacetEngine.counts([self.category.pk], {})
+        self.assertEqual(facets["total"], 3)
+        self.assertEqual(facets["tags"], {self.red.pk: 2, self.blue.pk: 2})
+        self.assertEqual(facets["vendor"], {self.alice.pk: 2, self.bob.pk: 1})
+        self.assertEqual(facets["price"], {0: 1, 1: 1, 2: 1})
+        self.assertEqual(facets["in_stock"], {True: 2})
+        self.assertEqual(facets["on_sale"], {True: 1})
+
+        # Index en mémoire : plus aucune requête
+        with self.assertNumQueries(0):
+            facets = FacetEngine.counts(
+                [self.category.pk], {"tags": {self.red.pk}, "in_stock": {True}}
+            )
+        self.assertEqual(facets["total"], 1)
+        # Les valeurs d'une facette sont comptées sans son propre filtre
+        self.assertEqual(facets["tags"], {self.red.pk: 1, self.blue.pk: 1})
+        self.assertEqual(facets["in_stock"], {True: 1})
+        self.assertEqual(facets["vendor"], {self.alice.pk: 1})
+
+        facets = FacetEngine.counts(
+            [self.category.pk], {"max_price": 8000, "product_ids": {self.seau.pk}}
+        )
+        self.assertEqual(facets["total"], 1)
+        self.assertEqual(facets["vendor"], {self.bob.pk: 1})
+
+    def test_product_changes_update_index_incrementally(self):
+        from .facets import FacetEngine
+
+        FacetEngine.counts([self.category.pk], {})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pelle.stock = 4
+            self.pelle.save()
+            self.pot.tags.remove(self.red)
+            self.seau.status = "archived"
+            self.seau.save()
+
+        # Seuls les produits modifiés sont relus, à la lecture suivante
+        with self.assertNumQueries(2):
+            FacetEngine.counts([self.category.pk], {})
+        with self.assertNumQueries(0):
+            facets = FacetEngine.counts([self.category.pk], {})
+        self.assertEqual(facets["total"], 2)
+        self.assertEqual(facets["tags"], {self.red.pk: 1, self.blue.pk: 1})
+        self.assertEqual(facets["in_stock"], {True: 2})
+        self.assertEqual(facets["on_sale"], {})
+
+        from django.test import RequestFactory
+
+        from .views import ProductListView
+
+        view = ProductListView()
+        view.setup(
+            RequestFactory().get(
+                reverse("products:product_list"), {"vendor": self.alice.pk}
+            )
+        )
+        view.object_list = view.get_queryset()
+        context = view.get_context_data()
+        self.assertEqual(context["facets"]["total"], 2)
+        self.assertEqual(len(context["products"]), 2)
+        self.assertEqual(context["facets"]["vendors"][0]["name"], "alice")
+
+
+class PriceHistoryTest(TestCase):
+    """Tests pour l'historique des prix"""
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="historyvendor", password="x", user_type="vendeur"
+        )
+        self.category = Category.objects.create(name="Historique")
+        self.product = Product.objects.create(
+            name="Lampe",
+            description="Lampe",
+            vendor=self.user,
+            category=self.category,
+            price=100,
+            status="published",
+        )
+        self.other = Product.objects.create(
+            name="Table",
+            description="Table",
+            vendor=self.user,
+            category=self.category,
+            price=50,
+            status="published",
+        )
+
+    def test_changes_are_recorded_and_lowest_price_is_one_query(self):
+        from datetime import timedelta
+        from decimal import Decimal
+
+        from django.utils import timezone
+
+        from .models import PriceHistory
+        from .price_history import PriceHistoryService
+
+        history = PriceHistory.objects.filter(product=self.product)
+        self.assertEqual(history.count(), 1)
+
+        self.product.price = 80
+        self.product.save()
+        # Prix catalogue seul : le prix effectif ne change pas
+        self.product.compare_price = 150
+        self.product.save()
+        self.product.views = 3
+        self.product.save(update_fields=["views"])
+        self.product.price = 120
+        self.product.save()
+        # Début de la réduction en cours
+        self.product.price = 90
+        self.product.save()
+
+        rows = list(history.order_by("recorded_at", "pk"))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[1].previous_effective_price, 100)
+        self.assertEqual(rows[1].effective_price, 80)
+        self.assertEqual(rows[2].compare_price, 150)
+        self.assertEqual(rows[2].effective_price, 80)
+        self.assertEqual(rows[3].effective_price, 120)
+        self.assertEqual(rows[4].effective_price, 90)
+
+        products = list(Product.objects.filter(pk__in=[self.product.pk, self.other.pk]))
+        with self.assertNumQueries(1):
+            lowest = PriceHistoryService.lowest_prices(products)
+        # Sans baisse enregistrée, pas de prix de référence
+        self.assertEqual(lowest, {self.product.pk: 80, self.other.pk: None})
+        # Sans prix barré affiché, aucune requête
+        with self.assertNumQueries(0):
+            lowest = PriceHistoryService.lowest_prices([self.other], reduced_only=True)
+        self.assertEqual(lowest, {self.other.pk: None})
+
+        # Seuls comptent les 30 jours précédant le début de la réduction
+        start = timezone.now() - timedelta(days=20)
+        history.filter(pk=rows[4].pk).update(recorded_at=start)
+        history.exclude(pk=rows[4].pk).update(recorded_at=start - timedelta(days=40))
+        history.filter(pk=rows[3].pk).update(recorded_at=start - timedelta(days=25))
+        lowest = PriceHistoryService.lowest_prices([self.product])
+        # 80 a été remplacé dans la fenêtre, le prix courant (90) est exclu
+        self.assertEqual(lowest[self.product.pk], 80)
+        history.filter(pk=rows[3].pk).update(recorded_at=start - timedelta(days=40))
+        # Reste le prix d'avant la réduction
+        self.assertEqual(
+            PriceHistoryService.lowest_prices([self.product])[self.product.pk], 120
+        )
+
+        # Série pour les graphiques du tableau de bord vendeur
+        client = Client()
+        url = reverse("dashboard:vendor_price_history", args=[self.product.pk])
+        client.force_login(self.user)
+        data = client.get(url, {"days": 30}).json()
+        self.assertEqual(len(data["series"]), 1)
+        self.assertEqual(Decimal(data["lowest_30_days"]), 120)
+        client.force_login(User.objects.create_user(username="intrus", password="x"))
+        self.assertEqual(client.get(url).status_code, 403)
+
+    def test_downsample_merges_old_rows_by_day_then_week(self):
+        from datetime import datetime, timedelta
+        from datetime import timezone as dt_timezone
+        from decimal import Decimal
+
+        from .models import PriceHistory
+        from .price_history import PriceHistoryService
+
+        PriceHistory.objects.all().delete()
+        now = datetime(2024, 6, 3, 12, tzinfo=dt_timezone.utc)
+        old = now - timedelta(days=40)
+        # Un vendredi : le lendemain est dans la même semaine
+        very_old = now - timedelta(days=402)
+
+        def row(moment, effective, previous):
+            return PriceHistory(
+                product=self.product,
+                price=effective,
+                effective_price=effective,
+                previous_effective_price=previous,
+                recorded_at=moment,
+            )
+
+        PriceHistory.objects.bulk_create(
+            [
+                row(old.replace(hour=8), 90, 100),
+                row(old.replace(hour=10), 70, 90),
+                row(old.replace(hour=18), 95, 70),
+                row(now - timedelta(days=2), 85, 95),
+                row(very_old, 60, 65),
+                row(very_old + timedelta(days=1), 62, 60),
+            ]
+        )
+
+        # Un passage : brut -> jour, puis jour ancien -> semaine
+        result = PriceHistoryService.downsample(now)
+        self.assertEqual(result["day"], {"read": 5, "written": 3})
+        self.assertEqual(result["week"], {"read": 2, "written": 1})
+
+        day = PriceHistory.objects.get(resolution="day")
+        self.assertEqual(day.recorded_at.date(), old.date())
+        self.assertEqual(day.effective_price, Decimal("70"))
+        self.assertEqual(day.previous_effective_price, Decimal("100"))
+        self.assertEqual(day.price, Decimal("95"))
+        self.assertEqual(PriceHistory.objects.filter(resolution="change").count(), 1)
+
+        week = PriceHistory.objects.get(resolution="week")
+        self.assertEqual(week.effective_price, Decimal("60"))
+        self.assertEqual(week.previous_effective_price, Decimal("65"))
+        self.assertEqual(week.recorded_at.weekday(), 0)
+        self.assertEqual(
+            PriceHistoryService.downsample(now),
+            {"day": {"read": 0, "written": 0}, "week": {"read": 0, "written": 0}},
+        )
+        self.assertEqual(PriceHistory.objects.count(), 3)
@@ -14,6 +14,17 @@ urlpatterns = [
     # Gestion des produits (vendeurs)
     path("create/", views.ProductCreateView.as_view(), name="product_create"),
     path("renew-stock/<int:product_id>/", views.renew_stock, name="renew_stock"),
+    path("import/", views.product_import_upload, name="product_import"),
+    path(
+        "import/<int:job_id>/",
+        views.product_import_status,
+        name="product_import_status",
+    ),
+    path(
+        "import/<int:job_id>/errors.csv",
+        views.product_import_report,
+        name="product_import_report",
+    ),
     # Panier
     path("add-to-cart/<int:product_id>/", views.add_to_cart, name="add_to_cart"),
     path(
@@ -1,3 +1,5 @@
+from decimal import Decimal, InvalidOperation
+
 from django.contrib import messages
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
@@ -5,7 +7,7 @@ from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.core.paginator import Paginator
 from django.db import transaction
 from django.db.models import Avg, Count, F, Q
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse, reverse_lazy
 from django.utils.translation import gettext_lazy as _
@@ -18,8 +20,11 @@ from django.views.generic import (
     UpdateView,
 )
 
+from i18n.services import TranslationService
+from inventory.services import StockImportError
 from orders.models import Cart, CartItem
 
+from .facets import FacetEngine
 from .forms import (
     CategoryForm,
     ProductForm,
@@ -29,15 +34,18 @@ from .forms import (
     ProductVariantForm,
     TagForm,
 )
+from .importer import ProductImporter
 from .models import (
     Category,
     Product,
     ProductImage,
+    ProductImportJob,
     ProductReview,
     ProductVariant,
     ProductViewHistory,
     Tag,
 )
+from .price_history import PriceHistoryService
 
 User = get_user_model()
 
@@ -67,9 +75,16 @@ class ProductListView(ListView):
         else:
             return 48  # Très grands catalogues : 48 par page
 
+    # Les tris par prix utilisent le prix effectif matérialisé (indexé)
+    PRICE_SORTS = {"price": "effective_price", "-price": "-effective_price"}
+
     def get_queryset(self):
-        queryset = Product.objects.filter(status="published").select_related(
-            "vendor", "category"
+        # Les prix effectifs échus sont recalculés par les signaux et la
+        # commande refresh_effective_prices, jamais pendant un GET
+        queryset = (
+            Product.objects.filter(status="published")
+            .select_related("vendor", "category")
+            .prefetch_related("tags")
         )
 
         # Filtres
@@ -88,37 +103,154 @@ class ProductListView(ListView):
             )
 
         if category_id:
-            try:
-                # Récupérer la catégorie et ses sous-catégories
-                category = Category.objects.get(id=category_id, is_active=True)
-                # Inclure la catégorie elle-même et toutes ses sous-catégories
-                subcategory_ids = [category.id]
-                subcategory_ids.extend(
-                    category.children.filter(is_active=True).values_list(
-                        "id", flat=True
-                    )
-                )
+            subcategory_ids = self.get_category_ids()
+            if subcategory_ids is not None:
                 # Filtrer les produits de la catégorie et de ses sous-catégories
                 queryset = queryset.filter(category_id__in=subcategory_ids)
-            except Category.DoesNotExist:
-                # Si la catégorie n'existe pas, ignorer le filtre
-                pass
 
         if min_price:
-            queryset = queryset.filter(price__gte=min_price)
+            queryset = queryset.filter(effective_price__gte=min_price)
 
         if max_price:
-            queryset = queryset.filter(price__lte=max_price)
+            queryset = queryset.filter(effective_price__lte=max_price)
 
         if tags:
             queryset = queryset.filter(tags__id__in=tags).distinct()
 
+        # Facettes (mêmes règles que products.facets)
+        facet_filters = self.get_facet_filters()
+        if facet_filters["vendor"]:
+            queryset = queryset.filter(vendor_id__in=facet_filters["vendor"])
+
+        if facet_filters["price"]:
+            ranges = Q()
+            for key, low, high in FacetEngine.price_ranges():
+                if key in facet_filters["price"]:
+                    bucket = Q()
+                    if low is not None:
+                        bucket &= Q(effective_price__gte=low)
+                    if high is not None:
+                        bucket &= Q(effective_price__lt=high)
+                    ranges |= bucket
+            queryset = queryset.filter(ranges)
+
+        if facet_filters.get("on_sale"):
+            queryset = queryset.filter(
+                Q(effective_price__lt=F("price"))
+                | Q(is_on_sale=True, effective_price__lt=F("original_price"))
+            )
+
+        if facet_filters.get("in_stock"):
+            queryset = queryset.filter(stock__gt=0)
+
         # Tri
         if sort_by:
-            queryset = queryset.order_by(sort_by)
+            queryset = queryset.order_by(self.PRICE_SORTS.get(sort_by, sort_by))
 
         return queryset
 
+    def get_category_ids(self):
+        """
+        Catégorie demandée et ses sous-catégories actives, ou None (pas de
+        filtre ou catégorie inconnue)
+        """
+        if not hasattr(self, "_category_ids"):
+            self._category_ids = None
+            category_id = self.request.GET.get("category")
+            if category_id:
+                try:
+                    category = Category.objects.get(id=category_id, is_active=True)
+                except (Category.DoesNotExist, ValueError):
+                    # Si la catégorie n'existe pas, ignorer le filtre
+                    return None
+                self._category_ids = [category.id]
+                self._category_ids.extend(
+                    category.children.filter(is_active=True).values_list(
+                        "id", flat=True
+                    )
+                )
+        return self._category_ids
+
+    def get_facet_filters(self):
+        """Filtres de facettes de la requête, au format de FacetEngine.counts"""
+        params = self.request.GET
+
+        def ids(name):
+            return {int(value) for value in params.getlist(name) if value.isdigit()}
+
+        filters = {
+            "tags": ids("tags"),
+            "vendor": ids("vendor"),
+            "price": ids("price_range"),
+        }
+        if params.get("on_sale"):
+            filters["on_sale"] = {True}
+        if params.get("in_stock"):
+            filters["in_stock"] = {True}
+        for name in ("min_price", "max_price"):
+            try:
+                filters[name] = Decimal(params[name]) if params.get(name) else None
+            except InvalidOperation:
+                filters[name] = None
+        return filters
+
+    def get_facets(self, tags):
+        """
+        Compteurs de facettes calculés en mémoire (products.facets) ; annote
+        les étiquettes de la barre latérale avec leur compteur
+        """
+        filters = self.get_facet_filters()
+        search_query = self.request.GET.get("query")
+        if search_query:
+            filters["product_ids"] = set(
+                Product.objects.filter(status="published")
+                .filter(
+                    Q(name__icontains=search_query)
+                    | Q(description__icontains=search_query)
+                    | Q(short_description__icontains=search_query)
+                )
+                .values_list("pk", flat=True)
+            )
+        category_ids = self.get_category_ids()
+        if category_ids is None:
+            category_ids = Category.objects.values_list("pk", flat=True)
+        facets = FacetEngine.counts(category_ids, filters)
+
+        for tag in tags:
+            tag.facet_count = facets["tags"].get(tag.pk, 0)
+
+        vendor_counts = sorted(facets["vendor"].items(), key=lambda item: -item[1])
+        vendor_counts = vendor_counts[:10]
+        names = dict(
+            User.objects.filter(pk__in=[pk for pk, _ in vendor_counts]).values_list(
+                "pk", "username"
+            )
+        )
+        return {
+            "total": facets["total"],
+            "prices": [
+                {
+                    "key": key,
+                    "min": low,
+                    "max": high,
+                    "count": facets["price"].get(key, 0),
+                    "selected": key in filters["price"],
+                }
+                for key, low, high in FacetEngine.price_ranges()
+            ],
+            "vendors": [
+                {
+                    "id": pk,
+                    "name": names.get(pk, ""),
+                    "count": count,
+                    "selected": pk in filters["vendor"],
+                }
+                for pk, count in vendor_counts
+            ],
+            "on_sale": facets["on_sale"].get(True, 0),
+            "in_stock": facets["in_stock"].get(True, 0),
+        }
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["search_form"] = ProductSearchForm(self.request.GET)
@@ -129,6 +261,21 @@ class ProductListView(ListView):
             .order_by("name")
         )
         context["tags"] = Tag.objects.all()
+
+        # Traductions de la page chargées en lot (une requête par modèle)
+        products = list(context["products"])
+        if context.get("page_obj") is not None:
+            context["page_obj"].object_list = products
+        context["products"] = TranslationService.translate(products)
+        TranslationService.translate_related(products, "category")
+        TranslationService.translate(
+            [tag for product in products for tag in product.tags.all()]
+        )
+        context["categories"] = TranslationService.translate(context["categories"])
+        context["tags"] = TranslationService.translate(context["tags"])
+        context["facets"] = self.get_facets(context["tags"])
+        # Prix le plus bas sur 30 jours des produits à prix barré (une requête)
+        PriceHistoryService.lowest_prices(products, reduced_only=True)
         context["featured_products"] = Product.objects.filter(
             status="published", is_featured=True
         )[:8]
@@ -241,6 +388,9 @@ class ProductDetailView(DetailView):
         if self.request.user.is_authenticated:
             context["review_form"] = ProductReviewForm()
 
+        # Prix le plus bas sur 30 jours (seulement avec un prix barré)
+        PriceHistoryService.lowest_prices([context["product"]], reduced_only=True)
+
         context.update(
             {
                 "similar_products": similar_products,
@@ -918,6 +1068,78 @@ def renew_stock(request, product_id):
     return redirect("products:product_list")
 
 
+# Import en masse du catalogue (vendeurs)
+@login_required
+@require_http_methods(["GET", "POST"])
+def product_import_upload(request):
+    """
+    Page d'import (GET) et dépôt d'un fichier CSV/XLSX de produits (POST) :
+    l'import est traité en arrière-plan (commande process_product_imports), sa
+    progression est suivie sur product_import_status
+    """
+    if request.user.user_type != "vendeur":
+        if request.method == "GET":
+            messages.error(request, "Accès refusé")
+            return redirect("products:home_page")
+        return JsonResponse({"success": False, "message": "Accès refusé"}, status=403)
+    if request.method == "GET":
+        return render(
+            request,
+            "products/product_import.html",
+            {"jobs": request.user.product_imports.all()[:10]},
+        )
+    upload = request.FILES.get("file")
+    if not upload:
+        return JsonResponse({"success": False, "message": "Fichier requis"}, status=400)
+    try:
+        job = ProductImporter.enqueue(request.user, upload)
+    except StockImportError as e:
+        return JsonResponse({"success": False, "message": str(e)}, status=400)
+    return JsonResponse(
+        {
+            "success": True,
+            "job_id": job.pk,
+            "status_url": reverse("products:product_import_status", args=[job.pk]),
+        },
+        status=202,
+    )
+
+
+@login_required
+def product_import_status(request, job_id):
+    """Progression et résultat d'un import de produits"""
+    job = get_object_or_404(ProductImportJob, pk=job_id, vendor=request.user)
+    return JsonResponse(
+        {
+            "job_id": job.pk,
+            "status": job.status,
+            "processed_rows": job.processed_rows,
+            "created": job.created_count,
+            "variants": job.variant_count,
+            "errors": job.error_count,
+            "message": job.error_message,
+            "report_url": (
+                reverse("products:product_import_report", args=[job.pk])
+                if job.status == "completed" and job.error_count
+                else None
+            ),
+        }
+    )
+
+
+@login_required
+def product_import_report(request, job_id):
+    """Rapport CSV des lignes refusées d'un import"""
+    job = get_object_or_404(ProductImportJob, pk=job_id, vendor=request.user)
+    response = HttpResponse(
+        ProductImporter.error_report(job), content_type="text/csv; charset=utf-8"
+    )
+    response[
+        "Content-Disposition"
+    ] = f'attachment; filename="import-{job.pk}-erreurs.csv"'
+    return response
+
+
 # Context processor pour le panier
 def cart_context(request):
     """
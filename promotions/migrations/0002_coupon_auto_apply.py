@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("promotions", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="coupon",
+            name="auto_apply",
+            field=models.BooleanField(
+                db_index=True,
+                default=False,
+                help_text="Appliqué automatiquement au panier, sans saisie du code",
+            ),
+        ),
+    ]
@@ -48,6 +48,11 @@ class Coupon(models.Model):
     valid_from = models.DateTimeField()
     valid_until = models.DateTimeField()
     is_active = models.BooleanField(default=True)
+    auto_apply = models.BooleanField(
+        default=False,
+        db_index=True,
+        help_text="Appliqué automatiquement au panier, sans saisie du code",
+    )
     applicable_products = models.ManyToManyField(
         "products.Product", blank=True, related_name="applicable_coupons"
     )
@@ -73,85 +78,36 @@ class Coupon(models.Model):
 
     def is_valid(self, user=None, order_amount=None):
         """Vérifier si le coupon est valide"""
-        now = timezone.now()
-
-        # Vérifications de base
-        if not self.is_active:
-            return False, "Ce coupon n'est plus actif"
-
-        if now < self.valid_from:
-            return False, "Ce coupon n'est pas encore valide"
-
-        if now > self.valid_until:
-            return False, "Ce coupon a expiré"
-
-        if self.used_count >= self.max_uses:
-            return False, "Ce coupon a atteint sa limite d'utilisation"
-
-        # Vérifications spécifiques à l'utilisateur
-        if user:
-            user_usage = CouponUsage.objects.filter(coupon=self, user=user).count()
-            if user_usage >= self.max_uses_per_user:
-                return (
-                    False,
-                    "Vous avez déjà utilisé ce coupon le nombre maximum de fois",
-                )
-
-            if (
-                self.applicable_users.exists()
-                and user not in self.applicable_users.all()
-            ):
-                return False, "Ce coupon n'est pas valide pour votre compte"
-
-        # Vérification du montant minimum
-        if order_amount and order_amount < self.min_order_amount:
-            return (
-                False,
-                f"Le montant minimum de commande est de {self.min_order_amount} FCFA",
-            )
+        from .services import CouponService
 
-        return True, "Coupon valide"
+        return CouponService.check(self, user=user, order_amount=order_amount)
 
     def calculate_discount(self, order_amount, products=None):
         """Calculer le montant de la réduction"""
-        if not self.is_valid(order_amount=order_amount)[0]:
+        from .services import CouponService
+
+        if not CouponService.check(self, order_amount=order_amount)[0]:
             return Decimal("0.00")
 
-        if self.discount_type == "percentage":
-            discount = (order_amount * self.discount_value) / 100
-            if self.max_discount_amount:
-                discount = min(discount, self.max_discount_amount)
-        elif self.discount_type == "fixed":
-            discount = self.discount_value
-        elif self.discount_type == "free_shipping":
-            discount = Decimal("0.00")  # Géré séparément
-        else:
-            discount = Decimal("0.00")
-
-        return min(
-            discount, order_amount
-        )  # Ne peut pas dépasser le montant de la commande
+        return CouponService.compute_discount(self, order_amount)
 
     def use_coupon(self, user, order):
         """Utiliser le coupon"""
-        is_valid, message = self.is_valid(user=user, order_amount=order.subtotal)
-
-        if not is_valid:
-            return False, message
+        from .services import CouponService
 
-        # Créer l'usage du coupon
-        usage = CouponUsage.objects.create(
-            coupon=self,
-            user=user,
-            order=order,
-            discount_amount=self.calculate_discount(order.subtotal),
+        # Une seule validation, puis incrément atomique de used_count
+        is_valid, message = CouponService.check(
+            self, user=user, order_amount=order.subtotal
         )
-
-        # Incrémenter le compteur d'utilisation
-        self.used_count += 1
-        self.save()
-
-        return True, "Coupon utilisé avec succès"
+        evaluation = {
+            "valid": is_valid,
+            "message": message,
+            "coupon": self,
+            "discount": CouponService.compute_discount(self, order.subtotal)
+            if is_valid
+            else Decimal("0.00"),
+        }
+        return CouponService.redeem(evaluation, user, order)
 
 
 class CouponUsage(models.Model):
@@ -232,13 +188,16 @@ class Promotion(models.Model):
 
     def get_applicable_products(self):
         """Récupérer tous les produits applicables"""
-        products = set()
-
-        # Produits spécifiques
-        products.update(self.applicable_products.filter(status="published"))
+        from django.db.models import Q
 
-        # Produits des catégories
-        for category in self.applicable_categories.filter(is_active=True):
-            products.update(category.products.filter(status="published"))
+        from products.models import Product
 
-        return list(products)
+        # Produits spécifiques et produits des catégories actives, en une requête
+        return list(
+            Product.objects.filter(status="published")
+            .filter(
+                Q(promotions=self)
+                | Q(category__promotions=self, category__is_active=True)
+            )
+            .distinct()
+        )
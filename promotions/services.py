@@ -0,0 +1,349 @@
+"""
+Service d'évaluation et d'utilisation des coupons
+"""
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Exists, F, OuterRef
+from django.utils import timezone
+
+from .models import Coupon, CouponUsage
+
+
+class CouponService:
+    """
+    Évalue les coupons en une requête et les consomme de façon atomique.
+
+    - l'appartenance à ``applicable_users`` est vérifiée par des sous-requêtes
+      ``EXISTS`` indexées, sans charger la liste des utilisateurs ;
+    - le nombre d'utilisations par utilisateur est mis en cache pour
+      l'évaluation, et recompté sous verrou (``select_for_update`` sur le
+      coupon) au moment de l'utilisation ;
+    - ``used_count`` n'est incrémenté que par un ``UPDATE`` conditionnel, dans
+      la même transaction : ni ``max_uses`` ni ``max_uses_per_user`` ne sont
+      dépassés, même en concurrence.
+    """
+
+    USAGE_CACHE_TIMEOUT = 3600
+
+    @staticmethod
+    def _usage_cache_key(coupon_id, user_id):
+        return f"promotions:coupon:{coupon_id}:user:{user_id}:uses"
+
+    @staticmethod
+    def annotated_coupons(user=None):
+        """
+        Queryset de coupons annoté avec les informations de ciblage utilisateur
+        """
+        through = Coupon.applicable_users.through
+        queryset = Coupon.objects.annotate(
+            is_restricted=Exists(through.objects.filter(coupon_id=OuterRef("pk")))
+        )
+        if user is not None and user.is_authenticated:
+            queryset = queryset.annotate(
+                is_user_allowed=Exists(
+                    through.objects.filter(coupon_id=OuterRef("pk"), user_id=user.pk)
+                )
+            )
+        return queryset
+
+    @classmethod
+    def get_user_usage_count(cls, coupon, user):
+        """
+        Nombre d'utilisations du coupon par l'utilisateur (mis en cache)
+        """
+        key = cls._usage_cache_key(coupon.pk, user.pk)
+        count = cache.get(key)
+        if count is None:
+            count = CouponUsage.objects.filter(coupon=coupon, user=user).count()
+            cache.set(key, count, cls.USAGE_CACHE_TIMEOUT)
+        return count
+
+    @classmethod
+    def get_user_usage_counts(cls, coupons, user):
+        """
+        Nombres d'utilisations d'une liste de coupons par l'utilisateur,
+        avec une seule requête groupée pour les valeurs absentes du cache
+        """
+        keys = {
+            cls._usage_cache_key(coupon.pk, user.pk): coupon.pk for coupon in coupons
+        }
+        cached = cache.get_many(keys.keys())
+        counts = {keys[key]: value for key, value in cached.items()}
+
+        missing = [pk for pk in keys.values() if pk not in counts]
+        if missing:
+            rows = dict(
+                CouponUsage.objects.filter(coupon_id__in=missing, user=user)
+                .values("coupon_id")
+                .annotate(total=Count("id"))
+                .values_list("coupon_id", "total")
+            )
+            fetched = {pk: rows.get(pk, 0) for pk in missing}
+            cache.set_many(
+                {
+                    cls._usage_cache_key(pk, user.pk): value
+                    for pk, value in fetched.items()
+                },
+                cls.USAGE_CACHE_TIMEOUT,
+            )
+            counts.update(fetched)
+        return counts
+
+    @staticmethod
+    def eligible_amount(cart_items, products=None, categories=None):
+        """
+        Montant des articles ciblés par un coupon (tout le panier si le coupon
+        ne cible ni produit ni catégorie)
+        """
+        return sum(
+            (
+                item.get_total_price()
+                for item in cart_items
+                if not (products or categories)
+                or (products and item.product_id in products)
+                or (categories and item.product.category_id in categories)
+            ),
+            Decimal("0.00"),
+        )
+
+    @staticmethod
+    def compute_discount(coupon, order_amount):
+        """
+        Calcule la réduction d'un coupon déjà validé
+        """
+        order_amount = Decimal(str(order_amount))
+        if coupon.discount_type == "percentage":
+            discount = (order_amount * coupon.discount_value) / 100
+            if coupon.max_discount_amount:
+                discount = min(discount, coupon.max_discount_amount)
+        elif coupon.discount_type == "fixed":
+            discount = coupon.discount_value
+        else:
+            # La livraison gratuite est gérée séparément
+            discount = Decimal("0.00")
+
+        # Ne peut pas dépasser le montant de la commande
+        return min(discount, order_amount).quantize(Decimal("0.01"))
+
+    @classmethod
+    def check(cls, coupon, user=None, order_amount=None, usage_count=None, now=None):
+        """
+        Vérifie la validité d'un coupon chargé via annotated_coupons().
+        Retourne (valide, message).
+        """
+        now = now or timezone.now()
+
+        if not coupon.is_active:
+            return False, "Ce coupon n'est plus actif"
+
+        if now < coupon.valid_from:
+            return False, "Ce coupon n'est pas encore valide"
+
+        if now > coupon.valid_until:
+            return False, "Ce coupon a expiré"
+
+        if coupon.used_count >= coupon.max_uses:
+            return False, "Ce coupon a atteint sa limite d'utilisation"
+
+        if user is not None and user.is_authenticated:
+            if usage_count is None:
+                usage_count = cls.get_user_usage_count(coupon, user)
+            if usage_count >= coupon.max_uses_per_user:
+                return (
+                    False,
+                    "Vous avez déjà utilisé ce coupon le nombre maximum de fois",
+                )
+
+            is_restricted = getattr(coupon, "is_restricted", None)
+            if is_restricted is None:
+                is_restricted = coupon.applicable_users.exists()
+            if is_restricted:
+                is_allowed = getattr(coupon, "is_user_allowed", None)
+                if is_allowed is None:
+                    is_allowed = coupon.applicable_users.filter(pk=user.pk).exists()
+                if not is_allowed:
+                    return False, "Ce coupon n'est pas valide pour votre compte"
+
+        if order_amount and order_amount < coupon.min_order_amount:
+            return (
+                False,
+                f"Le montant minimum de commande est de {coupon.min_order_amount} FCFA",
+            )
+
+        return True, "Coupon valide"
+
+    @classmethod
+    def evaluate(cls, code, user=None, order_amount=None, cart_items=None):
+        """
+        Évalue un code coupon pour une commande, en une seule validation.
+        Avec ``cart_items``, la réduction d'un coupon ciblant des produits ou
+        des catégories est limitée aux articles concernés.
+        Retourne un dictionnaire {valid, message, coupon, discount}.
+        """
+        coupon = cls.annotated_coupons(user).filter(code=(code or "").strip()).first()
+        if coupon is None:
+            return {
+                "valid": False,
+                "message": "Code coupon invalide",
+                "coupon": None,
+                "discount": Decimal("0.00"),
+            }
+
+        is_valid, message = cls.check(coupon, user=user, order_amount=order_amount)
+        discounted_amount = order_amount
+        if is_valid and cart_items is not None:
+            products = set(coupon.applicable_products.values_list("pk", flat=True))
+            categories = set(coupon.applicable_categories.values_list("pk", flat=True))
+            discounted_amount = cls.eligible_amount(cart_items, products, categories)
+            if not discounted_amount:
+                is_valid = False
+                message = "Ce coupon ne s'applique à aucun article de votre panier"
+        discount = Decimal("0.00")
+        if is_valid and discounted_amount is not None:
+            discount = cls.compute_discount(coupon, discounted_amount)
+        return {
+            "valid": is_valid,
+            "message": message,
+            "coupon": coupon,
+            "discount": discount,
+        }
+
+    @staticmethod
+    def reserve(coupon):
+        """
+        Incrémente used_count de façon atomique si la limite n'est pas atteinte.
+        Retourne True si une utilisation a pu être réservée.
+        """
+        updated = Coupon.objects.filter(
+            pk=coupon.pk, is_active=True, used_count__lt=F("max_uses")
+        ).update(used_count=F("used_count") + 1)
+        if updated:
+            coupon.used_count += 1
+        return bool(updated)
+
+    @classmethod
+    def redeem(cls, evaluation, user, order):
+        """
+        Consomme un coupon déjà évalué pour une commande.
+        Retourne (succès, message).
+        """
+        coupon = evaluation["coupon"]
+        if not evaluation["valid"] or coupon is None:
+            return False, evaluation["message"]
+
+        with transaction.atomic():
+            # Verrou sur le coupon : les utilisations concurrentes du même
+            # coupon sont sérialisées jusqu'à la fin de la transaction
+            locked = (
+                Coupon.objects.select_for_update()
+                .filter(pk=coupon.pk)
+                .values("max_uses_per_user")
+                .first()
+            )
+            if locked is None:
+                return False, "Code coupon invalide"
+            if CouponUsage.objects.filter(coupon=coupon, user=user).count() >= (
+                locked["max_uses_per_user"]
+            ):
+                return (
+                    False,
+                    "Vous avez déjà utilisé ce coupon le nombre maximum de fois",
+                )
+            if not cls.reserve(coupon):
+                return False, "Ce coupon a atteint sa limite d'utilisation"
+
+            CouponUsage.objects.create(
+                coupon=coupon,
+                user=user,
+                order=order,
+                discount_amount=evaluation["discount"],
+            )
+
+            key = cls._usage_cache_key(coupon.pk, user.pk)
+            transaction.on_commit(lambda: cls._increment_usage_cache(key))
+
+        return True, "Coupon utilisé avec succès"
+
+    @staticmethod
+    def _increment_usage_cache(key):
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Clé absente : elle sera recalculée à la prochaine lecture
+            pass
+
+    @classmethod
+    def evaluate_cart(cls, cart_items, user=None, now=None):
+        """
+        Évalue un panier contre tous les coupons à application automatique,
+        en un nombre constant de requêtes. Retourne la liste des évaluations
+        valides, triée de la meilleure réduction à la moins bonne.
+        """
+        now = now or timezone.now()
+        cart_items = list(cart_items)
+        subtotal = sum((item.get_total_price() for item in cart_items), Decimal("0.00"))
+
+        coupons = list(
+            cls.annotated_coupons(user).filter(
+                auto_apply=True,
+                is_active=True,
+                valid_from__lte=now,
+                valid_until__gte=now,
+                used_count__lt=F("max_uses"),
+            )
+        )
+        if not coupons:
+            return []
+
+        coupon_ids = [coupon.pk for coupon in coupons]
+        product_links = Coupon.applicable_products.through.objects.filter(
+            coupon_id__in=coupon_ids
+        ).values_list("coupon_id", "product_id")
+        product_targets = {}
+        for coupon_id, product_id in product_links:
+            product_targets.setdefault(coupon_id, set()).add(product_id)
+
+        category_links = Coupon.applicable_categories.through.objects.filter(
+            coupon_id__in=coupon_ids
+        ).values_list("coupon_id", "category_id")
+        category_targets = {}
+        for coupon_id, category_id in category_links:
+            category_targets.setdefault(coupon_id, set()).add(category_id)
+
+        usage_counts = {}
+        if user is not None and user.is_authenticated:
+            usage_counts = cls.get_user_usage_counts(coupons, user)
+
+        evaluations = []
+        for coupon in coupons:
+            # Réduction limitée aux articles ciblés par le coupon
+            eligible_amount = cls.eligible_amount(
+                cart_items,
+                product_targets.get(coupon.pk),
+                category_targets.get(coupon.pk),
+            )
+            if not eligible_amount:
+                continue
+
+            is_valid, message = cls.check(
+                coupon,
+                user=user,
+                order_amount=subtotal,
+                usage_count=usage_counts.get(coupon.pk, 0),
+                now=now,
+            )
+            if not is_valid:
+                continue
+            evaluations.append(
+                {
+                    "valid": True,
+                    "message": message,
+                    "coupon": coupon,
+                    "discount": cls.compute_discount(coupon, eligible_amount),
+                }
+            )
+
+        evaluations.sort(key=lambda evaluation: evaluation["discount"], reverse=True)
+        return evaluations
@@ -0,0 +1,267 @@
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from orders.models import Order
+
+from .models import Coupon, CouponUsage
+from .services import CouponService
+
+User = get_user_model()
+
+
+def create_order(user, subtotal=Decimal("10000.00")):
+    return Order.objects.create(
+        user=user,
+        shipping_first_name="John",
+        shipping_last_name="Doe",
+        shipping_phone="0700000000",
+        shipping_address="Rue 12",
+        shipping_city="Abidjan",
+        payment_method="cash",
+        subtotal=subtotal,
+        total_amount=subtotal,
+    )
+
+
+def create_coupon(creator, **kwargs):
+    now = timezone.now()
+    data = {
+        "code": "PROMO10",
+        "name": "Promo 10%",
+        "discount_type": "percentage",
+        "discount_value": Decimal("10.00"),
+        "max_uses": 10,
+        "max_uses_per_user": 1,
+        "valid_from": now - timedelta(days=1),
+        "valid_until": now + timedelta(days=1),
+        "created_by": creator,
+    }
+    data.update(kwargs)
+    return Coupon.objects.create(**data)
+
+
+class CouponServiceTest(TestCase):
+    """Tests pour le service d'évaluation des coupons"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="couponclient",
+            email="coupon@example.com",
+            password="testpass123",
+        )
+        self.other = User.objects.create_user(
+            username="otherclient",
+            email="other@example.com",
+            password="testpass123",
+        )
+        self.coupon = create_coupon(self.user)
+
+    def test_evaluate_valid_coupon(self):
+        """Un coupon valide retourne la réduction calculée"""
+        evaluation = CouponService.evaluate(
+            "PROMO10", user=self.user, order_amount=Decimal("5000.00")
+        )
+        self.assertTrue(evaluation["valid"])
+        self.assertEqual(evaluation["discount"], Decimal("500.00"))
+
+    def test_applicable_users_restriction(self):
+        """Un coupon restreint refuse les autres utilisateurs"""
+        self.coupon.applicable_users.add(self.user)
+
+        self.assertTrue(CouponService.evaluate("PROMO10", user=self.user)["valid"])
+        evaluation = CouponService.evaluate("PROMO10", user=self.other)
+        self.assertFalse(evaluation["valid"])
+        self.assertEqual(
+            evaluation["message"], "Ce coupon n'est pas valide pour votre compte"
+        )
+
+    def test_redeem_updates_counters(self):
+        """L'utilisation incrémente used_count et le compteur par utilisateur"""
+        order = create_order(self.user)
+        evaluation = CouponService.evaluate(
+            "PROMO10", user=self.user, order_amount=order.subtotal
+        )
+        self.assertEqual(CouponService.get_user_usage_count(self.coupon, self.user), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            redeemed, _ = CouponService.redeem(evaluation, self.user, order)
+
+        self.assertTrue(redeemed)
+        self.coupon.refresh_from_db()
+        self.assertEqual(self.coupon.used_count, 1)
+        self.assertEqual(CouponService.get_user_usage_count(self.coupon, self.user), 1)
+        self.assertFalse(CouponService.evaluate("PROMO10", user=self.user)["valid"])
+
+    def test_redeem_enforces_per_user_limit_despite_stale_cache(self):
+        """La limite par utilisateur est revérifiée au moment de l'utilisation"""
+        first_order, second_order = create_order(self.user), create_order(self.user)
+        # Deux évaluations avant toute utilisation (requêtes parallèles)
+        first = CouponService.evaluate("PROMO10", user=self.user, order_amount=1000)
+        second = CouponService.evaluate("PROMO10", user=self.user, order_amount=1000)
+        self.assertTrue(second["valid"])
+
+        self.assertTrue(CouponService.redeem(first, self.user, first_order)[0])
+        redeemed, message = CouponService.redeem(second, self.user, second_order)
+
+        self.assertFalse(redeemed)
+        self.assertEqual(
+            message, "Vous avez déjà utilisé ce coupon le nombre maximum de fois"
+        )
+        self.coupon.refresh_from_db()
+        self.assertEqual(self.coupon.used_count, 1)
+
+    def test_evaluate_code_limits_discount_to_targeted_items(self):
+        """Un code ciblé ne réduit que les articles concernés du panier"""
+        from products.models import Category
+
+        shoes, hats = Category.objects.create(
+            name="Chaussures"
+        ), Category.objects.create(name="Chapeaux")
+
+        class Item:
+            def __init__(self, category, total):
+                self.product_id = None
+                self.product = type("P", (), {"category_id": category.pk})()
+                self.total = Decimal(total)
+
+            def get_total_price(self):
+                return self.total
+
+        self.coupon.applicable_categories.add(shoes)
+        evaluation = CouponService.evaluate(
+            "PROMO10",
+            user=self.user,
+            order_amount=Decimal("5000.00"),
+            cart_items=[Item(shoes, "2000.00"), Item(hats, "3000.00")],
+        )
+        self.assertTrue(evaluation["valid"])
+        self.assertEqual(evaluation["discount"], Decimal("200.00"))
+
+        evaluation = CouponService.evaluate(
+            "PROMO10",
+            user=self.user,
+            order_amount=Decimal("3000.00"),
+            cart_items=[Item(hats, "3000.00")],
+        )
+        self.assertFalse(evaluation["valid"])
+        self.assertEqual(evaluation["discount"], Decimal("0.00"))
+
+    def test_stale_instances_cannot_exceed_max_uses(self):
+        """Deux instances chargées avant utilisation ne dépassent pas max_uses"""
+        self.coupon.max_uses = 1
+        self.coupon.save()
+        first = Coupon.objects.get(pk=self.coupon.pk)
+        second = Coupon.objects.get(pk=self.coupon.pk)
+
+        self.assertTrue(CouponService.reserve(first))
+        self.assertFalse(CouponService.reserve(second))
+        self.coupon.refresh_from_db()
+        self.assertEqual(self.coupon.used_count, 1)
+
+    def test_evaluate_cart_against_auto_apply_coupons(self):
+        """Le panier est évalué en lot contre les coupons automatiques"""
+        from products.models import Category, Product
+
+        category = Category.objects.create(name="Mode")
+        product = Product.objects.create(
+            name="Chemise",
+            description="Test",
+            vendor=self.other,
+            category=category,
+            price=1000,
+            stock=10,
+            status="published",
+        )
+
+        class Item:
+            product_id = product.pk
+
+            def __init__(self):
+                self.product = product
+
+            def get_total_price(self):
+                return Decimal("3000.00")
+
+        create_coupon(self.user, code="AUTO5", discount_value=5, auto_apply=True)
+        targeted = create_coupon(
+            self.user, code="AUTO20", discount_value=20, auto_apply=True
+        )
+        targeted.applicable_categories.add(category)
+
+        evaluations = CouponService.evaluate_cart([Item()], user=self.user)
+
+        self.assertEqual(
+            [evaluation["coupon"].code for evaluation in evaluations],
+            ["AUTO20", "AUTO5"],
+        )
+        self.assertEqual(evaluations[0]["discount"], Decimal("600.00"))
+
+
+class CouponConcurrencyTest(TransactionTestCase):
+    """Tests de concurrence sur l'utilisation des coupons"""
+
+    def test_concurrent_redemptions_never_exceed_max_uses(self):
+        """Des utilisations simultanées ne dépassent jamais max_uses"""
+        cache.clear()
+        creator = User.objects.create_user(
+            username="creator", email="creator@example.com", password="testpass123"
+        )
+        coupon = create_coupon(creator, max_uses=3)
+        clients = [
+            User.objects.create_user(
+                username=f"client{index}",
+                email=f"client{index}@example.com",
+                password="testpass123",
+            )
+            for index in range(8)
+        ]
+        orders = [create_order(client) for client in clients]
+
+        barrier = threading.Barrier(len(clients))
+        results = []
+
+        def redeem(client, order):
+            try:
+                # Chaque client évalue le coupon avant que quiconque l'utilise
+                evaluation = CouponService.evaluate(
+                    "PROMO10", user=client, order_amount=order.subtotal
+                )
+                barrier.wait()
+                for _ in range(50):
+                    try:
+                        results.append(
+                            CouponService.redeem(evaluation, client, order)[0]
+                        )
+                        return
+                    except OperationalError:
+                        # Base SQLite verrouillée par un autre thread : réessayer
+                        time.sleep(0.01)
+                results.append(False)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=redeem, args=(client, order))
+            for client, order in zip(clients, orders)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        coupon.refresh_from_db()
+        self.assertLessEqual(coupon.used_count, coupon.max_uses)
+        self.assertEqual(coupon.used_count, results.count(True))
+        self.assertEqual(coupon.used_count, coupon.max_uses)
+        self.assertEqual(
+            CouponUsage.objects.filter(coupon=coupon).count(), coupon.used_count
+        )
@@ -0,0 +1,105 @@
+"""
+Commande Django de traitement des retours par lots
+À exécuter en fin de journée, après la réception des colis à l'entrepôt
+
+    python manage.py process_returns --user admin --approve RET-1A2B3C4D
+    python manage.py process_returns --user admin --receive-file recus.txt
+"""
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import User
+from returns.models import ReturnRequest
+from returns.services import ReturnProcessingService
+
+
+class Command(BaseCommand):
+    help = "Approuve, rejette et réceptionne des demandes de retour en un lot"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user", required=True, help="Membre du personnel qui traite le lot"
+        )
+        for step, text in (
+            ("approve", "à approuver"),
+            ("reject", "à rejeter"),
+            ("receive", "réceptionnées à l'entrepôt"),
+        ):
+            parser.add_argument(
+                f"--{step}",
+                action="append",
+                default=[],
+                help=f"Numéro(s) de demande {text} (répétable, séparés par virgules)",
+            )
+            parser.add_argument(
+                f"--{step}-file",
+                help=f"Fichier des numéros de demande {text} (un par ligne)",
+            )
+        parser.add_argument("--reason", default="", help="Motif des rejets")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["user"], is_staff=True)
+        except User.DoesNotExist:
+            raise CommandError(f"Membre du personnel inconnu : {options['user']}")
+
+        numbers = {}
+        for step in ("approve", "reject", "receive"):
+            values = [
+                number.strip() for value in options[step] for number in value.split(",")
+            ]
+            if options[f"{step}_file"]:
+                try:
+                    values += Path(options[f"{step}_file"]).read_text().split()
+                except OSError as e:
+                    raise CommandError(str(e))
+            numbers[step] = {number for number in values if number}
+        if numbers["reject"] and not options["reason"]:
+            raise CommandError("--reason est requis pour rejeter des demandes")
+
+        known = dict(
+            ReturnRequest.objects.filter(
+                request_number__in=set().union(*numbers.values())
+            ).values_list("request_number", "pk")
+        )
+        unknown = set().union(*numbers.values()) - set(known)
+        if unknown:
+            raise CommandError(f"Demande(s) inconnue(s) : {', '.join(sorted(unknown))}")
+
+        summary = ReturnProcessingService.process_batch(
+            user,
+            approve=[known[number] for number in numbers["approve"]],
+            reject=[known[number] for number in numbers["reject"]],
+            receive=[known[number] for number in numbers["receive"]],
+            reject_reason=options["reason"],
+        )
+
+        self.stdout.write(
+            f"{summary['approved']} approuvée(s), {summary['rejected']} rejetée(s), "
+            f"{summary['received']} réceptionnée(s) ; "
+            f"{summary['restocked_units']} unité(s) remise(s) en stock, "
+            f"{summary['store_credits']} crédit(s) magasin, "
+            f"{summary['refunds']} remboursement(s) dont "
+            f"{summary['provider_refunds']} transmis au prestataire."
+        )
+        if summary["skipped"]:
+            numbers_by_pk = {pk: number for number, pk in known.items()}
+            self.stdout.write(
+                self.style.WARNING(
+                    "Ignorée(s) (statut incompatible) : "
+                    + ", ".join(
+                        f"{numbers_by_pk[pk]} ({status})"
+                        for pk, status in sorted(summary["skipped"].items())
+                    )
+                )
+            )
+        timings = ", ".join(
+            f"{step} {ms} ms" for step, ms in summary["timings_ms"].items()
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✓ Lot traité en {summary['total_ms']} ms"
+                + (f" ({timings})" if timings else "")
+            )
+        )
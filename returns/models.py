@@ -6,6 +6,7 @@ from decimal import Decimal
 from django.contrib.auth import get_user_model
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.utils import timezone
 
 User = get_user_model()
 
@@ -121,47 +122,20 @@ class ReturnRequest(models.Model):
 
     def approve(self, admin_user, approved_amount=None):
         """Approuver la demande de retour"""
-        if self.status != "pending":
-            return False
-
-        self.status = "approved"
-        self.approved_at = models.timezone.now()
-        self.processed_by = admin_user
-        if approved_amount:
-            self.approved_amount = approved_amount
-        else:
-            self.approved_amount = self.requested_amount
-        self.save()
+        from .services import ReturnProcessingService
 
-        # Créer un historique
-        ReturnStatusHistory.objects.create(
-            return_request=self,
-            status="approved",
-            notes=f"Approuvé par {admin_user.get_display_name()}",
-            changed_by=admin_user,
-        )
-
-        return True
+        amounts = {self.pk: approved_amount} if approved_amount else None
+        summary = ReturnProcessingService.approve([self.pk], admin_user, amounts)
+        self.refresh_from_db()
+        return bool(summary["approved"])
 
     def reject(self, admin_user, reason):
         """Rejeter la demande de retour"""
-        if self.status != "pending":
-            return False
+        from .services import ReturnProcessingService
 
-        self.status = "rejected"
-        self.processed_by = admin_user
-        self.admin_notes = reason
-        self.save()
-
-        # Créer un historique
-        ReturnStatusHistory.objects.create(
-            return_request=self,
-            status="rejected",
-            notes=f"Rejeté par {admin_user.get_display_name()}: {reason}",
-            changed_by=admin_user,
-        )
-
-        return True
+        summary = ReturnProcessingService.reject([self.pk], admin_user, reason)
+        self.refresh_from_db()
+        return bool(summary["rejected"])
 
 
 class ReturnItem(models.Model):
@@ -290,7 +264,7 @@ class Refund(models.Model):
             return False
 
         self.status = "processing"
-        self.processed_at = models.timezone.now()
+        self.processed_at = timezone.now()
         self.processed_by = admin_user
         self.save()
 
@@ -298,16 +272,13 @@ class Refund(models.Model):
 
     def complete(self, transaction_id=None):
         """Marquer le remboursement comme terminé"""
-        if self.status != "processing":
-            return False
-
-        self.status = "completed"
-        self.completed_at = models.timezone.now()
-        if transaction_id:
-            self.transaction_id = transaction_id
-        self.save()
+        from .services import ReturnProcessingService
 
-        return True
+        completed = ReturnProcessingService.complete_refunds(
+            {self.pk: transaction_id or ""}, self.processed_by
+        )
+        self.refresh_from_db()
+        return bool(completed)
 
 
 class StoreCredit(models.Model):
@@ -353,5 +324,5 @@ class StoreCredit(models.Model):
     def is_expired(self):
         """Vérifier si le crédit est expiré"""
         if self.expires_at:
-            return models.timezone.now() > self.expires_at
+            return timezone.now() > self.expires_at
         return False
@@ -0,0 +1,372 @@
+"""
+Services de l'application returns
+"""
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Refund, ReturnItem, ReturnRequest, ReturnStatusHistory, StoreCredit
+
+
+class ReturnProcessingService:
+    """
+    Traitement des retours par lots (tournée de fin de journée de l'entrepôt).
+
+    ``process_batch`` approuve, rejette et réceptionne des demandes dans une
+    seule transaction. Chaque étape verrouille les demandes concernées, ne
+    garde que celles dont le statut le permet, écrit le nouveau statut en un
+    UPDATE et l'historique en un ``bulk_create``. À la réception :
+
+    - les articles revendables sont remis en stock en une écriture par table ;
+    - les crédits magasin sont créés en un ``bulk_create`` ;
+    - les remboursements sont créés en un ``bulk_create`` et, quand la
+      commande a été payée en ligne, une demande de remboursement est
+      transmise au système de paiement (``payment_system.RefundRequest``).
+
+    Le résumé retourné indique les demandes traitées, ignorées et la durée
+    de chaque étape.
+    """
+
+    BATCH_SIZE = 500
+
+    # États des articles qui peuvent être remis en vente
+    RESTOCK_CONDITIONS = {"new", "used"}
+
+    # Raison de la demande de retour -> raison du remboursement au prestataire
+    PROVIDER_REASONS = {
+        "defective": "defective",
+        "wrong_item": "wrong_item",
+        "damaged_shipping": "defective",
+    }
+
+    @classmethod
+    def process_batch(
+        cls,
+        admin_user,
+        approve=(),
+        reject=(),
+        receive=(),
+        reject_reason="",
+        amounts=None,
+    ):
+        """
+        Approuve, rejette puis réceptionne les demandes données (identifiants)
+        en une transaction. ``amounts`` ({id: montant}) remplace le montant
+        demandé à l'approbation. Retourne le résumé du lot.
+        """
+        summary = {
+            "approved": 0,
+            "rejected": 0,
+            "received": 0,
+            "skipped": {},
+            "restocked_units": 0,
+            "store_credits": 0,
+            "refunds": 0,
+            "provider_refunds": 0,
+            "timings_ms": {},
+        }
+        start = time.perf_counter()
+        with transaction.atomic():
+            if approve:
+                with cls._timed(summary, "approve"):
+                    cls._approve(approve, admin_user, summary, amounts or {})
+            if reject:
+                with cls._timed(summary, "reject"):
+                    cls._reject(reject, admin_user, summary, reject_reason)
+            if receive:
+                with cls._timed(summary, "receive"):
+                    cls._receive(receive, admin_user, summary)
+        summary["total_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        return summary
+
+    @classmethod
+    def approve(cls, return_ids, admin_user, amounts=None):
+        """Approuve les demandes en attente"""
+        return cls.process_batch(admin_user, approve=return_ids, amounts=amounts)
+
+    @classmethod
+    def reject(cls, return_ids, admin_user, reason):
+        """Rejette les demandes en attente"""
+        return cls.process_batch(admin_user, reject=return_ids, reject_reason=reason)
+
+    @classmethod
+    def receive(cls, return_ids, admin_user):
+        """Réceptionne les demandes approuvées (stock, crédit, remboursement)"""
+        return cls.process_batch(admin_user, receive=return_ids)
+
+    @classmethod
+    def complete_refunds(cls, refunds, admin_user=None):
+        """
+        Termine les remboursements en cours ({id: identifiant de transaction}
+        ou liste d'identifiants) et les demandes de retour correspondantes.
+        Retourne le nombre de remboursements terminés.
+        """
+        if not isinstance(refunds, dict):
+            refunds = {pk: "" for pk in refunds}
+        now = timezone.now()
+        with transaction.atomic():
+            rows = list(
+                Refund.objects.select_for_update()
+                .filter(pk__in=list(refunds), status="processing")
+                .order_by("pk")
+            )
+            for refund in rows:
+                refund.status = "completed"
+                refund.completed_at = now
+                refund.transaction_id = refunds[refund.pk] or refund.transaction_id
+                if admin_user is not None:
+                    refund.processed_by = admin_user
+            Refund.objects.bulk_update(
+                rows,
+                ["status", "completed_at", "transaction_id", "processed_by"],
+                batch_size=cls.BATCH_SIZE,
+            )
+            completed = cls._set_status(
+                [refund.return_request_id for refund in rows],
+                "completed",
+                admin_user,
+                "Remboursement effectué",
+                completed_at=now,
+                sources={"processing"},
+            )
+        return len(completed)
+
+    # Étapes
+
+    @classmethod
+    def _approve(cls, ids, admin_user, summary, amounts):
+        now = timezone.now()
+        approved = cls._lock(ids, {"pending"}, summary)
+        updates = [pk for pk in approved if pk not in amounts]
+        ReturnRequest.objects.filter(pk__in=updates).update(
+            approved_amount=Coalesce("approved_amount", "requested_amount")
+        )
+        overrides = [
+            ReturnRequest(pk=pk, approved_amount=amounts[pk])
+            for pk in approved
+            if pk in amounts
+        ]
+        ReturnRequest.objects.bulk_update(
+            overrides, ["approved_amount"], batch_size=cls.BATCH_SIZE
+        )
+        cls._set_status(
+            approved,
+            "approved",
+            admin_user,
+            f"Approuvé par {admin_user.get_display_name()}",
+            approved_at=now,
+            processed_by=admin_user,
+        )
+        summary["approved"] += len(approved)
+
+    @classmethod
+    def _reject(cls, ids, admin_user, summary, reason):
+        rejected = cls._lock(ids, {"pending"}, summary)
+        cls._set_status(
+            rejected,
+            "rejected",
+            admin_user,
+            f"Rejeté par {admin_user.get_display_name()}: {reason}",
+            processed_by=admin_user,
+            admin_notes=reason,
+        )
+        summary["rejected"] += len(rejected)
+
+    @classmethod
+    def _receive(cls, ids, admin_user, summary):
+        from inventory.services import RestockService
+
+        received = cls._lock(ids, {"approved"}, summary)
+        if not received:
+            return
+        requests = {
+            request.pk: request
+            for request in ReturnRequest.objects.filter(pk__in=received).only(
+                "pk",
+                "request_number",
+                "order_id",
+                "user_id",
+                "return_type",
+                "reason",
+                "requested_amount",
+                "approved_amount",
+            )
+        }
+
+        # Articles revendables, agrégés par produit et par variante
+        products, variants = defaultdict(int), defaultdict(int)
+        for product_id, variant_id, quantity in (
+            ReturnItem.objects.filter(
+                return_request_id__in=received,
+                condition__in=cls.RESTOCK_CONDITIONS,
+            )
+            .values("order_item__product_id", "order_item__variant_id")
+            .annotate(quantity=Sum("quantity"))
+            .order_by()
+            .values_list("order_item__product_id", "order_item__variant_id", "quantity")
+        ):
+            if variant_id:
+                variants[variant_id] += quantity
+            else:
+                products[product_id] += quantity
+        summary["restocked_units"] += RestockService.restock(
+            dict(products),
+            dict(variants),
+            user=admin_user,
+            reference="Retours clients",
+            notes=f"{len(received)} retour(s) réceptionné(s)",
+            sales=dict(products),
+        )
+
+        credits, refunds = [], []
+        already_refunded = set(
+            Refund.objects.filter(return_request_id__in=received).values_list(
+                "return_request_id", flat=True
+            )
+        )
+        for request in requests.values():
+            amount = request.approved_amount or request.requested_amount
+            if request.return_type == "store_credit":
+                credits.append(
+                    StoreCredit(
+                        user_id=request.user_id,
+                        amount=amount,
+                        balance=amount,
+                        reason=f"Retour {request.request_number}",
+                        return_request_id=request.pk,
+                    )
+                )
+            elif request.return_type == "refund" and request.pk not in already_refunded:
+                refunds.append(
+                    Refund(
+                        return_request_id=request.pk,
+                        refund_number=f"REF-{uuid.uuid4().hex[:8].upper()}",
+                        amount=amount,
+                        status="processing",
+                        processed_at=timezone.now(),
+                        processed_by=admin_user,
+                    )
+                )
+        StoreCredit.objects.bulk_create(credits, batch_size=cls.BATCH_SIZE)
+        Refund.objects.bulk_create(refunds, batch_size=cls.BATCH_SIZE)
+        summary["store_credits"] += len(credits)
+        summary["refunds"] += len(refunds)
+        summary["provider_refunds"] += cls._queue_provider_refunds(
+            [requests[refund.return_request_id] for refund in refunds], refunds
+        )
+
+        # Le remboursement reste à effectuer : la demande est en cours
+        pending_refund = {refund.return_request_id for refund in refunds}
+        now = timezone.now()
+        cls._set_status(
+            [pk for pk in received if pk not in pending_refund],
+            "completed",
+            admin_user,
+            "Articles réceptionnés",
+            completed_at=now,
+        )
+        cls._set_status(
+            list(pending_refund),
+            "processing",
+            admin_user,
+            "Articles réceptionnés, remboursement en cours",
+        )
+        summary["received"] += len(received)
+
+    @classmethod
+    def _queue_provider_refunds(cls, requests, refunds):
+        """
+        Transmet au système de paiement les remboursements des commandes
+        payées en ligne (une demande approuvée par transaction réussie)
+        """
+        from payment_system.models import PaymentTransaction, RefundRequest
+
+        transactions = {}
+        for order_id, transaction_id in (
+            PaymentTransaction.objects.filter(
+                order_id__in={request.order_id for request in requests},
+                status="completed",
+            )
+            .order_by("order_id", "-completed_at")
+            .values_list("order_id", "pk")
+        ):
+            transactions.setdefault(order_id, transaction_id)
+
+        rows = [
+            RefundRequest(
+                transaction_id=transactions[request.order_id],
+                user_id=request.user_id,
+                reason=cls.PROVIDER_REASONS.get(request.reason, "other"),
+                description=(
+                    f"{refund.refund_number} : retour {request.request_number}, "
+                    f"{refund.amount} FCFA"
+                ),
+                status="approved",
+            )
+            for request, refund in zip(requests, refunds)
+            if request.order_id in transactions
+        ]
+        RefundRequest.objects.bulk_create(rows, batch_size=cls.BATCH_SIZE)
+        return len(rows)
+
+    # Outils
+
+    @classmethod
+    def _lock(cls, ids, sources, summary):
+        """Verrouille les demandes et retourne celles dont le statut convient"""
+        allowed = []
+        for pk, status in (
+            ReturnRequest.objects.select_for_update()
+            .filter(pk__in=list(ids))
+            .order_by("pk")
+            .values_list("pk", "status")
+        ):
+            if status in sources:
+                allowed.append(pk)
+            else:
+                summary["skipped"][pk] = status
+        return allowed
+
+    @classmethod
+    def _set_status(cls, ids, status, admin_user, notes, sources=None, **fields):
+        """Écrit le statut et l'historique des demandes données"""
+        if sources is not None:
+            ids = list(
+                ReturnRequest.objects.filter(
+                    pk__in=ids, status__in=sources
+                ).values_list("pk", flat=True)
+            )
+        if not ids:
+            return []
+        for start in range(0, len(ids), cls.BATCH_SIZE):
+            ReturnRequest.objects.filter(
+                pk__in=ids[start : start + cls.BATCH_SIZE]
+            ).update(status=status, updated_at=timezone.now(), **fields)
+        if admin_user is not None:
+            ReturnStatusHistory.objects.bulk_create(
+                [
+                    ReturnStatusHistory(
+                        return_request_id=pk,
+                        status=status,
+                        notes=notes,
+                        changed_by=admin_user,
+                    )
+                    for pk in ids
+                ],
+                batch_size=cls.BATCH_SIZE,
+            )
+        return ids
+
+    @staticmethod
+    @contextmanager
+    def _timed(summary, step):
+        """Mesure la durée d'une étape du lot (en millisecondes)"""
+        start = time.perf_counter()
+        yield
+        summary["timings_ms"][step] = round((time.perf_counter() - start) * 1000, 2)
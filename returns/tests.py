@@ -0,0 +1,148 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from inventory.models import StockMovement
+from orders.models import Order, OrderItem
+from payment_system.models import PaymentMethod, PaymentTransaction, RefundRequest
+from products.models import Category, Product
+
+from .models import Refund, ReturnItem, ReturnRequest, ReturnStatusHistory, StoreCredit
+from .services import ReturnProcessingService
+
+User = get_user_model()
+
+
+class ReturnProcessingServiceTest(TestCase):
+    """Tests pour le traitement des retours par lots"""
+
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username="entrepot",
+            email="entrepot@example.com",
+            password="x",
+            is_staff=True,
+        )
+        self.user = User.objects.create_user(
+            username="retourclient", email="client@example.com", password="x"
+        )
+        vendor = User.objects.create_user(
+            username="retourvendeur", email="vendor@example.com", password="x"
+        )
+        category = Category.objects.create(name="Mode")
+        self.product = Product.objects.create(
+            name="Chemise",
+            description="Chemise",
+            vendor=vendor,
+            category=category,
+            price=Decimal("8000"),
+            stock=0,
+            sales_count=10,
+            status="archived",
+        )
+        method = PaymentMethod.objects.create(name="Orange Money")
+        self.requests = []
+        for index, (return_type, condition) in enumerate(
+            [("refund", "new"), ("refund", "used"), ("store_credit", "damaged")]
+        ):
+            order = Order.objects.create(
+                user=self.user,
+                shipping_first_name="Awa",
+                shipping_last_name="Koné",
+                shipping_phone="0700000000",
+                shipping_address="Rue 12",
+                shipping_city="Abidjan",
+                payment_method="orangemoney",
+                subtotal=Decimal("16000"),
+                total_amount=Decimal("16000"),
+            )
+            item = OrderItem.objects.create(
+                order=order,
+                product=self.product,
+                quantity=2,
+                unit_price=Decimal("8000"),
+                total_price=Decimal("16000"),
+            )
+            if index == 0:
+                PaymentTransaction.objects.create(
+                    order=order,
+                    user=self.user,
+                    payment_method=method,
+                    amount=Decimal("16000"),
+                    total_amount=Decimal("16000"),
+                    status="completed",
+                )
+            request = ReturnRequest.objects.create(
+                order=order,
+                user=self.user,
+                return_type=return_type,
+                reason="defective",
+                description="Couture défaite",
+                requested_amount=Decimal("16000"),
+            )
+            ReturnItem.objects.create(
+                return_request=request, order_item=item, quantity=2, condition=condition
+            )
+            self.requests.append(request)
+        self.ids = [request.pk for request in self.requests]
+
+    def test_process_batch(self):
+        summary = ReturnProcessingService.process_batch(
+            self.admin, approve=self.ids, receive=self.ids
+        )
+
+        self.assertEqual(summary["approved"], 3)
+        self.assertEqual(summary["received"], 3)
+        self.assertEqual(summary["restocked_units"], 4)
+        self.assertEqual(summary["store_credits"], 1)
+        self.assertEqual(summary["refunds"], 2)
+        self.assertEqual(summary["provider_refunds"], 1)
+        self.assertEqual(set(summary["timings_ms"]), {"approve", "receive"})
+
+        # Les articles endommagés ne sont pas remis en vente
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 4)
+        self.assertEqual(self.product.sales_count, 6)
+        self.assertEqual(self.product.status, "published")
+        self.assertEqual(StockMovement.objects.get().quantity, 4)
+
+        self.assertEqual(StoreCredit.objects.get().balance, Decimal("16000"))
+        self.assertEqual(RefundRequest.objects.get().status, "approved")
+        statuses = dict(ReturnRequest.objects.values_list("pk", "status"))
+        self.assertEqual(
+            [statuses[pk] for pk in self.ids], ["processing", "processing", "completed"]
+        )
+        self.assertEqual(ReturnStatusHistory.objects.count(), 6)
+
+        # Une demande déjà réceptionnée est ignorée
+        summary = ReturnProcessingService.receive(self.ids, self.admin)
+        self.assertEqual(summary["received"], 0)
+        self.assertEqual(len(summary["skipped"]), 3)
+
+        refund = Refund.objects.get(return_request=self.requests[0])
+        self.assertTrue(refund.complete("TX-42"))
+        self.requests[0].refresh_from_db()
+        self.assertEqual(self.requests[0].status, "completed")
+
+    def test_model_methods_and_command(self):
+        self.assertTrue(self.requests[0].approve(self.admin, Decimal("12000")))
+        self.assertEqual(self.requests[0].approved_amount, Decimal("12000"))
+        self.assertFalse(self.requests[0].reject(self.admin, "Hors délai"))
+
+        out = StringIO()
+        call_command(
+            "process_returns",
+            "--user=entrepot",
+            f"--reject={self.requests[1].request_number}",
+            "--reason=Hors délai",
+            f"--receive={self.requests[0].request_number}",
+            stdout=out,
+        )
+        self.assertIn("1 rejetée(s), 1 réceptionnée(s)", out.getvalue())
+        self.assertEqual(
+            Refund.objects.get(return_request=self.requests[0]).amount,
+            Decimal("12000"),
+        )
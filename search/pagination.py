@@ -0,0 +1,70 @@
+"""
+Pagination sans COUNT(*) pour les grandes tables
+"""
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+
+
+class CountlessPage(Page):
+    """
+    Page qui sait seulement s'il existe une page suivante (une ligne de plus
+    a été lue) ; le nombre total de pages n'est pas connu
+    """
+
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self.number > 1
+
+    def next_page_number(self):
+        if not self._has_next:
+            raise EmptyPage("Cette page est la dernière")
+        return self.number + 1
+
+    def start_index(self):
+        if not self.object_list:
+            return 0
+        return (self.number - 1) * self.paginator.per_page + 1
+
+    def end_index(self):
+        return self.start_index() + len(self.object_list) - 1 if self.object_list else 0
+
+
+class CountlessPaginator(Paginator):
+    """
+    Paginator qui lit ``per_page + 1`` lignes au lieu de compter le résultat.
+    Compatible avec ``ListView.paginator_class``. ``count`` et ``num_pages``
+    restent disponibles mais font un COUNT : ils ne sont utilisés que sur
+    demande explicite (``?page=last``), jamais par la navigation normale.
+    """
+
+    def validate_number(self, number):
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger("Le numéro de page n'est pas un entier")
+        if number < 1:
+            raise EmptyPage("Le numéro de page est inférieur à 1")
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom : bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage("Cette page ne contient aucun résultat")
+        return CountlessPage(
+            rows[: self.per_page], number, self, len(rows) > self.per_page
+        )
+
+    def get_page(self, number):
+        try:
+            return self.page(number)
+        except (PageNotAnInteger, EmptyPage):
+            return self.page(1)
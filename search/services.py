@@ -0,0 +1,133 @@
+"""
+Recherche d'administration sur les commandes et les produits
+"""
+from orders.models import Order
+from products.models import Product
+
+from .utils import normalize_search_text
+
+
+class AdminSearchService:
+    """
+    Recherche des écrans d'administration.
+
+    Chaque commande et chaque produit porte une colonne ``search_text``
+    normalisée (tenue à jour par les signaux de l'application search), indexée
+    en trigrammes sous PostgreSQL. Une recherche ne filtre donc qu'une seule
+    colonne, sans jointure ; les numéros de commande (``CMD-...``) et les SKU
+    (``SKU-...``) passent par un intervalle sur leur index unique.
+    """
+
+    ORDER_PREFIX = "CMD-"
+    SKU_PREFIX = "SKU-"
+    BATCH_SIZE = 500
+
+    # Bornes de l'intervalle de préfixe : utilisables par un index B-tree
+    # quel que soit le moteur (LIKE 'x%' ne l'est pas toujours)
+    _PREFIX_END = "\U0010ffff"
+
+    @staticmethod
+    def order_search_text(order):
+        user = order.user
+        return normalize_search_text(
+            order.order_number,
+            user.username,
+            user.email,
+            user.first_name,
+            user.last_name,
+            order.shipping_first_name,
+            order.shipping_last_name,
+        )
+
+    @staticmethod
+    def product_search_text(product):
+        return normalize_search_text(product.name, product.sku, product.vendor.username)
+
+    @classmethod
+    def _prefix_filter(cls, queryset, field, value):
+        return queryset.filter(
+            **{f"{field}__gte": value, f"{field}__lt": value + cls._PREFIX_END}
+        )
+
+    @staticmethod
+    def _terms_filter(queryset, query):
+        for term in normalize_search_text(query).split():
+            queryset = queryset.filter(search_text__contains=term)
+        return queryset
+
+    @classmethod
+    def search_orders(cls, query, queryset=None):
+        """
+        Commandes correspondant à la recherche : préfixe exact si la requête
+        est un numéro de commande, sinon tous les termes dans ``search_text``
+        """
+        queryset = Order.objects.all() if queryset is None else queryset
+        query = (query or "").strip()
+        if not query:
+            return queryset
+        if query.upper().startswith(cls.ORDER_PREFIX) and " " not in query:
+            return cls._prefix_filter(queryset, "order_number", query.upper())
+        return cls._terms_filter(queryset, query)
+
+    @classmethod
+    def search_products(cls, query, queryset=None):
+        """
+        Produits correspondant à la recherche : préfixe exact si la requête
+        est un SKU généré, sinon (ou si aucun SKU ne commence ainsi, par
+        exemple un SKU vendeur en minuscules) tous les termes dans
+        ``search_text``
+        """
+        queryset = Product.objects.all() if queryset is None else queryset
+        query = (query or "").strip()
+        if not query:
+            return queryset
+        if query.upper().startswith(cls.SKU_PREFIX) and " " not in query:
+            matches = cls._prefix_filter(queryset, "sku", query.upper())
+            if matches.exists():
+                return matches
+        return cls._terms_filter(queryset, query)
+
+    @classmethod
+    def refresh_orders(cls, queryset):
+        """Recalcule ``search_text`` des commandes données, par lots"""
+        updated = 0
+        batch = []
+        for order in queryset.select_related("user").iterator(
+            chunk_size=cls.BATCH_SIZE
+        ):
+            search_text = cls.order_search_text(order)
+            if search_text != order.search_text:
+                order.search_text = search_text
+                batch.append(order)
+            if len(batch) >= cls.BATCH_SIZE:
+                updated += Order.objects.bulk_update(batch, ["search_text"])
+                batch = []
+        if batch:
+            updated += Order.objects.bulk_update(batch, ["search_text"])
+        return updated
+
+    @classmethod
+    def refresh_products(cls, queryset):
+        """Recalcule ``search_text`` des produits donnés, par lots"""
+        updated = 0
+        batch = []
+        for product in queryset.select_related("vendor").iterator(
+            chunk_size=cls.BATCH_SIZE
+        ):
+            search_text = cls.product_search_text(product)
+            if search_text != product.search_text:
+                product.search_text = search_text
+                batch.append(product)
+            if len(batch) >= cls.BATCH_SIZE:
+                updated += Product.objects.bulk_update(batch, ["search_text"])
+                batch = []
+        if batch:
+            updated += Product.objects.bulk_update(batch, ["search_text"])
+        return updated
+
+    @classmethod
+    def refresh_user(cls, user):
+        """Répercute un changement de nom ou d'email sur ses commandes et produits"""
+        return cls.refresh_orders(
+            Order.objects.filter(user=user)
+        ) + cls.refresh_products(Product.objects.filter(vendor=user))
@@ -0,0 +1,75 @@
+"""
+Signaux Django pour l'application search
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+
+from orders.models import Order
+from products.models import Product
+
+from .services import AdminSearchService
+
+User = get_user_model()
+
+ORDER_SEARCH_FIELDS = {
+    "order_number",
+    "user",
+    "shipping_first_name",
+    "shipping_last_name",
+}
+PRODUCT_SEARCH_FIELDS = {"name", "sku", "vendor"}
+USER_SEARCH_FIELDS = {"username", "email", "first_name", "last_name"}
+
+
+@receiver(pre_save, sender=Order)
+def set_order_search_text(sender, instance, raw=False, **kwargs):
+    """Calcule le texte de recherche de la commande avant son écriture"""
+    if raw or kwargs.get("update_fields"):
+        return
+    instance.search_text = AdminSearchService.order_search_text(instance)
+
+
+@receiver(pre_save, sender=Product)
+def set_product_search_text(sender, instance, raw=False, **kwargs):
+    """Calcule le texte de recherche du produit avant son écriture"""
+    if raw or kwargs.get("update_fields"):
+        return
+    instance.search_text = AdminSearchService.product_search_text(instance)
+
+
+@receiver(post_save, sender=Order)
+def refresh_order_search_text(sender, instance, raw=False, **kwargs):
+    """
+    Sauvegarde partielle (``update_fields``) touchant un champ recherché :
+    le texte n'a pas été écrit avec la ligne, le mettre à jour à part
+    """
+    update_fields = kwargs.get("update_fields")
+    if raw or not update_fields or not set(update_fields) & ORDER_SEARCH_FIELDS:
+        return
+    instance.search_text = AdminSearchService.order_search_text(instance)
+    Order.objects.filter(pk=instance.pk).update(search_text=instance.search_text)
+
+
+@receiver(post_save, sender=Product)
+def refresh_product_search_text(sender, instance, raw=False, **kwargs):
+    """Même rattrapage que pour les commandes, pour les produits"""
+    update_fields = kwargs.get("update_fields")
+    if raw or not update_fields or not set(update_fields) & PRODUCT_SEARCH_FIELDS:
+        return
+    instance.search_text = AdminSearchService.product_search_text(instance)
+    Product.objects.filter(pk=instance.pk).update(search_text=instance.search_text)
+
+
+@receiver(post_save, sender=User)
+def refresh_user_search_text(sender, instance, created=False, raw=False, **kwargs):
+    """
+    Répercute un changement d'identité du client ou du vendeur sur ses
+    commandes et ses produits (rien à faire à la création)
+    """
+    if created or raw:
+        return
+    update_fields = kwargs.get("update_fields")
+    if update_fields and not set(update_fields) & USER_SEARCH_FIELDS:
+        return
+    AdminSearchService.refresh_user(instance)
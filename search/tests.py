@@ -0,0 +1,160 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from orders.models import Order
+from products.models import Category, Product
+
+from .pagination import CountlessPaginator
+from .services import AdminSearchService
+from .utils import normalize_search_text
+
+User = get_user_model()
+
+
+def create_order(user, **kwargs):
+    data = {
+        "user": user,
+        "shipping_first_name": "Aïcha",
+        "shipping_last_name": "Koné",
+        "shipping_phone": "0700000000",
+        "shipping_address": "Rue 12",
+        "shipping_city": "Abidjan",
+        "payment_method": "cash",
+        "subtotal": Decimal("1000.00"),
+        "total_amount": Decimal("1000.00"),
+    }
+    data.update(kwargs)
+    return Order.objects.create(**data)
+
+
+class AdminSearchServiceTest(TestCase):
+    """Tests pour la recherche d'administration"""
+
+    def setUp(self):
+        self.customer = User.objects.create_user(
+            username="searchclient",
+            email="client@example.com",
+            password="testpass123",
+            user_type="client",
+        )
+        self.vendor = User.objects.create_user(
+            username="searchvendor",
+            email="vendor@example.com",
+            password="testpass123",
+            user_type="vendeur",
+        )
+        self.category = Category.objects.create(name="Électronique")
+        self.product = Product.objects.create(
+            name="Téléphone Étoile",
+            description="Description",
+            vendor=self.vendor,
+            category=self.category,
+            price=100.00,
+            stock=10,
+            status="published",
+        )
+        self.order = create_order(self.customer)
+
+    def test_normalize_search_text(self):
+        """Minuscules, accents retirés, valeurs vides ignorées"""
+        self.assertEqual(
+            normalize_search_text("  Éloïse ", None, "KONÉ\tDiallo"),
+            "eloise kone diallo",
+        )
+
+    def test_search_orders_by_terms_and_prefix(self):
+        """Les termes sont cherchés sans accents ; CMD- passe par le préfixe"""
+        other = create_order(self.customer, shipping_first_name="Marc")
+
+        self.assertEqual(
+            list(AdminSearchService.search_orders("aicha KONE")), [self.order]
+        )
+        prefix = self.order.order_number[:7].lower()
+        self.assertIn(self.order, AdminSearchService.search_orders(prefix))
+        self.assertEqual(
+            list(AdminSearchService.search_orders(self.order.order_number)),
+            [self.order],
+        )
+        self.assertNotIn(other, AdminSearchService.search_orders("aicha"))
+
+    def test_search_text_follows_user_and_partial_saves(self):
+        """Un changement d'email client ou de nom produit est répercuté"""
+        self.customer.email = "nouveau@example.com"
+        self.customer.save()
+        self.assertIn(self.order, AdminSearchService.search_orders("nouveau@"))
+
+        self.product.name = "Casque sans fil"
+        self.product.save(update_fields=["name"])
+        self.assertEqual(
+            list(AdminSearchService.search_products("casque")), [self.product]
+        )
+        self.assertEqual(
+            list(AdminSearchService.search_products(self.product.sku)),
+            [self.product],
+        )
+
+    def test_search_products_by_vendor_sku(self):
+        """Un SKU vendeur en casse mixte reste trouvable"""
+        product = Product.objects.create(
+            name="T-shirt",
+            description="Description",
+            vendor=self.vendor,
+            category=self.category,
+            price=10,
+            sku="SKU-tshirt-red",
+        )
+        self.assertEqual(
+            list(AdminSearchService.search_products("SKU-tshirt")), [product]
+        )
+        self.assertEqual(
+            list(AdminSearchService.search_products("sku-TSHIRT-red")), [product]
+        )
+
+    def test_countless_paginator(self):
+        """La pagination lit une ligne de plus au lieu de compter"""
+        for _ in range(4):
+            create_order(self.customer)
+        paginator = CountlessPaginator(Order.objects.order_by("pk"), 2)
+
+        with self.assertNumQueries(1):
+            first = paginator.page(1)
+            self.assertTrue(first.has_next())
+        self.assertFalse(first.has_previous())
+        last = paginator.get_page(3)
+        self.assertEqual(len(last), 1)
+        self.assertFalse(last.has_next())
+        self.assertEqual(paginator.get_page(9).number, 1)
+
+        # ?page=last : un COUNT, uniquement sur demande
+        from django.test import RequestFactory
+
+        from orders.views import AdminOrderListView
+
+        request = RequestFactory().get("/orders/admin/", {"page": "last"})
+        request.user = User.objects.create_user(username="pager", is_staff=True)
+        view = AdminOrderListView()
+        view.setup(request)
+        paginator, page, orders, _ = view.paginate_queryset(view.get_queryset(), 3)
+        self.assertEqual(paginator.num_pages, 2)
+        self.assertEqual((page.number, len(orders)), (2, 2))
+
+    @override_settings(
+        STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage"
+    )
+    def test_admin_products_view(self):
+        """La liste d'administration des produits utilise la recherche indexée"""
+        admin = User.objects.create_user(
+            username="searchadmin",
+            email="admin@example.com",
+            password="testpass123",
+            is_staff=True,
+        )
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse("dashboard:admin_products"), {"search": "etoile"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context["products"]), [self.product])
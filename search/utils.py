@@ -0,0 +1,18 @@
+"""
+Utilitaires de l'application search
+"""
+import re
+import unicodedata
+
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_search_text(*values):
+    """
+    Texte de recherche normalisé : minuscules, sans accents, espaces réduits.
+    Les valeurs vides sont ignorées.
+    """
+    text = " ".join(str(value) for value in values if value)
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return _SPACES.sub(" ", text).strip().lower()
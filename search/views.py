@@ -9,6 +9,7 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 
 from accounts.models import User
+from analytics.buffers import get_write_buffer
 from products.models import Category, Product
 from search.models import SearchHistory, SearchSuggestion
 
@@ -34,15 +35,6 @@ def search_products(request):
             | Q(category__name__icontains=query)
         ).distinct()
 
-        # Enregistrer la recherche
-        if request.user.is_authenticated:
-            SearchHistory.objects.create(
-                user=request.user,
-                query=query,
-                results_count=products.count(),
-                ip_address=request.META.get("REMOTE_ADDR"),
-            )
-
     # Filtrage par catégorie
     if category_id:
         products = products.filter(category_id=category_id)
@@ -50,21 +42,21 @@ def search_products(request):
     # Filtrage par prix
     if min_price:
         try:
-            products = products.filter(price__gte=float(min_price))
+            products = products.filter(effective_price__gte=float(min_price))
         except ValueError:
             pass
 
     if max_price:
         try:
-            products = products.filter(price__lte=float(max_price))
+            products = products.filter(effective_price__lte=float(max_price))
         except ValueError:
             pass
 
     # Tri des produits
     if sort_by == "price_low":
-        products = products.order_by("price")
+        products = products.order_by("effective_price")
     elif sort_by == "price_high":
-        products = products.order_by("-price")
+        products = products.order_by("-effective_price")
     elif sort_by == "name":
         products = products.order_by("name")
     elif sort_by == "newest":
@@ -100,6 +92,18 @@ def search_products(request):
     paginator = Paginator(products, 12)
     page_obj = paginator.get_page(page)
 
+    # Enregistrer la recherche (écriture différée ; le nombre de résultats
+    # est celui déjà compté par la pagination)
+    if query and request.user.is_authenticated:
+        get_write_buffer().append(
+            SearchHistory(
+                user=request.user,
+                query=query[:255],
+                results_count=paginator.count,
+                ip_address=request.META.get("REMOTE_ADDR"),
+            )
+        )
+
     # Données pour les filtres
     categories = Category.objects.filter(is_active=True)
 
@@ -167,12 +171,10 @@ def update_search_suggestion(request):
     query = data.get("query", "").strip()
 
     if query:
-        suggestion, created = SearchSuggestion.objects.get_or_create(
-            query=query, defaults={"popularity": 1}
+        # Popularité cumulée puis appliquée par F() (analytics.buffers)
+        get_write_buffer().increment_by_key(
+            SearchSuggestion, "query", query[:255], "popularity"
         )
-        if not created:
-            suggestion.popularity += 1
-            suggestion.save()
 
     return JsonResponse({"status": "success"})
 
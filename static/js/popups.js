@@ -25,7 +25,9 @@ class PopupManager {
 
     async loadPopups() {
         try {
-            const response = await fetch('/popups/api/popups/');
+            // Ciblage évalué côté serveur ; réponse revalidée par ETag
+            const page = encodeURIComponent(window.location.pathname);
+            const response = await fetch(`/popups/api/popups/?page=${page}`);
             const data = await response.json();
 
             if (data.status === 'success') {
@@ -37,28 +39,31 @@ class PopupManager {
         }
     }
 
+    countPageView() {
+        // Nombre de pages vues pendant la session (déclencheur page_views)
+        try {
+            const views = parseInt(sessionStorage.getItem('popupPageViews') || '0', 10) + 1;
+            sessionStorage.setItem('popupPageViews', String(views));
+            return views;
+        } catch (error) {
+            return 1;
+        }
+    }
+
     schedulePopups() {
+        const pageViews = this.countPageView();
         this.popups.forEach(popup => {
-            if (this.shouldShowPopup(popup)) {
+            if (this.shouldShowPopup(popup, pageViews)) {
                 this.schedulePopup(popup);
             }
         });
     }
 
-    shouldShowPopup(popup) {
-        // Vérifier si le popup doit être affiché selon les conditions
-        const userType = this.getUserType();
-        const currentPage = window.location.pathname;
-
-        // Vérifier le type d'utilisateur
-        if (userType === 'authenticated' && !popup.show_to_authenticated) return false;
-        if (userType === 'anonymous' && !popup.show_to_anonymous) return false;
-
-        // Vérifier les pages
-        if (popup.pages && popup.pages.length > 0) {
-            if (!popup.pages.includes(currentPage)) return false;
+    shouldShowPopup(popup, pageViews) {
+        // Audience et pages sont filtrées par le serveur
+        if (popup.trigger_type === 'page_views') {
+            return pageViews >= popup.trigger_page_views;
         }
-
         return true;
     }
 
@@ -3,7 +3,13 @@ Configuration de l'administration pour l'authentification à deux facteurs
 """
 from django.contrib import admin
 
-from .models import TwoFactorAuth, TwoFactorCode, TwoFactorDevice, TwoFactorSession
+from .models import (
+    TwoFactorAuth,
+    TwoFactorBackupCode,
+    TwoFactorCode,
+    TwoFactorDevice,
+    TwoFactorSession,
+)
 
 
 @admin.register(TwoFactorAuth)
@@ -28,9 +34,25 @@ class TwoFactorAuthAdmin(admin.ModelAdmin):
 
 @admin.register(TwoFactorCode)
 class TwoFactorCodeAdmin(admin.ModelAdmin):
-    list_display = ["user", "code_type", "code", "is_used", "expires_at", "created_at"]
+    list_display = [
+        "user",
+        "code_type",
+        "attempts",
+        "is_used",
+        "expires_at",
+        "created_at",
+    ]
     list_filter = ["code_type", "is_used", "created_at"]
-    search_fields = ["user__username", "code"]
+    search_fields = ["user__username"]
+    exclude = ["code"]
+
+
+@admin.register(TwoFactorBackupCode)
+class TwoFactorBackupCodeAdmin(admin.ModelAdmin):
+    list_display = ["user", "used_at", "created_at"]
+    list_filter = ["used_at", "created_at"]
+    search_fields = ["user__username"]
+    exclude = ["code_hash"]
 
 
 @admin.register(TwoFactorSession)
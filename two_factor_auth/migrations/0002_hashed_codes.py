@@ -0,0 +1,125 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from two_factor_auth.services import TwoFactorVerificationService
+
+
+def hash_backup_codes(apps, schema_editor):
+    """
+    Remplace les codes de sauvegarde en clair (User.backup_codes et
+    TwoFactorAuth.backup_codes) par leurs empreintes et retire les codes
+    SMS/email en clair encore actifs
+    """
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split("."))
+    TwoFactorAuth = apps.get_model("two_factor_auth", "TwoFactorAuth")
+    TwoFactorBackupCode = apps.get_model("two_factor_auth", "TwoFactorBackupCode")
+    TwoFactorCode = apps.get_model("two_factor_auth", "TwoFactorCode")
+
+    codes = {}
+    for model, user_field in ((User, "pk"), (TwoFactorAuth, "user_id")):
+        rows = model.objects.exclude(backup_codes=[]).values_list(
+            user_field, "backup_codes"
+        )
+        for user_id, plain_codes in rows:
+            for code in plain_codes or []:
+                code_hash = TwoFactorVerificationService.hash_code(user_id, code)
+                codes[code_hash] = TwoFactorBackupCode(
+                    user_id=user_id, code_hash=code_hash
+                )
+        model.objects.exclude(backup_codes=[]).update(backup_codes=[])
+    TwoFactorBackupCode.objects.bulk_create(codes.values(), batch_size=500)
+    TwoFactorCode.objects.filter(is_used=False).update(is_used=True)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("accounts", "0003_user_backup_codes_user_two_factor_enabled_and_more"),
+        ("two_factor_auth", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="twofactorcode",
+            name="attempts",
+            field=models.PositiveSmallIntegerField(
+                default=0, verbose_name="Tentatives échouées"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="twofactorcode",
+            name="code",
+            field=models.CharField(blank=True, max_length=64, verbose_name="Code"),
+        ),
+        migrations.AlterField(
+            model_name="twofactorcode",
+            name="ip_address",
+            field=models.GenericIPAddressField(
+                blank=True, null=True, verbose_name="Adresse IP"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="twofactordevice",
+            name="ip_address",
+            field=models.GenericIPAddressField(
+                blank=True, null=True, verbose_name="Adresse IP"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="twofactordevice",
+            name="user_agent",
+            field=models.TextField(blank=True, verbose_name="User Agent"),
+        ),
+        migrations.AlterField(
+            model_name="twofactorsession",
+            name="ip_address",
+            field=models.GenericIPAddressField(
+                blank=True, null=True, verbose_name="Adresse IP"
+            ),
+        ),
+        migrations.CreateModel(
+            name="TwoFactorBackupCode",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "code_hash",
+                    models.CharField(
+                        max_length=64, unique=True, verbose_name="Empreinte"
+                    ),
+                ),
+                (
+                    "used_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Utilisé à"
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="two_factor_backup_codes",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Utilisateur",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Code de sauvegarde",
+                "verbose_name_plural": "Codes de sauvegarde",
+                "ordering": ["created_at"],
+            },
+        ),
+        migrations.RunPython(hash_backup_codes, migrations.RunPython.noop),
+    ]
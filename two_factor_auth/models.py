@@ -6,7 +6,6 @@ import io
 from datetime import timedelta
 
 import pyotp
-import qrcode
 from django.contrib.auth import get_user_model
 from django.core.validators import RegexValidator
 from django.db import models
@@ -100,6 +99,8 @@ class TwoFactorAuth(models.Model):
             name=self.user.email, issuer_name="KefyStore"
         )
 
+        import qrcode
+
         qr = qrcode.QRCode(version=1, box_size=10, border=5)
         qr.add_data(provisioning_uri)
         qr.make(fit=True)
@@ -122,28 +123,19 @@ class TwoFactorAuth(models.Model):
         return totp.verify(code, valid_window=1)
 
     def generate_backup_codes(self, count=10):
-        """Générer des codes de sauvegarde"""
-        import secrets
-        import string
-
-        codes = []
-        for _ in range(count):
-            code = "".join(
-                secrets.choice(string.ascii_uppercase + string.digits) for _ in range(8)
-            )
-            codes.append(code)
+        """
+        Générer des codes de sauvegarde (seules leurs empreintes sont
+        conservées, voir ``TwoFactorBackupCode``)
+        """
+        from .services import TwoFactorVerificationService
 
-        self.backup_codes = codes
-        self.save()
-        return codes
+        return TwoFactorVerificationService.generate_backup_codes(self.user, count)
 
     def verify_backup_code(self, code):
-        """Vérifier un code de sauvegarde"""
-        if code in self.backup_codes:
-            self.backup_codes.remove(code)
-            self.save()
-            return True
-        return False
+        """Vérifier (et consommer) un code de sauvegarde"""
+        from .services import TwoFactorVerificationService
+
+        return TwoFactorVerificationService.verify_backup_code(self.user, code)
 
     def is_method_verified(self, method):
         """Vérifier si une méthode est vérifiée"""
@@ -170,6 +162,11 @@ class TwoFactorAuth(models.Model):
         self.backup_codes = []
         self.save()
 
+        from .services import TwoFactorVerificationService
+
+        # Codes de sauvegarde, codes actifs et appareils de confiance
+        TwoFactorVerificationService.reset(self.user)
+
 
 class TwoFactorCode(models.Model):
     """Modèle pour les codes de vérification 2FA"""
@@ -191,7 +188,12 @@ class TwoFactorCode(models.Model):
     code_type = models.CharField(
         max_length=20, choices=CODE_TYPES, verbose_name="Type de code"
     )
-    code = models.CharField(max_length=10, verbose_name="Code")
+    # Empreinte du code (voir TwoFactorVerificationService.hash_code) ; vide
+    # pour les fenêtres de limitation des codes TOTP et de sauvegarde
+    code = models.CharField(max_length=64, blank=True, verbose_name="Code")
+    attempts = models.PositiveSmallIntegerField(
+        default=0, verbose_name="Tentatives échouées"
+    )
 
     # Expiration
     expires_at = models.DateTimeField(verbose_name="Expire à")
@@ -199,7 +201,9 @@ class TwoFactorCode(models.Model):
     used_at = models.DateTimeField(null=True, blank=True, verbose_name="Utilisé à")
 
     # Métadonnées
-    ip_address = models.GenericIPAddressField(verbose_name="Adresse IP")
+    ip_address = models.GenericIPAddressField(
+        null=True, blank=True, verbose_name="Adresse IP"
+    )
     user_agent = models.TextField(blank=True, verbose_name="User Agent")
 
     created_at = models.DateTimeField(auto_now_add=True)
@@ -235,47 +239,47 @@ class TwoFactorCode(models.Model):
 
     @classmethod
     def generate_sms_code(cls, user, phone_number, ip_address, user_agent=""):
-        """Générer un code SMS"""
-        import random
-
-        code = str(random.randint(100000, 999999))
-        expires_at = timezone.now() + timedelta(minutes=10)
+        """Générer un code SMS (retourne le code en clair, ou None si bloqué)"""
+        from .services import TwoFactorVerificationService
 
-        # Désactiver les anciens codes SMS
-        cls.objects.filter(user=user, code_type="sms", is_used=False).update(
-            is_used=True
-        )
-
-        return cls.objects.create(
-            user=user,
-            code_type="sms",
-            code=code,
-            expires_at=expires_at,
-            ip_address=ip_address,
-            user_agent=user_agent,
+        return TwoFactorVerificationService.issue_code(
+            user, "sms", ip_address=ip_address, user_agent=user_agent
         )
 
     @classmethod
     def generate_email_code(cls, user, ip_address, user_agent=""):
-        """Générer un code email"""
-        import random
-
-        code = str(random.randint(100000, 999999))
-        expires_at = timezone.now() + timedelta(minutes=15)
+        """Générer un code email (retourne le code en clair, ou None si bloqué)"""
+        from .services import TwoFactorVerificationService
 
-        # Désactiver les anciens codes email
-        cls.objects.filter(user=user, code_type="email", is_used=False).update(
-            is_used=True
+        return TwoFactorVerificationService.issue_code(
+            user, "email", ip_address=ip_address, user_agent=user_agent
         )
 
-        return cls.objects.create(
-            user=user,
-            code_type="email",
-            code=code,
-            expires_at=expires_at,
-            ip_address=ip_address,
-            user_agent=user_agent,
-        )
+
+class TwoFactorBackupCode(models.Model):
+    """
+    Code de sauvegarde à usage unique, conservé sous forme d'empreinte
+    (HMAC de l'utilisateur et du code) : la vérification est une recherche
+    sur l'index unique de l'empreinte.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="two_factor_backup_codes",
+        verbose_name="Utilisateur",
+    )
+    code_hash = models.CharField(max_length=64, unique=True, verbose_name="Empreinte")
+    used_at = models.DateTimeField(null=True, blank=True, verbose_name="Utilisé à")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Code de sauvegarde"
+        verbose_name_plural = "Codes de sauvegarde"
+        ordering = ["created_at"]
+
+    def __str__(self):
+        return f"Code de sauvegarde - {self.user.get_display_name()}"
 
 
 class TwoFactorSession(models.Model):
@@ -294,7 +298,9 @@ class TwoFactorSession(models.Model):
     is_verified = models.BooleanField(default=False, verbose_name="Vérifié")
 
     # Métadonnées
-    ip_address = models.GenericIPAddressField(verbose_name="Adresse IP")
+    ip_address = models.GenericIPAddressField(
+        null=True, blank=True, verbose_name="Adresse IP"
+    )
     user_agent = models.TextField(blank=True, verbose_name="User Agent")
     device_info = models.JSONField(
         default=dict, blank=True, verbose_name="Informations appareil"
@@ -366,13 +372,17 @@ class TwoFactorDevice(models.Model):
     device_type = models.CharField(
         max_length=20, choices=DEVICE_TYPES, verbose_name="Type d'appareil"
     )
+    # Empreinte du jeton de l'appareil (cookie signé) : la vérification est
+    # une recherche sur cet index unique
     device_fingerprint = models.CharField(
         max_length=100, unique=True, verbose_name="Empreinte appareil"
     )
 
     # Métadonnées
-    ip_address = models.GenericIPAddressField(verbose_name="Adresse IP")
-    user_agent = models.TextField(verbose_name="User Agent")
+    ip_address = models.GenericIPAddressField(
+        null=True, blank=True, verbose_name="Adresse IP"
+    )
+    user_agent = models.TextField(blank=True, verbose_name="User Agent")
     location = models.CharField(max_length=200, blank=True, verbose_name="Localisation")
 
     # Statut
@@ -0,0 +1,315 @@
+"""
+Services de l'application two_factor_auth
+"""
+import hashlib
+import hmac
+import secrets
+import string
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, Max, OuterRef
+from django.utils import timezone
+
+from .models import TwoFactorBackupCode, TwoFactorCode, TwoFactorDevice
+
+
+class TwoFactorVerificationService:
+    """
+    Vérification 2FA partagée entre les workers.
+
+    Tout l'état vit en base, jamais dans le cache local d'un processus :
+
+    - les codes SMS et email sont des lignes ``TwoFactorCode`` (empreinte du
+      code, expiration, compteur de tentatives échouées) ; la vérification
+      réussie est un seul UPDATE conditionnel ;
+    - les échecs TOTP et de codes de sauvegarde sont comptés sur une ligne
+      ``TwoFactorCode`` sans code qui sert de fenêtre de limitation ;
+    - les codes de sauvegarde sont des empreintes ``TwoFactorBackupCode``
+      consommées par un UPDATE sur leur index unique ;
+    - un appareil de confiance est reconnu par l'empreinte du jeton de son
+      cookie signé, en un UPDATE sur l'index unique ``device_fingerprint``.
+
+    Au-delà de ``MAX_ATTEMPTS`` échecs, la méthode est bloquée jusqu'à
+    l'expiration de la ligne concernée.
+    """
+
+    MAX_ATTEMPTS = 5
+
+    # Durée de validité des codes envoyés et des fenêtres de limitation
+    CODE_TTL = {
+        "sms": timedelta(minutes=10),
+        "email": timedelta(minutes=15),
+    }
+    LOCKOUT_WINDOW = timedelta(minutes=15)
+
+    BACKUP_CODE_COUNT = 10
+    BACKUP_CODE_ALPHABET = string.ascii_uppercase + string.digits
+
+    # Cookie signé des appareils de confiance
+    DEVICE_COOKIE = "2fa_device"
+    DEVICE_COOKIE_SALT = "two_factor_auth.device"
+    DEVICE_TRUST_DAYS = 30
+
+    @staticmethod
+    def hash_code(user_id, code):
+        """Empreinte (HMAC-SHA256) d'un code pour un utilisateur"""
+        message = f"{user_id}:{str(code).strip().upper()}".encode()
+        return hmac.new(
+            settings.SECRET_KEY.encode(), message, hashlib.sha256
+        ).hexdigest()
+
+    # Codes envoyés (SMS, email)
+
+    @classmethod
+    def issue_code(cls, user, code_type, ip_address=None, user_agent=""):
+        """
+        Crée un code à 6 chiffres et invalide les précédents. Retourne le code
+        en clair (à envoyer), ou None si la méthode est bloquée.
+        """
+        if cls.is_locked(user, code_type):
+            return None
+        code = "".join(secrets.choice(string.digits) for _ in range(6))
+        now = timezone.now()
+        with transaction.atomic():
+            previous = TwoFactorCode.objects.select_for_update().filter(
+                user=user, code_type=code_type, is_used=False
+            )
+            # Les échecs sur le code encore actif sont reportés sur le nouveau
+            attempts = (
+                previous.filter(expires_at__gt=now).aggregate(attempts=Max("attempts"))[
+                    "attempts"
+                ]
+                or 0
+            )
+            previous.update(is_used=True)
+            TwoFactorCode.objects.create(
+                user=user,
+                code_type=code_type,
+                code=cls.hash_code(user.pk, code),
+                attempts=attempts,
+                expires_at=now + cls.CODE_TTL.get(code_type, cls.LOCKOUT_WINDOW),
+                ip_address=ip_address,
+                user_agent=user_agent,
+            )
+        return code
+
+    @classmethod
+    def verify_code(cls, user, code_type, code):
+        """
+        Vérifie et consomme un code envoyé : une requête en cas de succès,
+        un incrément du compteur de tentatives sinon
+        """
+        if not code:
+            return False
+        now = timezone.now()
+        used = TwoFactorCode.objects.filter(
+            user=user,
+            code_type=code_type,
+            code=cls.hash_code(user.pk, code),
+            is_used=False,
+            expires_at__gt=now,
+            attempts__lt=cls.MAX_ATTEMPTS,
+        ).update(is_used=True, used_at=now)
+        if used:
+            return True
+        cls.register_failure(user, code_type)
+        return False
+
+    # TOTP
+
+    @classmethod
+    def verify_totp(cls, user, secret, code):
+        """Vérifie un code TOTP, sauf si la méthode est bloquée"""
+        import pyotp
+
+        if not secret or not code or cls.is_locked(user, "totp"):
+            return False
+        if pyotp.TOTP(secret).verify(str(code).strip(), valid_window=1):
+            return True
+        cls.register_failure(user, "totp")
+        return False
+
+    # Codes de sauvegarde
+
+    @classmethod
+    def generate_backup_codes(cls, user, count=None):
+        """
+        Remplace les codes de sauvegarde de l'utilisateur et retourne les
+        nouveaux codes en clair (ils ne sont affichés qu'une fois)
+        """
+        codes = [
+            "".join(secrets.choice(cls.BACKUP_CODE_ALPHABET) for _ in range(8))
+            for _ in range(count or cls.BACKUP_CODE_COUNT)
+        ]
+        with transaction.atomic():
+            TwoFactorBackupCode.objects.filter(user=user).delete()
+            TwoFactorBackupCode.objects.bulk_create(
+                [
+                    TwoFactorBackupCode(
+                        user=user, code_hash=cls.hash_code(user.pk, code)
+                    )
+                    for code in codes
+                ]
+            )
+        return codes
+
+    @classmethod
+    def verify_backup_code(cls, user, code):
+        """
+        Consomme un code de sauvegarde : un UPDATE sur l'index unique de
+        l'empreinte, conditionné à l'absence de blocage
+        """
+        if not code:
+            return False
+        now = timezone.now()
+        locked = TwoFactorCode.objects.filter(
+            user=OuterRef("user"),
+            code_type="backup",
+            is_used=False,
+            expires_at__gt=now,
+            attempts__gte=cls.MAX_ATTEMPTS,
+        )
+        used = (
+            TwoFactorBackupCode.objects.filter(
+                code_hash=cls.hash_code(user.pk, code), used_at__isnull=True
+            )
+            .filter(~Exists(locked))
+            .update(used_at=now)
+        )
+        if used:
+            return True
+        cls.register_failure(user, "backup")
+        return False
+
+    @staticmethod
+    def remaining_backup_codes(user):
+        """Nombre de codes de sauvegarde encore utilisables"""
+        return TwoFactorBackupCode.objects.filter(
+            user=user, used_at__isnull=True
+        ).count()
+
+    # Limitation des tentatives
+
+    @classmethod
+    def is_locked(cls, user, code_type):
+        """La méthode a-t-elle atteint le nombre maximal d'échecs ?"""
+        return TwoFactorCode.objects.filter(
+            user=user,
+            code_type=code_type,
+            is_used=False,
+            expires_at__gt=timezone.now(),
+            attempts__gte=cls.MAX_ATTEMPTS,
+        ).exists()
+
+    @classmethod
+    def register_failure(cls, user, code_type):
+        """
+        Compte un échec sur le code actif de la méthode, ou ouvre une fenêtre
+        de limitation si aucun code n'est actif (TOTP, codes de sauvegarde)
+        """
+        now = timezone.now()
+        updated = TwoFactorCode.objects.filter(
+            user=user, code_type=code_type, is_used=False, expires_at__gt=now
+        ).update(attempts=F("attempts") + 1)
+        if not updated:
+            TwoFactorCode.objects.create(
+                user=user,
+                code_type=code_type,
+                attempts=1,
+                expires_at=now + cls.LOCKOUT_WINDOW,
+            )
+
+    # Appareils de confiance
+
+    @classmethod
+    def trust_device(cls, user, user_agent="", ip_address=None, device_name=""):
+        """
+        Enregistre l'appareil courant et retourne le jeton à placer dans le
+        cookie signé ``DEVICE_COOKIE``
+        """
+        token = secrets.token_urlsafe(32)
+        lowered = user_agent.lower()
+        if "tablet" in lowered or "ipad" in lowered:
+            device_type = "tablet"
+        elif "mobile" in lowered or "android" in lowered:
+            device_type = "mobile"
+        elif user_agent:
+            device_type = "desktop"
+        else:
+            device_type = "other"
+        TwoFactorDevice.objects.create(
+            user=user,
+            device_name=(device_name or user_agent or "Appareil")[:100],
+            device_type=device_type,
+            device_fingerprint=cls.hash_code(user.pk, token),
+            ip_address=ip_address,
+            user_agent=user_agent,
+        )
+        return token
+
+    @classmethod
+    def is_trusted_device(cls, user, token):
+        """
+        L'appareil du jeton est-il de confiance pour cet utilisateur ? Une
+        requête sur l'index unique de l'empreinte, qui rafraîchit aussi sa
+        date de dernière utilisation
+        """
+        if not token:
+            return False
+        now = timezone.now()
+        return bool(
+            TwoFactorDevice.objects.filter(
+                device_fingerprint=cls.hash_code(user.pk, token),
+                user=user,
+                is_active=True,
+                is_trusted=True,
+                last_used__gte=now - timedelta(days=cls.DEVICE_TRUST_DAYS),
+            ).update(last_used=now)
+        )
+
+    @staticmethod
+    def client_metadata(request):
+        """Adresse IP et User Agent de la requête (pour les codes et appareils)"""
+        forwarded = request.META.get("HTTP_X_FORWARDED_FOR")
+        return {
+            "ip_address": (
+                forwarded.split(",")[0].strip()
+                if forwarded
+                else request.META.get("REMOTE_ADDR")
+            ),
+            "user_agent": request.META.get("HTTP_USER_AGENT", "")[:500],
+        }
+
+    @classmethod
+    def get_device_token(cls, request):
+        """Jeton d'appareil du cookie signé de la requête (ou None)"""
+        return request.get_signed_cookie(
+            cls.DEVICE_COOKIE, default=None, salt=cls.DEVICE_COOKIE_SALT
+        )
+
+    @classmethod
+    def set_device_cookie(cls, response, token):
+        """Place le jeton d'appareil dans un cookie signé"""
+        response.set_signed_cookie(
+            cls.DEVICE_COOKIE,
+            token,
+            salt=cls.DEVICE_COOKIE_SALT,
+            max_age=cls.DEVICE_TRUST_DAYS * 24 * 3600,
+            httponly=True,
+            secure=settings.SESSION_COOKIE_SECURE,
+            samesite="Lax",
+        )
+        return response
+
+    @staticmethod
+    def reset(user):
+        """Supprime codes de sauvegarde, codes actifs et appareils de confiance"""
+        with transaction.atomic():
+            TwoFactorBackupCode.objects.filter(user=user).delete()
+            # Les fenêtres de limitation (sans code) restent en place
+            TwoFactorCode.objects.filter(user=user, is_used=False).exclude(
+                code=""
+            ).update(is_used=True)
+            TwoFactorDevice.objects.filter(user=user).update(is_active=False)
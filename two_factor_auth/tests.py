@@ -1,3 +1,96 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from accounts.two_factor_service import TwoFactorService
+
+from .models import TwoFactorBackupCode, TwoFactorCode, TwoFactorDevice
+from .services import TwoFactorVerificationService
+
+User = get_user_model()
+
+
+class TwoFactorVerificationServiceTest(TestCase):
+    """Tests pour la vérification 2FA partagée entre les workers"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="double", email="double@example.com", password="secret-pass"
+        )
+
+    def test_sent_code_single_query_and_throttling(self):
+        code = TwoFactorVerificationService.issue_code(self.user, "email")
+        stored = TwoFactorCode.objects.get(user=self.user)
+        self.assertNotEqual(stored.code, code)
+
+        with self.assertNumQueries(1):
+            self.assertTrue(
+                TwoFactorVerificationService.verify_code(self.user, "email", code)
+            )
+        # Un code ne sert qu'une fois
+        self.assertFalse(
+            TwoFactorVerificationService.verify_code(self.user, "email", code)
+        )
+
+        code = TwoFactorVerificationService.issue_code(self.user, "email")
+        wrong = "000000" if code != "000000" else "111111"
+        for _ in range(TwoFactorVerificationService.MAX_ATTEMPTS):
+            self.assertFalse(
+                TwoFactorVerificationService.verify_code(self.user, "email", wrong)
+            )
+        # Bloqué : même le bon code est refusé et aucun nouveau code n'est émis
+        self.assertFalse(
+            TwoFactorVerificationService.verify_code(self.user, "email", code)
+        )
+        self.assertIsNone(TwoFactorVerificationService.issue_code(self.user, "email"))
+
+    def test_backup_codes_are_hashed(self):
+        codes = TwoFactorVerificationService.generate_backup_codes(self.user)
+        self.assertEqual(len(codes), 10)
+        self.assertFalse(
+            TwoFactorBackupCode.objects.filter(code_hash__in=codes).exists()
+        )
+
+        with self.assertNumQueries(1):
+            self.assertTrue(
+                TwoFactorVerificationService.verify_backup_code(self.user, codes[0])
+            )
+        self.assertFalse(TwoFactorService.verify_backup_code(self.user, codes[0]))
+        self.assertEqual(
+            TwoFactorVerificationService.remaining_backup_codes(self.user), 9
+        )
+
+    def test_trusted_device_skips_second_factor(self):
+        self.user.two_factor_enabled = True
+        self.user.save()
+        token = TwoFactorVerificationService.trust_device(
+            self.user, user_agent="Mozilla/5.0 (Android) Mobile", ip_address="10.0.0.1"
+        )
+        self.assertEqual(TwoFactorDevice.objects.get().device_type, "mobile")
+        with self.assertNumQueries(1):
+            self.assertTrue(
+                TwoFactorVerificationService.is_trusted_device(self.user, token)
+            )
+        other = User.objects.create_user(username="autre", password="x")
+        self.assertFalse(TwoFactorVerificationService.is_trusted_device(other, token))
+
+        # Cookie signé posé sur la réponse, relu par la requête suivante
+        response = TwoFactorVerificationService.set_device_cookie(HttpResponse(), token)
+        request = RequestFactory().get("/")
+        request.COOKIES[TwoFactorVerificationService.DEVICE_COOKIE] = response.cookies[
+            TwoFactorVerificationService.DEVICE_COOKIE
+        ].value
+        self.assertEqual(TwoFactorVerificationService.get_device_token(request), token)
+
+        self.client.cookies[
+            TwoFactorVerificationService.DEVICE_COOKIE
+        ] = request.COOKIES[TwoFactorVerificationService.DEVICE_COOKIE]
+        response = self.client.post(
+            reverse("accounts:login"),
+            {"username": "double", "password": "secret-pass"},
+        )
+        self.assertNotEqual(
+            response.get("Location"), reverse("accounts:two_factor_required")
+        )
+        self.assertIn("_auth_user_id", self.client.session)
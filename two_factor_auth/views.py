@@ -5,8 +5,6 @@ from datetime import datetime, timedelta
 from io import BytesIO
 
 import pyotp
-import qrcode
-import qrcode.image.svg
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import login, logout
@@ -24,7 +22,8 @@ from django.views.generic import CreateView, DetailView, ListView, UpdateView
 
 from accounts.models import User
 
-from .models import TwoFactorAuth, TwoFactorCode, TwoFactorDevice, TwoFactorSession
+from .models import TwoFactorAuth, TwoFactorDevice, TwoFactorSession
+from .services import TwoFactorVerificationService
 
 logger = logging.getLogger(__name__)
 
@@ -34,11 +33,14 @@ def setup_2fa(request):
     """Configurer l'authentification à deux facteurs"""
 
     # Vérifier si l'utilisateur a déjà configuré 2FA
-    if hasattr(request.user, "twofactorauth") and request.user.twofactorauth.is_enabled:
+    if (
+        hasattr(request.user, "two_factor_auth")
+        and request.user.two_factor_auth.is_enabled
+    ):
         messages.info(
             request, "L'authentification à deux facteurs est déjà configurée."
         )
-        return redirect("two_factor_auth:verify_2fa")
+        return redirect("two_factor_auth:verify")
 
     if request.method == "POST":
         # Générer une clé secrète
@@ -47,16 +49,11 @@ def setup_2fa(request):
         # Créer ou mettre à jour l'enregistrement 2FA
         two_factor_auth, created = TwoFactorAuth.objects.get_or_create(
             user=request.user,
-            defaults={
-                "secret_key": secret_key,
-                "is_enabled": False,
-                "backup_codes": generate_backup_codes(),
-            },
+            defaults={"totp_secret": secret_key, "is_enabled": False},
         )
 
         if not created:
-            two_factor_auth.secret_key = secret_key
-            two_factor_auth.backup_codes = generate_backup_codes()
+            two_factor_auth.totp_secret = secret_key
             two_factor_auth.save()
 
         # Générer le QR code
@@ -65,7 +62,9 @@ def setup_2fa(request):
             name=request.user.email, issuer_name=settings.SITE_NAME or "E-commerce Site"
         )
 
-        # Créer le QR code
+        # Créer le QR code (qrcode et PIL chargés à la demande)
+        import qrcode
+
         qr = qrcode.QRCode(
             version=1,
             error_correction=qrcode.constants.ERROR_CORRECT_L,
@@ -86,7 +85,10 @@ def setup_2fa(request):
             "secret_key": secret_key,
             "qr_code": img_str,
             "provisioning_uri": provisioning_uri,
-            "backup_codes": two_factor_auth.backup_codes,
+            # Codes affichés une seule fois : seules leurs empreintes sont gardées
+            "backup_codes": TwoFactorVerificationService.generate_backup_codes(
+                request.user
+            ),
         }
 
         return render(request, "two_factor_auth/setup_2fa.html", context)
@@ -107,19 +109,17 @@ def verify_2fa_setup(request):
 
         try:
             two_factor_auth = TwoFactorAuth.objects.get(user=request.user)
-            totp = pyotp.TOTP(two_factor_auth.secret_key)
 
-            if totp.verify(code, valid_window=1):
+            if TwoFactorVerificationService.verify_totp(
+                request.user, two_factor_auth.totp_secret, code
+            ):
                 # Activer 2FA
                 two_factor_auth.is_enabled = True
+                two_factor_auth.totp_verified = True
                 two_factor_auth.save()
 
                 # Créer une session 2FA
-                TwoFactorSession.objects.create(
-                    user=request.user,
-                    session_key=request.session.session_key,
-                    expires_at=timezone.now() + timedelta(hours=24),
-                )
+                create_verified_session(request, request.user)
 
                 messages.success(
                     request, "Authentification à deux facteurs activée avec succès !"
@@ -146,8 +146,12 @@ def backup_codes(request):
     try:
         two_factor_auth = TwoFactorAuth.objects.get(user=request.user, is_enabled=True)
 
+        # Les codes ne sont plus lisibles : seul le nombre restant est affiché
         context = {
-            "backup_codes": two_factor_auth.backup_codes,
+            "two_factor_auth": two_factor_auth,
+            "remaining_codes": TwoFactorVerificationService.remaining_backup_codes(
+                request.user
+            ),
         }
 
         return render(request, "two_factor_auth/backup_codes.html", context)
@@ -161,11 +165,14 @@ def regenerate_backup_codes(request):
     """Régénérer les codes de sauvegarde"""
     try:
         two_factor_auth = TwoFactorAuth.objects.get(user=request.user, is_enabled=True)
-        two_factor_auth.backup_codes = generate_backup_codes()
-        two_factor_auth.save()
+        codes = two_factor_auth.generate_backup_codes()
 
         messages.success(request, "Codes de sauvegarde régénérés avec succès.")
-        return redirect("two_factor_auth:backup_codes")
+        return render(
+            request,
+            "two_factor_auth/backup_codes.html",
+            {"two_factor_auth": two_factor_auth, "backup_codes": codes},
+        )
     except TwoFactorAuth.DoesNotExist:
         messages.error(request, "Configuration 2FA introuvable.")
         return redirect("two_factor_auth:setup_2fa")
@@ -177,8 +184,8 @@ def verify_2fa(request):
 
     # Vérifier si l'utilisateur a 2FA activé
     if (
-        not hasattr(request.user, "twofactorauth")
-        or not request.user.twofactorauth.is_enabled
+        not hasattr(request.user, "two_factor_auth")
+        or not request.user.two_factor_auth.is_enabled
     ):
         messages.info(request, "L'authentification à deux facteurs n'est pas activée.")
         return redirect("accounts:profile")
@@ -206,20 +213,10 @@ def verify_2fa(request):
             )
 
             if use_backup_code:
-                # Vérifier le code de sauvegarde
-                if code in two_factor_auth.backup_codes:
-                    # Supprimer le code de sauvegarde utilisé
-                    backup_codes = two_factor_auth.backup_codes
-                    backup_codes.remove(code)
-                    two_factor_auth.backup_codes = backup_codes
-                    two_factor_auth.save()
-
+                # Vérifier (et consommer) le code de sauvegarde
+                if TwoFactorVerificationService.verify_backup_code(request.user, code):
                     # Créer une session 2FA
-                    TwoFactorSession.objects.create(
-                        user=request.user,
-                        session_key=request.session.session_key,
-                        expires_at=timezone.now() + timedelta(hours=24),
-                    )
+                    create_verified_session(request, request.user)
 
                     messages.success(
                         request, "Authentification réussie avec le code de sauvegarde."
@@ -230,15 +227,11 @@ def verify_2fa(request):
                     return render(request, "two_factor_auth/verify_2fa.html")
             else:
                 # Vérifier le code TOTP
-                totp = pyotp.TOTP(two_factor_auth.secret_key)
-
-                if totp.verify(code, valid_window=1):
+                if TwoFactorVerificationService.verify_totp(
+                    request.user, two_factor_auth.totp_secret, code
+                ):
                     # Créer une session 2FA
-                    TwoFactorSession.objects.create(
-                        user=request.user,
-                        session_key=request.session.session_key,
-                        expires_at=timezone.now() + timedelta(hours=24),
-                    )
+                    create_verified_session(request, request.user)
 
                     messages.success(
                         request, "Authentification à deux facteurs réussie !"
@@ -277,8 +270,7 @@ def disable_2fa(request):
 
         try:
             two_factor_auth = TwoFactorAuth.objects.get(user=request.user)
-            two_factor_auth.is_enabled = False
-            two_factor_auth.save()
+            two_factor_auth.disable_2fa()
 
             # Supprimer les sessions 2FA
             TwoFactorSession.objects.filter(user=request.user).delete()
@@ -318,28 +310,21 @@ def add_trusted_device(request):
 
     if request.method == "POST":
         device_name = request.POST.get("device_name")
-        device_type = request.POST.get("device_type", "browser")
 
         if not device_name:
             messages.error(request, "Veuillez entrer un nom pour l'appareil.")
             return redirect("two_factor_auth:manage_devices")
 
-        # Récupérer les informations de l'appareil
-        user_agent = request.META.get("HTTP_USER_AGENT", "")
-        ip_address = get_client_ip(request)
-
-        # Créer l'appareil de confiance
-        device = TwoFactorDevice.objects.create(
-            user=request.user,
-            name=device_name,
-            device_type=device_type,
-            user_agent=user_agent,
-            ip_address=ip_address,
-            is_active=True,
+        # Créer l'appareil de confiance ; son jeton est gardé dans un cookie signé
+        token = TwoFactorVerificationService.trust_device(
+            request.user,
+            device_name=device_name,
+            **TwoFactorVerificationService.client_metadata(request),
         )
 
         messages.success(request, f"Appareil '{device_name}' ajouté avec succès.")
-        return redirect("two_factor_auth:manage_devices")
+        response = redirect("two_factor_auth:manage_devices")
+        return TwoFactorVerificationService.set_device_cookie(response, token)
 
     return redirect("two_factor_auth:manage_devices")
 
@@ -355,7 +340,9 @@ def remove_trusted_device(request, device_id):
         device.is_active = False
         device.save()
 
-        messages.success(request, f"Appareil '{device.name}' supprimé avec succès.")
+        messages.success(
+            request, f"Appareil '{device.device_name}' supprimé avec succès."
+        )
     except TwoFactorDevice.DoesNotExist:
         messages.error(request, "Appareil introuvable.")
     except Exception as e:
@@ -402,16 +389,19 @@ def send_2fa_code(request):
 
         user = User.objects.get(id=user_id)
 
-        # Générer un code temporaire
-        code = generate_temporary_code()
+        if method not in ("email", "sms"):
+            return JsonResponse(
+                {"status": "error", "message": "Méthode non supportée"}, status=400
+            )
 
-        # Enregistrer le code
-        TwoFactorCode.objects.create(
-            user=user,
-            code=code,
-            method=method,
-            expires_at=timezone.now() + timedelta(minutes=10),
+        # Générer et enregistrer le code (empreinte en base)
+        code = TwoFactorVerificationService.issue_code(
+            user, method, **TwoFactorVerificationService.client_metadata(request)
         )
+        if code is None:
+            return JsonResponse(
+                {"status": "error", "message": "Trop de tentatives"}, status=429
+            )
 
         # Envoyer le code (implémentation selon la méthode)
         if method == "email":
@@ -432,27 +422,20 @@ def send_2fa_code(request):
         )
 
 
-def generate_backup_codes():
-    """Générer des codes de sauvegarde"""
-    import secrets
-    import string
-
-    codes = []
-    for _ in range(10):
-        code = "".join(
-            secrets.choice(string.ascii_uppercase + string.digits) for _ in range(8)
-        )
-        codes.append(code)
-
-    return codes
-
-
-def generate_temporary_code():
-    """Générer un code temporaire"""
-    import secrets
-    import string
-
-    return "".join(secrets.choice(string.digits) for _ in range(6))
+def create_verified_session(request, user):
+    """Enregistrer la session courante comme vérifiée par 2FA"""
+    if not request.session.session_key:
+        request.session.save()
+    metadata = TwoFactorVerificationService.client_metadata(request)
+    TwoFactorSession.objects.update_or_create(
+        session_key=request.session.session_key,
+        defaults={
+            "user": user,
+            "is_verified": True,
+            "expires_at": timezone.now() + timedelta(hours=24),
+            **metadata,
+        },
+    )
 
 
 def get_client_ip(request):
@@ -505,18 +488,23 @@ class TwoFactorLoginView(LoginView):
         """Rediriger vers la vérification 2FA après connexion"""
         user = form.get_user()
 
-        # Vérifier si l'utilisateur a 2FA activé
-        if hasattr(user, "twofactorauth") and user.twofactorauth.is_enabled:
+        # Vérifier si l'utilisateur a 2FA activé (sauf appareil de confiance)
+        if (
+            hasattr(user, "two_factor_auth")
+            and user.two_factor_auth.is_enabled
+            and not TwoFactorVerificationService.is_trusted_device(
+                user, TwoFactorVerificationService.get_device_token(self.request)
+            )
+        ):
             # Stocker l'utilisateur dans la session temporairement
             self.request.session["temp_user_id"] = user.id
-            return redirect("two_factor_auth:verify_2fa")
+            return redirect("two_factor_auth:login")
         else:
             # Connexion normale
             login(self.request, user)
             return redirect("accounts:profile")
 
 
-@login_required
 def login_2fa(request):
     """Page de connexion avec 2FA"""
 
@@ -543,18 +531,15 @@ def login_2fa(request):
 
         try:
             two_factor_auth = TwoFactorAuth.objects.get(user=user, is_enabled=True)
-            totp = pyotp.TOTP(two_factor_auth.secret_key)
 
-            if totp.verify(code, valid_window=1):
+            if TwoFactorVerificationService.verify_totp(
+                user, two_factor_auth.totp_secret, code
+            ):
                 # Connexion réussie
                 login(request, user)
 
                 # Créer une session 2FA
-                TwoFactorSession.objects.create(
-                    user=user,
-                    session_key=request.session.session_key,
-                    expires_at=timezone.now() + timedelta(hours=24),
-                )
+                create_verified_session(request, user)
 
                 # Nettoyer la session temporaire
                 del request.session["temp_user_id"]